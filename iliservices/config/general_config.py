@@ -32,6 +32,14 @@ LOG_FILE_PATH = ''
 
 USE_ILIVALIDATOR_DEBUG_MODE = False
 
+# Opt-in: run ili2db jobs in a pool of warm JVMs instead of starting a new JVM per operation
+USE_ILI2DB_WORKER_POOL = False
+ILI2DB_WORKER_POOL_SIZE = 2  # Max. number of warm JVMs per ili2db tool (ili2pg, ili2gpkg)
+ILI2DB_WORKER_MAX_JOBS = 25  # A worker JVM is recycled after running this number of jobs
+ILI2DB_WORKER_MAX_IDLE_TIME = 300  # Seconds an idle worker JVM is kept alive
+
+ILI2DB_BATCH_MAX_WORKERS = 4  # Max. number of concurrent ili2db jobs in batch operations
+
 CTM12_PG_SCRIPT_PATH = os.path.join(APP_DIR, 'resources', 'sql', 'insert_ctm12_pg.sql')
 CTM12_GPKG_SCRIPT_PATH = os.path.join(APP_DIR, 'resources', 'sql', 'insert_ctm12_gpkg.sql')
 
@@ -44,3 +52,21 @@ ILISERVICES_DB_PASS = os.environ.get("ILISERVICES_DB_PASS")
 ILISERVICES_DB_PORT = os.environ.get("ILISERVICES_DB_PORT")
 ILISERVICES_DB_HOST = os.environ.get("ILISERVICES_DB_HOST")
 
+# Connections to PostgreSQL are pooled and shared by all connectors using the same connection parameters
+PG_POOL_MIN_SIZE = 1  # Idle connections per pool that are never closed
+PG_POOL_MAX_SIZE = 10  # Max. number of open connections per pool
+PG_POOL_MAX_IDLE_TIME = 300  # Seconds an idle connection (beyond PG_POOL_MIN_SIZE) is kept open
+PG_POOL_HEALTH_CHECK_INTERVAL = 30  # Seconds a recently used connection is trusted without asking the server
+PG_POOL_CHECKOUT_TIMEOUT = 30  # Seconds to wait for a free connection when the pool is exhausted
+PG_STREAM_ITERSIZE = 2000  # Rows fetched per round trip by queries streamed through server-side cursors
+
+# ili2db metadata (models, basket handling, ili2db version) of each schema is cached by the DB connectors. It's
+# invalidated after schema imports and updates, this TTL handles changes made by other processes.
+DB_METADATA_SNAPSHOT_TTL = 300
+# Max. number of DB connections tested at the same time by bulk connection checks. Keep it below PG_POOL_MAX_SIZE
+DB_CHECK_MAX_WORKERS = 8
+
+# Read-only GeoPackage connections (e.g., for inspecting or exporting big delivered GeoPackages)
+GPKG_READ_MMAP_SIZE = 268435456  # Bytes of the file that are memory-mapped (256 MiB)
+GPKG_READ_CACHE_SIZE = -65536  # Page cache size. Negative values are in KiB (64 MiB)
+
@@ -1,3 +1,9 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from PyQt5.QtCore import (QObject)
 
 
@@ -9,6 +15,7 @@ from ..config.general_config import (DEFAULT_TOML_FILE,
 from ..config.ili2db_names import ILI2DBNames
 from ..config.config_db_supported import ConfigDBsSupported
 from ..modelbaker.iliwrapper.ilicache import IliCache
+from ..modelbaker.iliwrapper.iliworkerpool import IliWorkerPool
 
 from ..modelbaker.iliwrapper.ili2dbconfig import (BaseConfiguration,
                                                   SchemaImportConfiguration,
@@ -27,7 +34,12 @@ from ..config.general_config import (FULL_JAVA_EXE_PATH,
                                      USE_CUSTOM_MODEL_DIR,
                                      CUSTOM_MODEL_DIR,
                                      USE_ILI2DB_DEBUG_MODE,
-                                     LOG_FILE_PATH)
+                                     LOG_FILE_PATH,
+                                     USE_ILI2DB_WORKER_POOL,
+                                     ILI2DB_WORKER_POOL_SIZE,
+                                     ILI2DB_WORKER_MAX_JOBS,
+                                     ILI2DB_WORKER_MAX_IDLE_TIME,
+                                     ILI2DB_BATCH_MAX_WORKERS)
 
 import logging
 from ..config.logging_config import setup_logging
@@ -50,6 +62,7 @@ class Ili2DB(QObject):
 
         self._base_configuration = None
         self._ilicache = None
+        self._worker_pool = None
         self._log = ''
 
     def _get_base_configuration(self):
@@ -81,6 +94,17 @@ class Ili2DB(QObject):
 
         return self._base_configuration
 
+    def _get_worker_pool(self):
+        """
+        :return: IliWorkerPool shared by all operations of this object, or None if the worker pool is disabled.
+        """
+        if USE_ILI2DB_WORKER_POOL and not self._worker_pool:
+            self._worker_pool = IliWorkerPool(ILI2DB_WORKER_POOL_SIZE,
+                                              ILI2DB_WORKER_MAX_JOBS,
+                                              ILI2DB_WORKER_MAX_IDLE_TIME)
+
+        return self._worker_pool
+
     def get_import_schema_configuration(self, db, ili_models=list(), create_basket_col=False):
         db_factory = self.dbs_supported.get_db_factory(db.engine)
 
@@ -187,6 +211,7 @@ class Ili2DB(QObject):
         importer = iliimporter.Importer()
         importer.tool = db_factory.get_model_baker_db_ili_mode()
         importer.configuration = configuration
+        importer.worker_pool = self._get_worker_pool()
 
         # Run!
         res = True
@@ -206,6 +231,8 @@ class Ili2DB(QObject):
             logger.error(msg)
             res = False
 
+        db.invalidate_metadata_snapshot()  # Models and settings might have changed
+
         self._show_log_process_info('END IMPORT SCHEMA')
 
         return res, msg
@@ -221,6 +248,7 @@ class Ili2DB(QObject):
         importer = iliimporter.Importer(dataImport=True)
         importer.tool = db_factory.get_model_baker_db_ili_mode()
         importer.configuration = configuration
+        importer.worker_pool = self._get_worker_pool()
 
         # Run!
         res = True
@@ -244,6 +272,65 @@ class Ili2DB(QObject):
 
         return res, msg
 
+    def import_data_batch(self, jobs, max_workers=ILI2DB_BATCH_MAX_WORKERS, disable_validation=False):
+        """
+        Import many XTF files concurrently, each one into its own dataset.
+
+        Jobs that write into the same target (i.e., the same PG schema or the same GPKG file) never run at the same
+        time, they are run one after the other in the given order. Jobs with different targets run in parallel, each
+        one in its own ili2db process.
+
+        :param jobs: List of tuples (db, xtf_path, dataset).
+        :param max_workers: Max. number of ili2db jobs running at the same time.
+        :param disable_validation: Whether to disable the ili2db validation for all jobs.
+        :return: tuple(results, elapsed_time). results is a list of (res, msg) tuples in the same order as jobs and
+                 elapsed_time is the total wall-clock time in seconds. A job that raises an error gets a failed result,
+                 the remaining jobs are run anyway.
+        """
+        self._show_log_process_info('START BATCH IMPORT DATA')
+        start_time = time.time()
+
+        # Prepare configurations here, since DB connections (e.g., sqlite3) can't be shared among threads
+        results = [None] * len(jobs)
+        groups = OrderedDict()  # {target_key: [(job_index, db, configuration), ...]}
+        for index, (db, xtf_path, dataset) in enumerate(jobs):
+            try:
+                configuration = self.get_import_data_configuration(db, xtf_path, dataset,
+                                                                   disable_validation=disable_validation)
+            except Exception as e:
+                results[index] = self._get_batch_job_error(xtf_path, e)
+                continue
+            groups.setdefault(self._get_db_target_key(db), list()).append((index, db, configuration))
+
+        self._get_worker_pool()  # Create it (if enabled) before it's shared among threads
+
+        def run_group(group_jobs):
+            for job_index, job_db, job_configuration in group_jobs:
+                try:
+                    results[job_index] = self.import_data(job_db, job_configuration)
+                except Exception as e:
+                    results[job_index] = self._get_batch_job_error(job_configuration.xtffile, e)
+
+        logger.info("Importing {} XTF files into {} targets ({} jobs at most at the same time)...".format(
+            len(jobs), len(groups), max_workers))
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for future in [executor.submit(run_group, group_jobs) for group_jobs in groups.values()]:
+                future.result()
+
+        elapsed_time = time.time() - start_time
+        logger.info("{} of {} XTF files imported successfully in {:.2f} seconds.".format(
+            len([res for res, msg in results if res]), len(jobs), elapsed_time))
+
+        self._show_log_process_info('END BATCH IMPORT DATA')
+
+        return results, elapsed_time
+
+    @staticmethod
+    def _get_batch_job_error(xtf_path, error):
+        msg = "An error occurred when importing the XTF '{}': {}".format(xtf_path, error)
+        logger.exception(msg)
+        return False, msg
+
     def export(self, db, configuration: ExportConfiguration):
 
         self._show_log_process_info('START EXPORT DATA')
@@ -254,6 +341,7 @@ class Ili2DB(QObject):
         exporter = iliexporter.Exporter()
         exporter.tool = db_factory.get_model_baker_db_ili_mode()
         exporter.configuration = configuration
+        exporter.worker_pool = self._get_worker_pool()
 
         # Run!
         res = True
@@ -288,6 +376,7 @@ class Ili2DB(QObject):
         updater = iliupdater.Updater()
         updater.tool = db_factory.get_model_baker_db_ili_mode()
         updater.configuration = configuration
+        updater.worker_pool = self._get_worker_pool()
 
         # Run!
         res = True
@@ -310,6 +399,8 @@ class Ili2DB(QObject):
             logger.error(msg)
             res = False
 
+        db.invalidate_metadata_snapshot()
+
         self._show_log_process_info('END UPDATE DATA')
         return res, msg
 
@@ -324,6 +415,7 @@ class Ili2DB(QObject):
         validator = ili2dbvalidator.Ili2dbValidator()
         validator.tool = db_factory.get_model_baker_db_ili_mode()
         validator.configuration = configuration
+        validator.worker_pool = self._get_worker_pool()
 
         # Run!
         res = True
@@ -350,6 +442,151 @@ class Ili2DB(QObject):
 
         return res, msg
 
+    async def aimport_schema(self, db, configuration: SchemaImportConfiguration, timeout=None):
+        """
+        Coroutine version of import_schema. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ili2db can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        db_factory = self.dbs_supported.get_db_factory(db.engine)
+        importer = iliimporter.Importer()
+        importer.tool = db_factory.get_model_baker_db_ili_mode()
+        importer.configuration = configuration
+
+        logger.info("Creating INTERLIS model structure into {}...".format(db.engine.upper()))
+        try:
+            return await self._arun_executor(importer,
+                                             timeout,
+                                             "Schema import ran successfully!",
+                                             "An error occurred when importing a schema into a DB (check the logs).")
+        finally:
+            db.invalidate_metadata_snapshot()
+
+    async def aimport_data(self, db, configuration: ImportDataConfiguration, timeout=None):
+        """
+        Coroutine version of import_data. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ili2db can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        db_factory = self.dbs_supported.get_db_factory(db.engine)
+        importer = iliimporter.Importer(dataImport=True)
+        importer.tool = db_factory.get_model_baker_db_ili_mode()
+        importer.configuration = configuration
+
+        logger.info("Importing XTF into {}...".format(db.engine.upper()))
+        return await self._arun_executor(importer,
+                                         timeout,
+                                         "XTF '{}' imported successfully!".format(configuration.xtffile),
+                                         "An error occurred when importing from XTF (check the logs).")
+
+    async def aexport(self, db, configuration: ExportConfiguration, timeout=None):
+        """
+        Coroutine version of export. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ili2db can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        db_factory = self.dbs_supported.get_db_factory(db.engine)
+        exporter = iliexporter.Exporter()
+        exporter.tool = db_factory.get_model_baker_db_ili_mode()
+        exporter.configuration = configuration
+
+        logger.info("Exporting from {} to XTF...".format(db.engine.upper()))
+        return await self._arun_executor(exporter,
+                                         timeout,
+                                         "XTF '{}' exported successfully!".format(configuration.xtffile),
+                                         "An error occurred when exporting data to XTF (check the logs).")
+
+    async def aupdate(self, db, configuration: UpdateDataConfiguration, timeout=None):
+        """
+        Coroutine version of update. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ili2db can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        db_factory = self.dbs_supported.get_db_factory(db.engine)
+        updater = iliupdater.Updater()
+        updater.tool = db_factory.get_model_baker_db_ili_mode()
+        updater.configuration = configuration
+
+        logger.info("Updating {} DB from XTF '{}'...".format(db.engine.upper(), configuration.xtffile))
+        try:
+            return await self._arun_executor(updater,
+                                             timeout,
+                                             "DB updated successfully from XTF file '{}'!".format(
+                                                 configuration.xtffile),
+                                             "An error occurred when updating the DB from an XTF (check the logs).")
+        finally:
+            db.invalidate_metadata_snapshot()
+
+    async def avalidate(self, db, configuration: ValidateConfiguration, timeout=None):
+        """
+        Coroutine version of validate. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ili2db can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        db_factory = self.dbs_supported.get_db_factory(db.engine)
+        validator = ili2dbvalidator.Ili2dbValidator()
+        validator.tool = db_factory.get_model_baker_db_ili_mode()
+        validator.configuration = configuration
+
+        logger.info("Validating data from '{}' DB...".format(db.get_description_conn_string()))
+        return await self._arun_executor(validator,
+                                         timeout,
+                                         "Data successfully validated from DB '{}'!".format(
+                                             db.get_description_conn_string()),
+                                         "An error occurred when validating data from a DB (check the logs).",
+                                         (ili2dbvalidator.Ili2dbValidator.SUCCESS,
+                                          ili2dbvalidator.Ili2dbValidator.SUCCESS_WITH_VALIDATION_ERRORS))
+
+    @staticmethod
+    async def _arun_executor(executor, timeout, success_msg, error_msg, success_codes=None):
+        """
+        Runs an IliExecutable in the running event loop.
+
+        asyncio.CancelledError is not handled here, so that callers can cancel the operation as usual.
+
+        :return: tuple(res, msg)
+        """
+        if success_codes is None:
+            success_codes = (executor.SUCCESS,)
+
+        res = True
+        msg = success_msg
+        try:
+            if await executor.arun(timeout) not in success_codes:
+                msg = error_msg
+                res = False
+                logger.error(msg)
+                logger.critical(executor.output.text())
+            else:
+                logger.info(msg)
+        except asyncio.TimeoutError:
+            msg = "The ili2db operation was cancelled, it took more than {} seconds.".format(timeout)
+            logger.error(msg)
+            res = False
+        except Exception as e:
+            msg = "Java {} could not be found. You can configure the JAVA_HOME environment variable manually and try again.".format(JAVA_REQUIRED_VERSION)
+            logger.critical(e)
+            logger.error(msg)
+            res = False
+
+        return res, msg
+
+    @staticmethod
+    def _get_db_target_key(db):
+        """
+        :return: Hashable key that identifies where ili2db writes to (PG schema or GPKG file).
+        """
+        params = db.dict_conn_params
+        if db.engine == 'gpkg':
+            return db.engine, os.path.normcase(os.path.realpath(params['dbfile']))
+
+        return db.engine, params.get('host'), str(params.get('port')), params.get('database'), params.get('schema')
+
     @staticmethod
     def _show_log_process_info(msg):
         logger.info('*' * 10 + msg + '*' * 10)
@@ -1,3 +1,5 @@
+import asyncio
+import copy
 import os
 import logging
 import tempfile
@@ -61,7 +63,8 @@ class IliValidator(QObject):
             logger.critical("Working directory not exists")
             raise Exception("Working directory does not have write permissions")
 
-        configuration = self._get_configuration()
+        # Copy it, so that several validations can be configured before running them (e.g., concurrently)
+        configuration = copy.copy(self._get_configuration())
         configuration.xtf_file = xtf_file_path
         configuration.output_dir = output_dir
 
@@ -89,7 +92,7 @@ class IliValidator(QObject):
                 logger.error(msg)
         except Exception as e:
             msg = ("Java {} could not be found. You can configure the JAVA_HOME " +
-                   "environment variable manually and try again.".format(JAVA_REQUIRED_VERSION))
+                   "environment variable manually and try again.").format(JAVA_REQUIRED_VERSION)
             logger.critical(e)
             logger.error(msg)
             res = False
@@ -98,6 +101,38 @@ class IliValidator(QObject):
 
         return res, msg
 
+    async def avalidate_xtf(self, configuration: IliValidatorConfiguration, timeout=None):
+        """
+        Coroutine version of validate_xtf. The java process is killed if the coroutine is cancelled.
+
+        :param timeout: Max. number of seconds ilivalidator can run, or None to wait until it ends.
+        :return: tuple(res, msg)
+        """
+        validator = ilivalidator.IliValidator()
+        validator.configuration = configuration
+
+        res = True
+        msg = "Validator ran successfully!"
+        logger.info("Validating XTF file '{}'".format(configuration.xtf_file))
+
+        try:
+            if await validator.arun(timeout) != ilivalidator.IliValidator.SUCCESS:
+                msg = "An error occurred when try to validate the xtf file (check the logs)."
+                res = False
+                logger.error(msg)
+        except asyncio.TimeoutError:
+            msg = "The validation was cancelled, it took more than {} seconds.".format(timeout)
+            logger.error(msg)
+            res = False
+        except Exception as e:
+            msg = ("Java {} could not be found. You can configure the JAVA_HOME " +
+                   "environment variable manually and try again.").format(JAVA_REQUIRED_VERSION)
+            logger.critical(e)
+            logger.error(msg)
+            res = False
+
+        return res, msg
+
     @staticmethod
     def _show_log_process_info(msg):
         logger.info('*' * 10 + msg + '*' * 10)
\ No newline at end of file
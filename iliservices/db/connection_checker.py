@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ..config.enums import (EnumTestLevel,
+                            EnumUserLevel,
+                            EnumTestConnectionMsg)
+from ..config.general_config import (DB_CHECK_MAX_WORKERS,
+                                     PG_POOL_MAX_SIZE)
+
+logger = logging.getLogger(__name__)
+
+
+def test_connections(dbs, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={},
+                     max_workers=DB_CHECK_MAX_WORKERS):
+    """
+    Runs test_connection on many DBs (PG schemas and GPKG files) concurrently.
+
+    Each DB is checked with its own copy of the given connector, so that the given connectors are left untouched and
+    GPKG connections are open in the thread that uses them. PG connections come from the pool shared by all connectors
+    to the same database (see pg_connection_pool), so checking many schemas of a database doesn't open a connection
+    per schema.
+
+    :param dbs: List of DB connectors.
+    :param test_level: (EnumTestLevel) level of the checks, as in test_connection.
+    :param user_level: (EnumUserLevel) level of permissions a user has, as in test_connection.
+    :param models: Models required for the DB connections, as in test_connection.
+    :param max_workers: Max. number of DBs checked at the same time. It's capped below PG_POOL_MAX_SIZE, so that checks
+                        borrowing pooled connections never wait for each other.
+    :return: tuple(results, elapsed_time). results is a list of dicts, in the same order as dbs, with keys:
+             'db' (the given connector), 'res', 'code' and 'msg' (as returned by test_connection), 'stages' (ordered
+             dict {level name: seconds} with the levels that were checked) and 'elapsed' (seconds for the whole
+             check). elapsed_time is the total wall-clock time in seconds.
+    """
+    start_time = time.perf_counter()
+
+    max_workers = max(1, min(max_workers, PG_POOL_MAX_SIZE - 1))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda db: _test_connection(db, test_level, user_level, models), dbs))
+
+    elapsed_time = time.perf_counter() - start_time
+    logger.info("{} of {} DB connections tested successfully in {:.2f} seconds.".format(
+        len([result for result in results if result['res']]), len(dbs), elapsed_time))
+
+    return results, elapsed_time
+
+
+def _test_connection(db, test_level, user_level, models):
+    stages = OrderedDict()
+    start_time = time.perf_counter()
+    db_copy = type(db)(None, conn_dict=db.dict_conn_params)
+    try:
+        res, code, msg = db_copy.test_connection(test_level, user_level, models, stage_times=stages)
+    except Exception as e:
+        logger.warning("Unexpected error testing the connection to {}: {}".format(db.get_display_conn_string(), e))
+        res, code, msg = False, EnumTestConnectionMsg.UNKNOWN_CONNECTION_ERROR, str(e)
+    finally:
+        db_copy.close_connection()  # PG connections go back to their pool
+
+    return {'db': db,
+            'res': res,
+            'code': code,
+            'msg': msg,
+            'stages': stages,
+            'elapsed': time.perf_counter() - start_time}
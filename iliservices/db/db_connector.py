@@ -15,11 +15,18 @@
  *                                                                         *
  ***************************************************************************/
 """
+import time
+
 from PyQt5.QtCore import QObject
 
 from ..config.enums import (EnumTestLevel,
                             EnumUserLevel,
                             EnumTestConnectionMsg)
+from .db_metadata import (get_cached_metadata_snapshot,
+                          set_cached_metadata_snapshot,
+                          invalidate_metadata_snapshots)
+from .model_hierarchy import (get_model_hierarchy,
+                              parse_model_hierarchy)
 
 
 class DBConnector(QObject):
@@ -85,6 +92,77 @@ class DBConnector(QObject):
     def get_models(self, schema=None):
         raise NotImplementedError
 
+    def get_metadata_snapshot(self, refresh=False):
+        """
+        Gets the ili2db metadata of the schema (models, basket handling, ili2db version). It's read in a single query
+        and cached (per schema, shared by all connectors) until it's invalidated or it expires.
+
+        :param refresh: Read the metadata from the DB, even if there is a cached snapshot.
+        :return: DBMetadataSnapshot
+        """
+        key = self._get_metadata_key()
+        if not refresh:
+            snapshot = get_cached_metadata_snapshot(key)
+            if snapshot is not None:
+                return snapshot
+
+        snapshot = self._read_metadata_snapshot()
+        if snapshot.metadata_exists:  # Not INTERLIS (yet), don't cache it, a schema import might be on the way
+            set_cached_metadata_snapshot(key, snapshot)
+
+        return snapshot
+
+    def invalidate_metadata_snapshot(self):
+        """
+        Discards the cached metadata of the schema. Call it after operations that change the ili2db metadata, like
+        schema imports or updates.
+        """
+        invalidate_metadata_snapshots(self._get_metadata_key())
+
+    def _get_metadata_key(self):
+        """
+        :return: Hashable key that identifies the schema (or file) whose metadata is cached.
+        """
+        raise NotImplementedError
+
+    def _read_metadata_snapshot(self):
+        """
+        :return: DBMetadataSnapshot read from the DB.
+        """
+        raise NotImplementedError
+
+    def iterate_sql_query(self, query, batch_size=None):
+        """
+        Executes a SQL statement whose results are streamed instead of being loaded into memory at once.
+
+        :param query: SQL Statement
+        :param batch_size: If None, rows are yielded one by one. Otherwise, rows are yielded in batches of (at most)
+                           batch_size rows, as dicts {column name: list of values}.
+        :return: tuple(bool, result). result is a generator of rows or batches if the statement could be executed, or
+                 the error otherwise.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _iterate_cursor(cursor, batch_size):
+        """
+        Yields the rows of an executed cursor one by one, or in column batches if batch_size is given. The cursor is
+        closed at the end (or when the generator is closed).
+        """
+        try:
+            if batch_size is None:
+                for row in cursor:
+                    yield row
+            else:
+                rows = cursor.fetchmany(batch_size)
+                # Columns are read after fetching, server-side cursors don't describe them before
+                columns = [column[0] for column in cursor.description] if rows else list()
+                while rows:
+                    yield {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+                    rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
+
     def get_display_conn_string(self):
         # Do not use to connect to a DB, only for display purposes
         tmp_dict_conn_params = self._dict_conn_params.copy()
@@ -123,12 +201,27 @@ class DBConnector(QObject):
         """
         raise NotImplementedError
 
-    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={}):
+    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={},
+                        stage_times=None):
         """
         'Template method' subclasses should overwrite it, proposing their own way to test a connection.
         """
         raise NotImplementedError
 
+    @staticmethod
+    def _run_test_stage(stage_times, stage, test_function, *args):
+        """
+        Runs a step of test_connection, storing how long it took in stage_times (if given).
+
+        :return: Whatever test_function returns.
+        """
+        start_time = time.perf_counter()
+        try:
+            return test_function(*args)
+        finally:
+            if stage_times is not None:
+                stage_times[stage] = time.perf_counter() - start_time
+
     def _test_connection_to_db(self):
         raise NotImplementedError
 
@@ -147,18 +240,21 @@ class DBConnector(QObject):
         :param lst_models: The list of values stored in the DB meta attrs model table (column 'modelname').
         :return: Dict of model dependencies.
         """
-        model_hierarchy = dict()
-        for str_model in lst_models:
-            parts = str_model.split("}")
-            if len(parts) > 1:  # With dependencies
-                for part in parts:
-                    if part:  # The last element of parts is ''
-                        model, dependencies = part.split("{")
-                        model_hierarchy[model.strip()] = dependencies.strip().split(" ")
-            elif len(parts) == 1:  # No dependencies
-                model_hierarchy[parts[0].strip()] = list()
+        return parse_model_hierarchy(lst_models)
 
-        return model_hierarchy
+    @staticmethod
+    def _resolve_models(lst_models, trafo_models):
+        """
+        Gets the models of a schema: those used in t_ili2db_trafo, plus their dependencies found in t_ili2db_model.
+
+        The dependency graph is memoized by the content of t_ili2db_model, and so are the results per set of trafo
+        models.
+
+        :param lst_models: The list of values stored in the DB meta attrs model table (column 'modelname').
+        :param trafo_models: The list of model names found in t_ili2db_trafo.
+        :return: List of model names.
+        """
+        return get_model_hierarchy(lst_models).resolve(trafo_models)
 
 
 class FileDB(DBConnector):
@@ -175,7 +271,8 @@ class FileDB(DBConnector):
         """
         raise NotImplementedError
 
-    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={}):
+    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={},
+                        stage_times=None):
         """We check several levels in order:
             1. FILE SERVER (DB file)
             2. DB
@@ -189,19 +286,20 @@ class FileDB(DBConnector):
         :param models: A dict of model prefixes that are required for this DB connection. If key is REQUIRED_MODELS,
                        models are mandatory, whereas if keys are ROLE_SUPPORTED_MODELS and ROLE_HIDDEN_MODELS, we test
                        the DB has at list all hidden (base) models and at least one non-hidden one.
+        :param stage_times: Optional dict, filled with the seconds each checked level took ({level name: seconds}).
         :return Triple: boolean result, message code, message text
         """
         is_schema_import = bool(test_level & EnumTestLevel.SCHEMA_IMPORT)
-        res, code, msg = self._test_db_file(is_schema_import)
+        res, code, msg = self._run_test_stage(stage_times, 'file', self._test_db_file, is_schema_import)
         if not res or test_level == EnumTestLevel.SERVER_OR_FILE or is_schema_import:
             return res, code, msg
 
-        res, code, msg = self._test_connection_to_db()
+        res, code, msg = self._run_test_stage(stage_times, 'db', self._test_connection_to_db)
 
         if not res or test_level == EnumTestLevel.DB or test_level == EnumTestLevel.DB_FILE:
             return res, code, msg
 
-        res, code, msg = self._test_connection_to_interlis_model(models)
+        res, code, msg = self._run_test_stage(stage_times, 'interlis', self._test_connection_to_interlis_model, models)
 
         if not res or test_level == EnumTestLevel.INTERLIS:
             return res, code, msg
@@ -219,7 +317,8 @@ class ClientServerDB(DBConnector):
     def _test_connection_to_schema(self, user_level):
         raise NotImplementedError
 
-    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={}):
+    def test_connection(self, test_level=EnumTestLevel.INTERLIS, user_level=EnumUserLevel.CONNECT, models={},
+                        stage_times=None):
         """We check several levels in order:
             1. SERVER
             2. DB
@@ -232,17 +331,18 @@ class ClientServerDB(DBConnector):
         :param models: A list of model prefixes that are required for this DB connection. If key is REQUIRED_MODELS,
                        models are mandatory, whereas if keys are ROLE_SUPPORTED_MODELS and ROLE_HIDDEN_MODELS, we test
                        the DB has at list all hidden (base) models and at least one non-hidden one.
+        :param stage_times: Optional dict, filled with the seconds each checked level took ({level name: seconds}).
         :return Triple: boolean result, message code, message text
         """
         if test_level == EnumTestLevel.SERVER_OR_FILE:
-            return self._test_connection_to_server()
+            return self._run_test_stage(stage_times, 'server', self._test_connection_to_server)
 
-        res, code, msg = self._test_connection_to_db()
+        res, code, msg = self._run_test_stage(stage_times, 'db', self._test_connection_to_db)
 
         if not res or test_level == EnumTestLevel.DB:
             return res, code, msg
 
-        res, code, msg = self._test_connection_to_schema(user_level)
+        res, code, msg = self._run_test_stage(stage_times, 'schema', self._test_connection_to_schema, user_level)
 
         if test_level & EnumTestLevel.SCHEMA_IMPORT:
             return True, EnumTestConnectionMsg.CONNECTION_TO_DB_SUCCESSFUL_NO_LADM_COL, "Connection successful!"
@@ -250,7 +350,7 @@ class ClientServerDB(DBConnector):
         if not res or test_level == EnumTestLevel.DB_SCHEMA:
             return res, code, msg
 
-        res, code, msg = self._test_connection_to_interlis_model(models)
+        res, code, msg = self._run_test_stage(stage_times, 'interlis', self._test_connection_to_interlis_model, models)
 
         if not res or test_level == EnumTestLevel.INTERLIS:
             return res, code, msg
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from ..config.general_config import DB_METADATA_SNAPSHOT_TTL
+
+
+class DBMetadataSnapshot:
+    """
+    ili2db metadata of a DB schema (or GPKG file), as read at a given time.
+
+    :param metadata_exists: Whether the ili2db metadata tables exist (i.e., it's an INTERLIS schema).
+    :param models: List of models in the schema (including their dependencies), as returned by get_models().
+    :param trafo_models: List of models found in t_ili2db_trafo.
+    :param basket_col: Whether the schema was created with basket handling.
+    :param ili2db_version: Major version of ili2db that created the schema (3 or 4), or -1 if unknown.
+    """
+
+    def __init__(self, metadata_exists=False, models=None, trafo_models=None, basket_col=False, ili2db_version=-1):
+        self.metadata_exists = metadata_exists
+        self.models = models or list()
+        self.trafo_models = trafo_models or list()
+        self.basket_col = basket_col
+        self.ili2db_version = ili2db_version
+        self.loaded_at = time.monotonic()
+
+    def is_expired(self, ttl=DB_METADATA_SNAPSHOT_TTL):
+        return time.monotonic() - self.loaded_at > ttl
+
+
+_snapshots = dict()  # {metadata key: DBMetadataSnapshot}
+_snapshots_lock = threading.Lock()
+
+
+def get_cached_metadata_snapshot(key):
+    """
+    :return: Snapshot stored for the given key or None if there is none or if it expired.
+    """
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None and snapshot.is_expired():
+            del _snapshots[key]
+            snapshot = None
+
+    return snapshot
+
+
+def set_cached_metadata_snapshot(key, snapshot):
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+
+
+def invalidate_metadata_snapshots(key=None):
+    """
+    :param key: Metadata key of the schema whose snapshot should be discarded. If None, all snapshots are discarded.
+    """
+    with _snapshots_lock:
+        if key is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop(key, None)
@@ -24,6 +24,9 @@ from ..config.ili2db_keys import *
 from ..config.ili2db_names import ILI2DBNames
 from .db_connector import (FileDB,
                            DBConnector)
+from .db_metadata import DBMetadataSnapshot
+from .gpkg_read_connections import (get_file_signature,
+                                    get_shared_read_connection)
 
 import logging
 
@@ -34,7 +37,9 @@ class GPKGConnector(FileDB):
 
     _PROVIDER_NAME = 'ogr'
     _DEFAULT_VALUES = {
-        'dbfile': ''
+        'dbfile': '',
+        'read_only': False,  # Read-optimized connection, shared by all connectors reading the same file
+        'immutable': False  # Only for read_only connections to files nobody writes to (e.g., delivered GPKGs)
     }
 
     def __init__(self, uri, conn_dict=dict()):
@@ -42,12 +47,19 @@ class GPKGConnector(FileDB):
         self.engine = 'gpkg'
         self.conn = None
         self.provider = 'ogr'
+        self._conn_file_id = None  # (st_dev, st_ino) of the file self.conn was open for
 
     @DBConnector.uri.setter
     def uri(self, value):
-        self._dict_conn_params = {'dbfile': value}
+        self._dict_conn_params = {'dbfile': value,
+                                  'read_only': False,
+                                  'immutable': False}
         self._uri = value
 
+    @property
+    def read_only(self):
+        return bool(self._dict_conn_params.get('read_only'))
+
     def _get_ili2db_names(self):
         dict_names = dict()
         # Custom names
@@ -80,53 +92,65 @@ class GPKGConnector(FileDB):
         return bool(cursor.fetchall())
 
     def _metadata_exists(self):
-        return self._table_exists(ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG)
+        return self.get_metadata_snapshot().metadata_exists
 
     def has_basket_col(self):
-        if self.conn is None:
-            res, msg = self.open_connection()
-            if not res:
-                logger.warning(msg)
-                return False
+        return self.get_metadata_snapshot().basket_col
 
-        cursor = self.conn.cursor()
-        cursor.execute("""SELECT *
-                          FROM t_ili2db_settings
-                          WHERE tag='{}' AND setting='{}';""".format(ILI2DBNames.BASKET_COL_TAG, ILI2DBNames.BASKET_COL_VALUE))
+    def get_models(self, schema=None):
+        res_models = list(self.get_metadata_snapshot().models)
+        logger.debug("Models found: {}".format(res_models))
 
-        return bool(cursor.fetchall())
+        return res_models
+
+    def _get_metadata_key(self):
+        # The inode tells apart a GPKG that was deleted and created again under the same path
+        try:
+            inode = os.stat(self._uri).st_ino
+        except OSError:
+            inode = None
 
-    def get_models(self):
+        return 'gpkg', os.path.realpath(self._uri), inode
+
+    def _read_metadata_snapshot(self):
         if self.conn is None:
             res, msg = self.open_connection()
             if not res:
                 logger.warning(msg)
-                return list()
+                return DBMetadataSnapshot()
+
+        # Everything in a single query. If the ili2db tables are not there, the query fails.
+        query = """
+            SELECT
+                (SELECT count(*) FROM pragma_table_info('{metadata_table}')) AS metadata_columns,
+                (SELECT group_concat(modelname, char(31)) FROM t_ili2db_model) AS model_names,
+                (SELECT group_concat(modelname, char(31)) FROM
+                    (SELECT DISTINCT substr(iliname, 1, instr(iliname, '.') - 1) AS modelname
+                     FROM t_ili2db_trafo)) AS trafo_models,
+                (SELECT count(*) FROM t_ili2db_settings
+                 WHERE tag = '{tag}' AND setting = '{value}') AS basket_settings,
+                (SELECT count(*) FROM pragma_table_info('t_ili2db_attrname') WHERE name = 'owner') AS ili2db_v3_columns
+        """.format(metadata_table=ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG,
+                   tag=ILI2DBNames.BASKET_COL_TAG,
+                   value=ILI2DBNames.BASKET_COL_VALUE)
 
-        # First go for all models registered in t_ili2db_model
         cursor = self.conn.cursor()
-        result = cursor.execute("""SELECT modelname FROM t_ili2db_model;""")
-        model_hierarchy = dict()
-        if result is not None:
-            all_models = [db_model['modelname'] for db_model in result]
-            model_hierarchy = self._parse_models_from_db_meta_attrs(all_models)
-
-        # Now go for all models listed in t_ili2db_trafo
-        result = cursor.execute("""SELECT distinct substr(iliname, 1, pos-1) AS modelname from 
-                                   (SELECT *, instr(iliname,'.') AS pos FROM t_ili2db_trafo)""")
-        trafo_models = list()
-        if result is not None:
-            trafo_models = [db_model['modelname'] for db_model in result]
-
-        # Finally, using those obtained from t_ili2db_trafo, go for dependencies found in t_ili2db_model
-        dependencies = list()
-        for model in trafo_models:
-            dependencies.extend(model_hierarchy.get(model, list()))
-
-        res_models = list(set(dependencies + trafo_models))
-        logger.debug("Models found: {}".format(res_models))
-
-        return res_models
+        try:
+            metadata_columns, model_names, trafo_models, basket_settings, ili2db_v3_columns = \
+                cursor.execute(query).fetchone()
+        except sqlite3.OperationalError:
+            return DBMetadataSnapshot(metadata_exists=self._table_exists(ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG),
+                                      ili2db_version=self._read_ili2db_version())
+        finally:
+            cursor.close()
+
+        model_names = model_names.split(chr(31)) if model_names else list()
+        trafo_models = trafo_models.split(chr(31)) if trafo_models else list()
+        return DBMetadataSnapshot(metadata_exists=bool(metadata_columns),
+                                  models=self._resolve_models(model_names, trafo_models),
+                                  trafo_models=trafo_models,
+                                  basket_col=bool(basket_settings),
+                                  ili2db_version=3 if ili2db_v3_columns else 4)
 
     def get_description_conn_string(self):
         result = None
@@ -142,8 +166,13 @@ class GPKGConnector(FileDB):
             if self.conn:
                 self.close_connection()
 
-            self.conn = sqlite3.connect(self._uri)
-            self.conn.row_factory = sqlite3.Row
+            if self.read_only:
+                # Tuned for bulk reads: mmap, bigger page cache, query_only and, optionally, immutable
+                self.conn = get_shared_read_connection(self._uri, bool(self._dict_conn_params.get('immutable')))
+            else:
+                self.conn = sqlite3.connect(self._uri)
+                self.conn.row_factory = sqlite3.Row
+            self._conn_file_id = self._get_file_id()
             logger.info("Connection was open! ({})".format(self._uri))
             return (True, "Connection is open!")
         elif not os.path.exists(self._uri):
@@ -153,11 +182,20 @@ class GPKGConnector(FileDB):
 
     def close_connection(self):
         if self.conn:
-            self.conn.close()
+            if not self.read_only:  # Shared read-only connections stay open for other connectors
+                self.conn.close()
             logger.info("Connection was closed! ({})".format(self._uri))
             self.conn = None
+            self._conn_file_id = None
+
+    def _get_file_id(self):
+        signature = get_file_signature(self._uri)
+        return signature[:2] if signature else None
 
     def get_ili2db_version(self):
+        return self.get_metadata_snapshot().ili2db_version
+
+    def _read_ili2db_version(self):
         if self.conn is None:
             res, msg = self.open_connection()
             if not res:
@@ -192,6 +230,11 @@ class GPKGConnector(FileDB):
         return True, EnumTestConnectionMsg.CONNECTION_TO_SERVER_SUCCESSFUL, "Connection to server was successful."
 
     def _test_connection_to_db(self):
+        # Reuse the connection unless the file was replaced (or removed) after it was open
+        if self.conn and not self.read_only and self._conn_file_id is not None and \
+                self._conn_file_id == self._get_file_id():
+            return True, EnumTestConnectionMsg.CONNECTION_TO_DB_SUCCESSFUL, "Connection to db was successful."
+
         if self.conn:
             self.close_connection()
 
@@ -226,6 +269,26 @@ class GPKGConnector(FileDB):
         except sqlite3.ProgrammingError as e:
             return False, e
 
+    def iterate_sql_query(self, query, batch_size=None):
+        """
+        Executes a SQL statement whose results are streamed from SQLite instead of being fetched at once.
+
+        :param query: SQL Statement
+        :param batch_size: If None, sqlite3.Row objects are yielded one by one. Otherwise, rows are yielded in batches
+                           of (at most) batch_size rows, as dicts {column name: list of values}.
+        :return: tuple(bool, result). result is a generator of rows or batches if the statement could be executed, or
+                 the error otherwise.
+        """
+        cursor = self.conn.cursor()
+
+        try:
+            cursor.execute(query)
+        except (sqlite3.ProgrammingError, sqlite3.OperationalError) as e:
+            cursor.close()
+            return False, e
+
+        return True, self._iterate_cursor(cursor, batch_size)
+
     def vacuum(self):
         """
         'Sanitize' the DB. See https://www.sqlite.org/lang_vacuum.html
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sqlite3
+import threading
+from urllib.parse import quote
+
+from ..config.general_config import (GPKG_READ_MMAP_SIZE,
+                                     GPKG_READ_CACHE_SIZE)
+
+logger = logging.getLogger(__name__)
+
+# sqlite3 connections can only be used by the thread that created them, so they are shared per thread
+_local = threading.local()
+
+
+def get_file_signature(path):
+    """
+    :return: Tuple that changes whenever the file is modified or replaced, or None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def is_wal_database(path):
+    """
+    :return: Whether the SQLite file uses Write-Ahead Logging, according to its header.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(20)
+    except OSError:
+        return False
+
+    # Bytes 18 and 19 are the file format write/read versions: 1 for rollback journal, 2 for WAL
+    return len(header) == 20 and header[18] == 2 and header[19] == 2
+
+
+def has_pending_wal(path):
+    """
+    :return: Whether there are changes in the WAL file that haven't been checkpointed into the database file.
+    """
+    try:
+        return os.path.getsize(path + '-wal') > 0
+    except OSError:
+        return False
+
+
+def open_read_connection(path, immutable=False):
+    """
+    Opens a read-only connection tuned for bulk reads (large page cache, memory-mapped I/O, query_only).
+
+    :param path: Path to the GPKG file.
+    :param immutable: Open the file as immutable, i.e., SQLite won't take any lock nor look for changes made by other
+                      connections. Use it only for files nobody writes to (e.g., delivered GeoPackages). It's ignored
+                      if the file has changes pending in its WAL file, since those would not be seen.
+    :return: sqlite3.Connection
+    """
+    wal = is_wal_database(path)
+    if immutable and wal and has_pending_wal(path):
+        logger.info("'{}' has pending changes in its WAL file, it won't be opened as immutable.".format(path))
+        immutable = False
+
+    uri = 'file:{}?mode=ro{}'.format(quote(os.path.abspath(path)), '&immutable=1' if immutable else '')
+    conn = sqlite3.connect(uri, uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA query_only = 1')
+    conn.execute('PRAGMA cache_size = {}'.format(int(GPKG_READ_CACHE_SIZE)))
+    conn.execute('PRAGMA mmap_size = {}'.format(int(GPKG_READ_MMAP_SIZE)))
+    logger.debug("Read-only connection open for '{}' (WAL: {}, immutable: {})".format(path, wal, immutable))
+
+    return conn
+
+
+def get_shared_read_connection(path, immutable=False):
+    """
+    Gets a read-only connection to a GPKG file, shared by all connectors of the current thread that read it. The
+    connection is open again if the file was modified or replaced in the meantime.
+
+    :return: sqlite3.Connection
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = dict()
+
+    key = (os.path.realpath(path), immutable)
+    signature = get_file_signature(path)
+    if signature is not None and not immutable:
+        signature = signature[:2]  # Regular connections see changes, only replacing the file matters
+    entry = connections.get(key)
+    if entry is not None:
+        conn, conn_signature = entry
+        if conn_signature == signature:
+            return conn
+        conn.close()
+        del connections[key]
+
+    conn = open_read_connection(path, immutable)
+    connections[key] = (conn, signature)
+    return conn
+
+
+def close_shared_read_connections():
+    """
+    Closes the shared read-only connections of the current thread.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections:
+        for conn, signature in connections.values():
+            conn.close()
+        connections.clear()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import threading
+from collections import OrderedDict
+
+MAX_CACHED_HIERARCHIES = 256
+
+
+def parse_model_hierarchy(lst_models):
+    """
+    Reads a list of models as saved by ili2db and returns a dict of model dependencies.
+
+    :param lst_models: The list of values stored in the DB meta attrs model table (column 'modelname').
+    :return: Dict of model dependencies.
+    """
+    model_hierarchy = dict()
+    for str_model in lst_models:
+        parts = str_model.split("}")
+        if len(parts) > 1:  # With dependencies
+            for part in parts:
+                if part:  # The last element of parts is ''
+                    model, dependencies = part.split("{")
+                    model_hierarchy[model.strip()] = dependencies.strip().split(" ")
+        elif len(parts) == 1:  # No dependencies
+            model_hierarchy[parts[0].strip()] = list()
+
+    return model_hierarchy
+
+
+class ModelHierarchy:
+    """
+    Dependency graph of the models stored in a t_ili2db_model table, parsed once and reused for every lookup.
+
+    :param lst_models: The list of values stored in the DB meta attrs model table (column 'modelname').
+    """
+
+    def __init__(self, lst_models):
+        self.dependencies = {model: frozenset(dependencies)
+                             for model, dependencies in parse_model_hierarchy(lst_models).items()}
+        self._resolved = dict()  # {frozenset(trafo models): tuple(models)}
+        self._lock = threading.Lock()
+
+    def resolve(self, trafo_models):
+        """
+        :param trafo_models: Model names found in t_ili2db_trafo.
+        :return: List of the given models plus their dependencies, sorted by name.
+        """
+        key = frozenset(trafo_models)
+        with self._lock:
+            models = self._resolved.get(key)
+            if models is None:
+                models = set(key)
+                for model in key:
+                    models.update(self.dependencies.get(model, ()))
+                models = tuple(sorted(models))
+                self._resolved[key] = models
+
+        return list(models)
+
+
+_hierarchies = OrderedDict()  # {content hash: ModelHierarchy}
+_hierarchies_lock = threading.Lock()
+
+
+def get_model_hierarchy(lst_models):
+    """
+    Gets the ModelHierarchy of a t_ili2db_model table, memoized by the hash of its content, so that schemas sharing
+    the same models (or the same schema read again) don't parse it again.
+
+    :param lst_models: The list of values stored in the DB meta attrs model table (column 'modelname').
+    :return: ModelHierarchy
+    """
+    content_hash = hashlib.sha1("\x1f".join(sorted(lst_models)).encode("utf-8")).hexdigest()
+    with _hierarchies_lock:
+        hierarchy = _hierarchies.get(content_hash)
+        if hierarchy is not None:
+            _hierarchies.move_to_end(content_hash)
+            return hierarchy
+
+    hierarchy = ModelHierarchy(lst_models)
+
+    with _hierarchies_lock:
+        hierarchy = _hierarchies.setdefault(content_hash, hierarchy)
+        while len(_hierarchies) > MAX_CACHED_HIERARCHIES:
+            _hierarchies.popitem(last=False)
+
+    return hierarchy
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+import atexit
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from ..config.general_config import (PG_POOL_MIN_SIZE,
+                                     PG_POOL_MAX_SIZE,
+                                     PG_POOL_MAX_IDLE_TIME,
+                                     PG_POOL_HEALTH_CHECK_INTERVAL,
+                                     PG_POOL_CHECKOUT_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """
+    No connection became available in the pool before the checkout timeout.
+
+    It's an OperationalError, so that callers handling connection errors from psycopg2.connect() handle it as well.
+    """
+    pass
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection that keeps track of when it was last used and last known to be alive.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+
+class PGConnectionPool:
+    """
+    Pool of connections to a PostgreSQL database, shared by all the connectors that use the same connection uri.
+
+    Connections are checked out (and lent to the caller) and checked in (and kept for later use). Idle connections
+    beyond min_size are closed after max_idle_time seconds, and connections are checked for health before being
+    lent, so that dropped connections (e.g., due to server timeouts) are replaced transparently.
+
+    max_size only bounds the connections lent for a single operation. Connections that a caller keeps for its whole
+    lifetime (e.g., the connection of a PGConnector) are checked out with bounded=False: they reuse idle connections,
+    but never wait for nor count towards max_size, so that many live connectors to the same database don't exhaust
+    the pool.
+
+    :param uri: psycopg2 connection string.
+    :param min_size: Number of idle connections that are never evicted.
+    :param max_size: Maximum number of open connections (idle and checked out).
+    :param max_idle_time: Seconds an idle connection beyond min_size is kept open.
+    :param health_check_interval: Seconds during which a connection that was successfully used is trusted without
+                                  asking the server.
+    """
+
+    def __init__(self, uri, min_size=PG_POOL_MIN_SIZE, max_size=PG_POOL_MAX_SIZE, max_idle_time=PG_POOL_MAX_IDLE_TIME,
+                 health_check_interval=PG_POOL_HEALTH_CHECK_INTERVAL):
+        self.uri = uri
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+
+        self._idle_connections = list()  # LIFO, the most recently used connection is lent first
+        # Connections that were lent and not checked in yet. If a caller closes or loses a connection without checking
+        # it in, it won't count towards max_size anymore.
+        self._used_connections = weakref.WeakSet()
+        self._condition = threading.Condition()
+
+    @property
+    def size(self):
+        """
+        :return: Number of open connections (idle and checked out).
+        """
+        with self._condition:
+            return len(self._idle_connections) + self._count_used_connections()
+
+    def checkout(self, timeout=PG_POOL_CHECKOUT_TIMEOUT, bounded=True):
+        """
+        Lends a healthy connection. It must be returned with checkin().
+
+        :param timeout: Seconds to wait for a connection if max_size connections are checked out.
+        :param bounded: False to get a connection that doesn't count towards max_size (and never waits), for callers
+                        that keep it for long.
+        :return: PooledConnection
+        :raises PoolTimeoutError: If no connection became available in time.
+        :raises psycopg2.Error: If a new connection could not be open.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                self._evict_idle_connections()
+
+                while self._idle_connections:
+                    conn = self._idle_connections.pop()
+                    if self.check_health(conn):
+                        if bounded:
+                            self._used_connections.add(conn)
+                        return conn
+                    self._discard(conn)
+
+                if not bounded:
+                    break
+
+                if len(self._idle_connections) + self._count_used_connections() < self.max_size:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError("No connection to the database became available in {} seconds "
+                                           "(pool size: {}).".format(timeout, self.max_size))
+                self._condition.wait(remaining)
+
+            # Reserve the slot, the connection is open out of the lock
+            placeholder = _Placeholder()
+            if bounded:
+                self._used_connections.add(placeholder)
+
+        try:
+            conn = psycopg2.connect(self.uri, connection_factory=PooledConnection)
+        except Exception:
+            with self._condition:
+                self._used_connections.discard(placeholder)
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._used_connections.discard(placeholder)
+            if bounded:
+                self._used_connections.add(conn)
+
+        return conn
+
+    def checkin(self, conn, discard=False):
+        """
+        Returns a connection to the pool. Any pending transaction is rolled back. The connection is closed instead if
+        the pool already has max_size connections (e.g., because of connections checked out with bounded=False).
+
+        :param discard: Close the connection instead of keeping it (e.g., if it is known to be broken).
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+                conn.last_used = time.monotonic()
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+            self._used_connections.discard(conn)
+            if discard or conn.closed or \
+                    len(self._idle_connections) + self._count_used_connections() >= self.max_size:
+                self._discard(conn)
+            else:
+                self._idle_connections.append(conn)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=PG_POOL_CHECKOUT_TIMEOUT):
+        """
+        Context manager that checks out a connection and checks it in when the block ends. Connections that fail with
+        an OperationalError are discarded.
+        """
+        conn = self.checkout(timeout)
+        discard = False
+        try:
+            yield conn
+        except psycopg2.OperationalError:
+            discard = True
+            raise
+        finally:
+            self.checkin(conn, discard)
+
+    def check_health(self, conn):
+        """
+        Checks whether a connection is usable. The server is only asked if the connection wasn't used for more than
+        health_check_interval seconds, otherwise this check is local.
+
+        :return: True if the connection is usable, False otherwise.
+        """
+        if conn.closed:
+            return False
+
+        try:
+            if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                conn.rollback()
+
+            now = time.monotonic()
+            if now - max(conn.last_used, conn.last_checked) < self.health_check_interval:
+                return True
+
+            cur = conn.cursor()
+            cur.execute('SELECT 1')  # This query will fail if the db is no longer connected
+            cur.close()
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE and not conn.autocommit:
+                conn.rollback()
+            conn.last_checked = now
+        except psycopg2.Error as e:
+            logger.debug("Pooled connection is no longer usable: {}".format(e))
+            return False
+
+        return True
+
+    def close(self):
+        """
+        Closes the idle connections. Connections checked out are closed when checked in.
+        """
+        with self._condition:
+            for conn in self._idle_connections:
+                self._discard(conn)
+            self._idle_connections.clear()
+            self._condition.notify_all()
+
+    def _count_used_connections(self):
+        return len([conn for conn in self._used_connections if not conn.closed])
+
+    def _evict_idle_connections(self):
+        now = time.monotonic()
+        for conn in list(self._idle_connections):
+            if len(self._idle_connections) <= self.min_size:
+                break
+            if conn.closed or now - conn.last_used > self.max_idle_time:
+                self._idle_connections.remove(conn)
+                self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+class _Placeholder:
+    """
+    Stands for a connection that is being open, so that it counts towards the pool size.
+    """
+    closed = False
+
+
+_pools = dict()  # {uri: PGConnectionPool}
+_pools_lock = threading.Lock()
+
+
+def get_pg_connection_pool(uri):
+    """
+    :param uri: psycopg2 connection string.
+    :return: PGConnectionPool shared by the whole process for the given connection string.
+    """
+    with _pools_lock:
+        pool = _pools.get(uri)
+        if pool is None:
+            pool = PGConnectionPool(uri)
+            _pools[uri] = pool
+
+    return pool
+
+
+def close_pg_connection_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_pg_connection_pools)
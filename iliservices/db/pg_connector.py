@@ -16,8 +16,9 @@
  *                                                                         *
  ***************************************************************************/
 """
+import uuid
+
 import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import psycopg2.extras
 from psycopg2 import ProgrammingError
 
@@ -27,6 +28,8 @@ from ..config.enums import (EnumTestLevel,
 
 from .db_connector import (ClientServerDB,
                                   DBConnector)
+from .db_metadata import DBMetadataSnapshot
+from .pg_connection_pool import get_pg_connection_pool
 
 from ..config.ili2db_names import ILI2DBNames
 from ..config.ili2db_keys import *
@@ -36,7 +39,8 @@ from ..config.general_config import (ILISERVICES_DB_NAME,
                                      ILISERVICES_DB_USER,
                                      ILISERVICES_DB_PASS,
                                      ILISERVICES_DB_PORT,
-                                     ILISERVICES_DB_HOST)
+                                     ILISERVICES_DB_HOST,
+                                     PG_STREAM_ITERSIZE)
 
 import logging
 
@@ -58,6 +62,7 @@ class PGConnector(ClientServerDB):
         DBConnector.__init__(self, uri, conn_dict)
         self.engine = 'pg'
         self.conn = None
+        self._pool = None  # Pool self.conn was checked out from
         self.schema = conn_dict['schema'] if 'schema' in conn_dict else ''
         self.provider = 'postgres'
         self._tables_info = None
@@ -128,29 +133,81 @@ class PGConnector(ClientServerDB):
         return False
 
     def _metadata_exists(self):
-        return self._table_exists(ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG)
+        return self.get_metadata_snapshot().metadata_exists
 
     def has_basket_col(self):
-        sql_query = """SELECT count(tag)
-                       FROM {schema}.t_ili2db_settings
-                       WHERE tag ='{tag}' and setting='{value}';""".format(schema=self.schema,
-                                                                           tag=ILI2DBNames.BASKET_COL_TAG,
-                                                                           value=ILI2DBNames.BASKET_COL_VALUE)
-        cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute(sql_query)
-        return bool(cur.fetchone()[0])
+        return self.get_metadata_snapshot().basket_col
+
+    def _get_metadata_key(self):
+        return ('pg',
+                self._dict_conn_params['host'],
+                self._dict_conn_params['port'],
+                self._dict_conn_params['database'],
+                self.schema)
+
+    def _read_metadata_snapshot(self):
+        if not self.schema:
+            return DBMetadataSnapshot()
+
+        res, msg = self.check_and_fix_connection()
+        if not res:
+            logger.warning(msg)
+            return DBMetadataSnapshot()
+
+        # Everything in a single round trip. If the ili2db tables are not there, the query fails.
+        query = """
+            SELECT
+                (SELECT count(tablename) FROM pg_catalog.pg_tables
+                 WHERE schemaname = '{schema}' AND tablename = '{metadata_table}') AS metadata_tables,
+                (SELECT array_agg(modelname) FROM {schema}.t_ili2db_model) AS model_names,
+                (SELECT array_agg(DISTINCT split_part(iliname, '.', 1)) FROM {schema}.t_ili2db_trafo) AS trafo_models,
+                (SELECT count(tag) FROM {schema}.t_ili2db_settings
+                 WHERE tag = '{tag}' AND setting = '{value}') AS basket_settings,
+                (SELECT count(*) FROM information_schema.columns
+                 WHERE table_schema = '{schema}'
+                 AND (table_name = 't_ili2db_attrname' OR table_name = 't_ili2db_model')
+                 AND (column_name = 'owner' OR column_name = 'file')) AS ili2db_v3_columns
+        """.format(schema=self.schema,
+                   metadata_table=ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG,
+                   tag=ILI2DBNames.BASKET_COL_TAG,
+                   value=ILI2DBNames.BASKET_COL_VALUE)
+
+        cur = self.conn.cursor()
+        try:
+            cur.execute(query)
+            metadata_tables, model_names, trafo_models, basket_settings, ili2db_v3_columns = cur.fetchone()
+        except ProgrammingError:
+            self.conn.rollback()
+            return DBMetadataSnapshot(metadata_exists=self._table_exists(ILI2DBNames.INTERLIS_TEST_METADATA_TABLE_PG),
+                                      ili2db_version=self._read_ili2db_version())
+        finally:
+            cur.close()
+
+        model_names = model_names or list()
+        trafo_models = trafo_models or list()
+        return DBMetadataSnapshot(metadata_exists=bool(metadata_tables),
+                                  models=self._resolve_models(model_names, trafo_models),
+                                  trafo_models=trafo_models,
+                                  basket_col=bool(basket_settings),
+                                  ili2db_version=3 if ili2db_v3_columns > 1 else 4)
 
     def open_connection(self, uri=None):
         if uri is None:
             uri = self._uri
-        else:
-            self.conn.close()
+        elif self.conn is not None:
+            self._release_connection()
 
         if self.conn is None or self.conn.closed:
+            if self.conn is not None:
+                self._release_connection(discard=True)
+
+            pool = get_pg_connection_pool(uri)
             try:
-                self.conn = psycopg2.connect(uri)
+                # The connector keeps its connection until it's closed, so it must not take a slot of the pool
+                self.conn = pool.checkout(bounded=False)
             except (psycopg2.OperationalError, psycopg2.ProgrammingError) as e:
                 return False, "Could not open connection! Details: {}".format(e)
+            self._pool = pool
 
             logger.info("Connection was open! ({})".format(self.get_description_conn_string()))
         else:
@@ -160,9 +217,19 @@ class PGConnector(ClientServerDB):
 
     def close_connection(self):
         if self.conn:
-            self.conn.close()
+            self._release_connection()
             logger.info("Connection was closed ({}) !".format(self.get_description_conn_string()))
-            self.conn = None
+
+    def _release_connection(self, discard=False):
+        """
+        Gives self.conn back to its pool, where it stays open to be reused by this or other connectors.
+        """
+        if self._pool is not None:
+            self._pool.checkin(self.conn, discard)
+        else:
+            self.conn.close()
+        self.conn = None
+        self._pool = None
 
     def _get_ili2db_names(self):
         dict_names = dict()
@@ -214,6 +281,37 @@ class PGConnector(ClientServerDB):
         except ProgrammingError as e:
             return False, e
 
+    def iterate_sql_query(self, query, batch_size=None, itersize=PG_STREAM_ITERSIZE):
+        """
+        Executes a SQL statement through a server-side (named) cursor, so that its results are streamed in chunks of
+        itersize rows and memory stays flat regardless of the number of rows.
+
+        The cursor lives in the current transaction, so don't commit nor roll back before consuming the generator.
+
+        :param query: SQL Statement
+        :param batch_size: If None, RealDictRows are yielded one by one. Otherwise, rows are yielded in batches of (at
+                           most) batch_size rows, as dicts {column name: list of values}.
+        :param itersize: Number of rows fetched per round trip when rows are yielded one by one.
+        :return: tuple(bool, result). result is a generator of rows or batches if the statement could be executed, or
+                 the error otherwise.
+        """
+        res, msg = self.check_and_fix_connection()
+        if not res:
+            return res, msg
+
+        cursor_factory = psycopg2.extras.RealDictCursor if batch_size is None else None
+        cur = self.conn.cursor(name="iliservices_{}".format(uuid.uuid4().hex), cursor_factory=cursor_factory)
+        cur.itersize = itersize
+
+        try:
+            cur.execute(query)  # Declares the cursor, so that invalid statements fail here
+        except ProgrammingError as e:
+            cur.close()
+            self.conn.rollback()  # Otherwise the failed transaction makes any next statement fail
+            return False, e
+
+        return True, self._iterate_cursor(cur, batch_size)
+
     def execute_sql_query_dict_cursor(self, query):
         """
         Generic function for executing SQL statements
@@ -229,30 +327,28 @@ class PGConnector(ClientServerDB):
         return cur.fetchall()
 
     def get_models(self, schema=None):
-        # First go for all models registered in t_ili2db_model
-        query = "SELECT modelname FROM {schema}.t_ili2db_model".format(schema=schema if schema else self.schema)
+        if not schema or schema == self.schema:
+            res_models = list(self.get_metadata_snapshot().models)
+            logger.debug("Models found: {}".format(res_models))
+            return res_models
+
+        # Models registered in t_ili2db_model and models listed in t_ili2db_trafo, in a single round trip
+        query = """
+            SELECT
+                (SELECT array_agg(modelname) FROM {schema}.t_ili2db_model) AS model_names,
+                (SELECT array_agg(DISTINCT split_part(iliname, '.', 1)) FROM {schema}.t_ili2db_trafo) AS trafo_models
+        """.format(schema=schema)
         res, result = self.execute_sql_query(query)
-        model_hierarchy = dict()
+        all_models = list()
+        trafo_models = list()
         if res:
-            all_models = [db_model['modelname'] for db_model in result]
-            model_hierarchy = self._parse_models_from_db_meta_attrs(all_models)
+            all_models = result[0]['model_names'] or list()
+            trafo_models = result[0]['trafo_models'] or list()
         else:
             logger.error("Error getting models: {}".format(result))
 
-        # Now go for all models listed in t_ili2db_trafo
-        query = "SELECT distinct split_part(iliname,'.',1) as modelname FROM {schema}.t_ili2db_trafo".format(
-            schema=schema if schema else self.schema)
-        res, result = self.execute_sql_query(query)
-        trafo_models = list()
-        if res:
-            trafo_models = [db_model['modelname'] for db_model in result]
-
         # Finally, using those obtained from t_ili2db_trafo, go for dependencies found in t_ili2db_model
-        dependencies = list()
-        for model in trafo_models:
-            dependencies.extend(model_hierarchy.get(model, list()))
-
-        res_models = list(set(dependencies + trafo_models))
+        res_models = self._resolve_models(all_models, trafo_models)
         logger.debug("Models found: {}".format(res_models))
 
         return res_models
@@ -267,17 +363,14 @@ class PGConnector(ClientServerDB):
             str: Message to the user indicating the type of error or if everything was executed correctly
         """
         sql = """CREATE DATABASE "{}" WITH ENCODING = 'UTF8' CONNECTION LIMIT = -1""".format(db_name)
-        conn = psycopg2.connect(uri)
 
-        if conn:
+        with get_pg_connection_pool(uri).connection() as conn:
             try:
-                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-                cur = conn.cursor()
-                cur.execute(sql)
+                conn.autocommit = True  # CREATE DATABASE cannot run inside a transaction block
+                with conn.cursor() as cur:
+                    cur.execute(sql)
             except psycopg2.ProgrammingError as e:
                 return (False, "An error occurred while trying to create the '{}' database: {}".format(db_name, e))
-        cur.close()
-        conn.close()
         return (True, "Database '{}' was successfully created!".format(db_name))
 
     def create_schema(self, uri, schema_name):
@@ -290,17 +383,14 @@ class PGConnector(ClientServerDB):
             str: Message to the user indicating the type of error or if everything was executed correctly
         """
         sql = 'CREATE SCHEMA "{}"'.format(schema_name)
-        conn = psycopg2.connect(uri)
 
-        if conn:
+        with get_pg_connection_pool(uri).connection() as conn:
             try:
-                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-                cur = conn.cursor()
-                cur.execute(sql)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(sql)
             except psycopg2.ProgrammingError as e:
                 return (False, "An error occurred while trying to create the '{}' schema: {}".format(schema_name, e))
-        cur.close()
-        conn.close()
         return (True, "Schema '{}' was successfully created!".format(schema_name))
 
     def get_dbnames_list(self, uri):
@@ -310,15 +400,13 @@ class PGConnector(ClientServerDB):
 
         dbnames_list = list()
         try:
-            conn = psycopg2.connect(uri)
-            cur = conn.cursor()
-            query = """SELECT datname FROM pg_database WHERE datistemplate = false AND datname <> 'postgres' ORDER BY datname"""
-            cur.execute(query)
-            dbnames = cur.fetchall()
+            with get_pg_connection_pool(uri).connection() as conn:
+                with conn.cursor() as cur:
+                    query = """SELECT datname FROM pg_database WHERE datistemplate = false AND datname <> 'postgres' ORDER BY datname"""
+                    cur.execute(query)
+                    dbnames = cur.fetchall()
             for dbname in dbnames:
                 dbnames_list.append(dbname[0])
-            cur.close()
-            conn.close()
         except Exception as e:
             return (False, "There was an error when obtaining the list of existing databases. : {}".format(e))
         return (True, dbnames_list)
@@ -326,41 +414,45 @@ class PGConnector(ClientServerDB):
     def get_dbname_schema_list(self, uri):
         schemas_list = list()
         try:
-            conn = psycopg2.connect(uri)
-            cur = conn.cursor()
             query = """
                 SELECT n.nspname as "{schema_name}" FROM pg_catalog.pg_namespace n 
                 WHERE n.nspname !~ '^pg_' AND n.nspname <> 'information_schema' AND nspname <> 'public' ORDER BY "{schema_name}"
             """.format(schema_name=QueryNames.SCHEMA_NAME)
-            cur.execute(query)
-            schemas = cur.fetchall()
+            with get_pg_connection_pool(uri).connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query)
+                    schemas = cur.fetchall()
             for schema in schemas:
                 schemas_list.append(schema[0])
-            cur.close()
-            conn.close()
         except Exception as e:
             return (False, "There was an error when obtaining the list of existing schemas: {}".format(e))
         return (True, schemas_list)
 
-    def has_schema_privileges(self, uri, schema, user_level=EnumUserLevel.CREATE):
+    def has_schema_privileges(self, uri, schema, user_level=EnumUserLevel.CREATE, conn=None):
+        """
+        :param conn: Open connection to run the query on. If None, a pooled connection to uri is used.
+        """
         try:
-            conn = psycopg2.connect(uri)
-            cur = conn.cursor()
             query = """
                         SELECT
                             CASE WHEN pg_catalog.has_schema_privilege(current_user, '{schema}', 'CREATE') = True  THEN 1 ELSE 0 END AS "create",
                             CASE WHEN pg_catalog.has_schema_privilege(current_user, '{schema}', 'USAGE')  = True  THEN 1 ELSE 0 END AS "usage";
                     """.format(schema=schema)
 
-            cur.execute(query)
-            schema_privileges = cur.fetchone()
+            if conn is not None:
+                with conn.cursor() as cur:
+                    cur.execute(query)
+                    schema_privileges = cur.fetchone()
+            else:
+                with get_pg_connection_pool(uri).connection() as pooled_conn:
+                    with pooled_conn.cursor() as cur:
+                        cur.execute(query)
+                        schema_privileges = cur.fetchone()
             if schema_privileges:
                 privileges = {'create': bool(int(schema_privileges[0])),  # 'create'
                               'usage': bool(int(schema_privileges[1]))}  # 'usage'
             else:
                 return False, "No information for schema '{}'.".format(schema)
-            cur.close()
-            conn.close()
         except Exception as e:
             return False, "There was an error when obtaining privileges for schema '{}'. Details: {}".format(schema, e)
 
@@ -390,9 +482,13 @@ class PGConnector(ClientServerDB):
         return ' '.join(uri)
 
     def get_ili2db_version(self):
+        return self.get_metadata_snapshot().ili2db_version
+
+    def _read_ili2db_version(self):
         res, msg = self.check_and_fix_connection()
         if not res:
-            return (res, msg)
+            logger.warning(msg)
+            return -1
 
         # Borrowed from Model Baker
         cur = self.conn.cursor()
@@ -424,17 +520,11 @@ class PGConnector(ClientServerDB):
             res, msg = self.open_connection()
             if not res:
                 return res, EnumTestConnectionMsg.CONNECTION_COULD_NOT_BE_OPEN, msg
-        if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:  # 3
-            self.conn.rollback()  # Go back to TRANSACTION_STATUS_IDLE (0)
 
-        try:
-            # Server side check
-            cur = self.conn.cursor()
-            cur.execute('SELECT 1')  # This query will fail if the db is no longer connected
-            cur.close()
-        except psycopg2.OperationalError:
+        # Server side check (only if the connection has not been used recently). Also rolls back failed transactions.
+        if self._pool is None or not self._pool.check_health(self.conn):
             # Reopen the connection if it is closed due to timeout
-            self.conn.close()
+            self._release_connection(discard=True)
             res, msg = self.open_connection()
             if not res:
                 return res, EnumTestConnectionMsg.CONNECTION_COULD_NOT_BE_OPEN, msg
@@ -448,7 +538,8 @@ class PGConnector(ClientServerDB):
         if not self._schema_exists():
             return False, EnumTestConnectionMsg.SCHEMA_NOT_FOUND, "The schema '{}' does not exist in the database!".format(self.schema)
 
-        res, msg = self.has_schema_privileges(self._uri, self.schema, user_level)
+        # Use the connection of the connector, instead of taking another one from the pool
+        res, msg = self.has_schema_privileges(self._uri, self.schema, user_level, conn=self.conn)
         if not res:
             return False, EnumTestConnectionMsg.USER_HAS_NO_PERMISSION, "User '{}' has not enough permissions over the schema '{}'.".format(self._dict_conn_params['username'], self.schema)
 
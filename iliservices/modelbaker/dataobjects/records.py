@@ -0,0 +1,314 @@
+# Plain records with the attributes of Field, Layer, Relation and LegendGroup,
+# built by the Generator in headless mode. They don't import QGIS and their
+# dump() methods return the same definitions as the QGIS-backed objects.
+
+# Same values as QgsRelation.RelationStrength
+RELATION_ASSOCIATION = 0
+RELATION_COMPOSITION = 1
+
+
+class FieldRecord:
+    __slots__ = (
+        "name",
+        "alias",
+        "hidden",
+        "read_only",
+        "widget",
+        "widget_config",
+        "default_value_expression",
+        "enum_domain",
+        "oid_domain",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.alias = None
+        self.hidden = False
+        self.read_only = False
+        self.widget = None
+        self.widget_config = dict()
+        self.default_value_expression = None
+        self.enum_domain = None
+        self.oid_domain = None
+
+    def dump(self):
+        definition = dict()
+        if self.alias:
+            definition["alias"] = self.alias
+
+        return definition
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "alias": self.alias,
+            "hidden": self.hidden,
+            "read_only": self.read_only,
+            "widget": self.widget,
+            "widget_config": self.widget_config,
+            "default_value_expression": self.default_value_expression,
+            "enum_domain": self.enum_domain,
+            "oid_domain": self.oid_domain,
+        }
+
+
+class LayerRecord:
+    __slots__ = (
+        "provider",
+        "uri",
+        "name",
+        "srid",
+        "extent",
+        "geometry_column",
+        "wkb_type",
+        "alias",
+        "fields",
+        "is_domain",
+        "is_structure",
+        "is_nmrel",
+        "display_expression",
+        "coordinate_precision",
+        "is_basket_table",
+        "is_dataset_table",
+        "ili_name",
+        "is_relevant",
+        "all_topics",
+        "relevant_topics",
+        "definitionfile",
+        "qmlstylefile",
+        "styles",
+        "expanded",
+        "checked",
+        "featurecount",
+    )
+
+    def __init__(
+        self,
+        provider=None,
+        uri=None,
+        name=None,
+        srid=None,
+        extent=None,
+        geometry_column=None,
+        wkb_type=None,
+        alias=None,
+        is_domain=False,
+        is_structure=False,
+        is_nmrel=False,
+        display_expression=None,
+        coordinate_precision=None,
+        is_basket_table=False,
+        is_dataset_table=False,
+        ili_name=None,
+        is_relevant=True,
+        all_topics=[],
+        relevant_topics=[],
+        definitionfile=None,
+        qmlstylefile=None,
+        styles={},
+    ):
+        self.provider = provider
+        self.uri = uri
+        self.name = name
+        if extent is not None:
+            # (xmin, ymin, xmax, ymax), instead of a QgsRectangle
+            extent = tuple(float(coord) for coord in extent.split(";")[:4])
+        self.extent = extent
+        self.geometry_column = geometry_column
+        self.wkb_type = wkb_type  # Geometry type name, as stored in the DB
+        self.alias = alias
+        self.fields = list()
+        self.is_domain = is_domain
+        self.is_structure = is_structure
+        self.is_nmrel = is_nmrel
+        self.srid = srid
+        self.display_expression = display_expression
+        self.coordinate_precision = coordinate_precision
+        self.is_basket_table = is_basket_table
+        self.is_dataset_table = is_dataset_table
+        self.ili_name = ili_name
+        self.is_relevant = is_relevant
+        self.all_topics = all_topics
+        self.relevant_topics = relevant_topics
+        self.definitionfile = definitionfile
+        self.qmlstylefile = qmlstylefile
+        self.styles = styles
+        # legend settings
+        self.expanded = True
+        self.checked = True
+        self.featurecount = False
+
+    def dump(self):
+        definition = dict()
+        definition["provider"] = self.provider
+        definition["uri"] = self.uri
+        definition["isdomain"] = self.is_domain
+        definition["isstructure"] = self.is_structure
+        definition["isnmrel"] = self.is_nmrel
+        definition["isbaskettable"] = self.is_basket_table
+        definition["isdatasettable"] = self.is_dataset_table
+        definition["displayexpression"] = self.display_expression
+        definition["coordinateprecision"] = self.coordinate_precision
+        definition["ili_name"] = self.ili_name
+        definition["is_relevant"] = self.is_relevant
+        definition["all_topics"] = self.all_topics
+        definition["relevant_topics"] = self.relevant_topics
+        definition["definitionfile"] = self.definitionfile
+        definition["qmlstylefile"] = self.qmlstylefile
+        definition["styles"] = self.styles
+        definition["form"] = list()  # Forms are only built for QGIS layers
+        return definition
+
+    def as_dict(self):
+        definition = self.dump()
+        definition["name"] = self.name
+        definition["alias"] = self.alias
+        definition["srid"] = self.srid
+        definition["extent"] = self.extent
+        definition["geometry_column"] = self.geometry_column
+        definition["wkb_type"] = self.wkb_type
+        definition["fields"] = [field.as_dict() for field in self.fields]
+        return definition
+
+
+class RelationRecord:
+    __slots__ = (
+        "referencing_layer",
+        "referenced_layer",
+        "referencing_field",
+        "referenced_field",
+        "name",
+        "strength",
+        "cardinality_max",
+        "child_domain_name",
+    )
+
+    def __init__(self):
+        self.referencing_layer = None
+        self.referenced_layer = None
+        self.referencing_field = None
+        self.referenced_field = None
+        self.name = None
+        self.strength = RELATION_ASSOCIATION
+        self.cardinality_max = None
+        self.child_domain_name = None
+
+    def dump(self):
+        definition = dict()
+        definition["referencingLayer"] = self.referencing_layer
+        definition["referencingField"] = self.referencing_field
+        definition["referencedLayer"] = self.referenced_layer
+        definition["referencedField"] = self.referenced_field
+        definition["strength"] = self.strength
+        definition["cardinality_max"] = self.cardinality_max
+        definition["child_domain_name"] = self.child_domain_name
+
+        return definition
+
+
+class LegendGroupRecord:
+    __slots__ = (
+        "name",
+        "items",
+        "expanded",
+        "checked",
+        "mutually_exclusive",
+        "mutually_exclusive_child",
+        "definitionfile",
+        "static_sorting",
+        "ignore_node_names",
+    )
+
+    def __init__(
+        self, name=None, expanded=True, ignore_node_names=None, static_sorting=False
+    ):
+        self.name = name
+        self.items = list()
+        self.expanded = expanded
+        self.checked = True
+        self.mutually_exclusive = False
+        self.mutually_exclusive_child = -1
+        self.definitionfile = None
+        self.static_sorting = static_sorting
+        self.ignore_node_names = ignore_node_names
+
+    def dump(self):
+        definition = list()
+        for item in self.items:
+            definition.append(item.dump())
+        return definition
+
+    def append(self, item):
+        self.items.append(item)
+
+    def __getitem__(self, item):
+        for i in self.items:
+            if i.name == item:
+                return i
+
+        raise KeyError(item)
+
+    def is_empty(self):
+        return not bool(self.items)
+
+
+def structure_as_dict(layers, relations, legend=None):
+    """
+    Gets a JSON serializable definition of a project structure built in
+    headless mode, e.g., to send it to a web client.
+
+    Layers are listed with their dump() definition plus name, alias, geometry
+    and fields. Relations keep their dump() definition, but their layers are
+    given as indexes in the layer list (layers may share a name when a table
+    has several geometry columns). The legend is given as nested groups whose
+    layer items are indexes in the layer list as well.
+
+    :param layers: List of LayerRecord objects, as returned by Generator.layers().
+    :param relations: List of RelationRecord objects, as returned by Generator.relations().
+    :param legend: LegendGroupRecord, as returned by Generator.legend(), or None.
+    :return: dict with 'layers', 'relations' and 'legend' keys.
+    """
+    layer_indexes = {id(layer): i for i, layer in enumerate(layers)}
+
+    relations_definition = list()
+    for relation in relations:
+        definition = relation.dump()
+        definition["name"] = relation.name
+        definition["referencingLayer"] = layer_indexes.get(
+            id(relation.referencing_layer)
+        )
+        definition["referencedLayer"] = layer_indexes.get(
+            id(relation.referenced_layer)
+        )
+        relations_definition.append(definition)
+
+    return {
+        "layers": [layer.as_dict() for layer in layers],
+        "relations": relations_definition,
+        "legend": _legend_group_as_dict(legend, layer_indexes) if legend else None,
+    }
+
+
+def _legend_group_as_dict(group, layer_indexes):
+    items = list()
+    for item in group.items:
+        if isinstance(item, LegendGroupRecord):
+            items.append(_legend_group_as_dict(item, layer_indexes))
+        else:
+            items.append(
+                {
+                    "layer": layer_indexes.get(id(item)),
+                    "expanded": item.expanded,
+                    "checked": item.checked,
+                    "featurecount": item.featurecount,
+                }
+            )
+
+    return {
+        "group": group.name,
+        "expanded": group.expanded,
+        "checked": group.checked,
+        "mutually_exclusive": group.mutually_exclusive,
+        "mutually_exclusive_child": group.mutually_exclusive_child,
+        "items": items,
+    }
@@ -16,14 +16,16 @@
  ***************************************************************************/
 """
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import TYPE_CHECKING, Tuple
 
-from ..dataobjects.fields import Field
 from ..dbconnector.db_connector import DBConnector
 from ..iliwrapper.ili2dbconfig import Ili2DbCommandConfiguration
 from .db_command_config_manager import DbCommandConfigManager
 from .layer_uri import LayerUri
 
+if TYPE_CHECKING:
+    from ..dataobjects.fields import Field
+
 
 class DbFactory(ABC):
     """Creates an entire set of objects so that modelbaker supports some database. This is a abstract class."""
@@ -91,7 +93,7 @@ class DbFactory(ABC):
 
         return messages
 
-    def customize_widget_editor(self, field: Field, data_type: str):
+    def customize_widget_editor(self, field: "Field", data_type: str):
         """Allows customizing the way a field is shown in the widget editor.
 
         For instance, a boolean field can be shown as a checkbox.
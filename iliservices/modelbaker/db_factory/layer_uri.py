@@ -34,6 +34,16 @@ class LayerUri(ABC):
         self.uri = uri
         self.provider = None
 
+    def get_connection_uri(self):
+        """Provides the connection part that get_data_source_uri() puts at the beginning of every layer uri.
+
+        It may carry credentials, so that layer uris can be stored without it.
+
+        :return: Connection part of the layer uris.
+        :rtype: str
+        """
+        return self.uri
+
     @abstractmethod
     def get_data_source_uri(self, record: dict):
         """Provides layer uri based on database uri and specific information of the data source.
@@ -15,12 +15,16 @@
  *                                                                         *
  ***************************************************************************/
 """
-from ..dataobjects.fields import Field
+from typing import TYPE_CHECKING
+
 from ..dbconnector.mssql_connector import MssqlConnector
 from .db_factory import DbFactory
 from .mssql_command_config_manager import MssqlCommandConfigManager
 from .mssql_layer_uri import MssqlLayerUri
 
+if TYPE_CHECKING:
+    from ..dataobjects.fields import Field
+
 
 class MssqlFactory(DbFactory):
     def get_db_connector(self, uri, schema):
@@ -38,7 +42,7 @@ class MssqlFactory(DbFactory):
     def post_generate_project_validations(self, configuration):
         return True, ""
 
-    def customize_widget_editor(self, field: Field, data_type: str):
+    def customize_widget_editor(self, field: "Field", data_type: str):
         if "bit" in data_type:
             field.widget = "CheckBox"
             field.widget_config["CheckedState"] = "1"
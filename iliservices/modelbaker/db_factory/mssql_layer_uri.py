@@ -44,6 +44,9 @@ class MssqlLayerUri(LayerUri):
 
         return data_source_uri
 
+    def get_connection_uri(self):
+        return self._get_layer_uri_common()
+
     def _get_layer_uri_common(self):
         param_db = dict()
         lst_item = self.uri.split(";")
@@ -72,3 +72,17 @@ IGNORED_ILI_ELEMENTS = [
     "LocalisationCH_V1.LocalisedMText",
     "LocalisationCH_V1.LocalisedText",
 ]
+
+# ili2db tables describing a schema (not the data in it), read to compute the
+# schema fingerprint
+ILI2DB_SCHEMA_METADATA_TABLES = [
+    "t_ili2db_attrname",
+    "t_ili2db_classname",
+    "t_ili2db_column_prop",
+    "t_ili2db_inheritance",
+    "t_ili2db_meta_attrs",
+    "t_ili2db_model",
+    "t_ili2db_settings",
+    "t_ili2db_table_prop",
+    "t_ili2db_trafo",
+]
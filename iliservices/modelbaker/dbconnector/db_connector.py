@@ -19,6 +19,7 @@
 from PyQt5.QtCore import QObject, pyqtSignal
 
 from .config import BASKET_TABLES, IGNORED_ILI_ELEMENTS, IGNORED_SCHEMAS, IGNORED_TABLES
+from .query_observer import ObservedConnection
 
 
 class DBConnector(QObject):
@@ -38,11 +39,34 @@ class DBConnector(QObject):
         self.dispName = ""  # For BAG OF config, specific for each DB
         self.basket_table_name = ""  # For basket handling, specific for each DB
         self.dataset_table_name = ""  # For basket handling, specific for each DB
+        # Whether several connectors to the same DB can run metadata queries
+        # concurrently (see Generator's parallel_introspection)
+        self.concurrent_introspection = False
+        # Errors the DB driver raises when a query fails, e.g., psycopg2.Error
+        self.driver_errors = tuple()
 
     def map_data_types(self, data_type):
         """Map provider date/time types to QGIS date/time types"""
         return None
 
+    def close_connection(self):
+        """Closes the connection to the DB, if the connector keeps one open."""
+        pass
+
+    def set_query_observer(self, observer):
+        """
+        Sets a callable observer(sql, elapsed, rows), called after each query the
+        connector runs (see ObservedConnection), e.g., to profile the Generator.
+
+        :param observer: The observer or None to stop observing queries.
+        """
+        conn = getattr(self, "conn", None)
+        if conn is None:
+            return
+        if isinstance(conn, ObservedConnection):
+            conn = conn.connection
+        self.conn = ObservedConnection(conn, observer) if observer else conn
+
     def db_or_schema_exists(self):
         """Whether the DB (for GPKG) or schema (for PG) exists or not."""
         raise NotImplementedError
@@ -147,6 +171,45 @@ class DBConnector(QObject):
         """
         return {}
 
+    def get_fields_info_by_table(self, table_names):
+        """
+        Info about fields of several tables at once. Connectors should override
+        it to read the info of all tables in bulk.
+
+        Return:
+            Dictionary with table names as keys and, as values, lists with the
+            rows get_fields_info returns for each table
+        """
+        return {
+            table_name: list(self.get_fields_info(table_name))
+            for table_name in table_names
+        }
+
+    def get_min_max_info_by_table(self, table_names):
+        """
+        Info about range constraints found in several tables at once.
+
+        Return:
+            Dictionary with table names as keys and, as values, what
+            get_min_max_info returns for each table
+        """
+        return {
+            table_name: self.get_min_max_info(table_name) for table_name in table_names
+        }
+
+    def get_value_map_info_by_table(self, table_names):
+        """
+        Info about value map constraints found in several tables at once.
+
+        Return:
+            Dictionary with table names as keys and, as values, what
+            get_value_map_info returns for each table
+        """
+        return {
+            table_name: self.get_value_map_info(table_name)
+            for table_name in table_names
+        }
+
     def get_relations_info(self, filter_layer_list=[]):
         """
         Info about relations found in a database (or database schema).
@@ -182,16 +245,26 @@ class DBConnector(QObject):
         """
         return []
 
-    def get_ignored_layers(self, ignore_basket_tables=True):
+    def get_ignored_layers(
+        self,
+        ignore_basket_tables=True,
+        tables_info=None,
+        relations_info=None,
+        meta_attrs_info=None,
+    ):
         """
         The ignored layers according to the ignored schemas and ignored tables and the ignored ili elements
         listed in the config.py.
         Additionally all the ili elements that have the attribute name ili2db.mapping in the meta attribute
         table.
-        """
-        tables_info = self.get_tables_info()
-        relations_info = self.get_relations_info()
-        meta_attrs_info = self.get_meta_attrs_info()
+        Tables, relations (unfiltered) and meta attributes info can be given if they were already fetched.
+        """
+        if tables_info is None:
+            tables_info = self.get_tables_info()
+        if relations_info is None:
+            relations_info = self.get_relations_info()
+        if meta_attrs_info is None:
+            meta_attrs_info = self.get_meta_attrs_info()
         mapping_ili_elements = []
         static_tables = []
         detected_tables = []
@@ -338,6 +411,15 @@ class DBConnector(QObject):
         """
         return {}
 
+    def get_schema_fingerprint(self):
+        """
+        Returns a digest (str) of the ili2db metadata tables, the ili2db settings
+        and the table definitions of the schema, which changes whenever the
+        schema changes, but not when its data change. Returns None if the
+        schema cannot be fingerprinted, so that nothing is cached for it.
+        """
+        return None
+
     def get_ili2db_sequence_value(self):
         """
         Returns the current value of the sequence used for the t_id
@@ -16,6 +16,7 @@
  ***************************************************************************/
 """
 import errno
+import hashlib
 import numbers
 import os
 import re
@@ -26,6 +27,7 @@ import qgis.utils
 from qgis.core import Qgis
 
 from ..generator.config import GPKG_FILTER_TABLES_MATCHING_PREFIX_SUFFIX
+from .config import ILI2DB_SCHEMA_METADATA_TABLES
 from .db_connector import DBConnector, DBConnectorError
 
 GPKG_METADATA_TABLE = "T_ILI2DB_TABLE_PROP"
@@ -375,6 +377,82 @@ class GPKGConnector(DBConnector):
         if self.metadata_exists() and self._table_exists(GPKG_METAATTRS_TABLE):
             meta_attrs = self.get_meta_attrs_info()
 
+        cursor.close()
+        return self._get_fields_records(
+            columns_info,
+            self._group_by_key(columns_prop, "columnname"),
+            self._group_by_key(columns_full_name, "sqlname"),
+            self._group_by_key(meta_attrs, "ilielement"),
+        )
+
+    def get_fields_info_by_table(self, table_names):
+        # Read the columns, column props, attribute names and meta attributes
+        # of all tables in one pass, instead of four queries per table
+        fields_info = dict()
+        table_names = set(table_names)
+        if not table_names:
+            return fields_info
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """
+            SELECT m.name AS tablename, p.name, p.type
+            FROM sqlite_master AS m
+            JOIN pragma_table_info(m.name) AS p
+            WHERE m.type = 'table'
+            ORDER BY m.name, p.cid
+            """
+        )
+        columns_info = self._group_by_key(cursor, "tablename", table_names)
+
+        columns_prop = dict()
+        columns_full_name = dict()
+        meta_attrs = dict()
+
+        if self.metadata_exists():
+            cursor.execute(
+                """
+                SELECT tablename, columnname, tag, setting
+                FROM t_ili2db_column_prop
+                """
+            )
+            columns_prop = self._group_by_key(cursor, "tablename", table_names)
+
+            cursor.execute(
+                """
+                SELECT {} AS tablename, SqlName, IliName
+                FROM t_ili2db_attrname
+                """.format(
+                    "owner" if self.ili_version() == 3 else "colowner"
+                )
+            )
+            columns_full_name = self._group_by_key(cursor, "tablename", table_names)
+
+            if self._table_exists(GPKG_METAATTRS_TABLE):
+                meta_attrs = self._group_by_key(
+                    self.get_meta_attrs_info(), "ilielement"
+                )
+
+        cursor.close()
+
+        for table_name, table_columns_info in columns_info.items():
+            fields_info[table_name] = self._get_fields_records(
+                table_columns_info,
+                self._group_by_key(columns_prop.get(table_name, []), "columnname"),
+                self._group_by_key(columns_full_name.get(table_name, []), "sqlname"),
+                meta_attrs,
+            )
+
+        return fields_info
+
+    def _get_fields_records(
+        self, columns_info, columns_prop, columns_full_name, meta_attrs
+    ):
+        """
+        Builds the get_fields_info records of a table. Column props and
+        attribute names come grouped by column name, and meta attributes
+        by ili element.
+        """
         complete_records = list()
         for column_info in columns_info:
             record = {}
@@ -393,23 +471,21 @@ class GPKGConnector(DBConnector):
                     "default_value_expression"
                 ] = "sqlite_fetch_and_increment(@layer, 'T_KEY_OBJECT', 'T_LastUniqueId', 'T_Key', 'T_Id', map('T_LastChange','date(''now'')','T_CreateDate','date(''now'')','T_User','''' || @user_account_name || ''''))"
 
-            for column_full_name in columns_full_name:
-                if column_full_name["sqlname"] == column_info["name"]:
-                    record["fully_qualified_name"] = column_full_name["iliname"]
-                    break
-
-            for column_prop in columns_prop:
-                if column_prop["columnname"] == column_info["name"]:
-                    if column_prop["tag"] == "ch.ehi.ili2db.unit":
-                        record["unit"] = column_prop["setting"]
-                    elif column_prop["tag"] == "ch.ehi.ili2db.textKind":
-                        record["texttype"] = column_prop["setting"]
-                    elif column_prop["tag"] == "ch.ehi.ili2db.dispName":
-                        record["column_alias"] = column_prop["setting"]
-                    elif column_prop["tag"] == "ch.ehi.ili2db.enumDomain":
-                        record["enum_domain"] = column_prop["setting"]
-                    elif column_prop["tag"] == "ch.ehi.ili2db.oidDomain":
-                        record["oid_domain"] = column_prop["setting"]
+            for column_full_name in columns_full_name.get(column_info["name"], []):
+                record["fully_qualified_name"] = column_full_name["iliname"]
+                break
+
+            for column_prop in columns_prop.get(column_info["name"], []):
+                if column_prop["tag"] == "ch.ehi.ili2db.unit":
+                    record["unit"] = column_prop["setting"]
+                elif column_prop["tag"] == "ch.ehi.ili2db.textKind":
+                    record["texttype"] = column_prop["setting"]
+                elif column_prop["tag"] == "ch.ehi.ili2db.dispName":
+                    record["column_alias"] = column_prop["setting"]
+                elif column_prop["tag"] == "ch.ehi.ili2db.enumDomain":
+                    record["enum_domain"] = column_prop["setting"]
+                elif column_prop["tag"] == "ch.ehi.ili2db.oidDomain":
+                    record["oid_domain"] = column_prop["setting"]
 
             record["attr_order"] = "999"
             if (
@@ -417,10 +493,7 @@ class GPKGConnector(DBConnector):
             ):  # e.g., t_id's don't have a fully qualified name
                 attr_order_found = False
                 attr_mapping_found = False
-                for meta_attr in meta_attrs:
-                    if record["fully_qualified_name"] != meta_attr["ilielement"]:
-                        continue
-
+                for meta_attr in meta_attrs.get(record["fully_qualified_name"], []):
                     if meta_attr["attr_name"] == "form_order":
                         record["attr_order"] = meta_attr["attr_value"]
                         attr_order_found = True
@@ -435,13 +508,22 @@ class GPKGConnector(DBConnector):
             complete_records.append(record)
 
         # Finally, let's order the records by attr_order
-        complete_records = sorted(complete_records, key=lambda k: int(k["attr_order"]))
+        return sorted(complete_records, key=lambda k: int(k["attr_order"]))
 
-        cursor.close()
-        return complete_records
+    @staticmethod
+    def _group_by_key(records, key, values=None):
+        """
+        Groups records by the value of one of their columns, keeping their
+        order. If values is given, records with other values are skipped.
+        """
+        records_by_key = dict()
+        for record in records:
+            if values is None or record[key] in values:
+                records_by_key.setdefault(record[key], list()).append(record)
+
+        return records_by_key
 
     def get_min_max_info(self, table_name):
-        constraint_mapping = dict()
         cursor = self.conn.cursor()
         cursor.execute(
             """SELECT sql
@@ -452,10 +534,39 @@ class GPKGConnector(DBConnector):
             )
         )
 
+        constraint_mapping = self._get_min_max_mapping(cursor.fetchone()[0])
+
+        cursor.close()
+        return constraint_mapping
+
+    def get_min_max_info_by_table(self, table_names):
+        # Read the definitions of all tables at once
+        min_max_info = dict()
+        table_names = set(table_names)
+        if not table_names:
+            return min_max_info
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """SELECT name, sql
+                          FROM sqlite_master
+                          WHERE type = 'table'
+                       """
+        )
+        for table in cursor:
+            if table["name"] in table_names:
+                min_max_info[table["name"]] = self._get_min_max_mapping(table["sql"])
+
+        cursor.close()
+        return min_max_info
+
+    @staticmethod
+    def _get_min_max_mapping(table_sql):
         # Create a mapping in the form of
         #
         # fieldname: (min, max)
-        res1 = re.findall(r"CHECK\((.*)\)", cursor.fetchone()[0])
+        constraint_mapping = dict()
+        res1 = re.findall(r"CHECK\((.*)\)", table_sql or "")
         for res in res1:
             res2 = re.search(
                 r"(\w+) BETWEEN ([-?\d\.E]+) AND ([-?\d\.E]+)", res
@@ -463,7 +574,6 @@ class GPKGConnector(DBConnector):
             if res2:
                 constraint_mapping[res2.group(1)] = (res2.group(2), res2.group(3))
 
-        cursor.close()
         return constraint_mapping
 
     def get_relations_info(self, filter_layer_list=[]):
@@ -939,6 +1049,44 @@ class GPKGConnector(DBConnector):
             cursor.close()
         return result
 
+    def get_schema_fingerprint(self):
+        if not self.metadata_exists():
+            return None
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """SELECT type, name, sql
+            FROM sqlite_master
+            WHERE sql IS NOT NULL
+            ORDER BY type, name"""
+        )
+        schema_objects = [tuple(record) for record in cursor.fetchall()]
+
+        fingerprint = hashlib.sha1()
+        for schema_object in schema_objects:
+            fingerprint.update("{}\n".format(schema_object).encode())
+
+        existing_tables = {
+            table_name.lower(): table_name
+            for object_type, table_name, _ in schema_objects
+            if object_type == "table"
+        }
+        tables = ["gpkg_geometry_columns"] + ILI2DB_SCHEMA_METADATA_TABLES
+        for table_name in tables:
+            if table_name in existing_tables:
+                cursor.execute(
+                    'SELECT * FROM "{}"'.format(existing_tables[table_name])
+                )
+                records = sorted(repr(tuple(record)) for record in cursor)
+                fingerprint.update(
+                    "{}:{}\n".format(table_name, len(records)).encode()
+                )
+                for record in records:
+                    fingerprint.update(record.encode())
+        cursor.close()
+
+        return fingerprint.hexdigest()
+
     def _fetch_and_increment_key_object(self, field_name):
         next_id = 0
         if self._table_exists("T_KEY_OBJECT"):
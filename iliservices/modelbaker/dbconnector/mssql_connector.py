@@ -20,8 +20,8 @@ import numbers
 import re
 
 import pyodbc
-from qgis.core import Qgis
 
+from ..utils.globals import MessageLevel
 from .db_connector import DBConnector, DBConnectorError
 
 METADATA_TABLE = "t_ili2db_table_prop"
@@ -478,121 +478,185 @@ class MssqlConnector(DBConnector):
         res = []
         # Get all fields for this table
         if self.schema:
-            metadata_exists = self.metadata_exists()
-            metaattrs_exists = self._table_exists(METAATTRS_TABLE)
-            ln = "\n"
-            stmt = ""
-
-            # TODO description column is missing
-            stmt += ln + "SELECT"
-            stmt += ln + "     c.column_name"
-            stmt += (
-                ln
-                + "    , case c.data_type when 'decimal' then 'numeric' else c.DATA_TYPE end as data_type"
+            cur = self.conn.cursor()
+            cur.execute(
+                self._get_fields_info_query("c.TABLE_NAME = '{}'".format(table_name))
             )
-            stmt += ln + "    , c.numeric_scale"
-            if metadata_exists:
-                stmt += ln + "    , unit.setting AS unit"
-                stmt += ln + "    , txttype.setting AS texttype"
-                stmt += ln + "    , alias.setting AS column_alias"
-                stmt += ln + "    , full_name.iliname AS fully_qualified_name"
-                stmt += ln + "    , enum_domain.setting AS enum_domain"
-                stmt += ln + "    , oid_domain.setting AS oid_domain"
-                if metaattrs_exists:
-                    stmt += (
-                        ln
-                        + "    , COALESCE(CAST(form_order.attr_value AS int), 999) AS attr_order"
-                        + "    , attr_mapping.attr_value AS attr_mapping"
-                    )
-            stmt += ln + "    , null AS comment"
-            stmt += ln + "FROM INFORMATION_SCHEMA.COLUMNS AS c"
-            if metadata_exists:
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop unit"
-                stmt += ln + "    ON c.table_name = unit.tablename"
-                stmt += ln + "    AND c.column_name = unit.columnname"
-                stmt += ln + "    AND unit.tag = 'ch.ehi.ili2db.unit'"
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop txttype"
-                stmt += ln + "    ON c.table_name = txttype.tablename"
-                stmt += ln + "    AND c.column_name = txttype.columnname"
-                stmt += ln + "    AND txttype.tag = 'ch.ehi.ili2db.textKind'"
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop alias"
-                stmt += ln + "    ON c.table_name = alias.tablename"
-                stmt += ln + "    AND c.column_name = alias.columnname"
-                stmt += ln + "    AND alias.tag = 'ch.ehi.ili2db.dispName'"
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_attrname full_name"
-                stmt += ln + "    ON full_name.{}='{{table}}'".format(
-                    "owner" if self.ili_version() == 3 else "colowner"
+            res = self._get_dict_result(cur)
+        return res
+
+    def get_fields_info_by_table(self, table_names):
+        # Get all fields for all the given tables at once
+        fields_info = dict()
+        if self.schema and table_names:
+            cur = self.conn.cursor()
+            cur.execute(
+                self._get_fields_info_query(
+                    "c.TABLE_NAME IN ('{}')".format("','".join(table_names)),
+                    "c.TABLE_NAME AS table_name, ",
                 )
-                stmt += ln + "    AND c.column_name=full_name.sqlname"
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop enum_domain"
-                stmt += ln + "    ON c.table_name = enum_domain.tablename"
-                stmt += ln + "    AND c.column_name = enum_domain.columnname"
-                stmt += ln + "    AND enum_domain.tag = 'ch.ehi.ili2db.enumDomain'"
-                stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop oid_domain"
-                stmt += ln + "    ON c.table_name = oid_domain.tablename"
+            )
+
+            # Rows keep, within each table, the order get_fields_info returns them in
+            fields_info = self._group_by_table(self._get_dict_result(cur))
+
+        return fields_info
+
+    def _get_fields_info_query(self, table_filter, additional_fields=""):
+        """
+        Builds the query for the fields info of the tables matching
+        table_filter (a condition on INFORMATION_SCHEMA.COLUMNS c).
+        """
+        metadata_exists = self.metadata_exists()
+        metaattrs_exists = self._table_exists(METAATTRS_TABLE)
+        ln = "\n"
+        stmt = ""
+
+        # TODO description column is missing
+        stmt += ln + "SELECT"
+        stmt += ln + "     {}c.column_name".format(additional_fields)
+        stmt += (
+            ln
+            + "    , case c.data_type when 'decimal' then 'numeric' else c.DATA_TYPE end as data_type"
+        )
+        stmt += ln + "    , c.numeric_scale"
+        if metadata_exists:
+            stmt += ln + "    , unit.setting AS unit"
+            stmt += ln + "    , txttype.setting AS texttype"
+            stmt += ln + "    , alias.setting AS column_alias"
+            stmt += ln + "    , full_name.iliname AS fully_qualified_name"
+            stmt += ln + "    , enum_domain.setting AS enum_domain"
+            stmt += ln + "    , oid_domain.setting AS oid_domain"
+            if metaattrs_exists:
                 stmt += (
-                    ln + "    AND LOWER(c.column_name) = LOWER(oid_domain.columnname)"
+                    ln
+                    + "    , COALESCE(CAST(form_order.attr_value AS int), 999) AS attr_order"
+                    + "    , attr_mapping.attr_value AS attr_mapping"
                 )
-                stmt += ln + "    AND oid_domain.tag = 'ch.ehi.ili2db.oidDomain'"
-                if metaattrs_exists:
-                    stmt += ln + "LEFT JOIN {schema}.t_ili2db_meta_attrs form_order"
-                    stmt += ln + "    ON full_name.iliname=form_order.ilielement AND"
-                    stmt += ln + "    form_order.attr_name='form_order'"
-                    stmt += ln + "LEFT JOIN {schema}.t_ili2db_meta_attrs attr_mapping"
-                    stmt += ln + "    ON full_name.iliname=attr_mapping.ilielement AND"
-                    stmt += ln + "    attr_mapping.attr_name='ili2db.mapping'"
-            stmt += ln + "WHERE TABLE_NAME = '{table}' AND TABLE_SCHEMA = '{schema}'"
-            if metadata_exists and metaattrs_exists:
-                stmt += ln + "ORDER BY attr_order;"
-            stmt = stmt.format(schema=self.schema, table=table_name)
-
-            cur = self.conn.cursor()
-            cur.execute(stmt)
-            res = self._get_dict_result(cur)
-        return res
+        stmt += ln + "    , null AS comment"
+        stmt += ln + "FROM INFORMATION_SCHEMA.COLUMNS AS c"
+        if metadata_exists:
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop unit"
+            stmt += ln + "    ON c.table_name = unit.tablename"
+            stmt += ln + "    AND c.column_name = unit.columnname"
+            stmt += ln + "    AND unit.tag = 'ch.ehi.ili2db.unit'"
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop txttype"
+            stmt += ln + "    ON c.table_name = txttype.tablename"
+            stmt += ln + "    AND c.column_name = txttype.columnname"
+            stmt += ln + "    AND txttype.tag = 'ch.ehi.ili2db.textKind'"
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop alias"
+            stmt += ln + "    ON c.table_name = alias.tablename"
+            stmt += ln + "    AND c.column_name = alias.columnname"
+            stmt += ln + "    AND alias.tag = 'ch.ehi.ili2db.dispName'"
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_attrname full_name"
+            stmt += ln + "    ON full_name.{}=c.table_name".format(
+                "owner" if self.ili_version() == 3 else "colowner"
+            )
+            stmt += ln + "    AND c.column_name=full_name.sqlname"
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop enum_domain"
+            stmt += ln + "    ON c.table_name = enum_domain.tablename"
+            stmt += ln + "    AND c.column_name = enum_domain.columnname"
+            stmt += ln + "    AND enum_domain.tag = 'ch.ehi.ili2db.enumDomain'"
+            stmt += ln + "LEFT JOIN {schema}.t_ili2db_column_prop oid_domain"
+            stmt += ln + "    ON c.table_name = oid_domain.tablename"
+            stmt += (
+                ln + "    AND LOWER(c.column_name) = LOWER(oid_domain.columnname)"
+            )
+            stmt += ln + "    AND oid_domain.tag = 'ch.ehi.ili2db.oidDomain'"
+            if metaattrs_exists:
+                stmt += ln + "LEFT JOIN {schema}.t_ili2db_meta_attrs form_order"
+                stmt += ln + "    ON full_name.iliname=form_order.ilielement AND"
+                stmt += ln + "    form_order.attr_name='form_order'"
+                stmt += ln + "LEFT JOIN {schema}.t_ili2db_meta_attrs attr_mapping"
+                stmt += ln + "    ON full_name.iliname=attr_mapping.ilielement AND"
+                stmt += ln + "    attr_mapping.attr_name='ili2db.mapping'"
+        stmt += ln + "WHERE {table_filter} AND c.TABLE_SCHEMA = '{schema}'"
+        if metadata_exists and metaattrs_exists:
+            stmt += ln + "ORDER BY attr_order;"
+        stmt = stmt.format(schema=self.schema, table_filter=table_filter)
+
+        return stmt
 
     def get_min_max_info(self, table_name):
         result = {}
         # Get all 'c'heck constraints for this table
         if self.schema:
             constraints_cur = self.conn.cursor()
-            # this query returns the clause check intervals that are similar to:
-            #       ([numero_pisos]>=(1) AND [numero_pisos]<=(100))
-            query = """
-                SELECT CHECK_CLAUSE
-                FROM
-                    INFORMATION_SCHEMA.CHECK_CONSTRAINTS cc INNER JOIN
-                    INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE c
-                        ON cc.CONSTRAINT_NAME = c.CONSTRAINT_NAME
-                        AND cc.CONSTRAINT_SCHEMA = c.CONSTRAINT_SCHEMA
-                WHERE
-                    cc.CONSTRAINT_SCHEMA = '{schema}'
-                    AND TABLE_NAME = '{table}'
-                """.format(
-                schema=self.schema, table=table_name
+            constraints_cur.execute(
+                self._get_min_max_info_query("TABLE_NAME = '{}'".format(table_name))
+            )
+
+            result = self._get_min_max_mapping(constraints_cur)
+
+        return result
+
+    def get_min_max_info_by_table(self, table_names):
+        # Get all 'c'heck constraints for all the given tables at once
+        min_max_info = dict()
+        if self.schema and table_names:
+            constraints_cur = self.conn.cursor()
+            constraints_cur.execute(
+                self._get_min_max_info_query(
+                    "TABLE_NAME IN ('{}')".format("','".join(table_names)),
+                    "TABLE_NAME AS table_name, ",
+                )
             )
 
-            constraints_cur.execute(query)
-
-            # Create a mapping in the form of
-            #
-            # fieldname: (min, max)
-            constraint_mapping = dict()
-            for constraint in constraints_cur:
-                # The regex takes the query results (e.g. '([numero_pisos]>=(1) AND [numero_pisos]<=(100))')
-                # and gets the field name (regex-group 1), the minimum value (regex-group 2),
-                # and the maximum value (regex-group 4) of the field for each register
-                m = re.match(
-                    r"\(\[(.*)\]>=\(([+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)\) AND \[(.*)\]<=\(([+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)\)\)",
-                    constraint[0],
+            for table_name, constraints in self._group_by_table(
+                self._get_dict_result(constraints_cur)
+            ).items():
+                min_max_info[table_name] = self._get_min_max_mapping(
+                    [(constraint["CHECK_CLAUSE"],) for constraint in constraints]
                 )
 
-                if m:
-                    constraint_mapping[m.group(1)] = (m.group(2), m.group(4))
+        return min_max_info
+
+    def _get_min_max_info_query(self, table_filter, additional_fields=""):
+        # this query returns the clause check intervals that are similar to:
+        #       ([numero_pisos]>=(1) AND [numero_pisos]<=(100))
+        return """
+            SELECT {additional_fields}CHECK_CLAUSE
+            FROM
+                INFORMATION_SCHEMA.CHECK_CONSTRAINTS cc INNER JOIN
+                INFORMATION_SCHEMA.CONSTRAINT_COLUMN_USAGE c
+                    ON cc.CONSTRAINT_NAME = c.CONSTRAINT_NAME
+                    AND cc.CONSTRAINT_SCHEMA = c.CONSTRAINT_SCHEMA
+            WHERE
+                cc.CONSTRAINT_SCHEMA = '{schema}'
+                AND {table_filter}
+            """.format(
+            additional_fields=additional_fields,
+            schema=self.schema,
+            table_filter=table_filter,
+        )
 
-            result = constraint_mapping
+    @staticmethod
+    def _get_min_max_mapping(constraints):
+        # Create a mapping in the form of
+        #
+        # fieldname: (min, max)
+        constraint_mapping = dict()
+        for constraint in constraints:
+            # The regex takes the query results (e.g. '([numero_pisos]>=(1) AND [numero_pisos]<=(100))')
+            # and gets the field name (regex-group 1), the minimum value (regex-group 2),
+            # and the maximum value (regex-group 4) of the field for each register
+            m = re.match(
+                r"\(\[(.*)\]>=\(([+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)\) AND \[(.*)\]<=\(([+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)\)\)",
+                constraint[0],
+            )
 
-        return result
+            if m:
+                constraint_mapping[m.group(1)] = (m.group(2), m.group(4))
+
+        return constraint_mapping
+
+    @staticmethod
+    def _group_by_table(records):
+        records_by_table = dict()
+        for record in records:
+            records_by_table.setdefault(record["table_name"], list()).append(record)
+
+        return records_by_table
 
     def get_relations_info(self, filter_layer_list=[]):
         result = []
@@ -833,7 +897,7 @@ WHERE TABLE_SCHEMA='{schema}'
         res = cur.fetchone()[0]
         if res > 0:
             self.new_message.emit(
-                Qgis.Warning,
+                MessageLevel.WARNING,
                 "DB schema created with ili2db version 3. Better use version 4.",
             )
             return 3
@@ -16,6 +16,7 @@
  *                                                                         *
  ***************************************************************************/
 """
+import hashlib
 import logging
 import numbers
 import re
@@ -23,8 +24,9 @@ import re
 import psycopg2
 import psycopg2.extras
 from psycopg2 import OperationalError, sql
-from qgis.core import Qgis
 
+from ..utils.globals import MessageLevel
+from .config import ILI2DB_SCHEMA_METADATA_TABLES
 from .db_connector import DBConnector, DBConnectorError
 
 PG_METADATA_TABLE = "t_ili2db_table_prop"
@@ -53,6 +55,12 @@ class PGConnector(DBConnector):
         self.dispName = "dispname"
         self.basket_table_name = PG_BASKET_TABLE
         self.dataset_table_name = PG_DATASET_TABLE
+        self.concurrent_introspection = True
+        self.driver_errors = (psycopg2.Error,)
+
+    def close_connection(self):
+        if self.conn and not self.conn.closed:
+            self.conn.close()
 
     def map_data_types(self, data_type):
         if not data_type:
@@ -422,144 +430,172 @@ class PGConnector(DBConnector):
         # Get all fields for this table
         if self.schema:
             fields_cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            fields_cur.execute(
+                self._get_fields_info_query(
+                    """st.relid = '{schema}."{table}"'::regclass""".format(
+                        schema=self.schema, table=table_name
+                    )
+                )
+            )
 
-            unit_field = ""
-            text_kind_field = ""
-            full_name_field = ""
-            enum_domain_field = ""
-            oid_domain_field = ""
-            attr_order_field = ""
-            attr_mapping_field = ""
-            column_alias = ""
-            unit_join = ""
-            text_kind_join = ""
-            disp_name_join = ""
-            full_name_join = ""
-            enum_domain_join = ""
-            oid_domain_join = ""
-            attr_order_join = ""
-            attr_mapping_join = ""
-            order_by_attr_order = ""
+            return fields_cur
 
-            if self.metadata_exists():
-                unit_field = "unit.setting AS unit,"
-                text_kind_field = "txttype.setting AS texttype,"
-                column_alias = "alias.setting AS column_alias,"
-                full_name_field = "full_name.iliname as fully_qualified_name,"
-                enum_domain_field = "enum_domain.setting as enum_domain,"
-                oid_domain_field = "oid_domain.setting as oid_domain,"
-                unit_join = """LEFT JOIN {}.t_ili2db_column_prop unit
-                                                    ON c.table_name=unit.tablename AND
-                                                    c.column_name=unit.columnname AND
-                                                    unit.tag = 'ch.ehi.ili2db.unit'""".format(
-                    self.schema
-                )
-                text_kind_join = """LEFT JOIN {}.t_ili2db_column_prop txttype
-                                                        ON c.table_name=txttype.tablename AND
-                                                        c.column_name=txttype.columnname AND
-                                                        txttype.tag = 'ch.ehi.ili2db.textKind'""".format(
-                    self.schema
-                )
-                disp_name_join = """LEFT JOIN {}.t_ili2db_column_prop alias
-                                                        ON c.table_name=alias.tablename AND
-                                                        c.column_name=alias.columnname AND
-                                                        alias.tag = 'ch.ehi.ili2db.dispName'""".format(
-                    self.schema
-                )
-                full_name_join = """LEFT JOIN {}.t_ili2db_attrname full_name
-                                                            ON full_name.{}='{}' AND
-                                                            c.column_name=full_name.sqlname
-                                                            """.format(
-                    self.schema,
-                    "owner" if self.ili_version() == 3 else "colowner",
-                    table_name,
-                )
-                enum_domain_join = """LEFT JOIN {}.t_ili2db_column_prop enum_domain
-                                                    ON c.table_name=enum_domain.tablename AND
-                                                    c.column_name=enum_domain.columnname AND
-                                                    enum_domain.tag = 'ch.ehi.ili2db.enumDomain'""".format(
-                    self.schema
-                )
-                oid_domain_join = """LEFT JOIN {}.t_ili2db_column_prop oid_domain
-                                                    ON c.table_name=oid_domain.tablename AND
-                                                    lower(c.column_name)=lower(oid_domain.columnname) AND
-                                                    oid_domain.tag = 'ch.ehi.ili2db.oidDomain'""".format(
-                    self.schema
-                )
-                if self._table_exists(PG_METAATTRS_TABLE):
-                    attr_order_field = "COALESCE(to_number(form_order.attr_value, '999'), 999) as attr_order,"
-                    attr_order_join = """LEFT JOIN {schema}.{t_ili2db_meta_attrs} form_order
-                                                            ON full_name.iliname=form_order.ilielement AND
-                                                            form_order.attr_name='form_order'
-                                                            """.format(
-                        schema=self.schema, t_ili2db_meta_attrs=PG_METAATTRS_TABLE
-                    )
-                    order_by_attr_order = """ORDER BY attr_order"""
+        return []
 
-                    attr_mapping_field = (
-                        "meta_attr_mapping_value.attr_value as attr_mapping,"
-                    )
-                    attr_mapping_join = """LEFT JOIN {schema}.{t_ili2db_meta_attrs} meta_attr_mapping_value
-                                                            ON full_name.iliname=meta_attr_mapping_value.ilielement AND
-                                                            meta_attr_mapping_value.attr_name='ili2db.mapping'
-                                                            """.format(
-                        schema=self.schema, t_ili2db_meta_attrs=PG_METAATTRS_TABLE
-                    )
+    def get_fields_info_by_table(self, table_names):
+        # Get all fields for all the given tables at once
+        fields_info = dict()
+        if self.schema and table_names:
+            fields_cur = self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+            fields_cur.execute(
+                self._get_fields_info_query(
+                    "st.schemaname = %(schema)s AND st.relname = ANY(%(tables)s)",
+                    "c.table_name,",
+                ),
+                {"schema": self.schema, "tables": list(table_names)},
+            )
 
-                fields_cur.execute(
-                    """
-                    SELECT
-                      c.column_name,
-                      c.data_type,
-                      c.numeric_scale,
-                      {unit_field}
-                      {text_kind_field}
-                      {column_alias}
-                      {full_name_field}
-                      {enum_domain_field}
-                      {oid_domain_field}
-                      {attr_order_field}
-                      {attr_mapping_field}
-                      pgd.description AS comment
-                    FROM pg_catalog.pg_statio_all_tables st
-                    LEFT JOIN information_schema.columns c ON c.table_schema=st.schemaname AND c.table_name=st.relname
-                    LEFT JOIN pg_catalog.pg_description pgd ON pgd.objoid=st.relid AND pgd.objsubid=c.ordinal_position
-                    {unit_join}
-                    {text_kind_join}
-                    {disp_name_join}
-                    {full_name_join}
-                    {enum_domain_join}
-                    {oid_domain_join}
-                    {attr_order_join}
-                    {attr_mapping_join}
-                    WHERE st.relid = '{schema}."{table}"'::regclass
-                    {order_by_attr_order};
-                    """.format(
-                        schema=self.schema,
-                        table=table_name,
-                        unit_field=unit_field,
-                        text_kind_field=text_kind_field,
-                        column_alias=column_alias,
-                        full_name_field=full_name_field,
-                        enum_domain_field=enum_domain_field,
-                        oid_domain_field=oid_domain_field,
-                        attr_order_field=attr_order_field,
-                        attr_mapping_field=attr_mapping_field,
-                        unit_join=unit_join,
-                        text_kind_join=text_kind_join,
-                        disp_name_join=disp_name_join,
-                        full_name_join=full_name_join,
-                        enum_domain_join=enum_domain_join,
-                        oid_domain_join=oid_domain_join,
-                        attr_order_join=attr_order_join,
-                        attr_mapping_join=attr_mapping_join,
-                        order_by_attr_order=order_by_attr_order,
-                    )
+            # Rows keep, within each table, the order get_fields_info returns them in
+            fields_info = self._group_by_table(fields_cur)
+
+        return fields_info
+
+    def _get_fields_info_query(self, table_filter, additional_fields=""):
+        """
+        Builds the query for the fields info of the tables matching table_filter (a condition on
+        pg_statio_all_tables st). ili2db metadata (units, aliases, etc.) is only read if the schema has it.
+        """
+        unit_field = ""
+        text_kind_field = ""
+        full_name_field = ""
+        enum_domain_field = ""
+        oid_domain_field = ""
+        attr_order_field = ""
+        attr_mapping_field = ""
+        column_alias = ""
+        unit_join = ""
+        text_kind_join = ""
+        disp_name_join = ""
+        full_name_join = ""
+        enum_domain_join = ""
+        oid_domain_join = ""
+        attr_order_join = ""
+        attr_mapping_join = ""
+        order_by_attr_order = ""
+
+        if self.metadata_exists():
+            unit_field = "unit.setting AS unit,"
+            text_kind_field = "txttype.setting AS texttype,"
+            column_alias = "alias.setting AS column_alias,"
+            full_name_field = "full_name.iliname as fully_qualified_name,"
+            enum_domain_field = "enum_domain.setting as enum_domain,"
+            oid_domain_field = "oid_domain.setting as oid_domain,"
+            unit_join = """LEFT JOIN {}.t_ili2db_column_prop unit
+                                                ON c.table_name=unit.tablename AND
+                                                c.column_name=unit.columnname AND
+                                                unit.tag = 'ch.ehi.ili2db.unit'""".format(
+                self.schema
+            )
+            text_kind_join = """LEFT JOIN {}.t_ili2db_column_prop txttype
+                                                    ON c.table_name=txttype.tablename AND
+                                                    c.column_name=txttype.columnname AND
+                                                    txttype.tag = 'ch.ehi.ili2db.textKind'""".format(
+                self.schema
+            )
+            disp_name_join = """LEFT JOIN {}.t_ili2db_column_prop alias
+                                                    ON c.table_name=alias.tablename AND
+                                                    c.column_name=alias.columnname AND
+                                                    alias.tag = 'ch.ehi.ili2db.dispName'""".format(
+                self.schema
+            )
+            full_name_join = """LEFT JOIN {}.t_ili2db_attrname full_name
+                                                        ON full_name.{}=c.table_name AND
+                                                        c.column_name=full_name.sqlname
+                                                        """.format(
+                self.schema,
+                "owner" if self.ili_version() == 3 else "colowner",
+            )
+            enum_domain_join = """LEFT JOIN {}.t_ili2db_column_prop enum_domain
+                                                ON c.table_name=enum_domain.tablename AND
+                                                c.column_name=enum_domain.columnname AND
+                                                enum_domain.tag = 'ch.ehi.ili2db.enumDomain'""".format(
+                self.schema
+            )
+            oid_domain_join = """LEFT JOIN {}.t_ili2db_column_prop oid_domain
+                                                ON c.table_name=oid_domain.tablename AND
+                                                lower(c.column_name)=lower(oid_domain.columnname) AND
+                                                oid_domain.tag = 'ch.ehi.ili2db.oidDomain'""".format(
+                self.schema
+            )
+            if self._table_exists(PG_METAATTRS_TABLE):
+                attr_order_field = "COALESCE(to_number(form_order.attr_value, '999'), 999) as attr_order,"
+                attr_order_join = """LEFT JOIN {schema}.{t_ili2db_meta_attrs} form_order
+                                                        ON full_name.iliname=form_order.ilielement AND
+                                                        form_order.attr_name='form_order'
+                                                        """.format(
+                    schema=self.schema, t_ili2db_meta_attrs=PG_METAATTRS_TABLE
                 )
+                order_by_attr_order = """ORDER BY attr_order"""
 
-                return fields_cur
+                attr_mapping_field = (
+                    "meta_attr_mapping_value.attr_value as attr_mapping,"
+                )
+                attr_mapping_join = """LEFT JOIN {schema}.{t_ili2db_meta_attrs} meta_attr_mapping_value
+                                                        ON full_name.iliname=meta_attr_mapping_value.ilielement AND
+                                                        meta_attr_mapping_value.attr_name='ili2db.mapping'
+                                                        """.format(
+                    schema=self.schema, t_ili2db_meta_attrs=PG_METAATTRS_TABLE
+                )
 
-        return []
+        return """
+            SELECT
+              {additional_fields}
+              c.column_name,
+              c.data_type,
+              c.numeric_scale,
+              {unit_field}
+              {text_kind_field}
+              {column_alias}
+              {full_name_field}
+              {enum_domain_field}
+              {oid_domain_field}
+              {attr_order_field}
+              {attr_mapping_field}
+              pgd.description AS comment
+            FROM pg_catalog.pg_statio_all_tables st
+            LEFT JOIN information_schema.columns c ON c.table_schema=st.schemaname AND c.table_name=st.relname
+            LEFT JOIN pg_catalog.pg_description pgd ON pgd.objoid=st.relid AND pgd.objsubid=c.ordinal_position
+            {unit_join}
+            {text_kind_join}
+            {disp_name_join}
+            {full_name_join}
+            {enum_domain_join}
+            {oid_domain_join}
+            {attr_order_join}
+            {attr_mapping_join}
+            WHERE {table_filter}
+            {order_by_attr_order};
+            """.format(
+                table_filter=table_filter,
+                additional_fields=additional_fields,
+                unit_field=unit_field,
+                text_kind_field=text_kind_field,
+                column_alias=column_alias,
+                full_name_field=full_name_field,
+                enum_domain_field=enum_domain_field,
+                oid_domain_field=oid_domain_field,
+                attr_order_field=attr_order_field,
+                attr_mapping_field=attr_mapping_field,
+                unit_join=unit_join,
+                text_kind_join=text_kind_join,
+                disp_name_join=disp_name_join,
+                full_name_join=full_name_join,
+                enum_domain_join=enum_domain_join,
+                oid_domain_join=oid_domain_join,
+                attr_order_join=attr_order_join,
+                attr_mapping_join=attr_mapping_join,
+                order_by_attr_order=order_by_attr_order,
+            )
 
     def get_min_max_info(self, table_name):
         # Get all 'c'heck constraints for this table
@@ -580,20 +616,58 @@ class PGConnector(DBConnector):
                 )
             )
 
-            # Create a mapping in the form of
-            #
-            # fieldname: (min, max)
-            constraint_mapping = dict()
-            for constraint in constraints_cur:
-                constraint_mapping[constraint["check_details"][0]] = (
-                    constraint["check_details"][1],
-                    constraint["check_details"][3],
-                )
-
-            return constraint_mapping
+            return self._get_min_max_mapping(constraints_cur)
 
         return {}
 
+    def get_min_max_info_by_table(self, table_names):
+        # Get all 'c'heck constraints for all the given tables at once
+        min_max_info = dict()
+        if self.schema and table_names:
+            constraints_cur = self.conn.cursor(
+                cursor_factory=psycopg2.extras.DictCursor
+            )
+            constraints_cur.execute(
+                r"""
+                SELECT
+                  cl.relname AS table_name,
+                  regexp_matches(pg_get_constraintdef(con.oid), 'CHECK \(\(\((.*) >= [\'']?([-]?[\d\.]+)[\''::integer|numeric]*\) AND \((.*) <= [\'']?([-]?[\d\.]+)[\''::integer|numeric]*\)\)\)') AS check_details
+                FROM pg_constraint con
+                JOIN pg_class cl ON cl.oid = con.conrelid
+                JOIN pg_namespace ns ON ns.oid = cl.relnamespace
+                WHERE ns.nspname = %(schema)s AND cl.relname = ANY(%(tables)s)
+                AND con.contype = 'c'
+                """,
+                {"schema": self.schema, "tables": list(table_names)},
+            )
+
+            for table_name, constraints in self._group_by_table(constraints_cur).items():
+                min_max_info[table_name] = self._get_min_max_mapping(constraints)
+
+        return min_max_info
+
+    @staticmethod
+    def _get_min_max_mapping(constraints):
+        # Create a mapping in the form of
+        #
+        # fieldname: (min, max)
+        constraint_mapping = dict()
+        for constraint in constraints:
+            constraint_mapping[constraint["check_details"][0]] = (
+                constraint["check_details"][1],
+                constraint["check_details"][3],
+            )
+
+        return constraint_mapping
+
+    @staticmethod
+    def _group_by_table(records):
+        records_by_table = dict()
+        for record in records:
+            records_by_table.setdefault(record["table_name"], list()).append(record)
+
+        return records_by_table
+
     _ValueMapRegExp = re.compile(".*'(.*)'::.*")
 
     def get_value_map_info(self, table_name):
@@ -612,21 +686,50 @@ class PGConnector(DBConnector):
                     schema=self.schema, table=table_name
                 )
             )
-            # Returns value in the form of
-            #    {t_type,"'gl_ntznng_v1_4geobasisdaten_grundnutzung_zonenflaeche'::character varying, 'grundnutzung_zonenflaeche'::character varying"}
+            return self._get_value_map_mapping(constraints_cur)
 
-            constraint_mapping = dict()
-            for constraint in constraints_cur:
-                values = list()
-                for value in constraint["check_details"][1].split(","):
-                    match = re.match(PGConnector._ValueMapRegExp, value)
-                    values.append(match.group(1))
+        return {}
 
-                constraint_mapping[constraint["check_details"][0]] = values
+    def get_value_map_info_by_table(self, table_names):
+        value_map_info = dict()
+        if self.schema and table_names:
+            constraints_cur = self.conn.cursor(
+                cursor_factory=psycopg2.extras.DictCursor
+            )
+            constraints_cur.execute(
+                r"""
+                SELECT
+                  cl.relname AS table_name,
+                  regexp_matches(pg_get_constraintdef(con.oid), 'CHECK \(\(\((.*)\)::text = ANY \(\(ARRAY\[(.*)\]\)::text\[\]\)\)\)') AS check_details
+                FROM pg_constraint con
+                JOIN pg_class cl ON cl.oid = con.conrelid
+                JOIN pg_namespace ns ON ns.oid = cl.relnamespace
+                WHERE ns.nspname = %(schema)s AND cl.relname = ANY(%(tables)s)
+                AND con.contype = 'c'
+                """,
+                {"schema": self.schema, "tables": list(table_names)},
+            )
 
-            return constraint_mapping
+            for table_name, constraints in self._group_by_table(constraints_cur).items():
+                value_map_info[table_name] = self._get_value_map_mapping(constraints)
 
-        return {}
+        return value_map_info
+
+    @staticmethod
+    def _get_value_map_mapping(constraints):
+        # Returns value in the form of
+        #    {t_type,"'gl_ntznng_v1_4geobasisdaten_grundnutzung_zonenflaeche'::character varying, 'grundnutzung_zonenflaeche'::character varying"}
+
+        constraint_mapping = dict()
+        for constraint in constraints:
+            values = list()
+            for value in constraint["check_details"][1].split(","):
+                match = re.match(PGConnector._ValueMapRegExp, value)
+                values.append(match.group(1))
+
+            constraint_mapping[constraint["check_details"][0]] = values
+
+        return constraint_mapping
 
     def get_relations_info(self, filter_layer_list=[]):
         if self.schema:
@@ -860,7 +963,7 @@ class PGConnector(DBConnector):
         )
         if cur.rowcount > 1:
             self.new_message.emit(
-                Qgis.Warning,
+                MessageLevel.WARNING,
                 "DB schema created with ili2db version 3. Better use version 4.",
             )
             return 3
@@ -1085,6 +1188,62 @@ class PGConnector(DBConnector):
             result = cur.fetchall()
         return result
 
+    def get_schema_fingerprint(self):
+        if not self.schema or not self.metadata_exists():
+            return None
+
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = %(schema)s AND table_name = ANY(%(tables)s)
+            ORDER BY table_name
+            """,
+            {"schema": self.schema, "tables": ILI2DB_SCHEMA_METADATA_TABLES},
+        )
+        metadata_tables = [record[0] for record in cur.fetchall()]
+
+        # Digests are computed by the server, so only a few rows are transferred
+        metadata_queries = [
+            sql.SQL(
+                """SELECT {table_name}, count(*), md5(coalesce(string_agg(t::text, E'\\n' ORDER BY t::text), ''))
+                   FROM {schema}.{table} AS t"""
+            ).format(
+                table_name=sql.Literal(table_name),
+                schema=sql.Identifier(self.schema),
+                table=sql.Identifier(table_name),
+            )
+            for table_name in metadata_tables
+        ]
+        cur.execute(sql.SQL(" UNION ALL ").join(metadata_queries))
+        metadata_digests = sorted(cur.fetchall())
+
+        cur.execute(
+            """
+            SELECT
+              (SELECT md5(coalesce(string_agg(cl.relname || '.' || a.attname || ' ' || format_type(a.atttypid, a.atttypmod), ',' ORDER BY cl.relname, a.attnum), ''))
+               FROM pg_attribute a
+               JOIN pg_class cl ON cl.oid = a.attrelid
+               JOIN pg_namespace ns ON ns.oid = cl.relnamespace
+               WHERE ns.nspname = %(schema)s AND cl.relkind IN ('r', 'v', 'm', 'p', 'f')
+               AND a.attnum > 0 AND NOT a.attisdropped),
+              (SELECT md5(coalesce(string_agg(cl.relname || '.' || con.conname || ' ' || pg_get_constraintdef(con.oid), ',' ORDER BY cl.relname, con.conname), ''))
+               FROM pg_constraint con
+               JOIN pg_class cl ON cl.oid = con.conrelid
+               JOIN pg_namespace ns ON ns.oid = cl.relnamespace
+               WHERE ns.nspname = %(schema)s)
+            """,
+            {"schema": self.schema},
+        )
+        columns_digest, constraints_digest = cur.fetchone()
+
+        fingerprint = hashlib.sha1()
+        for table_name, count, digest in metadata_digests:
+            fingerprint.update("{}:{}:{}\n".format(table_name, count, digest).encode())
+        fingerprint.update("{}\n{}".format(columns_digest, constraints_digest).encode())
+        return fingerprint.hexdigest()
+
     def get_ili2db_sequence_value(self):
         if self.schema:
             cur = self.conn.cursor()
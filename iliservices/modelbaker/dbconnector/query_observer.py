@@ -0,0 +1,71 @@
+import time
+
+
+class ObservedConnection:
+    """
+    Wraps a DB-API connection (psycopg2, sqlite3, pyodbc), so that an observer
+    is called after each query run through its cursors.
+
+    :param connection: The wrapped connection.
+    :param observer: Callable observer(sql, elapsed, rows), with the SQL text,
+        the seconds execute() took and the number of rows returned or affected
+        (None if the driver doesn't tell it, e.g., for SQLite SELECTs).
+    """
+
+    def __init__(self, connection, observer):
+        self.connection = connection
+        self.observer = observer
+
+    def cursor(self, *args, **kwargs):
+        return ObservedCursor(self.connection.cursor(*args, **kwargs), self.observer)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def __setattr__(self, name, value):
+        if name in ("connection", "observer"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.connection, name, value)
+
+
+class ObservedCursor:
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def execute(self, query, *args, **kwargs):
+        return self._observe(self._cursor.execute, query, *args, **kwargs)
+
+    def executemany(self, query, *args, **kwargs):
+        return self._observe(self._cursor.executemany, query, *args, **kwargs)
+
+    def _observe(self, execute, query, *args, **kwargs):
+        start_time = time.perf_counter()
+        result = execute(query, *args, **kwargs)
+        elapsed = time.perf_counter() - start_time
+
+        # psycopg2 keeps the query as sent to the server, with its parameters
+        sql = getattr(self._cursor, "query", None) or query
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8", "replace")
+        rows = self._cursor.rowcount
+        if rows is not None and rows < 0:
+            rows = None
+        self._observer(str(sql), elapsed, rows)
+
+        # sqlite3 and pyodbc return the cursor itself, to chain calls
+        return self if result is self._cursor else result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._cursor.__exit__(exc_type, exc_value, traceback)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -22,3 +22,7 @@ GPKG_FILTER_TABLES_MATCHING_PREFIX_SUFFIX = [
     },
     {"prefix": "vgpkg_", "suffix": []},
 ]
+
+# Max. number of metadata queries run at the same time (each one with its own
+# connection) by the Generator in parallel_introspection mode
+INTROSPECTION_MAX_WORKERS = 4
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .profiler import profile_phase
+
+
+class ConnectorPool:
+    """
+    Runs DB connector methods concurrently. Each worker thread uses its own
+    connector (i.e., its own connection) to the same DB and schema, created
+    the first time the thread needs it and closed by close().
+
+    :param create_connector: Callable returning a new DB connector.
+    :param max_workers: Max. number of methods (and connections) running at the same time.
+    :param profiler: Optional GenerationProfiler, to time each method as a phase of its worker thread.
+    """
+
+    def __init__(self, create_connector, max_workers, profiler=None):
+        self._create_connector = create_connector
+        self._profiler = profiler
+        self._local = threading.local()
+        self._connectors = list()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def submit(self, method_name, *args):
+        """
+        Runs a DB connector method in a worker thread. Cursors returned by the
+        method are fetched in that thread, so that results are plain lists.
+
+        :param method_name: Name of the DB connector method, e.g., 'get_tables_info'.
+        :return: Future with the result of the method.
+        """
+        return self._executor.submit(self._run, method_name, *args)
+
+    def close(self):
+        """
+        Waits for the running methods and closes the connections of the pool.
+        """
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for connector in self._connectors:
+                connector.close_connection()
+            self._connectors.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self, method_name, *args):
+        connector = getattr(self._local, "connector", None)
+        if connector is None:
+            connector = self._create_connector()
+            self._local.connector = connector
+            with self._lock:
+                self._connectors.append(connector)
+
+        with profile_phase(self._profiler, method_name):
+            result = getattr(connector, method_name)(*args)
+            if hasattr(result, "fetchall"):
+                result = result.fetchall()
+        return result
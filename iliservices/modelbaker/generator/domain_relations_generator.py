@@ -17,18 +17,87 @@
  ***************************************************************************/
 """
 import re
-
-from ..dataobjects.relations import Relation
+from functools import lru_cache
+
+from .object_factory import get_object_factory
+from .parsed_model_cache import get_parsed_model
+from .profiler import profile_phase, profiled
+
+_re_comment = re.compile(r"\s*/\*")  # /* comment
+_re_end_comment = re.compile(r"\s*\*/")  # comment */
+_re_oneline_comment = re.compile(r"\s*/\*.*\*/")  # /* comment */
+_re_inline_comment = re.compile(r"^\s*!!(?!@)")  # !! comment
+
+# MODEL Catastro_COL_ES_V_2_0_20170331 (es)
+_re_model = re.compile(r"\s*MODEL\s*([\w\d_-]+).*")
+# TOPIC Catastro_Registro [=]
+_re_topic = re.compile(r"\s*TOPIC\s*([\w\d_-]+).*")
+_re_structure = re.compile(
+    r"\s*STRUCTURE\s*([\w\d_-]+)\s*\=.*"
+)  # STRUCTURE StructureName =
+_re_class = re.compile(
+    r"\s*CLASS\s*([\w\d_-]+)\s*[\(ABSTRACT\)]*\s*[EXTENDS]*\s*([\w\d_-]*).*"
+)  # CLASS ClassName (ABSTRACT) [EXTENDS] [BaseClassName] [=]
+_re_class_extends = re.compile(
+    r"\s*EXTENDS\s*([\w\d_\-\.]+)\s*\=.*"
+)  # EXTENDS BaseClassName =
+_re_inline_enum_start = re.compile(r"\s*([\w\d_-]+)\s*:\s*[MANDATORY]*\s*\(.*")
+_re_inline_enum_end = re.compile(r"\s*\);.*")
+_re_inline_enum_oneline = re.compile(r"\s*([\w\d_-]+)\s*:\s*[MANDATORY]*\s*\(.*\);.*")
+# Typ: BAG {1..*} OF EI_Punkt_Typ;
+_re_bag_of = re.compile(r"\s*([\w\d_-]+)\s*:\s*BAG\s*\{(.*)\}\s*OF\s*([\.\w\d_-]+);.*")
+
+# Patterns that depend on a name, compiled by _compile_regexp
+_STRUCTURE_ONE_LINE = r"STRUCTURE\s*{0}\s*\=(.*)\s*END\s*{0};"  # STRUCTURE Name = ... END Name;
+_DOMAIN_ATTRIBUTE = r"\s*([\w\d_-]+).*:.*\s{};.*"  # attr_name: [MANDATORY] DomainName;
+_DOMAIN_MENTION = r"\s{};"  # Cheap check to run before _DOMAIN_ATTRIBUTE
+
+
+@lru_cache(maxsize=4096)
+def _compile_regexp(pattern, name):
+    return re.compile(pattern.format(name))
+
+
+@lru_cache(maxsize=256)
+def _get_domain_attribute_regexps(domains_with_local):
+    """
+    :param domains_with_local: Tuple of domain names (qualified and local).
+    :return: tuple(regexp matching lines that mention any of the domains or None,
+        list of (domain, regexp matching lines that mention the domain, regexp
+        matching attributes of the domain))
+    """
+    if not domains_with_local:
+        return None, []
+
+    return (
+        re.compile(r"\s(?:{});".format("|".join(domains_with_local))),
+        [
+            (
+                d,
+                _compile_regexp(_DOMAIN_MENTION, d),
+                _compile_regexp(_DOMAIN_ATTRIBUTE, d),
+            )
+            for d in domains_with_local
+        ],
+    )
 
 
 class DomainRelationGenerator:
     """Used for ili2db version 3 relation creation"""
 
-    def __init__(self, db_connector, inheritance):
+    def __init__(self, db_connector, inheritance, object_factory=None, profiler=None):
+        """
+        :param object_factory: ObjectFactory used to create relations. If None,
+            the QGIS-backed one is used.
+        :param profiler: GenerationProfiler to time the domain relations phases.
+        """
         self._db_connector = db_connector
         self.inheritance = inheritance
+        self._object_factory = object_factory
+        self.profiler = profiler
         self.debug = False
 
+    @profiled("domain_relations")
     def get_domain_relations_info(self, layers):
         domains = [layer.name for layer in layers if layer.is_domain]
         if self.debug:
@@ -36,6 +105,8 @@ class DomainRelationGenerator:
         if not domains:
             return ([], {})  # relations, bags_of_enum
 
+        object_factory = self._object_factory or get_object_factory()
+
         layer_map = dict()
         for layer in layers:
             if layer.name not in layer_map.keys():
@@ -57,11 +128,14 @@ class DomainRelationGenerator:
             models[record["modelname"].split("{")[0]] = record["content"]
 
         bags_of_enum_info = dict()
-        for k, v in models.items():
-            parsed = self.parse_model(v, list(domains_ili_pg.keys()))
-            models_info.update(parsed[0])
-            extended_classes.update(parsed[1])
-            bags_of_enum_info.update(parsed[2])
+        with profile_phase(self.profiler, "parse_models"):
+            for k, v in models.items():
+                parsed = get_parsed_model(
+                    k, v, list(domains_ili_pg.keys()), self.parse_model
+                )
+                models_info.update(parsed[0])
+                extended_classes.update(parsed[1])
+                bags_of_enum_info.update(parsed[2])
 
         if self.debug:
             print("Classes with domain attrs:", len(models_info))
@@ -139,7 +213,7 @@ class DomainRelationGenerator:
                                 ]:
                                     # Might be that due to ORM mapping, a class is not
                                     # in mapped_layers
-                                    relation = Relation()
+                                    relation = object_factory.create_relation()
                                     relation.referencing_layer = referencing_layer
                                     relation.referenced_layer = referenced_layer
                                     relation.referencing_field = attrs_ili_pg_owner[
@@ -323,33 +397,13 @@ class DomainRelationGenerator:
         return (relations, bags_of_enum)
 
     def parse_model(self, model_content, domains):
-        re_comment = re.compile(r"\s*/\*")  # /* comment
-        re_end_comment = re.compile(r"\s*\*/")  # comment */
-        re_oneline_comment = re.compile(r"\s*/\*.*\*/")  # /* comment */
-        re_inline_comment = re.compile(r"^\s*!!(?!@)")  # !! comment
-
-        # MODEL Catastro_COL_ES_V_2_0_20170331 (es)
-        re_model = re.compile(r"\s*MODEL\s*([\w\d_-]+).*")
-        # TOPIC Catastro_Registro [=]
-        re_topic = re.compile(r"\s*TOPIC\s*([\w\d_-]+).*")
-        re_structure = re.compile(
-            r"\s*STRUCTURE\s*([\w\d_-]+)\s*\=.*"
-        )  # STRUCTURE StructureName =
-        re_class = re.compile(
-            r"\s*CLASS\s*([\w\d_-]+)\s*[\(ABSTRACT\)]*\s*[EXTENDS]*\s*([\w\d_-]*).*"
-        )  # CLASS ClassName (ABSTRACT) [EXTENDS] [BaseClassName] [=]
-        re_class_extends = re.compile(
-            r"\s*EXTENDS\s*([\w\d_\-\.]+)\s*\=.*"
-        )  # EXTENDS BaseClassName =
-        re_inline_enum_start = re.compile(r"\s*([\w\d_-]+)\s*:\s*[MANDATORY]*\s*\(.*")
-        re_inline_enum_end = re.compile(r"\s*\);.*")
-        re_inline_enum_oneline = re.compile(
-            r"\s*([\w\d_-]+)\s*:\s*[MANDATORY]*\s*\(.*\);.*"
-        )
-        # Typ: BAG {1..*} OF EI_Punkt_Typ;
-        re_bag_of = re.compile(
-            r"\s*([\w\d_-]+)\s*:\s*BAG\s*\{(.*)\}\s*OF\s*([\.\w\d_-]+);.*"
-        )
+        """
+        Scans the INTERLIS content of a model in a single pass, looking for
+        classes and structures with attributes that use the given domains.
+
+        :return: [models_info, extended_classes, bags_of_enum]
+        """
+        domains_set = set(domains)
         re_end_structure = None  # END StructureName;
         re_end_class = None  # END ClassName;
         re_end_topic = None  # END TopicName;
@@ -369,47 +423,45 @@ class DomainRelationGenerator:
         bClassJustFound = False  # Flag to search for EXTENDS classes
         local_names = dict()
         domains_with_local = list()
+        domain_regexps = _get_domain_attribute_regexps(tuple(domains_with_local))
 
         for line in model_content.splitlines():
 
             if not currently_inside_comment:
-                result = re_comment.search(line)
-                if result:
-                    result = re_oneline_comment.search(line)
-                    if not result:
+                if _re_comment.search(line):
+                    if not _re_oneline_comment.search(line):
                         currently_inside_comment = True
 
                     continue
             else:
-                result = re_end_comment.search(line)
-                if result:
+                if _re_end_comment.search(line):
                     currently_inside_comment = False
 
                 continue  # Whether comment ends or not, we are done in this line
 
-            if re_inline_comment.search(line):
+            if _re_inline_comment.search(line):
                 continue  # Inline comment at the start of the line
 
             if not current_model:
-                result = re_model.search(line)
+                result = _re_model.search(line)
                 if result:
                     current_model = result.group(1)
-                    re_end_model = re.compile(
-                        r".*END\s*{}\..*".format(current_model)
-                    )  # END TopicName;
+                    re_end_model = _compile_regexp(
+                        r"END\s*{}\.", current_model
+                    )  # END ModelName.
                     if self.debug:
                         print("\nMODEL encontrado", current_model)
 
             else:  # There is a current_model
 
                 if not current_topic:
-                    result = re_topic.search(line)
+                    result = _re_topic.search(line)
                     if result:
                         current_topic = result.group(1)
                         if self.debug:
                             print("TOPIC encontrada", current_topic)
-                        re_end_topic = re.compile(
-                            r"\s*END\s*{};.*".format(current_topic)
+                        re_end_topic = _compile_regexp(
+                            r"END\s*{};", current_topic
                         )  # END TopicName;
 
                         if self.debug:
@@ -426,6 +478,9 @@ class DomainRelationGenerator:
                             for name_list in local_names.values()
                             for name in name_list
                         ] + domains
+                        domain_regexps = _get_domain_attribute_regexps(
+                            tuple(domains_with_local)
+                        )
                         if self.debug:
                             print("domains_with_local:", domains_with_local)
                         continue
@@ -441,6 +496,9 @@ class DomainRelationGenerator:
                                 for name_list in local_names.values()
                                 for name in name_list
                             ] + domains
+                            domain_regexps = _get_domain_attribute_regexps(
+                                tuple(domains_with_local)
+                            )
                             if self.debug:
                                 print(
                                     "domains_with_local_out_of_topic:",
@@ -448,7 +506,7 @@ class DomainRelationGenerator:
                                 )
 
                         if not current_structure_out:
-                            result = re_structure.search(line)
+                            result = _re_structure.search(line)
                             if result:
                                 current_structure_out = result.group(1)
                                 if self.debug:
@@ -456,54 +514,22 @@ class DomainRelationGenerator:
                                 attributes = dict()
 
                                 # Check if definition is in one line and handle it
-                                re_structure_one_line = re.compile(
-                                    r"\s*STRUCTURE\s*{structure}\s*\=(.*)\s*END\s*{structure};.*".format(
-                                        structure=current_structure_out
-                                    )
-                                )
-                                if self.debug:
-                                    print(
-                                        "STRUCTURE OUT FOUND {}, testing one_line_regexp: {}".format(
-                                            current_structure_out, re_structure_one_line
-                                        )
-                                    )
-
-                                result = re_structure_one_line.search(line)
+                                result = _compile_regexp(
+                                    _STRUCTURE_ONE_LINE, current_structure_out
+                                ).search(line)
                                 if result:
                                     if self.debug:
                                         print("STRUCTURE OUT IN ONE LINE")
 
-                                    structure_defs = result.group(1)
-                                    for structure_def in structure_defs.strip().split(
-                                        ";"
-                                    ):
-                                        pair = structure_def.split(":")
-                                        if len(pair) > 1:
-                                            structure_attr = pair[0].strip()
-                                            structure_attr_full_name = (
-                                                "{}.{}.{}".format(
-                                                    current_model,
-                                                    current_structure_out,
-                                                    structure_attr,
-                                                )
-                                            )  # Fully qualified name
-                                            structure_domain = (
-                                                pair[1].strip().split(" ")[-1]
-                                            )  # Filters out "MANDATORY"
-
-                                            if (
-                                                structure_domain not in domains
-                                            ):  # Match was vs. local name, find its corresponding qualified name
-                                                for k, v in local_names.items():
-                                                    if structure_domain in v:
-                                                        structure_domain = k
-                                                        break
-
-                                            if structure_domain in domains_with_local:
-                                                attributes[
-                                                    structure_attr_full_name
-                                                ] = structure_domain
-
+                                    attributes = self._parse_one_line_structure(
+                                        result.group(1),
+                                        "{}.{}".format(
+                                            current_model, current_structure_out
+                                        ),
+                                        domains_set,
+                                        domains_with_local,
+                                        local_names,
+                                    )
                                     if attributes:
                                         models_info.update(
                                             {
@@ -516,46 +542,34 @@ class DomainRelationGenerator:
                                     current_structure_out = ""
                                     continue
 
-                                re_end_structure = re.compile(
-                                    r"\s*END\s*{};.*".format(current_structure)
+                                # Note the in-topic structure name is used here (empty
+                                # out of topics), so 'END;' closes the structure
+                                re_end_structure = _compile_regexp(
+                                    r"END\s*{};", current_structure
                                 )  # END StructureName;
                                 continue
 
                         else:  # There is a current_structure_out
-                            attribute = {
-                                res.group(1): d
-                                for d in domains_with_local
-                                for res in [
-                                    re.search(
-                                        r"\s*([\w\d_-]+).*:.*\s{};.*".format(d), line
-                                    )
-                                ]
-                                if res
-                            }
+                            attribute = self._search_domain_attribute(
+                                line, domain_regexps
+                            )
 
                             if attribute:
                                 if self.debug:
                                     print("MATCH (STRUCTURE):", attribute)
-                                old_key = list(attribute.keys())[
-                                    0
-                                ]  # Not qualified name
-                                new_key = "{}.{}.{}".format(
-                                    current_model, current_structure_out, old_key
-                                )  # Fully qualified name
-                                attr_value = list(attribute.values())[0]
-                                if (
-                                    attr_value not in domains
-                                ):  # Match was vs. local name, find its corresponding qualified name
-                                    for k, v in local_names.items():
-                                        if attr_value in v:
-                                            attribute[old_key] = k
-                                            break
-                                attribute[new_key] = attribute.pop(old_key)
-                                attributes.update(attribute)
+                                attributes.update(
+                                    self._qualify_domain_attribute(
+                                        attribute,
+                                        "{}.{}".format(
+                                            current_model, current_structure_out
+                                        ),
+                                        domains_set,
+                                        local_names,
+                                    )
+                                )
                                 continue
 
-                            result = re_end_structure.search(line)
-                            if result:
+                            if re_end_structure.search(line):
                                 if attributes:
                                     models_info.update(
                                         {
@@ -575,7 +589,7 @@ class DomainRelationGenerator:
                 else:  # There is a current_topic
 
                     if not current_structure:
-                        result = re_structure.search(line)
+                        result = _re_structure.search(line)
                         if result:
                             current_structure = result.group(1)
                             if self.debug:
@@ -583,51 +597,22 @@ class DomainRelationGenerator:
                             attributes = dict()
 
                             # Check if definition is in one line and handle it
-                            re_structure_one_line = re.compile(
-                                r"\s*STRUCTURE\s*{structure}\s*\=(.*)\s*END\s*{structure};.*".format(
-                                    structure=current_structure
-                                )
-                            )
-                            if self.debug:
-                                print(
-                                    "STRUCTURE FOUND {}, testing one_line_regexp: {}".format(
-                                        current_structure, re_structure_one_line
-                                    )
-                                )
-
-                            result = re_structure_one_line.search(line)
+                            result = _compile_regexp(
+                                _STRUCTURE_ONE_LINE, current_structure
+                            ).search(line)
                             if result:
                                 if self.debug:
                                     print("STRUCTURE IN ONE LINE")
 
-                                structure_defs = result.group(1)
-                                for structure_def in structure_defs.strip().split(";"):
-                                    pair = structure_def.split(":")
-                                    if len(pair) > 1:
-                                        structure_attr = pair[0].strip()
-                                        structure_attr_full_name = "{}.{}.{}.{}".format(
-                                            current_model,
-                                            current_topic,
-                                            current_structure,
-                                            structure_attr,
-                                        )  # Fully qualified name
-                                        structure_domain = (
-                                            pair[1].strip().split(" ")[-1]
-                                        )  # Filters out "MANDATORY"
-
-                                        if (
-                                            structure_domain not in domains
-                                        ):  # Match was vs. local name, find its corresponding qualified name
-                                            for k, v in local_names.items():
-                                                if structure_domain in v:
-                                                    structure_domain = k
-                                                    break
-
-                                        if structure_domain in domains_with_local:
-                                            attributes[
-                                                structure_attr_full_name
-                                            ] = structure_domain
-
+                                attributes = self._parse_one_line_structure(
+                                    result.group(1),
+                                    "{}.{}.{}".format(
+                                        current_model, current_topic, current_structure
+                                    ),
+                                    domains_set,
+                                    domains_with_local,
+                                    local_names,
+                                )
                                 if attributes:
                                     models_info.update(
                                         {
@@ -642,41 +627,29 @@ class DomainRelationGenerator:
                                 current_structure = ""
                                 continue
 
-                            re_end_structure = re.compile(
-                                r"\s*END\s*{};.*".format(current_structure)
+                            re_end_structure = _compile_regexp(
+                                r"END\s*{};", current_structure
                             )  # END StructureName;
                             continue
                     else:
-                        attribute = {
-                            res.group(1): d
-                            for d in domains_with_local
-                            for res in [
-                                re.search(r"\s*([\w\d_-]+).*:.*\s{};.*".format(d), line)
-                            ]
-                            if res
-                        }
+                        attribute = self._search_domain_attribute(line, domain_regexps)
 
                         if attribute:
                             if self.debug:
                                 print("MATCH (STRUCTURE):", attribute)
-                            old_key = list(attribute.keys())[0]  # Not qualified name
-                            new_key = "{}.{}.{}.{}".format(
-                                current_model, current_topic, current_structure, old_key
-                            )  # Fully qualified name
-                            attr_value = list(attribute.values())[0]
-                            if (
-                                attr_value not in domains
-                            ):  # Match was vs. local name, find its corresponding qualified name
-                                for k, v in local_names.items():
-                                    if attr_value in v:
-                                        attribute[old_key] = k
-                                        break
-                            attribute[new_key] = attribute.pop(old_key)
-                            attributes.update(attribute)
+                            attributes.update(
+                                self._qualify_domain_attribute(
+                                    attribute,
+                                    "{}.{}.{}".format(
+                                        current_model, current_topic, current_structure
+                                    ),
+                                    domains_set,
+                                    local_names,
+                                )
+                            )
                             continue
 
-                        result = re_end_structure.search(line)
-                        if result:
+                        if re_end_structure.search(line):
                             if attributes:
                                 models_info.update(
                                     {
@@ -693,19 +666,19 @@ class DomainRelationGenerator:
                             continue
 
                     if not current_class:  # Go for classes
-                        result = re_class.search(line)
+                        result = _re_class.search(line)
                         if result:
                             current_class = result.group(1)
                             if self.debug:
                                 print("Class encontrada", current_class)
                             attributes = dict()
-                            re_end_class = re.compile(
-                                r"\s*END\s*{};.*".format(current_class)
+                            re_end_class = _compile_regexp(
+                                r"END\s*{};", current_class
                             )  # END ClassName;
                             bClassJustFound = True
 
                             # Possible EXTENDS
-                            if len(result.groups()) > 1 and result.group(2):
+                            if result.group(2):
                                 extended_classes[
                                     "{}.{}.{}".format(
                                         current_model, current_topic, current_class
@@ -719,19 +692,20 @@ class DomainRelationGenerator:
                                 if self.debug:
                                     print(
                                         "EXTENDS->",
-                                        self.make_full_qualified(
-                                            result.group(2),
-                                            "class",
-                                            current_model,
-                                            current_topic,
-                                        ),
+                                        extended_classes[
+                                            "{}.{}.{}".format(
+                                                current_model,
+                                                current_topic,
+                                                current_class,
+                                            )
+                                        ],
                                     )
 
                             continue
                     else:  # There is a current_class, go for attributes
                         if bClassJustFound:  # Search for extended classes
                             bClassJustFound = False
-                            result = re_class_extends.search(line)
+                            result = _re_class_extends.search(line)
                             if result:
                                 extended_classes[
                                     "{}.{}.{}".format(
@@ -746,81 +720,56 @@ class DomainRelationGenerator:
                                 if self.debug:
                                     print(
                                         "EXTENDS->",
-                                        self.make_full_qualified(
-                                            result.group(1),
-                                            "class",
-                                            current_model,
-                                            current_topic,
-                                        ),
+                                        extended_classes[
+                                            "{}.{}.{}".format(
+                                                current_model,
+                                                current_topic,
+                                                current_class,
+                                            )
+                                        ],
                                     )
                                 continue
 
+                        class_name = "{}.{}.{}".format(
+                            current_model, current_topic, current_class
+                        )
+
                         # Look for BAG {} OF ENUM lines
-                        result = re_bag_of.search(line)
+                        result = _re_bag_of.search(line)
                         if result:
-                            attr_name = "{}.{}.{}.{}".format(
-                                current_model,
-                                current_topic,
-                                current_class,
-                                result.group(1),
-                            )
+                            attr_name = "{}.{}".format(class_name, result.group(1))
                             structure_name = result.group(3)
                             if not "." in structure_name:
                                 structure_name = "{}.{}.{}".format(
                                     current_model, current_topic, structure_name
                                 )
 
-                            class_name = "{}.{}.{}".format(
-                                current_model, current_topic, current_class
-                            )
-                            if not class_name in bags_of_enum:
-                                bags_of_enum[class_name] = {
-                                    attr_name: [result.group(2), structure_name]
-                                }
-                            else:
-                                bags_of_enum[class_name][attr_name] = [
-                                    result.group(2),
-                                    structure_name,
-                                ]
+                            bags_of_enum.setdefault(class_name, dict())[attr_name] = [
+                                result.group(2),
+                                structure_name,
+                            ]
                             continue
 
                         # Go for attributes
-                        attribute = {
-                            res.group(1): d
-                            for d in domains_with_local
-                            for res in [
-                                re.search(r"\s*([\w\d_-]+).*:.*\s{};.*".format(d), line)
-                            ]
-                            if res
-                        }
+                        attribute = self._search_domain_attribute(line, domain_regexps)
 
                         if attribute:
                             if self.debug:
                                 print("MATCH:", attribute)
-                            old_key = list(attribute.keys())[0]  # Not qualified name
-                            new_key = "{}.{}.{}.{}".format(
-                                current_model, current_topic, current_class, old_key
-                            )  # Fully qualified name
-                            attr_value = list(attribute.values())[0]
-                            if (
-                                attr_value not in domains
-                            ):  # Match was vs. local name, find its corresponding qualified name
-                                for k, v in local_names.items():
-                                    if attr_value in v:
-                                        attribute[old_key] = k
-                                        break
-                            attribute[new_key] = attribute.pop(old_key)
-                            attributes.update(attribute)
+                            attributes.update(
+                                self._qualify_domain_attribute(
+                                    attribute, class_name, domains_set, local_names
+                                )
+                            )
                             continue
 
                         if within_inline_enum:
-                            result = re_inline_enum_end.search(line)
-                            if result:
+                            if _re_inline_enum_end.search(line):
                                 within_inline_enum = False
                                 continue
 
                         # Look for inline ENUM definitions
-                        result = re_inline_enum_start.search(line)
+                        result = _re_inline_enum_start.search(line)
                         if result:
                             # result.group(1) is the attribute name
                             if self.debug:
@@ -828,49 +777,105 @@ class DomainRelationGenerator:
                                     "INLINE ENUM:",
                                     "{}.{}".format(current_class, result.group(1)),
                                 )
-                            name = "{}.{}.{}.{}".format(
-                                current_model,
-                                current_topic,
-                                current_class,
-                                result.group(1),
-                            )
+                            name = "{}.{}".format(class_name, result.group(1))
                             # Attribute and domain name match for inline ENUMs
                             attributes[name] = name
 
                             # Check if the whole ENUM is defined in one line
-                            result = re_inline_enum_oneline.search(line)
-                            if not result:
+                            if not _re_inline_enum_oneline.search(line):
                                 within_inline_enum = True
 
                             continue
 
-                        result = re_end_class.search(line)
-                        if result:
+                        if re_end_class.search(line):
                             if attributes:
-                                models_info.update(
-                                    {
-                                        "{}.{}.{}".format(
-                                            current_model, current_topic, current_class
-                                        ): attributes
-                                    }
-                                )
+                                models_info.update({class_name: attributes})
                             if self.debug:
                                 print("END Class encontrada", current_class)
                             current_class = ""
                             continue
 
-                    result = re_end_topic.search(line)
-                    if result:
+                    if re_end_topic.search(line):
                         current_topic = ""
 
-                result = re_end_model.search(line)
-                if result:
+                if re_end_model.search(line):
                     if self.debug:
                         print("END model encontrado", current_model, "\n")
                     current_model = ""
 
         return [models_info, extended_classes, bags_of_enum]
 
+    @staticmethod
+    def _search_domain_attribute(line, domain_regexps):
+        """
+        :return: Dict {attribute name: domain} with the domains (or local domain
+            names) the attribute defined in the line matches.
+        """
+        any_domain_regexp, regexps = domain_regexps
+        # Most lines don't mention any domain, skip them with a single search.
+        # Then, only run the (backtracking) attribute regexp of domains in the line
+        if any_domain_regexp is None or not any_domain_regexp.search(line):
+            return {}
+
+        return {
+            res.group(1): d
+            for d, mention_regexp, regexp in regexps
+            if mention_regexp.search(line)
+            for res in [regexp.search(line)]
+            if res
+        }
+
+    @staticmethod
+    def _qualify_domain_attribute(attribute, prefix, domains, local_names):
+        """
+        Qualifies the first attribute found by _search_domain_attribute with the
+        given prefix, replacing its domain local name by the qualified one.
+        """
+        old_key = next(iter(attribute))  # Not qualified name
+        new_key = "{}.{}".format(prefix, old_key)  # Fully qualified name
+        attr_value = attribute[old_key]
+        if (
+            attr_value not in domains
+        ):  # Match was vs. local name, find its corresponding qualified name
+            for k, v in local_names.items():
+                if attr_value in v:
+                    attribute[old_key] = k
+                    break
+        attribute[new_key] = attribute.pop(old_key)
+        return attribute
+
+    @staticmethod
+    def _parse_one_line_structure(
+        structure_defs, prefix, domains, domains_with_local, local_names
+    ):
+        """
+        :return: Dict {qualified attribute name: domain} of the attributes of a
+            structure defined in one line that use the given domains.
+        """
+        attributes = dict()
+        for structure_def in structure_defs.strip().split(";"):
+            pair = structure_def.split(":")
+            if len(pair) > 1:
+                structure_attr_full_name = "{}.{}".format(
+                    prefix, pair[0].strip()
+                )  # Fully qualified name
+                structure_domain = pair[1].strip().split(" ")[
+                    -1
+                ]  # Filters out "MANDATORY"
+
+                if (
+                    structure_domain not in domains
+                ):  # Match was vs. local name, find its corresponding qualified name
+                    for k, v in local_names.items():
+                        if structure_domain in v:
+                            structure_domain = k
+                            break
+
+                if structure_domain in domains_with_local:
+                    attributes[structure_attr_full_name] = structure_domain
+
+        return attributes
+
     def extract_local_names_from_domains(
         self, domains, current_model, current_topic=""
     ):
@@ -0,0 +1,442 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.expanduser("~/.ilicache"), "generations.sqlite"
+)
+MAX_CACHED_GENERATIONS = 32  # In memory
+MAX_STORE_SIZE = 200 * 1024 * 1024  # On disk, in bytes
+GENERATION_FORMAT_VERSION = 1  # Bump it whenever the Generator output changes
+
+# Stored layer attributes, under the keys Layer.dump() uses when it has them.
+# The layer uri is stored apart, without its connection part (credentials).
+LAYER_ATTRIBUTES = {
+    "provider": "provider",
+    "name": "name",
+    "srid": "srid",
+    "geometry_column": "geometry_column",
+    "alias": "alias",
+    "isdomain": "is_domain",
+    "isstructure": "is_structure",
+    "isnmrel": "is_nmrel",
+    "displayexpression": "display_expression",
+    "coordinateprecision": "coordinate_precision",
+    "isbaskettable": "is_basket_table",
+    "isdatasettable": "is_dataset_table",
+    "ili_name": "ili_name",
+    "is_relevant": "is_relevant",
+    "all_topics": "all_topics",
+    "relevant_topics": "relevant_topics",
+    "definitionfile": "definitionfile",
+    "qmlstylefile": "qmlstylefile",
+    "styles": "styles",
+}
+LAYER_LEGEND_ATTRIBUTES = ["expanded", "checked", "featurecount"]
+FIELD_ATTRIBUTES = [
+    "alias",
+    "hidden",
+    "read_only",
+    "widget",
+    "widget_config",
+    "default_value_expression",
+    "enum_domain",
+    "oid_domain",
+]
+RELATION_ATTRIBUTES = [
+    "name",
+    "referencing_field",
+    "referenced_field",
+    "cardinality_max",
+    "child_domain_name",
+]
+LEGEND_GROUP_ATTRIBUTES = [
+    "name",
+    "expanded",
+    "checked",
+    "mutually_exclusive",
+    "mutually_exclusive_child",
+    "definitionfile",
+    "static_sorting",
+    "ignore_node_names",
+]
+
+_generations = OrderedDict()  # {fingerprint: JSON of the generation}
+_generations_lock = threading.Lock()
+_store_path = DEFAULT_STORE_PATH
+_store = None
+
+
+def get_fingerprint(schema_fingerprint, settings):
+    """
+    :param schema_fingerprint: Digest of the schema, as given by DBConnector.get_schema_fingerprint().
+    :param settings: JSON serializable list of the Generator settings the result depends on.
+    :return: Key of the generation result in the cache.
+    """
+    content = json.dumps(
+        [GENERATION_FORMAT_VERSION, schema_fingerprint, settings], default=str
+    )
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def get_generation(fingerprint, object_factory, connection_uri):
+    """
+    Gets a generation result stored under the given fingerprint, in memory or
+    on disk (see set_generation_store_path).
+
+    :param fingerprint: As returned by get_fingerprint().
+    :param object_factory: ObjectFactory used to build the result.
+    :param connection_uri: Connection part of the layer uris, see LayerUri.get_connection_uri().
+    :return: tuple(layers, relations, bags_of_enum, legend), new objects on
+        each call, since callers modify them, or None if nothing is cached.
+    """
+    with _generations_lock:
+        content = _generations.get(fingerprint)
+        if content is not None:
+            _generations.move_to_end(fingerprint)
+
+    if content is None:
+        content = _get_stored(fingerprint)
+        if content is None:
+            return None
+        _set_in_memory(fingerprint, content)
+
+    return load_generation(json.loads(content), object_factory, connection_uri)
+
+
+def set_generation(
+    fingerprint,
+    object_factory,
+    connection_uri,
+    layers,
+    relations,
+    bags_of_enum,
+    legend,
+):
+    """
+    Stores a generation result under the given fingerprint, in memory and on
+    disk. Results that cannot be serialized are not stored.
+
+    :param connection_uri: Connection part of the layer uris, see LayerUri.get_connection_uri().
+        It's not stored.
+    """
+    try:
+        content = json.dumps(
+            dump_generation(
+                object_factory,
+                connection_uri,
+                layers,
+                relations,
+                bags_of_enum,
+                legend,
+            )
+        )
+    except (TypeError, ValueError) as e:
+        logger.warning("Generation result could not be cached: {}".format(e))
+        return
+
+    _set_in_memory(fingerprint, content)
+    _set_stored(fingerprint, content)
+
+
+def set_generation_store_path(path):
+    """
+    :param path: Path to the SQLite file where generation results are
+        persisted, or None to keep them only in memory.
+    """
+    global _store_path, _store
+    with _generations_lock:
+        _store_path = path
+        _store = None
+
+
+def clear_generation_cache():
+    """
+    Clears the in-memory cache. Generation results persisted on disk are kept.
+    """
+    with _generations_lock:
+        _generations.clear()
+
+
+def dump_generation(
+    object_factory, connection_uri, layers, relations, bags_of_enum, legend
+):
+    """
+    :param connection_uri: Connection part of the layer uris, left out of the
+        definition, since it may carry credentials.
+    :return: JSON serializable definition of a generation result. Layers are
+        referenced by their index in the layer list everywhere else.
+    """
+    layer_indexes = {id(layer): i for i, layer in enumerate(layers)}
+
+    def layer_index(layer):
+        if id(layer) not in layer_indexes:
+            raise ValueError("Layer '{}' is not in the layer list".format(layer.name))
+        return layer_indexes[id(layer)]
+
+    layers_definition = list()
+    for layer in layers:
+        definition = {
+            key: getattr(layer, attribute)
+            for key, attribute in LAYER_ATTRIBUTES.items()
+        }
+        definition.update(
+            {
+                attribute: getattr(layer, attribute)
+                for attribute in LAYER_LEGEND_ATTRIBUTES
+            }
+        )
+        if not layer.uri.startswith(connection_uri):
+            raise ValueError(
+                "The uri of the layer '{}' doesn't start with the connection uri".format(
+                    layer.name
+                )
+            )
+        definition["uri"] = layer.uri[len(connection_uri) :]
+        definition["extent"] = object_factory.extent_text(layer.extent)
+        definition["wkb_type"] = object_factory.wkb_type_name(layer.wkb_type)
+        definition["fields"] = [
+            dict(
+                name=field.name,
+                **{
+                    attribute: getattr(field, attribute, None)
+                    for attribute in FIELD_ATTRIBUTES
+                }
+            )
+            for field in layer.fields
+        ]
+        layers_definition.append(definition)
+
+    relations_definition = list()
+    for relation in relations:
+        definition = {
+            attribute: getattr(relation, attribute)
+            for attribute in RELATION_ATTRIBUTES
+        }
+        definition["referencing_layer"] = layer_index(relation.referencing_layer)
+        definition["referenced_layer"] = layer_index(relation.referenced_layer)
+        definition["composition"] = (
+            relation.strength == object_factory.relation_composition
+        )
+        relations_definition.append(definition)
+
+    # {layer name: {attribute: [layer, cardinality, domain layer, key, value]}}
+    bags_of_enum_definition = {
+        layer_name: {
+            attribute: [
+                {"layer": layer_index(item)} if i in (0, 2) else item
+                for i, item in enumerate(items)
+            ]
+            for attribute, items in attributes.items()
+        }
+        for layer_name, attributes in bags_of_enum.items()
+    }
+
+    def legend_group_definition(group):
+        definition = {
+            attribute: getattr(group, attribute)
+            for attribute in LEGEND_GROUP_ATTRIBUTES
+        }
+        definition["items"] = [
+            legend_group_definition(item)
+            if hasattr(item, "items")
+            else {"layer": layer_index(item)}
+            for item in group.items
+        ]
+        return definition
+
+    return {
+        "layers": layers_definition,
+        "relations": relations_definition,
+        "bags_of_enum": bags_of_enum_definition,
+        "legend": legend_group_definition(legend),
+    }
+
+
+def load_generation(definition, object_factory, connection_uri):
+    """
+    :param definition: As returned by dump_generation().
+    :param object_factory: ObjectFactory used to build the objects.
+    :param connection_uri: Connection part of the layer uris, prepended to the stored ones.
+    :return: tuple(layers, relations, bags_of_enum, legend)
+    """
+    layers = list()
+    for layer_definition in definition["layers"]:
+        layer = object_factory.create_layer(
+            uri=connection_uri + layer_definition["uri"],
+            extent=layer_definition["extent"],
+            wkb_type=object_factory.wkb_type(layer_definition["wkb_type"]),
+            **{
+                attribute: layer_definition[key]
+                for key, attribute in LAYER_ATTRIBUTES.items()
+            }
+        )
+        for attribute in LAYER_LEGEND_ATTRIBUTES:
+            setattr(layer, attribute, layer_definition[attribute])
+        for field_definition in layer_definition["fields"]:
+            field = object_factory.create_field(field_definition["name"])
+            for attribute in FIELD_ATTRIBUTES:
+                setattr(field, attribute, field_definition[attribute])
+            layer.fields.append(field)
+        layers.append(layer)
+
+    relations = list()
+    for relation_definition in definition["relations"]:
+        relation = object_factory.create_relation()
+        for attribute in RELATION_ATTRIBUTES:
+            setattr(relation, attribute, relation_definition[attribute])
+        relation.referencing_layer = layers[relation_definition["referencing_layer"]]
+        relation.referenced_layer = layers[relation_definition["referenced_layer"]]
+        relation.strength = (
+            object_factory.relation_composition
+            if relation_definition["composition"]
+            else object_factory.relation_association
+        )
+        relations.append(relation)
+
+    bags_of_enum = {
+        layer_name: {
+            attribute: [
+                layers[item["layer"]] if i in (0, 2) else item
+                for i, item in enumerate(items)
+            ]
+            for attribute, items in attributes.items()
+        }
+        for layer_name, attributes in definition["bags_of_enum"].items()
+    }
+
+    def load_legend_group(group_definition):
+        group = object_factory.create_legend_group()
+        for attribute in LEGEND_GROUP_ATTRIBUTES:
+            setattr(group, attribute, group_definition[attribute])
+        for item in group_definition["items"]:
+            if "layer" in item:
+                group.append(layers[item["layer"]])
+            else:
+                group.append(load_legend_group(item))
+        return group
+
+    return layers, relations, bags_of_enum, load_legend_group(definition["legend"])
+
+
+class GenerationStore:
+    """
+    SQLite store for generation results, evicting the least recently used ones
+    when the stored content exceeds max_size bytes.
+
+    :param db_path: Path to the SQLite file. Its directory is created if needed.
+    :param max_size: Max. size in bytes of the stored results.
+    """
+
+    def __init__(self, db_path, max_size=MAX_STORE_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: Content stored under the given key, or None if there is none.
+        """
+        if not os.path.isfile(self.db_path):
+            return None
+
+        with self._lock, closing(self._connect()) as conn:
+            with conn:
+                row = conn.execute(
+                    "SELECT content FROM generations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE generations SET last_used = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+
+        return row[0] if row else None
+
+    def set(self, key, content):
+        """
+        Stores content under the given key and evicts the least recently used
+        contents that don't fit in max_size anymore.
+        """
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._lock, closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations "
+                    "(key, content, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, content, len(content), time.time()),
+                )
+                total_size = 0
+                evicted_keys = list()
+                for stored_key, size in conn.execute(
+                    "SELECT key, size FROM generations ORDER BY last_used DESC"
+                ):
+                    total_size += size
+                    if total_size > self.max_size:
+                        evicted_keys.append((stored_key,))
+                conn.executemany(
+                    "DELETE FROM generations WHERE key = ?", evicted_keys
+                )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations "
+            "(key TEXT PRIMARY KEY, content TEXT, size INTEGER, last_used REAL)"
+        )
+        return conn
+
+
+def _set_in_memory(fingerprint, content):
+    with _generations_lock:
+        _generations[fingerprint] = content
+        _generations.move_to_end(fingerprint)
+        while len(_generations) > MAX_CACHED_GENERATIONS:
+            _generations.popitem(last=False)
+
+
+def _get_store():
+    global _store
+    with _generations_lock:
+        if _store is None and _store_path:
+            _store = GenerationStore(_store_path)
+        return _store
+
+
+def _get_stored(fingerprint):
+    store = _get_store()
+    if store is None:
+        return None
+
+    try:
+        return store.get(fingerprint)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(
+            "Generation result could not be read from '{}': {}".format(
+                store.db_path, e
+            )
+        )
+        return None
+
+
+def _set_stored(fingerprint, content):
+    store = _get_store()
+    if store is None:
+        return
+
+    try:
+        store.set(fingerprint, content)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(
+            "Generation result could not be written to '{}': {}".format(
+                store.db_path, e
+            )
+        )
@@ -16,20 +16,33 @@
  *                                                                         *
  ***************************************************************************/
 """
+import logging
 import re
 
-from qgis.core import QgsApplication, QgsRelation, QgsWkbTypes
 from PyQt5.QtCore import QCoreApplication, QLocale, QObject, pyqtSignal
 
-from ..dataobjects.fields import Field
-from ..dataobjects.layers import Layer
-from ..dataobjects.legend import LegendGroup
-from ..dataobjects.relations import Relation
 from ..db_factory.db_simple_factory import DbSimpleFactory
+from ..dbconnector.db_connector import DBConnectorError
 from ..utils.globals import OptimizeStrategy
 from ..utils.qt_utils import slugify
-from .config import BASKET_FIELDNAMES, IGNORED_FIELDNAMES, READONLY_FIELDNAMES
+from .config import (
+    BASKET_FIELDNAMES,
+    IGNORED_FIELDNAMES,
+    INTROSPECTION_MAX_WORKERS,
+    READONLY_FIELDNAMES,
+)
+from .connector_pool import ConnectorPool
 from .domain_relations_generator import DomainRelationGenerator
+from .generation_cache import get_fingerprint, get_generation, set_generation
+from .object_factory import (
+    LINE_GEOMETRY,
+    POINT_GEOMETRY,
+    POLYGON_GEOMETRY,
+    get_object_factory,
+)
+from .profiler import profile_phase, profiled
+
+logger = logging.getLogger(__name__)
 
 
 class Generator(QObject):
@@ -49,12 +62,22 @@ class Generator(QObject):
         mgmt_uri=None,
         consider_basket_handling=False,
         optimize_strategy=OptimizeStrategy.NONE,
+        bulk_introspection=True,
+        headless=False,
+        parallel_introspection=False,
+        introspection_max_workers=INTROSPECTION_MAX_WORKERS,
+        profiler=None,
     ):
         """
         Creates a new Generator objects.
         :param uri: The uri that should be used in the resulting project. If authcfg is used, make sure the mgmt_uri is set as well.
         :param mgmt_uri: The uri that should be used to create schemas, tables and query meta information. Does not support authcfg.
         :consider_basket_handling: Makes the specific handling of basket tables depending if schema is created with createBasketCol.
+        :param bulk_introspection: Read fields, range and value map info of all layers in a few queries, instead of querying them table by table.
+        :param headless: Build plain records (see dataobjects.records) instead of QGIS-backed layers, relations and legend groups, so that QGIS is not imported. Useful to get the project structure as data, e.g., with records.structure_as_dict().
+        :param parallel_introspection: In generate(), run the independent metadata queries concurrently, each one with its own connection to the DB, if the DB connector supports it (PG).
+        :param introspection_max_workers: Max. number of metadata queries (and extra connections) at the same time in parallel_introspection mode.
+        :param profiler: A GenerationProfiler to collect the wall time of the generation phases (generate, layers, relations, legend, etc.) and of the queries run in them, with their SQL text and row count. See GenerationProfiler.report().
         """
         QObject.__init__(self, parent)
         self.tool = tool
@@ -69,8 +92,17 @@ class Generator(QObject):
         self._db_connector = db_factory.get_db_connector(mgmt_uri or uri, schema)
         self._db_connector.stdout.connect(self.print_info)
         self._db_connector.new_message.connect(self.append_print_message)
+        self.profiler = profiler
+        if profiler:
+            self._db_connector.set_query_observer(profiler.add_query)
         self.basket_handling = consider_basket_handling and self.get_basket_handling()
         self.optimize_strategy = optimize_strategy
+        self.bulk_introspection = bulk_introspection
+        self.headless = headless
+        self._objects = get_object_factory(headless)
+        self.parallel_introspection = parallel_introspection
+        self.introspection_max_workers = introspection_max_workers
+        self._prefetched = dict()  # Metadata fetched concurrently by generate()
 
         self._additional_ignored_layers = (
             []
@@ -92,9 +124,206 @@ class Generator(QObject):
         if message not in self.collected_print_messages:
             self.collected_print_messages.append(message)
 
+    @profiled("generate")
+    def generate(self, filter_layer_list=[], ignore_node_names=None, use_cache=True):
+        """
+        Builds layers, relations and legend of the schema. Results are cached
+        by schema fingerprint (see get_schema_fingerprint), so that generating
+        them again for an unchanged schema doesn't query the DB catalog again.
+
+        :param filter_layer_list: As in layers().
+        :param ignore_node_names: As in legend().
+        :param use_cache: False to always query the DB (the result is not cached either).
+        :return: tuple(layers, relations, bags_of_enum, legend)
+        """
+        fingerprint = None
+        connection_uri = None
+        if use_cache:
+            fingerprint = self.get_schema_fingerprint(
+                filter_layer_list, ignore_node_names
+            )
+            if fingerprint:
+                # Not cached, since it may carry credentials
+                connection_uri = (
+                    self.db_simple_factory.create_factory(self.tool)
+                    .get_layer_uri(self.uri)
+                    .get_connection_uri()
+                )
+                with profile_phase(self.profiler, "cache_lookup"):
+                    result = get_generation(
+                        fingerprint, self._objects, connection_uri
+                    )
+                if result is not None:
+                    return result
+
+        if self.parallel_introspection and self._db_connector.concurrent_introspection:
+            self._prefetch_metadata(filter_layer_list)
+
+        try:
+            layers = self.layers(filter_layer_list)
+            relations, bags_of_enum = self.relations(layers, filter_layer_list)
+            legend = self.legend(layers, ignore_node_names)
+        finally:
+            self._prefetched.clear()
+
+        if fingerprint:
+            with profile_phase(self.profiler, "cache_store"):
+                set_generation(
+                    fingerprint,
+                    self._objects,
+                    connection_uri,
+                    layers,
+                    relations,
+                    bags_of_enum,
+                    legend,
+                )
+
+        return layers, relations, bags_of_enum, legend
+
+    @profiled("prefetch_metadata")
+    def _prefetch_metadata(self, filter_layer_list=[]):
+        """
+        Runs the metadata queries layers() and relations() need concurrently,
+        over a small pool of connections to the same schema. Results are kept
+        by query (not by completion order) and used instead of querying the
+        DB again, so the generation result is the same as without prefetching.
+        The slowest query, instead of the sum of all of them, bounds the time.
+
+        Fields, range and value map info need the table names, so they are
+        queried as soon as tables, relations and meta attributes are fetched.
+        """
+        db_factory = self.db_simple_factory.create_factory(self.tool)
+        ignore_basket_tables = not self.basket_handling
+        prefetched = dict()
+        # Other errors are bugs, not a reason to fall back to sequential queries
+        prefetch_errors = (DBConnectorError, OSError) + self._db_connector.driver_errors
+
+        def create_connector():
+            db_connector = db_factory.get_db_connector(
+                self.mgmt_uri or self.uri, self.schema
+            )
+            if self.profiler:
+                db_connector.set_query_observer(self.profiler.add_query)
+            return db_connector
+
+        try:
+            with ConnectorPool(
+                create_connector, self.introspection_max_workers, self.profiler
+            ) as pool:
+                futures = {
+                    "tables_info": pool.submit("get_tables_info"),
+                    ("relations_info", ()): pool.submit("get_relations_info"),
+                    "meta_attrs_info": pool.submit("get_meta_attrs_info"),
+                    "bags_of_info": pool.submit("get_bags_of_info"),
+                    "iliname_dbname_mapping": pool.submit(
+                        "get_iliname_dbname_mapping"
+                    ),
+                }
+                if filter_layer_list:
+                    key = ("relations_info", tuple(filter_layer_list))
+                    futures[key] = pool.submit("get_relations_info", filter_layer_list)
+
+                tables_info = futures["tables_info"].result()
+                meta_attrs_info = futures["meta_attrs_info"].result()
+                # On a pooled connector too, so that the prefetch doesn't use
+                # the connection of the Generator
+                ignored_layers = pool.submit(
+                    "get_ignored_layers",
+                    ignore_basket_tables,
+                    tables_info,
+                    futures[("relations_info", ())].result(),
+                    meta_attrs_info,
+                ).result()
+                prefetched["tables_info"] = tables_info
+                prefetched[("ignored_layers", ignore_basket_tables)] = ignored_layers
+                meta_attrs = dict()
+                for record in meta_attrs_info:
+                    meta_attrs.setdefault(record["ilielement"], list()).append(record)
+                prefetched["meta_attrs"] = meta_attrs
+
+                if self.bulk_introspection:
+                    # Same table names (and order) as in layers()
+                    self._prefetched = prefetched
+                    table_names = list()
+                    for record in self.get_tables_info_without_ignored_tables(
+                        ignore_basket_tables
+                    ):
+                        if (
+                            filter_layer_list
+                            and record["tablename"] not in filter_layer_list
+                        ):
+                            continue
+                        if record["tablename"] not in table_names:
+                            table_names.append(record["tablename"])
+
+                    key = frozenset(table_names)
+                    futures[("fields_info_by_table", key)] = pool.submit(
+                        "get_fields_info_by_table", table_names
+                    )
+                    futures[("min_max_info_by_table", key)] = pool.submit(
+                        "get_min_max_info_by_table", table_names
+                    )
+                    futures[("value_map_info_by_table", key)] = pool.submit(
+                        "get_value_map_info_by_table", table_names
+                    )
+
+                for key, future in futures.items():
+                    prefetched[key] = future.result()
+        except prefetch_errors as e:
+            # Not fatal, layers() and relations() will query the DB themselves
+            logger.warning(
+                "Metadata of the schema '{}' could not be fetched concurrently, it will be fetched sequentially: {}".format(
+                    self.schema, e
+                ),
+                exc_info=True,
+            )
+            prefetched = dict()
+
+        self._prefetched = prefetched
+
+    def _get_prefetched(self, key, fetch, *args):
+        if key in self._prefetched:
+            return self._prefetched[key]
+        return fetch(*args)
+
+    @profiled("fingerprint")
+    def get_schema_fingerprint(self, filter_layer_list=[], ignore_node_names=None):
+        """
+        Gets a cheap fingerprint of the generation result: a digest of the
+        ili2db metadata tables, the ili2db settings and the table definitions
+        of the schema, plus the Generator settings (optimize strategy, basket
+        handling, etc.) and the given generation arguments.
+
+        :return: Fingerprint (str) or None if the DB connector doesn't support it.
+        """
+        schema_fingerprint = self._db_connector.get_schema_fingerprint()
+        if not schema_fingerprint:
+            return None
+
+        return get_fingerprint(
+            schema_fingerprint,
+            [
+                int(self.tool),
+                self.uri,
+                self.schema,
+                self.inheritance,
+                self.pg_estimated_metadata,
+                self.basket_handling,
+                self.optimize_strategy.name,
+                self.headless,
+                sorted(filter_layer_list),
+                ignore_node_names,
+                sorted(self._additional_ignored_layers),
+            ],
+        )
+
+    @profiled("layers")
     def layers(self, filter_layer_list=[]):
         ignore_basket_tables = not self.basket_handling
-        tables_info = self.get_tables_info_without_ignored_tables(ignore_basket_tables)
+        with profile_phase(self.profiler, "tables_info"):
+            tables_info = self.get_tables_info_without_ignored_tables(
+                ignore_basket_tables
+            )
         layers = list()
 
         db_factory = self.db_simple_factory.create_factory(self.tool)
@@ -115,6 +344,29 @@ class Generator(QObject):
                 table_appearance_count.get(record["tablename"], 0) + 1
             )
 
+        if self.bulk_introspection:
+            table_names = list(table_appearance_count)
+            with profile_phase(self.profiler, "fields_info"):
+                fields_info_by_table = self.get_fields_info_by_table(table_names)
+                min_max_info_by_table = self.get_min_max_info_by_table(table_names)
+                value_map_info_by_table = self.get_value_map_info_by_table(
+                    table_names
+                )
+
+            get_fields_info = lambda table_name: fields_info_by_table.get(
+                table_name, []
+            )
+            get_min_max_info = lambda table_name: min_max_info_by_table.get(
+                table_name, {}
+            )
+            get_value_map_info = lambda table_name: value_map_info_by_table.get(
+                table_name, {}
+            )
+        else:
+            get_fields_info = self.get_fields_info
+            get_min_max_info = self.get_min_max_info
+            get_value_map_info = self.get_value_map_info
+
         for record in tables_info:
             # When in PostGIS mode, leaving schema blank should load tables from
             # all schemas, except the ignored ones
@@ -190,7 +442,7 @@ class Generator(QObject):
                         and "geometry_column" in record
                     ):
                         # table loaded multiple times (because of multiple geometry columns) - append geometry column to name (for PG source layers)
-                        fields_info = self.get_fields_info(record["tablename"])
+                        fields_info = get_fields_info(record["tablename"])
                         for field_info in fields_info:
                             if field_info["column_name"] == record["geometry_column"]:
                                 if (
@@ -246,14 +498,14 @@ class Generator(QObject):
             if coord_decimals:
                 coordinate_precision = 1 / (10**coord_decimals)
 
-            layer = Layer(
+            layer = self._objects.create_layer(
                 layer_uri.provider,
                 layer_uri.get_data_source_uri(record),
                 record.get("tablename"),
                 record.get("srid"),
                 record.get("extent"),
                 record.get("geometry_column"),
-                QgsWkbTypes.parseType(record["type"]) or QgsWkbTypes.Unknown,
+                self._objects.wkb_type(record["type"]),
                 alias,
                 is_domain,
                 is_structure,
@@ -269,9 +521,9 @@ class Generator(QObject):
             )
 
             # Configure fields for current table
-            fields_info = self.get_fields_info(record["tablename"])
-            min_max_info = self.get_min_max_info(record["tablename"])
-            value_map_info = self.get_value_map_info(record["tablename"])
+            fields_info = get_fields_info(record["tablename"])
+            min_max_info = get_min_max_info(record["tablename"])
+            value_map_info = get_value_map_info(record["tablename"])
             re_iliname = re.compile(r".*\.(.*)$")
 
             for fielddef in fields_info:
@@ -293,7 +545,7 @@ class Generator(QObject):
                 if m and not alias:
                     alias = m.group(1)
 
-                field = Field(column_name)
+                field = self._objects.create_field(column_name)
                 field.alias = alias
 
                 # Should we hide the field?
@@ -353,15 +605,10 @@ class Generator(QObject):
                     field.widget = "DateTime"
                     field.widget_config["calendar_popup"] = True
 
-                    dateFormat = QLocale(QgsApplication.instance().locale()).dateFormat(
-                        QLocale.ShortFormat
-                    )
-                    timeFormat = QLocale(QgsApplication.instance().locale()).timeFormat(
-                        QLocale.ShortFormat
-                    )
-                    dateTimeFormat = QLocale(
-                        QgsApplication.instance().locale()
-                    ).dateTimeFormat(QLocale.ShortFormat)
+                    locale = self._objects.locale()
+                    dateFormat = locale.dateFormat(QLocale.ShortFormat)
+                    timeFormat = locale.timeFormat(QLocale.ShortFormat)
+                    dateTimeFormat = locale.dateTimeFormat(QLocale.ShortFormat)
 
                     if data_type == self._db_connector.QGIS_TIME_TYPE:
                         field.widget_config["display_format"] = timeFormat
@@ -449,75 +696,76 @@ class Generator(QObject):
                             + layer.alias
                         )
 
+    @profiled("relations")
     def relations(self, layers, filter_layer_list=[]):
         relations_info = self.get_relations_info(filter_layer_list)
         layer_map = dict()
         for layer in layers:
-            if layer.name not in layer_map.keys():
-                layer_map[layer.name] = list()
-            layer_map[layer.name].append(layer)
+            layer_map.setdefault(layer.name, list()).append(layer)
         relations = list()
 
-        classname_info = [
+        classname_info = {
             record["iliname"] for record in self.get_iliname_dbname_mapping()
-        ]
+        }
+
+        if self.optimize_strategy == OptimizeStrategy.HIDE:
+            relevant_layer_map = {
+                name: [layer for layer in table_layers if layer.is_relevant]
+                for name, table_layers in layer_map.items()
+            }
+        else:
+            relevant_layer_map = layer_map
+
+        # Child domain names (or None) per referencing layer and column, since
+        # the same FK column is found once per referenced layer
+        child_domain_names = dict()  # {(id(layer), column name): child name}
+        layer_fields = dict()  # {id(layer): {field name: field}}
 
         for record in relations_info:
-            if (
-                record["referencing_table"] in layer_map.keys()
-                and record["referenced_table"] in layer_map.keys()
-            ):
-                for referencing_layer in layer_map[record["referencing_table"]]:
-                    if (
-                        not referencing_layer.is_relevant
-                        and self.optimize_strategy == OptimizeStrategy.HIDE
-                    ):
-                        continue
-                    for referenced_layer in layer_map[record["referenced_table"]]:
-                        if (
-                            not referenced_layer.is_relevant
-                            and self.optimize_strategy == OptimizeStrategy.HIDE
-                        ):
-                            continue
-                        relation = Relation()
-                        relation.referencing_layer = referencing_layer
-                        relation.referenced_layer = referenced_layer
-                        relation.referencing_field = record["referencing_column"]
-                        relation.referenced_field = record["referenced_column"]
-                        relation.name = record["constraint_name"]
-                        relation.strength = (
-                            QgsRelation.Composition
-                            if "strength" in record
-                            and record["strength"] == "COMPOSITE"
-                            or referencing_layer.is_structure
-                            else QgsRelation.Association
-                        )
-                        relation.cardinality_max = record.get("cardinality_max", None)
-
-                        # For domain-class relations, if we have an extended domain, get its child name
-                        child_name = None
-                        if referenced_layer.is_domain:
-                            # Get child name (if domain is extended)
-                            fields = [
-                                field
-                                for field in referencing_layer.fields
-                                if field.name == record["referencing_column"]
-                            ]
-                            if fields:
-                                field = fields[0]
-                                if (
-                                    field.enum_domain
-                                    and field.enum_domain not in classname_info
-                                ):
-                                    child_name = field.enum_domain
-                        relation.child_domain_name = child_name
+            referencing_layers = relevant_layer_map.get(record["referencing_table"])
+            referenced_layers = relevant_layer_map.get(record["referenced_table"])
+            if referencing_layers is None or referenced_layers is None:
+                continue
 
-                        relations.append(relation)
+            composite = "strength" in record and record["strength"] == "COMPOSITE"
+            for referencing_layer in referencing_layers:
+                for referenced_layer in referenced_layers:
+                    relation = self._objects.create_relation()
+                    relation.referencing_layer = referencing_layer
+                    relation.referenced_layer = referenced_layer
+                    relation.referencing_field = record["referencing_column"]
+                    relation.referenced_field = record["referenced_column"]
+                    relation.name = record["constraint_name"]
+                    relation.strength = (
+                        self._objects.relation_composition
+                        if composite or referencing_layer.is_structure
+                        else self._objects.relation_association
+                    )
+                    relation.cardinality_max = record.get("cardinality_max", None)
+
+                    # For domain-class relations, if we have an extended domain, get its child name
+                    child_name = None
+                    if referenced_layer.is_domain:
+                        key = (id(referencing_layer), record["referencing_column"])
+                        if key not in child_domain_names:
+                            child_domain_names[key] = self._get_child_domain_name(
+                                referencing_layer,
+                                record["referencing_column"],
+                                classname_info,
+                                layer_fields,
+                            )
+                        child_name = child_domain_names[key]
+                    relation.child_domain_name = child_name
+
+                    relations.append(relation)
 
         if self._db_connector.ili_version() == 3:
             # Used for ili2db version 3 relation creation
             domain_relations_generator = DomainRelationGenerator(
-                self._db_connector, self.inheritance
+                self._db_connector,
+                self.inheritance,
+                object_factory=self._objects,
+                profiler=self.profiler,
             )
             (
                 domain_relations,
@@ -529,38 +777,59 @@ class Generator(QObject):
             bags_of_info = self.get_bags_of_info()
             bags_of_enum = {}
             for record in bags_of_info:
-                for layer in layers:
-                    if record["current_layer_name"] == layer.name:
-                        new_item_list = [
-                            layer,
-                            record["cardinality_min"]
-                            + ".."
-                            + record["cardinality_max"],
-                            layer_map[record["target_layer_name"]][0],
-                            self._db_connector.tid,
-                            self._db_connector.dispName,
-                        ]
-                        unique_current_layer_name = "{}_{}".format(
-                            record["current_layer_name"], layer.geometry_column
-                        )
-                        if unique_current_layer_name in bags_of_enum.keys():
-                            bags_of_enum[unique_current_layer_name][
-                                record["attribute"]
-                            ] = new_item_list
-                        else:
-                            bags_of_enum[unique_current_layer_name] = {
-                                record["attribute"]: new_item_list
-                            }
+                for layer in layer_map.get(record["current_layer_name"], []):
+                    new_item_list = [
+                        layer,
+                        record["cardinality_min"] + ".." + record["cardinality_max"],
+                        layer_map[record["target_layer_name"]][0],
+                        self._db_connector.tid,
+                        self._db_connector.dispName,
+                    ]
+                    unique_current_layer_name = "{}_{}".format(
+                        record["current_layer_name"], layer.geometry_column
+                    )
+                    if unique_current_layer_name in bags_of_enum.keys():
+                        bags_of_enum[unique_current_layer_name][
+                            record["attribute"]
+                        ] = new_item_list
+                    else:
+                        bags_of_enum[unique_current_layer_name] = {
+                            record["attribute"]: new_item_list
+                        }
         return (relations, bags_of_enum)
 
+    @staticmethod
+    def _get_child_domain_name(layer, column_name, classname_info, layer_fields):
+        """
+        Gets the child name of the domain of a FK column, if the domain is extended
+        (i.e., it's not a class name). layer_fields caches the fields of each layer
+        by name.
+        """
+        fields = layer_fields.get(id(layer))
+        if fields is None:
+            fields = dict()
+            for field in layer.fields:
+                fields.setdefault(field.name, field)  # First field wins
+            layer_fields[id(layer)] = fields
+
+        field = fields.get(column_name)
+        if (
+            field is not None
+            and field.enum_domain
+            and field.enum_domain not in classname_info
+        ):
+            return field.enum_domain
+
+        return None
+
     def generate_node(self, layers, node_name, item_properties):
         if item_properties.get("group"):
-            node = LegendGroup(
+            node = self._objects.create_legend_group(
                 QCoreApplication.translate("LegendGroup", node_name),
                 static_sorting=True,
             )
         else:
-            node = Layer(alias=node_name)  # create dummy
+            node = self._objects.create_layer(alias=node_name)  # create dummy
             layers.append(node)
         return node
 
@@ -663,6 +932,7 @@ class Generator(QObject):
 
         return current_node
 
+    @profiled("legend")
     def legend(
         self,
         layers,
@@ -670,7 +940,7 @@ class Generator(QObject):
         layertree_structure=None,
         path_resolver=lambda path: path,
     ):
-        legend = LegendGroup(
+        legend = self._objects.create_legend_group(
             QCoreApplication.translate("LegendGroup", "root"),
             ignore_node_names=ignore_node_names,
             static_sorting=layertree_structure is not None,
@@ -710,14 +980,14 @@ class Generator(QObject):
 
             # create groups
             if len(table_layers):
-                tables = LegendGroup(
+                tables = self._objects.create_legend_group(
                     QCoreApplication.translate("LegendGroup", "tables")
                 )
                 for layer in table_layers:
                     tables.append(layer)
                 legend.append(tables)
             if len(domain_layers):
-                domains = LegendGroup(
+                domains = self._objects.create_legend_group(
                     QCoreApplication.translate("LegendGroup", "domains")
                 )
                 domains.expanded = False
@@ -725,7 +995,7 @@ class Generator(QObject):
                     domains.append(layer)
                 legend.append(domains)
             if len(system_layers):
-                system = LegendGroup(
+                system = self._objects.create_legend_group(
                     QCoreApplication.translate("LegendGroup", "system")
                 )
                 system.expanded = False
@@ -745,7 +1015,7 @@ class Generator(QObject):
                 ) = self._separated_legend_layers(irrelevant_layers)
 
                 # create base group
-                base_group = LegendGroup(
+                base_group = self._objects.create_legend_group(
                     QCoreApplication.translate("LegendGroup", "base layers")
                 )
                 base_group.expanded = False
@@ -760,14 +1030,14 @@ class Generator(QObject):
 
                 # create groups
                 if len(table_layers):
-                    tables = LegendGroup(
+                    tables = self._objects.create_legend_group(
                         QCoreApplication.translate("LegendGroup", "base tables")
                     )
                     for layer in table_layers:
                         tables.append(layer)
                     base_group.append(tables)
                 if len(domain_layers):
-                    domains = LegendGroup(
+                    domains = self._objects.create_legend_group(
                         QCoreApplication.translate("LegendGroup", "base domains")
                     )
                     domains.expanded = False
@@ -790,12 +1060,12 @@ class Generator(QObject):
 
         for layer in layers:
             if layer.geometry_column:
-                geometry_type = QgsWkbTypes.geometryType(layer.wkb_type)
-                if geometry_type == QgsWkbTypes.PointGeometry:
+                geometry_type = self._objects.geometry_type(layer.wkb_type)
+                if geometry_type == POINT_GEOMETRY:
                     point_layers.append(layer)
-                elif geometry_type == QgsWkbTypes.LineGeometry:
+                elif geometry_type == LINE_GEOMETRY:
                     line_layers.append(layer)
-                elif geometry_type == QgsWkbTypes.PolygonGeometry:
+                elif geometry_type == POLYGON_GEOMETRY:
                     polygon_layers.append(layer)
             else:
                 if layer.is_domain:
@@ -841,17 +1111,27 @@ class Generator(QObject):
 
     def get_ignored_layers(self, ignore_basket_tables=True):
         return (
-            self._db_connector.get_ignored_layers(ignore_basket_tables)
+            self._get_prefetched(
+                ("ignored_layers", ignore_basket_tables),
+                self._db_connector.get_ignored_layers,
+                ignore_basket_tables,
+            )
             + self._additional_ignored_layers
         )
 
     def get_tables_info(self):
-        return self._db_connector.get_tables_info()
+        return self._get_prefetched(
+            "tables_info", self._db_connector.get_tables_info
+        )
 
     def get_meta_attrs_info(self):
-        return self._db_connector.get_meta_attrs_info()
+        return self._get_prefetched(
+            "meta_attrs_info", self._db_connector.get_meta_attrs_info
+        )
 
     def get_meta_attrs(self, ili_name):
+        if "meta_attrs" in self._prefetched:
+            return self._prefetched["meta_attrs"].get(ili_name, [])
         return self._db_connector.get_meta_attrs(ili_name)
 
     def get_fields_info(self, table_name):
@@ -879,14 +1159,43 @@ class Generator(QObject):
     def get_value_map_info(self, table_name):
         return self._db_connector.get_value_map_info(table_name)
 
+    def get_fields_info_by_table(self, table_names):
+        return self._get_prefetched(
+            ("fields_info_by_table", frozenset(table_names)),
+            self._db_connector.get_fields_info_by_table,
+            table_names,
+        )
+
+    def get_min_max_info_by_table(self, table_names):
+        return self._get_prefetched(
+            ("min_max_info_by_table", frozenset(table_names)),
+            self._db_connector.get_min_max_info_by_table,
+            table_names,
+        )
+
+    def get_value_map_info_by_table(self, table_names):
+        return self._get_prefetched(
+            ("value_map_info_by_table", frozenset(table_names)),
+            self._db_connector.get_value_map_info_by_table,
+            table_names,
+        )
+
     def get_relations_info(self, filter_layer_list=[]):
-        return self._db_connector.get_relations_info(filter_layer_list)
+        return self._get_prefetched(
+            ("relations_info", tuple(filter_layer_list)),
+            self._db_connector.get_relations_info,
+            filter_layer_list,
+        )
 
     def get_bags_of_info(self):
-        return self._db_connector.get_bags_of_info()
+        return self._get_prefetched(
+            "bags_of_info", self._db_connector.get_bags_of_info
+        )
 
     def get_iliname_dbname_mapping(self):
-        return self._db_connector.get_iliname_dbname_mapping()
+        return self._get_prefetched(
+            "iliname_dbname_mapping", self._db_connector.get_iliname_dbname_mapping
+        )
 
     def get_basket_handling(self):
         return self._db_connector.get_basket_handling()
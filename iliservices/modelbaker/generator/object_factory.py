@@ -0,0 +1,110 @@
+from abc import ABC, abstractmethod
+
+from PyQt5.QtCore import QLocale
+
+from ..dataobjects.records import (
+    RELATION_ASSOCIATION,
+    RELATION_COMPOSITION,
+    FieldRecord,
+    LayerRecord,
+    LegendGroupRecord,
+    RelationRecord,
+)
+
+POINT_GEOMETRY = "point"
+LINE_GEOMETRY = "line"
+POLYGON_GEOMETRY = "polygon"
+
+
+class ObjectFactory(ABC):
+    """Creates the objects the Generator builds (layers, fields, relations and legend groups). This is an abstract class."""
+
+    relation_association = RELATION_ASSOCIATION
+    relation_composition = RELATION_COMPOSITION
+
+    @abstractmethod
+    def create_layer(self, *args, **kwargs):
+        """Returns a layer object, created with the arguments of :class:`Layer`."""
+
+    @abstractmethod
+    def create_field(self, name):
+        """Returns a field object, like :class:`Field`."""
+
+    @abstractmethod
+    def create_relation(self):
+        """Returns a relation object, like :class:`Relation`."""
+
+    @abstractmethod
+    def create_legend_group(self, *args, **kwargs):
+        """Returns a legend group object, created with the arguments of :class:`LegendGroup`."""
+
+    @abstractmethod
+    def wkb_type(self, type_name):
+        """Returns the wkb type of a layer from the geometry type name stored in the DB."""
+
+    @abstractmethod
+    def geometry_type(self, wkb_type):
+        """Returns POINT_GEOMETRY, LINE_GEOMETRY, POLYGON_GEOMETRY or None for a layer wkb type."""
+
+    @abstractmethod
+    def wkb_type_name(self, wkb_type):
+        """Returns a geometry type name for a layer wkb type, that wkb_type() parses back."""
+
+    @abstractmethod
+    def extent_text(self, extent):
+        """Returns a layer extent as the 'xmin;ymin;xmax;ymax' text layers are created with, or None."""
+
+    def locale(self):
+        """Returns the QLocale used to get date and time display formats."""
+        return QLocale()
+
+
+class RecordObjectFactory(ObjectFactory):
+    """Creates plain records (see :mod:`records`), so that the Generator runs without QGIS."""
+
+    def create_layer(self, *args, **kwargs):
+        return LayerRecord(*args, **kwargs)
+
+    def create_field(self, name):
+        return FieldRecord(name)
+
+    def create_relation(self):
+        return RelationRecord()
+
+    def create_legend_group(self, *args, **kwargs):
+        return LegendGroupRecord(*args, **kwargs)
+
+    def wkb_type(self, type_name):
+        return type_name.upper() if type_name else None
+
+    def geometry_type(self, wkb_type):
+        if not wkb_type:
+            return None
+        # Curve polygons and surfaces are polygons, even if they contain 'CURVE'
+        if "POLYGON" in wkb_type or "SURFACE" in wkb_type:
+            return POLYGON_GEOMETRY
+        if "LINE" in wkb_type or "CURVE" in wkb_type:
+            return LINE_GEOMETRY
+        if "POINT" in wkb_type:
+            return POINT_GEOMETRY
+        return None
+
+    def wkb_type_name(self, wkb_type):
+        return wkb_type
+
+    def extent_text(self, extent):
+        return ";".join(str(coord) for coord in extent) if extent else None
+
+
+def get_object_factory(headless=False):
+    """
+    :param headless: True to get plain records, False to get the QGIS-backed objects.
+    :return: An instance of :class:`ObjectFactory`.
+    """
+    if headless:
+        return RecordObjectFactory()
+
+    # Imported here, so that headless generation doesn't import QGIS at all
+    from .qgis_object_factory import QgisObjectFactory
+
+    return QgisObjectFactory()
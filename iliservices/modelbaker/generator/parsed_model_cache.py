@@ -0,0 +1,122 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from ..iliwrapper.ilicachestore import IliCacheStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.expanduser("~/.ilicache"), "parsed_models.sqlite"
+)
+MAX_CACHED_MODELS = 256
+PARSED_MODEL_FORMAT_VERSION = 1  # Bump it whenever parse_model output changes
+
+_parsed_models = OrderedDict()  # {key: JSON of the parse_model output}
+_parsed_models_lock = threading.Lock()
+_store_path = DEFAULT_STORE_PATH
+_store = None
+
+
+def get_parsed_model(model_name, model_content, domains, parse):
+    """
+    Gets the output of DomainRelationGenerator.parse_model for a model, parsing
+    it only if it was not parsed before.
+
+    Results are cached by model name, hash of the model content and hash of the
+    domains, in memory (bounded LRU) and on disk (see set_parsed_model_store_path),
+    so that generating projects for several schemas with the same models, or
+    for the same schema again, doesn't parse the models again.
+
+    :param model_name: Name of the model (as in t_ili2db_model.modelname).
+    :param model_content: INTERLIS content of the model (t_ili2db_model.content).
+    :param domains: List of domain ili names passed to parse_model.
+    :param parse: Callable parse(model_content, domains) doing the actual parsing.
+    :return: [models_info, extended_classes, bags_of_enum], a new copy on each
+        call, since callers modify it.
+    """
+    key = _get_key(model_name, model_content, domains)
+    with _parsed_models_lock:
+        content = _parsed_models.get(key)
+        if content is not None:
+            _parsed_models.move_to_end(key)
+            return json.loads(content)
+
+    parsed = _get_stored(key)
+    if parsed is None:
+        parsed = parse(model_content, domains)
+        _set_stored(key, model_name, parsed)
+
+    content = json.dumps(parsed)
+    with _parsed_models_lock:
+        _parsed_models[key] = content
+        while len(_parsed_models) > MAX_CACHED_MODELS:
+            _parsed_models.popitem(last=False)
+
+    return json.loads(content)
+
+
+def set_parsed_model_store_path(path):
+    """
+    :param path: Path to the SQLite file where parsed models are persisted, or
+        None to keep them only in memory.
+    """
+    global _store_path, _store
+    with _parsed_models_lock:
+        _store_path = path
+        _store = None
+
+
+def clear_parsed_model_cache():
+    """
+    Clears the in-memory cache. Parsed models persisted on disk are kept.
+    """
+    with _parsed_models_lock:
+        _parsed_models.clear()
+
+
+def _get_key(model_name, model_content, domains):
+    content_hash = hashlib.sha1(model_content.encode("utf-8")).hexdigest()
+    domains_hash = hashlib.sha1("\x1f".join(domains).encode("utf-8")).hexdigest()
+    return "{}:{}:{}:{}".format(
+        PARSED_MODEL_FORMAT_VERSION, model_name, content_hash, domains_hash
+    )
+
+
+def _get_store():
+    global _store
+    with _parsed_models_lock:
+        if _store is None and _store_path:
+            _store = IliCacheStore(_store_path)
+        return _store
+
+
+def _get_stored(key):
+    store = _get_store()
+    if store is None:
+        return None
+
+    try:
+        return store.get_parsed(key)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.warning(
+            "Parsed model could not be read from '{}': {}".format(store.db_path, e)
+        )
+        return None
+
+
+def _set_stored(key, model_name, parsed):
+    store = _get_store()
+    if store is None:
+        return
+
+    try:
+        store.set_parsed(key, model_name, parsed)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(
+            "Parsed model could not be written to '{}': {}".format(store.db_path, e)
+        )
@@ -0,0 +1,165 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+PHASE_RECORD = "phase"
+QUERY_RECORD = "query"
+
+
+class GenerationProfiler:
+    """
+    Collects the wall time of the generation phases (e.g., layers, relations,
+    legend) and of every query run while they are active, with its SQL text and
+    row count. Phases may be nested and may run in several threads at once
+    (see parallel introspection); queries are assigned to the innermost phase
+    active in their thread.
+
+    :param callback: Optional callable, called with each record (a dict) as soon
+        as it is complete, e.g., to log slow queries while generating.
+    :param record_sql: False to leave the SQL text out of query records.
+    """
+
+    def __init__(self, callback=None, record_sql=True):
+        self.callback = callback
+        self.record_sql = record_sql
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._phases = list()
+        self._queries = list()
+        self._start_time = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager timing the code run inside it as the phase `name`.
+        """
+        stack = self._stack()
+        record = {
+            "type": PHASE_RECORD,
+            "name": name,
+            "parent": stack[-1]["name"] if stack else None,
+            "thread": threading.current_thread().name,
+            "start": time.perf_counter() - self._start_time,
+            "elapsed": None,
+            "queries": 0,
+            "query_time": 0.0,
+            "rows": 0,
+        }
+        stack.append(record)
+        start_time = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["elapsed"] = time.perf_counter() - start_time
+            stack.pop()
+            with self._lock:
+                self._phases.append(record)
+            self._notify(record)
+
+    def add_query(self, sql, elapsed, rows=None):
+        """
+        Records a query. Meant to be set as query observer of DB connectors
+        (see DBConnector.set_query_observer()).
+
+        :param sql: SQL text of the query.
+        :param elapsed: Seconds the query took.
+        :param rows: Number of rows returned or affected, or None if unknown.
+        """
+        stack = self._stack()
+        phase = stack[-1] if stack else None
+        record = {
+            "type": QUERY_RECORD,
+            "phase": phase["name"] if phase else None,
+            "thread": threading.current_thread().name,
+            "start": time.perf_counter() - self._start_time - elapsed,
+            "elapsed": elapsed,
+            "rows": rows,
+            "sql": sql if self.record_sql else None,
+        }
+        if phase:
+            # Only this thread touches its phases before they are complete
+            phase["queries"] += 1
+            phase["query_time"] += elapsed
+            phase["rows"] += rows or 0
+        with self._lock:
+            self._queries.append(record)
+        self._notify(record)
+
+    def report(self):
+        """
+        :return: Dict with the complete phases and the queries (both sorted by
+            start time, in seconds since the profiler was created) and a summary.
+        """
+        with self._lock:
+            phases = sorted(self._phases, key=lambda record: record["start"])
+            queries = sorted(self._queries, key=lambda record: record["start"])
+
+        return {
+            "phases": [dict(record) for record in phases],
+            "queries": [dict(record) for record in queries],
+            "summary": {
+                "elapsed": sum(
+                    record["elapsed"] for record in phases if record["parent"] is None
+                ),
+                "queries": len(queries),
+                "query_time": sum(record["elapsed"] for record in queries),
+                "rows": sum(record["rows"] or 0 for record in queries),
+            },
+        }
+
+    def slowest_queries(self, count=10):
+        """
+        :param count: Max. number of queries to return.
+        :return: List of the slowest query records, slowest first.
+        """
+        with self._lock:
+            queries = sorted(
+                self._queries, key=lambda record: record["elapsed"], reverse=True
+            )
+        return [dict(record) for record in queries[:count]]
+
+    def clear(self):
+        """
+        Removes the collected records, e.g., to profile another generation.
+        """
+        with self._lock:
+            self._phases.clear()
+            self._queries.clear()
+            self._start_time = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = list()
+        return stack
+
+    def _notify(self, record):
+        if self.callback:
+            self.callback(dict(record))
+
+
+def profile_phase(profiler, name):
+    """
+    :param profiler: A GenerationProfiler or None.
+    :param name: Name of the phase.
+    :return: Context manager timing the phase, or doing nothing if there is no profiler.
+    """
+    return profiler.phase(name) if profiler else nullcontext()
+
+
+def profiled(name):
+    """
+    Decorator timing a method as the phase `name` with the profiler of its object
+    (i.e., its `profiler` attribute), if any.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with profile_phase(getattr(self, "profiler", None), name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
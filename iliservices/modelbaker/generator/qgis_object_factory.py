@@ -0,0 +1,58 @@
+from qgis.core import QgsApplication, QgsRelation, QgsWkbTypes
+from PyQt5.QtCore import QLocale
+
+from ..dataobjects.fields import Field
+from ..dataobjects.layers import Layer
+from ..dataobjects.legend import LegendGroup
+from ..dataobjects.relations import Relation
+from .object_factory import (
+    LINE_GEOMETRY,
+    POINT_GEOMETRY,
+    POLYGON_GEOMETRY,
+    ObjectFactory,
+)
+
+
+class QgisObjectFactory(ObjectFactory):
+    """Creates the Model Baker objects used to build QGIS projects."""
+
+    relation_association = QgsRelation.Association
+    relation_composition = QgsRelation.Composition
+
+    def create_layer(self, *args, **kwargs):
+        return Layer(*args, **kwargs)
+
+    def create_field(self, name):
+        return Field(name)
+
+    def create_relation(self):
+        return Relation()
+
+    def create_legend_group(self, *args, **kwargs):
+        return LegendGroup(*args, **kwargs)
+
+    def wkb_type(self, type_name):
+        return QgsWkbTypes.parseType(type_name) or QgsWkbTypes.Unknown
+
+    def geometry_type(self, wkb_type):
+        geometry_type = QgsWkbTypes.geometryType(wkb_type)
+        if geometry_type == QgsWkbTypes.PointGeometry:
+            return POINT_GEOMETRY
+        elif geometry_type == QgsWkbTypes.LineGeometry:
+            return LINE_GEOMETRY
+        elif geometry_type == QgsWkbTypes.PolygonGeometry:
+            return POLYGON_GEOMETRY
+        return None
+
+    def wkb_type_name(self, wkb_type):
+        return QgsWkbTypes.displayString(wkb_type)
+
+    def extent_text(self, extent):
+        if extent is None:
+            return None
+        return "{};{};{};{}".format(
+            extent.xMinimum(), extent.yMinimum(), extent.xMaximum(), extent.yMaximum()
+        )
+
+    def locale(self):
+        return QLocale(QgsApplication.instance().locale())
@@ -20,7 +20,11 @@
 # from qgis.core import QgsNetworkAccessManager
 # from PyQt5.QtNetwork import QNetworkProxy
 
-from .ili2dbutils import get_all_modeldir_in_path
+from .ili2dbutils import (
+    get_all_modeldir_in_path,
+    get_java_path,
+    invalidate_java_path_cache,
+)
 
 
 class BaseConfiguration:
@@ -86,6 +90,17 @@ class BaseConfiguration:
             args += ["--log", self.logfile_path]
         return args
 
+    def get_java_path(self):
+        """
+        Java to run ili2db with: the configured java_path or the one found in JAVA_HOME/PATH. The latter is probed
+        once and cached process-wide, until the java binary changes or invalidate_java_path_cache() is called.
+        """
+        return get_java_path(self)
+
+    @staticmethod
+    def invalidate_java_path_cache():
+        invalidate_java_path_cache()
+
     @property
     def model_directories(self):
         dirs = list()
@@ -16,13 +16,20 @@
  *                                                                         *
  ***************************************************************************/
 """
-import glob
 import os
 import platform
 import re
+import shutil
 import subprocess
 import tempfile
+import threading
 import zipfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 from PyQt5.QtCore import QCoreApplication
 from PyQt5.QtGui import QColor
@@ -30,6 +37,15 @@ from PyQt5.QtGui import QColor
 from ..utils.qt_utils import NetworkError, download_file
 from .globals import DbIliMode
 from .ili2dbtools import get_tool_url, get_tool_version
+from .modeldirindex import get_model_directory_index
+
+# Java paths found by get_java_path, so that candidates are probed (java -version) once per process
+_java_path_cache = dict()  # {(JAVA_HOME, PATH): (java_path, real path of the java binary, mtime of the binary)}
+_java_path_cache_lock = threading.Lock()
+
+# Locks serializing the download of each tool within the process (the lock file does it across processes)
+_download_locks = dict()  # {lock file path: threading.Lock}
+_download_locks_lock = threading.Lock()
 
 
 def get_ili2db_bin(tool, db_ili_version, stdout, stderr):
@@ -44,7 +60,7 @@ def get_ili2db_bin(tool, db_ili_version, stdout, stderr):
     ili_tool_version = get_tool_version(tool, db_ili_version)
     ili_tool_url = get_tool_url(tool, db_ili_version)
 
-    dir_path = os.path.dirname(os.path.realpath(__file__))
+    bin_dir = _get_bin_dir()
     ili2db_dir = "{}-{}".format(tool_name, ili_tool_version)
 
     # the structure changed since 3.12.2
@@ -55,15 +71,13 @@ def get_ili2db_bin(tool, db_ili_version, stdout, stderr):
         module_tested=tool_name,
     ):
         ili2db_file = os.path.join(
-            dir_path,
-            "bin",
+            bin_dir,
             ili2db_dir,
             "{tool}-{version}.jar".format(tool=tool_name, version=ili_tool_version),
         )
     else:
         ili2db_file = os.path.join(
-            dir_path,
-            "bin",
+            bin_dir,
             ili2db_dir,
             "{tool}-{version}/{tool}.jar".format(
                 tool=tool_name, version=ili_tool_version
@@ -71,46 +85,62 @@ def get_ili2db_bin(tool, db_ili_version, stdout, stderr):
         )
 
     if not os.path.isfile(ili2db_file):
-        try:
-            os.makedirs(os.path.join(dir_path, "bin", ili2db_dir), exist_ok=True)
-        except FileExistsError:
-            pass
-
-        tmpfile = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
-
-        stdout.emit(
-            QCoreApplication.translate(
-                "ili2dbutils",
-                "Downloading {} version {}…".format(tool_name, ili_tool_version),
-            )
-        )
-
-        try:
-            download_file(
-                ili_tool_url,
-                tmpfile.name,
-                on_progress=lambda received, total: stdout.emit("."),
-            )
-        except NetworkError as e:
-            stderr.emit(
-                QCoreApplication.translate(
-                    "ili2dbutils",
-                    'Could not download {tool_name}\n\n  Error: {error}\n\nFile "{file}" not found. Please download and extract <a href="{ili2db_url}">{tool_name}</a>'.format(
-                        tool_name=tool_name,
-                        ili2db_url=ili_tool_url,
-                        error=e.msg,
-                        file=ili2db_file,
-                    ),
+        os.makedirs(bin_dir, exist_ok=True)
+
+        # Fixed name, so that an interrupted download is resumed next time. Only one thread or process downloads
+        # the tool at a time, the others wait and use the extracted files
+        zip_file = os.path.join(bin_dir, "{}.zip".format(ili2db_dir))
+        lock_file = zip_file + ".lock"
+
+        with _download_lock(lock_file):
+            if not os.path.isfile(ili2db_file):
+                stdout.emit(
+                    QCoreApplication.translate(
+                        "ili2dbutils",
+                        "Downloading {} version {}…".format(tool_name, ili_tool_version),
+                    )
                 )
-            )
-            return None
 
-        try:
-            with zipfile.ZipFile(tmpfile.name, "r") as z:
-                z.extractall(os.path.join(dir_path, "bin", ili2db_dir))
-        except zipfile.BadZipFile:
-            # We will realize soon enough that the files were not extracted
-            pass
+                try:
+                    download_file(
+                        ili_tool_url,
+                        zip_file,
+                        on_progress=lambda received, total: stdout.emit("."),
+                    )
+                except NetworkError as e:
+                    stderr.emit(
+                        QCoreApplication.translate(
+                            "ili2dbutils",
+                            'Could not download {tool_name}\n\n  Error: {error}\n\nFile "{file}" not found. Please download and extract <a href="{ili2db_url}">{tool_name}</a>'.format(
+                                tool_name=tool_name,
+                                ili2db_url=ili_tool_url,
+                                error=e.msg,
+                                file=ili2db_file,
+                            ),
+                        )
+                    )
+                    return None
+
+                # Extracted aside and moved at once, so that nobody finds a half-extracted jar
+                extract_dir = tempfile.mkdtemp(dir=bin_dir, prefix=ili2db_dir + ".")
+                try:
+                    with zipfile.ZipFile(zip_file, "r") as z:
+                        z.extractall(extract_dir)
+                    shutil.rmtree(os.path.join(bin_dir, ili2db_dir), ignore_errors=True)
+                    os.replace(extract_dir, os.path.join(bin_dir, ili2db_dir))
+                except zipfile.BadZipFile:
+                    # We will realize soon enough that the files were not extracted
+                    pass
+                finally:
+                    os.remove(zip_file)
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+
+            if os.path.isfile(ili2db_file):
+                # Not needed anymore: whoever waits for the lock or takes a new one finds the extracted tool
+                try:
+                    os.remove(lock_file)
+                except OSError:
+                    pass  # E.g., on Windows, where open files can't be removed
 
         if not os.path.isfile(ili2db_file):
             stderr.emit(
@@ -126,15 +156,39 @@ def get_ili2db_bin(tool, db_ili_version, stdout, stderr):
     return ili2db_file
 
 
+def _get_bin_dir():
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), "bin")
+
+
+@contextmanager
+def _download_lock(lock_path):
+    """
+    Context manager that serializes the blocks using the same lock_path, across threads and (where fcntl is
+    available) processes.
+    """
+    with _download_locks_lock:
+        lock = _download_locks.setdefault(lock_path, threading.Lock())
+
+    with lock:
+        with open(lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def get_all_modeldir_in_path(path, lambdafunction=None):
-    all_subdirs = [path[0] for path in os.walk(path)]  # include path
-    # Make sure path is included, it can be a special string like `%XTF_DIR`
-    modeldirs = [path]
-    for subdir in all_subdirs:
-        if os.path.isdir(subdir) and len(glob.glob(subdir + "/*.ili")) > 0:
-            if lambdafunction is not None:
-                lambdafunction(subdir)
-            modeldirs += [subdir]
+    # Subdirectories with .ili files come from the shared (incrementally refreshed) model directory index
+    if os.path.isdir(path):
+        path = os.path.normpath(path)  # As the index returns it, so that duplicates are found
+    modeldirs = [path]  # Make sure path is included, it can be a special string like `%XTF_DIR`
+    for subdir in get_model_directory_index().get_model_directories(path):
+        if lambdafunction is not None:
+            lambdafunction(subdir)
+        modeldirs += [subdir]
 
     # Remove duplicates
     modeldirs = list(dict.fromkeys(modeldirs))
@@ -210,6 +264,11 @@ def get_java_path(base_configuration):
         # A java path is configured: respect it no mather what
         return base_configuration.java_path
     else:
+        cache_key = (os.environ.get("JAVA_HOME", ""), os.environ.get("PATH", ""))
+        cached_java_path = _get_cached_java_path(cache_key)
+        if cached_java_path:
+            return cached_java_path
+
         # By default try JAVA_HOME and PATH
         java_paths = []
         if "JAVA_HOME" in os.environ:
@@ -255,6 +314,7 @@ def get_java_path(base_configuration):
                     exact_required_version=False,
                     module_tested="Java",
                 ):
+                    _cache_java_path(cache_key, java_path)
                     return java_path
             except FileNotFoundError:
                 pass
@@ -262,6 +322,49 @@ def get_java_path(base_configuration):
         raise JavaNotFoundError(version_output)
 
 
+def _get_java_binary_stat(java_path):
+    """
+    :return: tuple(real path, mtime) of the java binary (java_path can be just 'java') or None if it's not found.
+    """
+    java_binary = shutil.which(java_path)
+    if not java_binary:
+        return None
+
+    java_binary = os.path.realpath(java_binary)
+    try:
+        return java_binary, os.path.getmtime(java_binary)
+    except OSError:
+        return None
+
+
+def _get_cached_java_path(cache_key):
+    with _java_path_cache_lock:
+        cached = _java_path_cache.get(cache_key)
+
+    if cached:
+        java_path, java_binary, mtime = cached
+        # A JVM upgrade (or a moved symlink) makes the cached entry obsolete
+        if _get_java_binary_stat(java_path) == (java_binary, mtime):
+            return java_path
+
+    return None
+
+
+def _cache_java_path(cache_key, java_path):
+    binary_stat = _get_java_binary_stat(java_path)
+    if binary_stat:
+        with _java_path_cache_lock:
+            _java_path_cache[cache_key] = (java_path,) + binary_stat
+
+
+def invalidate_java_path_cache():
+    """
+    Forgets the java paths found so far by get_java_path, e.g., after installing a new JVM.
+    """
+    with _java_path_cache_lock:
+        _java_path_cache.clear()
+
+
 def is_version_valid(
     current_version,
     min_required_version,
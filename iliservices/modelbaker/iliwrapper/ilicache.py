@@ -21,8 +21,11 @@ import logging
 import os
 import re
 import shutil
+import threading
+import time
 import urllib.parse
 import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import Enum
 import logging
 
@@ -32,17 +35,29 @@ from PyQt5.QtWidgets import QGridLayout, QItemDelegate, QLabel, QStyle, QWidget
 
 logger = logging.getLogger(__name__)
 
-from ..utils.qt_utils import download_file
+from requests.exceptions import RequestException
+
+from ..utils.qt_utils import download_file, download_file_if_modified
 from .ili2dbutils import get_all_modeldir_in_path
+from .ilicachestore import IliCacheStore
+from .ilimodelscanner import scan_ili_models
 
 
 class IliCache(QObject):
     ns = {"ili23": "http://www.interlis.ch/INTERLIS2.3"}
 
     CACHE_PATH = os.path.expanduser("~/.ilicache")
+    REVALIDATE_INTERVAL = 3600  # Seconds during which a downloaded repository file is used without asking the server
+    MAX_CONCURRENT_DOWNLOADS = 8  # Repository sites processed at the same time
+    MAX_CONNECTIONS_PER_HOST = 2
+    DOWNLOAD_TIMEOUT = 30  # Seconds to wait for a single repository file
+    DISCOVERY_TIMEOUT = 120  # Seconds to discover a repository and all its subsidiary sites
 
     def __init__(self, configuration, single_ili_file=None):
         QObject.__init__(self)
+        self._store = None
+        self._host_semaphores = dict()  # {netloc: threading.BoundedSemaphore}
+        self._host_semaphores_lock = threading.Lock()
         self.information_file = "ilimodels.xml"
         self.repositories = dict()
         self.base_configuration = configuration
@@ -113,59 +128,210 @@ class IliCache(QObject):
     def download_repository(self, url):
         """
         Downloads the informationfile (default: ilimodels.xml) and ilisite.xml files from the provided url
-        and updates the local cache.
+        and updates the local cache. Subsidiary sites listed in ilisite.xml are processed as well.
+
+        Files are downloaded (remote repositories) and parsed again only if they changed. Otherwise, the results of
+        the last parsing are taken from the on-disk store.
+
+        Sites are downloaded concurrently (at most MAX_CONNECTIONS_PER_HOST connections per host), each site is
+        processed only once (sites might reference each other) and sites not reached within DISCOVERY_TIMEOUT
+        seconds are skipped.
+        """
+        deadline = time.monotonic() + self.DISCOVERY_TIMEOUT
+        visited_sites = {self._site_key(url)}
+
+        executor = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_DOWNLOADS)
+        pending = {executor.submit(self._download_site, url, deadline): url}
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.warning(
+                        self.tr("Repository discovery took too long, {} sites were skipped: {}").format(
+                            len(pending), ", ".join(pending.values())
+                        )
+                    )
+                    break
+
+                for future in done:
+                    site_url = pending.pop(future)
+                    try:
+                        site = future.result()
+                    except Exception as e:
+                        logger.warning(
+                            self.tr("Could not process repository {url} ({message})").format(
+                                url=site_url, message=str(e)
+                            )
+                        )
+                        continue
+
+                    # Parsing updates the repositories (and the Qt model), keep it in this thread
+                    if site["information_file_available"]:
+                        self._load_informationfile(
+                            site["information_file_url"], site["information_file_path"], site["netloc"], site_url
+                        )
+
+                    for subsidiary_site in site["subsidiary_sites"]:
+                        site_key = self._site_key(subsidiary_site)
+                        if site_key not in visited_sites:
+                            visited_sites.add(site_key)
+                            pending[executor.submit(self._download_site, subsidiary_site, deadline)] = subsidiary_site
+        finally:
+            # Don't wait for downloads that exceeded the deadline
+            executor.shutdown(wait=not pending, cancel_futures=True)
+
+    def _download_site(self, url, deadline):
+        """
+        Brings the informationfile and ilisite.xml of a site up to date. It's run in worker threads, so it doesn't
+        touch the repositories.
+
+        :return: Dict with the informationfile location and availability, as well as the subsidiary sites.
         """
         netloc = urllib.parse.urlsplit(url)[1] if not os.path.isdir(url) else url
 
         information_file_url = self.file_url(url, self.information_file)
         ilisite_url = self.file_url(url, "ilisite.xml")
-        logger = logging.getLogger(__name__)
 
         if os.path.isdir(url):
-            # continue with the local file
-            if os.path.exists(information_file_url):
-                self._process_informationfile(information_file_url, netloc, url)
-            else:
-                logger.warning(
-                    self.tr("Could not find local file {}").format(information_file_url)
-                )
-            if os.path.exists(ilisite_url):
-                self._process_ilisite(ilisite_url)
-            else:
-                logger.warning(
-                    self.tr("Could not find local file  {}").format(ilisite_url)
-                )
+            # continue with the local files
+            information_file_path = information_file_url
+            ilisite_path = ilisite_url
+        else:
+            site_dir = self._site_cache_dir(url)
+            os.makedirs(site_dir, exist_ok=True)
+            information_file_path = os.path.join(site_dir, self.information_file)
+            ilisite_path = os.path.join(site_dir, "ilisite.xml")
+
+        site = {
+            "netloc": netloc,
+            "information_file_url": information_file_url,
+            "information_file_path": information_file_path,
+            "information_file_available": self._update_file(information_file_url, information_file_path, deadline),
+            "subsidiary_sites": list(),
+        }
+
+        if self._update_file(ilisite_url, ilisite_path, deadline):
+            key = self._parsed_key(ilisite_url)
+            subsidiary_sites = self.store.get_parsed(key) if key is not None else None
+            if subsidiary_sites is None:
+                subsidiary_sites = self._parse_ilisite(ilisite_path)
+                if subsidiary_sites is not None and key is not None:
+                    self.store.set_parsed(key, ilisite_url, subsidiary_sites)
+
+            site["subsidiary_sites"] = subsidiary_sites or list()
+
+        return site
+
+    def _load_informationfile(self, information_file_url, information_file_path, netloc, url):
+        key = self._parsed_key(information_file_url)
+        repository = self.store.get_parsed(key) if key is not None else None
+        if repository is None:
+            self.repositories.pop(netloc, None)
+            self._process_informationfile(information_file_path, netloc, url)
+            if netloc in self.repositories and key is not None:
+                self.store.set_parsed(key, information_file_url, self.repositories[netloc])
         else:
-            netloc_dir = os.path.join(self.CACHE_PATH, netloc)
-            os.makedirs(netloc_dir, exist_ok=True)
-            information_file_path = os.path.join(netloc_dir, self.information_file)
-            ilisite_path = os.path.join(self.CACHE_PATH, netloc, "ilisite.xml")
+            self.repositories[netloc] = repository
+            self.set_repositories_to_model()
 
-            # download ilimodels.xml
-            download_file(
-                information_file_url,
-                information_file_path,
-                on_success=lambda: self._process_informationfile(
-                    information_file_path, netloc, url
-                ),
-                on_error=lambda error, error_string: logger.warning(
-                    self.tr("Could not download {url} ({message})").format(
-                        url=information_file_url, message=error_string
-                    )
-                ),
-            )
+    def _site_cache_dir(self, url):
+        """
+        :return: Directory of the cache for the files of a remote site. It's derived from the whole url (not only the
+                 netloc), since sites of the same host are downloaded concurrently.
+        """
+        parts = urllib.parse.urlsplit(url.strip())
+        path_segments = [
+            segment for segment in urllib.parse.unquote(parts.path).split("/") if segment not in ("", ".", "..")
+        ]
+        return os.path.join(self.CACHE_PATH, parts.netloc, *path_segments)
+
+    @staticmethod
+    def _site_key(url):
+        """
+        :return: Normalized site location, to detect sites that were already processed.
+        """
+        if os.path.isdir(url):
+            return os.path.normcase(os.path.realpath(url))
 
-            # download ilisite.xml
-            download_file(
-                ilisite_url,
-                ilisite_path,
-                on_success=lambda: self._process_ilisite(ilisite_path),
-                on_error=lambda error, error_string: logger.warning(
-                    self.tr("Could not download {url} ({message})").format(
-                        url=ilisite_url, message=error_string
-                    )
-                ),
+        parts = urllib.parse.urlsplit(url.strip())
+        return urllib.parse.urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, "")
+        )
+
+    def _get_host_semaphore(self, netloc):
+        with self._host_semaphores_lock:
+            if netloc not in self._host_semaphores:
+                self._host_semaphores[netloc] = threading.BoundedSemaphore(self.MAX_CONNECTIONS_PER_HOST)
+            return self._host_semaphores[netloc]
+
+    @property
+    def store(self):
+        """
+        On-disk store (SQLite) of the repository files known by this cache, along with their parsed contents.
+        """
+        if self._store is None:
+            self._store = IliCacheStore(os.path.join(self.CACHE_PATH, "ilicache.sqlite"))
+        return self._store
+
+    def _parsed_key(self, source_url):
+        """
+        :return: Key under which the parsed contents of a source are stored, or None to parse the source every time.
+                 Subclasses whose parsing depends on other settings (e.g., filters) should include them in the key.
+        """
+        return source_url
+
+    def _update_file(self, source_url, file_path, deadline=None):
+        """
+        Makes sure file_path holds the current version of source_url, revalidating it against its source: mtime and
+        size for local files, a conditional request (ETag/Last-Modified) for remote ones. If the source changed, the
+        parsed contents stored for it are discarded.
+
+        :param deadline: Optional time.monotonic() value after which the source is not requested anymore.
+        :return: Whether file_path is available.
+        """
+        source = self.store.get_source(source_url)
+
+        if source_url == file_path:  # Local file
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                logger.warning(self.tr("Could not find local file {}").format(file_path))
+                return False
+
+            if source is None or (source["mtime_ns"], source["size"]) != (stat.st_mtime_ns, stat.st_size):
+                self.store.set_source(source_url, True, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            return True
+
+        file_exists = os.path.isfile(file_path)
+        if (source is not None and file_exists and source["checked_at"] is not None
+                and time.time() - source["checked_at"] < self.REVALIDATE_INTERVAL):
+            return True
+
+        timeout = self.DOWNLOAD_TIMEOUT
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+
+        try:
+            if timeout <= 0:
+                raise TimeoutError("repository discovery deadline exceeded")
+
+            with self._get_host_semaphore(urllib.parse.urlsplit(source_url)[1]):
+                modified, etag, last_modified = download_file_if_modified(
+                    source_url,
+                    file_path,
+                    source["etag"] if source and file_exists else None,
+                    source["last_modified"] if source and file_exists else None,
+                    timeout=timeout,
+                )
+        except (RequestException, OSError) as e:
+            logger.warning(
+                self.tr("Could not download {url} ({message})").format(url=source_url, message=str(e))
             )
+            # Keep working with the last downloaded version (if any)
+            return file_exists and source is not None
+
+        self.store.set_source(source_url, modified, etag=etag, last_modified=last_modified, checked_at=time.time())
+        return True
 
     @classmethod
     def clear_cache(cls):
@@ -174,9 +340,11 @@ class IliCache(QObject):
 
         shutil.rmtree(cls.CACHE_PATH, ignore_errors=False, onerror=None)
 
-    def _process_ilisite(self, file):
+    def _parse_ilisite(self, file):
         """
-        Parses the ilisite.xml provided in ``file`` and recursively downloads any subidiary sites.
+        Parses the ilisite.xml provided in ``file``.
+
+        :return: List of subsidiary site locations or None if the file could not be parsed.
         """
         try:
             root = ET.parse(file).getroot()
@@ -188,8 +356,9 @@ class IliCache(QObject):
                     )
                 )
             )
-            return
+            return None
 
+        subsidiary_sites = list()
         for site in root.iter(
             "{http://www.interlis.ch/INTERLIS2.3}IliSite09.SiteMetadata.Site"
         ):
@@ -200,7 +369,9 @@ class IliCache(QObject):
                 ):
                     value = self.get_element_text(location.find("ili23:value", self.ns))
                     if value:
-                        self.download_repository(value)
+                        subsidiary_sites.append(value)
+
+        return subsidiary_sites
 
     def _process_informationfile(self, file, netloc, url):
         """
@@ -282,69 +453,43 @@ class IliCache(QObject):
     def process_ili_file(self, ilifile):
         fileModels = list()
         try:
-            fileModels = self.parse_ili_file(ilifile, "utf-8")
-        except UnicodeDecodeError:
-            try:
-                fileModels = self.parse_ili_file(ilifile, "latin1")
-                logger.warning(
-                    self.tr(
-                        "Even though the ili file `{}` could be read, it is not in UTF-8. Please encode your ili models in UTF-8.".format(
-                            os.path.basename(ilifile)
-                        )
-                    )
-                )
-            except UnicodeDecodeError as e:
-
-                logger.critical(
-                    self.tr(
-                        "Could not parse ili file `{}` with UTF-8 nor Latin-1 encodings. Please encode your ili models in UTF-8.".format(
-                            os.path.basename(ilifile)
-                        )
+            fileModels, encoding = self._scan_ili_file(ilifile)
+        except OSError as e:
+            logger.info(
+                self.tr(
+                    "Could not parse ili file `{ilifile}` ({exception})".format(
+                        ilifile=ilifile, exception=str(e)
                     )
                 )
+            )
+            return fileModels
 
-                logger.info(
-                    self.tr(
-                        "Could not parse ili file `{ilifile}`. We suggest you to encode it in UTF-8. ({exception})".format(
-                            ilifile=ilifile, exception=str(e)
-                        )
+        if encoding != "utf-8":
+            logger.warning(
+                self.tr(
+                    "Even though the ili file `{}` could be read, it is not in UTF-8. Please encode your ili models in UTF-8.".format(
+                        os.path.basename(ilifile)
                     )
                 )
-                fileModels = list()
+            )
 
         return fileModels
 
     def parse_ili_file(self, ilipath, encoding):
         """
         Parses an ili file returning models and version data
+
+        Raises UnicodeDecodeError if the file cannot be decoded with the given encoding.
         """
-        models = list()
-        re_model = re.compile(r"\s*MODEL\s*([\w\d_-]+).*")
-        re_model_version = re.compile(r'VERSION "([ \w\d\._-]+)".*')
-        with open(ilipath, encoding=encoding) as file:
-            model = None
-            for lineno, line in enumerate(file):
-                line = line.split("!!")[0]
-                result = re_model.search(line)
-                if result:
-                    model = dict()
-                    model["name"] = result.group(1)
-                    model["version"] = ""
-                    model["repository"] = ilipath
-                    models += [model]
-
-                result = re_model_version.search(line)
-                if result:
-                    if not model:
-                        raise RuntimeError(
-                            "VERSION tag found in file {}:{} without previous MODEL definition.".format(
-                                ilipath, lineno
-                            )
-                        )
-                    model["version"] = result.group(1)
-                    model = None
+        return self._scan_ili_file(ilipath, encoding)[0]
 
-        return models
+    @staticmethod
+    def _scan_ili_file(ilipath, encoding=None):
+        models, encoding = scan_ili_models(ilipath, encoding)
+        for model in models:
+            model["repository"] = ilipath
+
+        return models, encoding
 
     @property
     def model_names(self):
@@ -466,6 +611,12 @@ class IliDataCache(IliCache):
         # download remote and local repositories
         self.download_repository(path)
 
+    def _parsed_key(self, source_url):
+        # The parsed datasets depend on the filters
+        return "{}|{}|{}|{}".format(
+            source_url, self.type, ";".join(self.filter_models), ";".join(self.datasources)
+        )
+
     def _process_informationfile(self, file, netloc, url):
         """
         Parses ilidata.xml provided in ``file`` and updates the local repositories cache.
@@ -896,6 +1047,11 @@ class IliToppingFileCache(IliDataCache):
         self.repositories[netloc] = repo_files
         self.set_repositories_to_model()
 
+    def _parsed_key(self, source_url):
+        # Parsing the ilidata.xml also downloads the topping files (and reports them with the download signals),
+        # so it can't be skipped by reusing parsed contents
+        return None
+
     def on_download_status(self, dataset_id):
         # here we could add some more logic
         if dataset_id is not None:
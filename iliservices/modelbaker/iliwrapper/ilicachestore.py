@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+
+class IliCacheStore:
+    """
+    SQLite store for the repository files known by IliCache (ilimodels.xml, ilisite.xml, ilidata.xml, ...).
+
+    For each source (URL or local path) it keeps what's needed to revalidate it (ETag/Last-Modified for remote
+    sources, mtime/size for local ones) and the results of parsing it, so that unchanged sources are not downloaded
+    nor parsed again.
+
+    :param db_path: Path to the SQLite file. Its directory is created if needed.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def get_source(self, url):
+        """
+        :return: Dict with the revalidation data of the source (etag, last_modified, mtime_ns, size, checked_at) or
+                 None if the source is unknown.
+        """
+        row = self._fetchone(
+            "SELECT etag, last_modified, mtime_ns, size, checked_at FROM sources WHERE url = ?", (url,)
+        )
+        if row is None:
+            return None
+
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "mtime_ns": row[2],
+            "size": row[3],
+            "checked_at": row[4],
+        }
+
+    def set_source(self, url, changed, etag=None, last_modified=None, mtime_ns=None, size=None, checked_at=None):
+        """
+        Stores the revalidation data of a source. If the source changed, the parsed results stored for it are removed.
+        """
+        statements = list()
+        if changed:
+            statements.append(("DELETE FROM parsed WHERE url = ?", (url,)))
+        statements.append((
+            "INSERT OR REPLACE INTO sources (url, etag, last_modified, mtime_ns, size, checked_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, mtime_ns, size, checked_at),
+        ))
+        self._execute(statements)
+
+    def get_parsed(self, key):
+        """
+        :return: Parsed results stored under the given key, or None if there are none.
+        """
+        row = self._fetchone("SELECT content FROM parsed WHERE key = ?", (key,))
+        return json.loads(row[0]) if row else None
+
+    def set_parsed(self, key, url, content):
+        """
+        Stores the parsed results of a source. Several keys can be stored per source (e.g., for different filters).
+        """
+        self._execute([(
+            "INSERT OR REPLACE INTO parsed (key, url, content) VALUES (?, ?, ?)",
+            (key, url, json.dumps(content)),
+        )])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS sources (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                        "mtime_ns INTEGER, size INTEGER, checked_at REAL)"
+                    )
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, url TEXT, content TEXT)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS parsed_url_idx ON parsed (url)")
+                self._initialized = True
+        return conn
+
+    def _fetchone(self, query, params):
+        if not os.path.isfile(self.db_path):
+            self._initialized = False  # e.g., the cache was cleared
+            return None
+
+        with closing(self._connect()) as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _execute(self, statements):
+        if not os.path.isfile(self.db_path):
+            self._initialized = False
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            with conn:
+                for query, params in statements:
+                    conn.execute(query, params)
@@ -15,6 +15,7 @@
  *                                                                         *
  ***************************************************************************/
 """
+import asyncio
 import subprocess
 import logging
 
@@ -28,6 +29,7 @@ from ..utils.qt_utils import AbstractQObjectMeta
 from .ili2dbargs import get_ili2db_args
 from .ili2dbconfig import Ili2DbCommandConfiguration
 from .ili2dbutils import get_ili2db_bin, get_java_path
+from .iliprocessoutput import DEFAULT_OUTPUT_MAX_LINES, ProcessOutput, arun_process, stream_process_output
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +51,10 @@ class IliExecutable(QObject, metaclass=AbstractQObjectMeta):
         self.filename = None
         self.tool = None
         self.configuration = self._create_config()
+        self.worker_pool = None  # Optional IliWorkerPool to run ili2db in warm JVMs
+        self.output_max_lines = DEFAULT_OUTPUT_MAX_LINES  # stderr lines kept in memory
+        self.output_file_path = None  # Optional file to write the whole stderr output to
+        self.output = None  # ProcessOutput of the last run
         _, self.encoding = locale.getlocale()
 
         # Lets python try to determine the default locale
@@ -144,30 +150,65 @@ class IliExecutable(QObject, metaclass=AbstractQObjectMeta):
             return [java_path] + self.command_with_password(edited_command)
 
     def run(self, edited_command=None):
-        """Executes the configured command asynchronously."""
+        """Executes the configured command, streaming its output line by line."""
         command = self._prepare_command(edited_command)
         self.__result = self.ERROR
 
         logger.debug(command)
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
 
-        msg_stdout = stdout.decode(self.encoding)
-        msg_stderr = stderr.decode(self.encoding)
+        self.output = ProcessOutput(self.output_max_lines, self.output_file_path)
+        try:
+            if self.worker_pool is not None and not edited_command:
+                exit_code = self.worker_pool.execute_command(command, self._on_stderr_line)
+                if exit_code is not None:
+                    return self._process_output(exit_code)
 
-        logger.debug('stdout')
-        logger.debug(msg_stdout)
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            exit_code = stream_process_output(process, self.encoding, self._on_stdout_line, self._on_stderr_line)
 
-        logger.debug('stderr')
-        logger.debug(msg_stderr)
+            return self._process_output(exit_code)
+        finally:
+            self.output.close()
 
+    async def arun(self, timeout=None):
+        """Coroutine version of *run*. The worker pool is not used here, every call runs its own java process.
 
-        if self.__done_pattern.search(msg_stderr):
+        :param timeout: Max. number of seconds the command can run, or None to wait until it ends.
+        :raises asyncio.TimeoutError: If the timeout expired. The java process is killed before raising (the same
+                                      happens if the coroutine is cancelled).
+        """
+        # Finding java and the jar might download the latter, keep the event loop free meanwhile
+        command = await asyncio.get_running_loop().run_in_executor(None, self._prepare_command)
+        self.__result = self.ERROR
+
+        logger.debug(command)
+
+        self.output = ProcessOutput(self.output_max_lines, self.output_file_path)
+        try:
+            exit_code = await arun_process(command, self.encoding, self._on_stdout_line, self._on_stderr_line,
+                                           timeout)
+
+            return self._process_output(exit_code)
+        finally:
+            self.output.close()
+
+    def _on_stdout_line(self, line):
+        logger.debug(line)
+        self.stdout.emit(line)
+
+    def _on_stderr_line(self, line):
+        logger.debug(line)
+        self.output.append(line)
+        self.stderr.emit(line)
+
+        if self.__done_pattern.search(line):
             self.__result = self.SUCCESS
-        
-        self._search_custom_pattern(msg_stderr)
 
-        exit_code = process.returncode
+    def _process_output(self, exit_code):
+        logger.debug("{} lines written to stderr".format(self.output.line_count))
+
+        self._search_custom_pattern(self.output.last_line())
+
         self.__result = self.SUCCESS if exit_code == 0 else self.ERROR
 
         return self.__result
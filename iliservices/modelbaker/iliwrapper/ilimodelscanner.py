@@ -0,0 +1,102 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+MAX_CACHED_FILES = 10000
+
+# MODEL header (e.g., 'CONTRACTED TYPE MODEL Name (es) AT "..." VERSION "2020-01-01" =')
+_re_model_header = re.compile(rb"\bMODEL\s+([\w-]+)([^=]*)=")
+_re_model_version = re.compile(rb'VERSION\s*"([ \w\d\._-]+)"')
+
+_scanned_files = OrderedDict()  # {(path, encoding): (mtime_ns, size, (models, encoding))}
+_scanned_files_lock = threading.Lock()
+
+
+def scan_ili_models(ilipath, encoding=None):
+    """
+    Gets the models declared in an ili file, reading only their headers.
+
+    The file is read as bytes and decoded just once (with the given encoding or else UTF-8 and, as a fallback,
+    Latin-1). Model bodies are skipped up to their 'END <model name>.' line, without being scanned. Results are
+    memoized per (path, mtime, size), so scanning an unchanged file costs a stat call.
+
+    :param ilipath: Path to the ili file.
+    :param encoding: Encoding of the file, None to detect it.
+    :return: tuple(models, encoding). models is a list of dicts with "name" and "version" keys, encoding is the
+             encoding that could decode the file ("utf-8" or "latin1" if it was detected).
+    :raises OSError: If the file cannot be read.
+    :raises UnicodeDecodeError: If the file cannot be decoded with the given encoding.
+    """
+    key = (ilipath, encoding)
+    stat = os.stat(ilipath)
+    with _scanned_files_lock:
+        cached = _scanned_files.get(key)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            _scanned_files.move_to_end(key)
+            return [dict(model) for model in cached[2][0]], cached[2][1]
+
+    with open(ilipath, "rb") as f:
+        data = f.read()
+
+    result = _scan(data, encoding)
+
+    with _scanned_files_lock:
+        _scanned_files[key] = (stat.st_mtime_ns, stat.st_size, result)
+        while len(_scanned_files) > MAX_CACHED_FILES:
+            _scanned_files.popitem(last=False)
+
+    return [dict(model) for model in result[0]], result[1]
+
+
+def clear_ili_scanner_cache():
+    with _scanned_files_lock:
+        _scanned_files.clear()
+
+
+def _scan(data, encoding=None):
+    if encoding:
+        data.decode(encoding)
+    else:
+        try:
+            data.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "latin1"
+
+    models = list()
+    pos = 0
+    while True:
+        match = _re_model_header.search(data, pos)
+        if not match:
+            break
+
+        if _is_comment(data, match.start()):
+            pos = match.end(1)
+            continue
+
+        name = match.group(1)
+        version = _re_model_version.search(match.group(2))
+        models.append({
+            "name": name.decode(encoding),
+            "version": version.group(1).decode(encoding) if version else "",
+        })
+
+        # Skip the model body
+        end = re.compile(rb"END\s+" + re.escape(name) + rb"\s*\.").search(data, match.end())
+        if not end:
+            break
+        pos = end.end()
+
+    return models, encoding
+
+
+def _is_comment(data, index):
+    """
+    :return: Whether the given position is part of a line comment ('!!') or a block comment ('/* */').
+    """
+    line_start = data.rfind(b"\n", 0, index) + 1
+    if data.find(b"!!", line_start, index) != -1:
+        return True
+
+    return data.rfind(b"/*", 0, index) > data.rfind(b"*/", 0, index)
@@ -0,0 +1,118 @@
+import asyncio
+import subprocess
+import threading
+from collections import deque
+
+DEFAULT_OUTPUT_MAX_LINES = 1000
+ASYNC_STREAM_LIMIT = 16 * 1024 * 1024  # Max. length of a single output line read by asyncio (e.g., long SQL traces)
+
+
+class ProcessOutput:
+    """
+    Keeps the last lines written by an ili2db/ilivalidator process, so that memory doesn't grow with the output size.
+
+    :param max_lines: Number of lines kept in memory.
+    :param file_path: Optional file where the whole output is written to, as it arrives.
+    """
+
+    def __init__(self, max_lines=DEFAULT_OUTPUT_MAX_LINES, file_path=None):
+        self.lines = deque(maxlen=max_lines)
+        self.line_count = 0
+        self._lock = threading.Lock()
+        self._file = open(file_path, "a", encoding="utf-8") if file_path else None
+
+    def append(self, line):
+        with self._lock:
+            self.lines.append(line)
+            self.line_count += 1
+            if self._file:
+                self._file.write(line + "\n")
+
+    def last_line(self):
+        """
+        :return: Last non-empty line or an empty string.
+        """
+        with self._lock:
+            for line in reversed(self.lines):
+                if line.strip():
+                    return line
+        return ""
+
+    def text(self):
+        with self._lock:
+            return "\n".join(self.lines)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def stream_process_output(process, encoding, on_stdout_line, on_stderr_line):
+    """
+    Reads the process stdout and stderr line by line until the process ends.
+
+    stdout is read in a helper thread so that a full pipe never blocks the process.
+
+    :param process: subprocess.Popen object created with stdout=PIPE and stderr=PIPE.
+    :param encoding: Encoding used to decode the output.
+    :param on_stdout_line: Callable receiving each decoded stdout line (without line break).
+    :param on_stderr_line: Callable receiving each decoded stderr line (without line break).
+    :return: Process exit code.
+    """
+    def read_lines(stream, on_line):
+        for line in iter(stream.readline, b""):
+            on_line(line.decode(encoding, "replace").rstrip("\r\n"))
+        stream.close()
+
+    stdout_thread = threading.Thread(target=read_lines, args=(process.stdout, on_stdout_line), daemon=True)
+    stdout_thread.start()
+
+    read_lines(process.stderr, on_stderr_line)
+    stdout_thread.join()
+
+    return process.wait()
+
+
+async def astream_process_output(process, encoding, on_stdout_line, on_stderr_line):
+    """
+    Coroutine version of *stream_process_output* for asyncio.subprocess.Process objects.
+
+    :return: Process exit code.
+    """
+    async def read_lines(stream, on_line):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            on_line(line.decode(encoding, "replace").rstrip("\r\n"))
+
+    await asyncio.gather(read_lines(process.stdout, on_stdout_line),
+                         read_lines(process.stderr, on_stderr_line))
+
+    return await process.wait()
+
+
+async def arun_process(command, encoding, on_stdout_line, on_stderr_line, timeout=None):
+    """
+    Runs a command in the running event loop, streaming its output line by line.
+
+    The process is killed if the coroutine is cancelled or if the timeout expires. In both cases, the original
+    exception (asyncio.CancelledError or asyncio.TimeoutError) is raised once the process is gone.
+
+    :param command: List with the command and its arguments.
+    :param timeout: Max. number of seconds the process can run, or None to wait until it ends.
+    :return: Process exit code.
+    """
+    process = await asyncio.create_subprocess_exec(*command,
+                                                   stdout=subprocess.PIPE,
+                                                   stderr=subprocess.PIPE,
+                                                   limit=ASYNC_STREAM_LIMIT)
+    try:
+        return await asyncio.wait_for(astream_process_output(process, encoding, on_stdout_line, on_stderr_line),
+                                      timeout)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await asyncio.shield(process.wait())
+        raise
@@ -17,6 +17,7 @@
  ***************************************************************************/
 """
 
+import asyncio
 import subprocess
 import logging
 
@@ -28,6 +29,7 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from ..ili2dbutils import get_java_path
 from .ilivalidatorutils import get_ilivalidator_bin
 from .ilivalidatorconfig import IliValidatorConfiguration
+from ..iliprocessoutput import DEFAULT_OUTPUT_MAX_LINES, ProcessOutput, arun_process, stream_process_output
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +60,10 @@ class IliValidator(QObject):
         if not self.encoding:
             self.encoding = "UTF8"
 
+        self.output_max_lines = DEFAULT_OUTPUT_MAX_LINES  # stderr lines kept in memory
+        self.output_file_path = None  # Optional file to write the whole stderr output to
+        self.output = None  # ProcessOutput of the last run
+
     def _ilivalidator_jar_arg(self):
         ilivalidator_bin = get_ilivalidator_bin()
         if not ilivalidator_bin:
@@ -100,31 +106,62 @@ class IliValidator(QObject):
         return [java_path] + ilivalidator_jar_arg + args
 
     def run(self):
-        """Executes the configured command asynchronously."""
+        """Executes the configured command, streaming its output line by line."""
         command = self._prepare_command()
         self.__result = self.ERROR
 
         logger.debug(command)
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
 
-        msg_stdout = stdout.decode(self.encoding)
-        msg_stderr = stderr.decode(self.encoding)
+        self.output = ProcessOutput(self.output_max_lines, self.output_file_path)
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            exit_code = stream_process_output(process, self.encoding, self._on_stdout_line, self._on_stderr_line)
+        finally:
+            self.output.close()
+
+        return self._process_output(exit_code)
+
+    async def arun(self, timeout=None):
+        """Coroutine version of *run*.
+
+        :param timeout: Max. number of seconds the command can run, or None to wait until it ends.
+        :raises asyncio.TimeoutError: If the timeout expired. The java process is killed before raising (the same
+                                      happens if the coroutine is cancelled).
+        """
+        # Finding java and the jar might download the latter, keep the event loop free meanwhile
+        command = await asyncio.get_running_loop().run_in_executor(None, self._prepare_command)
+        self.__result = self.ERROR
+
+        logger.debug(command)
+
+        self.output = ProcessOutput(self.output_max_lines, self.output_file_path)
+        try:
+            exit_code = await arun_process(command, self.encoding, self._on_stdout_line, self._on_stderr_line,
+                                           timeout)
+        finally:
+            self.output.close()
 
-        logger.debug('stdout')
-        logger.debug(msg_stdout)
+        return self._process_output(exit_code)
 
-        logger.debug('stderr')
-        logger.debug(msg_stderr)
+    def _process_output(self, exit_code):
+        logger.debug("{} lines written to stderr".format(self.output.line_count))
 
-        if msg_stderr.strip().endswith(self.__done_with_validation_errors):
+        if self.output.last_line().strip().endswith(self.__done_with_validation_errors):
             self.__result = self.ERROR
             return self.__result
 
-        if self.__done_pattern.search(msg_stderr):
-            self.__result = self.SUCCESS
-
-        exit_code = process.returncode
         self.__result = self.SUCCESS if exit_code == 0 else self.ERROR
 
         return self.__result
+
+    def _on_stdout_line(self, line):
+        logger.debug(line)
+        self.stdout.emit(line)
+
+    def _on_stderr_line(self, line):
+        logger.debug(line)
+        self.output.append(line)
+        self.stderr.emit(line)
+
+        if self.__done_pattern.search(line):
+            self.__result = self.SUCCESS
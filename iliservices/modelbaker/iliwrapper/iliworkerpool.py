@@ -0,0 +1,339 @@
+import atexit
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WORKER_CLASS_NAME = "IliWorker"
+READY_MARKER = "@@ILIWORKER_READY@@"
+DONE_MARKER = "@@ILIWORKER_DONE@@"
+ARGS_SEPARATOR = "\x1f"
+WORKER_ENCODING = "utf-8"  # Used by the launcher for its stdin, stdout and stderr, whatever the platform encoding is
+
+
+# Compiled launcher, out of the package dir (which might be read-only or shared among users)
+WORKER_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".ilicache", "iliworker")
+
+_java_major_versions = dict()  # {java_path: major version or None}
+_java_major_versions_lock = threading.Lock()
+
+
+def get_worker_classpath(java_path):
+    """
+    Finds the IliWorker launcher class or compiles it (only if needed) into WORKER_CACHE_PATH.
+
+    A class file shipped next to the source (java/IliWorker.class) is used as is, so that javac is only needed at
+    runtime if the package comes without it.
+
+    :param java_path: Path to the java executable. The javac found next to it (or in the PATH) is used.
+    :return: Classpath directory or None if the launcher could not be compiled.
+    """
+    source_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "java")
+    source_file = os.path.join(source_dir, "{}.java".format(WORKER_CLASS_NAME))
+    class_file_name = "{}.class".format(WORKER_CLASS_NAME)
+
+    for classpath in [source_dir, WORKER_CACHE_PATH]:
+        class_file = os.path.join(classpath, class_file_name)
+        if os.path.isfile(class_file) and os.path.getmtime(class_file) >= os.path.getmtime(source_file):
+            return classpath
+
+    java_dir = os.path.dirname(java_path) if java_path else ""
+    javac_path = os.path.join(java_dir, "javac") if java_dir else "javac"
+
+    # Compile into a temporary dir, so that concurrent processes never load a half-written class file
+    try:
+        os.makedirs(WORKER_CACHE_PATH, exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=WORKER_CACHE_PATH, prefix="build.")
+    except OSError as e:
+        logger.warning("Could not compile the ili2db worker launcher: {}".format(e))
+        return None
+
+    try:
+        try:
+            process = subprocess.Popen([javac_path, "-source", "8", "-target", "8", "-d", build_dir, source_file],
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+        except OSError as e:
+            logger.warning("Could not compile the ili2db worker launcher: {}".format(e))
+            return None
+
+        if process.returncode != 0 or not os.path.isfile(os.path.join(build_dir, class_file_name)):
+            logger.warning("Could not compile the ili2db worker launcher: {}".format(stderr.decode("utf-8", "replace")))
+            return None
+
+        os.replace(os.path.join(build_dir, class_file_name), os.path.join(WORKER_CACHE_PATH, class_file_name))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    return WORKER_CACHE_PATH
+
+
+def get_java_major_version(java_path):
+    """
+    :return: Major version of the given java (e.g., 8 for 1.8.0_392, 21 for 21.0.1) or None if it can't be found out.
+             Each java path is asked only once per process.
+    """
+    with _java_major_versions_lock:
+        if java_path in _java_major_versions:
+            return _java_major_versions[java_path]
+
+    major_version = None
+    try:
+        process = subprocess.Popen([java_path, "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        match = re.search(r'version "(?:1\.)?(\d+)', stderr.decode("utf-8", "replace"))
+        if match:
+            major_version = int(match.group(1))
+    except OSError:
+        pass
+
+    with _java_major_versions_lock:
+        _java_major_versions[java_path] = major_version
+    return major_version
+
+
+def get_worker_jvm_options(java_path):
+    """
+    :return: JVM options the worker needs on top of the ones of the ili2db command.
+    """
+    # IliWorker traps System.exit() with a SecurityManager, which Java 18+ only allows if explicitly enabled.
+    # The 'allow' value is known since Java 12, older versions would take it as a SecurityManager class name.
+    major_version = get_java_major_version(java_path)
+    if major_version is None or major_version >= 12:
+        return ["-Djava.security.manager=allow"]
+    return list()
+
+
+def split_java_command(command):
+    """
+    Splits a 'java [JVM options] -jar <jar> [args]' command.
+
+    :return: tuple(java_path, jvm_options, jar, args) or None if the command doesn't run a jar (e.g., an error code,
+             a command with -cp and a main class, or a '-jar' without jar).
+    """
+    if not isinstance(command, (list, tuple)) or len(command) < 3:
+        return None
+
+    java_path = command[0]
+    jvm_options = list()
+    for i, arg in enumerate(command[1:], 1):
+        if arg == "-jar":
+            if i + 1 >= len(command):
+                return None
+            return java_path, jvm_options, command[i + 1], list(command[i + 2:])
+        if not arg.startswith("-") or arg in ("-cp", "-classpath", "--class-path"):
+            return None  # A main class (not a jar) is run
+        jvm_options.append(arg)
+
+    return None
+
+
+class IliWorker:
+    """
+    A long-lived JVM that keeps an ili2db jar loaded and runs jobs sent through its stdin.
+    """
+
+    def __init__(self, java_path, classpath, jar, jvm_options=list()):
+        self.key = IliWorkerPool.worker_key(java_path, jar, jvm_options)
+        self.jar = jar
+        self.jobs = 0
+        self.last_used = time.monotonic()
+        command = [java_path] + list(jvm_options) + get_worker_jvm_options(java_path)
+        self.process = subprocess.Popen(command + ["-cp", classpath, WORKER_CLASS_NAME, jar],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE)
+
+        # The JVM might print some lines (e.g., 'Picked up JAVA_TOOL_OPTIONS') before being ready
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                stderr = self.process.stderr.read().decode(WORKER_ENCODING, "replace")
+                self.close()
+                raise RuntimeError("ili2db worker could not be started: {}".format(stderr))
+            if line.decode(WORKER_ENCODING, "replace").strip() == READY_MARKER:
+                break
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def execute(self, args, on_line):
+        """
+        Runs a single ili2db job.
+
+        :param args: List of ili2db arguments (without java and -jar).
+        :param on_line: Callable receiving each output line of the job, as it arrives.
+        :return: Exit code or None if the worker died while running the job.
+        """
+        try:
+            self.process.stdin.write((ARGS_SEPARATOR.join(args) + "\n").encode(WORKER_ENCODING))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            return None
+
+        while True:
+            line = self.process.stderr.readline()
+            if not line:
+                return None
+
+            text = line.decode(WORKER_ENCODING, "replace").rstrip("\r\n")
+            if text.startswith(DONE_MARKER):
+                self.jobs += 1
+                self.last_used = time.monotonic()
+                try:
+                    return int(text[len(DONE_MARKER):].strip())
+                except ValueError:
+                    return 1
+
+            on_line(text)
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+class IliWorkerPool:
+    """
+    Pool of warm ili2db JVMs, grouped by java, JVM options and ili2db jar (e.g., ili2pg and ili2gpkg have their own
+    workers).
+
+    :param size: Maximum number of workers per group.
+    :param max_jobs_per_worker: Recycle a worker (i.e., start a fresh JVM) after running this number of jobs.
+    :param max_idle_time: Seconds an idle worker is kept alive before it is shut down.
+    """
+
+    def __init__(self, size=2, max_jobs_per_worker=25, max_idle_time=300):
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_idle_time = max_idle_time
+
+        self._idle_workers = dict()  # {worker key: [IliWorker, ...]}
+        self._worker_count = dict()  # {worker key: number of started workers}
+        self._condition = threading.Condition()
+        self._classpath = None
+        self._unavailable = False
+
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def worker_key(java_path, jar, jvm_options):
+        return java_path, tuple(jvm_options), jar
+
+    def execute_command(self, command, on_line=lambda line: None):
+        """
+        Runs a 'java [JVM options] -jar <ili2db jar> [args]' command in a warm worker.
+
+        :return: Exit code or None if the pool cannot serve the command (see execute).
+        """
+        java_command = split_java_command(command)
+        if java_command is None:
+            return None
+
+        java_path, jvm_options, jar, args = java_command
+        return self.execute(java_path, jar, args, on_line, jvm_options)
+
+    def execute(self, java_path, jar, args, on_line=lambda line: None, jvm_options=list()):
+        """
+        Runs an ili2db job in a warm worker.
+
+        :param on_line: Callable receiving each output line of the job, as it arrives.
+        :param jvm_options: JVM options of the ili2db command (e.g., -Xmx2g), the worker JVM is started with them.
+        :return: Exit code or None if the pool cannot serve the job. In that case, the caller should fall back to a
+                 regular ili2db subprocess.
+        """
+        worker = self._checkout(java_path, jar, jvm_options)
+        if worker is None:
+            return None
+
+        try:
+            exit_code = worker.execute(args, on_line)
+        except Exception:
+            worker.close()  # The job output is only partially read, the worker can't be reused
+            self._checkin(worker)
+            raise
+        self._checkin(worker)
+
+        if exit_code is None:
+            logger.warning("The ili2db worker died while running a job, it will be replaced.")
+            exit_code = 1
+
+        return exit_code
+
+    def shutdown(self):
+        with self._condition:
+            for key, workers in self._idle_workers.items():
+                for worker in workers:
+                    worker.close()
+                    self._worker_count[key] -= 1
+            self._idle_workers.clear()
+            self._condition.notify_all()
+
+    def _checkout(self, java_path, jar, jvm_options):
+        key = self.worker_key(java_path, jar, jvm_options)
+        with self._condition:
+            if self._unavailable:
+                return None
+
+            if self._classpath is None:
+                self._classpath = get_worker_classpath(java_path)
+                if self._classpath is None:
+                    self._unavailable = True
+                    return None
+
+            while True:
+                self._evict_idle_workers()
+
+                idle_workers = self._idle_workers.get(key, list())
+                while idle_workers:
+                    worker = idle_workers.pop()
+                    if worker.is_alive():
+                        return worker
+                    self._worker_count[key] -= 1
+
+                if self._worker_count.get(key, 0) < self.size:
+                    self._worker_count[key] = self._worker_count.get(key, 0) + 1
+                    break
+
+                self._condition.wait()
+
+        # Start the JVM out of the lock, it takes a while
+        try:
+            return IliWorker(java_path, self._classpath, jar, jvm_options)
+        except (RuntimeError, OSError) as e:
+            logger.warning("{} Falling back to regular ili2db processes.".format(e))
+            with self._condition:
+                self._worker_count[key] -= 1
+                self._unavailable = True
+                self._condition.notify_all()
+            return None
+
+    def _checkin(self, worker):
+        with self._condition:
+            if not worker.is_alive() or worker.jobs >= self.max_jobs_per_worker:
+                worker.close()
+                self._worker_count[worker.key] -= 1
+            else:
+                self._idle_workers.setdefault(worker.key, list()).append(worker)
+            self._condition.notify()
+
+    def _evict_idle_workers(self):
+        now = time.monotonic()
+        for key, workers in self._idle_workers.items():
+            for worker in [w for w in workers if now - w.last_used > self.max_idle_time]:
+                workers.remove(worker)
+                worker.close()
+                self._worker_count[key] -= 1
@@ -0,0 +1,126 @@
+/*
+ * Long-lived launcher for ili2db jars (see iliworkerpool.py).
+ *
+ * Usage: java -Djava.security.manager=allow -cp <dir> IliWorker <ili2db.jar>
+ * (the -D option is needed on Java 18+ and must be left out on Java 8-11)
+ *
+ * The jar is loaded once. Each line read from stdin is a job: the ili2db
+ * arguments separated by the ASCII unit separator (0x1F). The job output is
+ * written to stderr (stdout is redirected there as well) and every job is
+ * terminated by a line "@@ILIWORKER_DONE@@ <exit code>". System.exit() calls
+ * issued by ili2db are trapped and reported as the job exit code.
+ *
+ * Keep this file compatible with Java 8.
+ */
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.security.Permission;
+import java.util.jar.JarFile;
+
+public class IliWorker {
+    private static final String READY_MARKER = "@@ILIWORKER_READY@@";
+    private static final String DONE_MARKER = "@@ILIWORKER_DONE@@";
+    private static final String ARGS_SEPARATOR = "\u001f";
+
+    private static volatile Integer exitStatus = null;
+
+    private static class ExitTrappedException extends SecurityException {
+        ExitTrappedException(int status) {
+            super("System.exit(" + status + ") trapped by IliWorker");
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.err), true, "UTF-8");
+        System.setOut(out);
+        System.setErr(out);
+
+        if (args.length != 1) {
+            out.println("Usage: IliWorker <ili2db.jar>");
+            Runtime.getRuntime().halt(2);
+        }
+
+        String mainClassName;
+        JarFile jarFile = new JarFile(args[0]);
+        try {
+            mainClassName = jarFile.getManifest().getMainAttributes().getValue("Main-Class");
+        } finally {
+            jarFile.close();
+        }
+
+        // The manifest Class-Path (ili2db's libs/ folder) is resolved by URLClassLoader
+        URLClassLoader loader = new URLClassLoader(new URL[] {new File(args[0]).toURI().toURL()},
+                IliWorker.class.getClassLoader());
+        Thread.currentThread().setContextClassLoader(loader);
+        Method mainMethod = Class.forName(mainClassName, true, loader).getMethod("main", String[].class);
+
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkPermission(Permission perm) {
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                }
+
+                @Override
+                public void checkExit(int status) {
+                    exitStatus = status;
+                    throw new ExitTrappedException(status);
+                }
+            });
+        } catch (UnsupportedOperationException e) {
+            // Java 18+ without -Djava.security.manager=allow: we can't trap System.exit()
+            out.println("IliWorker: " + e.getMessage());
+            Runtime.getRuntime().halt(3);
+        }
+
+        // Use the real stdout only to announce we are ready to take jobs
+        PrintStream realStdout = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        realStdout.println(READY_MARKER);
+        realStdout.flush();
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, "UTF-8"));
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.isEmpty()) {
+                continue;
+            }
+
+            String[] jobArgs = line.split(ARGS_SEPARATOR, -1);
+            exitStatus = null;
+            int status = 0;
+            try {
+                mainMethod.invoke(null, (Object) jobArgs);
+            } catch (InvocationTargetException e) {
+                if (!(e.getCause() instanceof ExitTrappedException)) {
+                    e.getCause().printStackTrace(out);
+                    status = 1;
+                }
+            } catch (Throwable e) {
+                e.printStackTrace(out);
+                status = 1;
+            }
+
+            // ili2db might swallow our exception, so rely on the recorded status
+            if (exitStatus != null) {
+                status = exitStatus;
+            }
+
+            out.flush();
+            out.println(DONE_MARKER + " " + status);
+            out.flush();
+        }
+
+        Runtime.getRuntime().halt(0);
+    }
+}
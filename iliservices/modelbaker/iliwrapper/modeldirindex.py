@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .ilimodelscanner import scan_ili_models
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~/.ilicache"), "modeldirindex.json")
+DEFAULT_REFRESH_INTERVAL = 10  # Seconds during which a model tree is not checked for changes again
+INDEX_FORMAT_VERSION = 1
+
+
+class ModelDirectoryIndex:
+    """
+    Index of the directories of a model tree that contain .ili files, along with the models each file declares.
+
+    The index is persisted as JSON and refreshed incrementally: only directories whose mtime changed are listed
+    again, and only .ili files whose mtime or size changed are parsed again.
+
+    :param index_path: JSON file where the index is persisted. None to keep it only in memory.
+    :param refresh_interval: Seconds during which a model tree is served from the index without checking it for
+                             changes (i.e., without any file system access).
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.index_path = index_path
+        self.refresh_interval = refresh_interval
+
+        # {directory: {"mtime": int, "subdirs": [name, ...], "ili_files": {name: {"mtime", "size", "models"}}}}
+        self._directories = None
+        self._last_refresh = dict()  # {root: time.monotonic()}
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def get_model_directories(self, root, force_refresh=False):
+        """
+        :param root: Root of the model tree.
+        :param force_refresh: Check the model tree for changes, even if it was checked recently.
+        :return: List of directories under root (root included) that contain at least one .ili file, in top-down
+                 order.
+        """
+        with self._lock:
+            self._refresh(root, force_refresh)
+            return [directory for directory in self._walk(root) if self._directories[directory]["ili_files"]]
+
+    def get_models(self, root, force_refresh=False):
+        """
+        :param root: Root of the model tree.
+        :param force_refresh: Check the model tree for changes, even if it was checked recently.
+        :return: Dict {ili file path: [model names declared in the file]}
+        """
+        models = dict()
+        with self._lock:
+            self._refresh(root, force_refresh)
+            for directory in self._walk(root):
+                for file_name, ili_file in self._directories[directory]["ili_files"].items():
+                    file_path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        continue
+
+                    if ili_file["models"] is None or (ili_file["mtime"], ili_file["size"]) != (stat.st_mtime_ns,
+                                                                                             stat.st_size):
+                        ili_file.update({"mtime": stat.st_mtime_ns,
+                                         "size": stat.st_size,
+                                         "models": read_ili_model_names(file_path)})
+                        self._dirty = True
+
+                    models[file_path] = list(ili_file["models"])
+
+            self._save()
+
+        return models
+
+    def invalidate(self, root=None):
+        """
+        Forces the next call to check the given model tree (or all of them if root is None) for changes.
+        """
+        with self._lock:
+            if root is None:
+                self._last_refresh.clear()
+            else:
+                self._last_refresh.pop(os.path.normpath(root), None)
+
+    def _refresh(self, root, force_refresh):
+        self._load()
+
+        root = os.path.normpath(root)
+        last_refresh = self._last_refresh.get(root)
+        if not force_refresh and last_refresh is not None and \
+                time.monotonic() - last_refresh < self.refresh_interval:
+            return
+
+        visited = set()
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            visited.add(directory)
+
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                visited.discard(directory)
+                continue
+
+            entry = self._directories.get(directory)
+            if entry is None or entry["mtime"] != mtime:
+                entry = self._scan_directory(directory, mtime, entry)
+                if entry is None:
+                    visited.discard(directory)
+                    continue
+                self._directories[directory] = entry
+                self._dirty = True
+
+            # Like os.walk, don't follow symlinks to directories
+            stack.extend(reversed([os.path.join(directory, subdir) for subdir in entry["subdirs"]]))
+
+        # Forget directories that are gone
+        root_prefix = root.rstrip(os.sep) + os.sep
+        for directory in list(self._directories):
+            if directory not in visited and (directory == root or directory.startswith(root_prefix)):
+                del self._directories[directory]
+                self._dirty = True
+
+        self._last_refresh[root] = time.monotonic()
+        self._save()
+
+    @staticmethod
+    def _scan_directory(directory, mtime, previous_entry):
+        previous_ili_files = previous_entry["ili_files"] if previous_entry else dict()
+        subdirs = list()
+        ili_files = dict()
+        try:
+            with os.scandir(directory) as entries:
+                for dir_entry in entries:
+                    if dir_entry.is_dir():
+                        if not dir_entry.is_symlink():
+                            subdirs.append(dir_entry.name)
+                    elif dir_entry.name.endswith(".ili") and not dir_entry.name.startswith("."):  # As with glob
+                        # Parsed lazily, keep what we already know about it
+                        ili_files[dir_entry.name] = previous_ili_files.get(dir_entry.name,
+                                                                           {"mtime": None,
+                                                                            "size": None,
+                                                                            "models": None})
+        except OSError as e:
+            logger.debug("Could not list model directory '{}': {}".format(directory, e))
+            return None
+
+        return {"mtime": mtime, "subdirs": sorted(subdirs), "ili_files": ili_files}
+
+    def _walk(self, root):
+        root = os.path.normpath(root)
+        stack = [root] if root in self._directories else list()
+        while stack:
+            directory = stack.pop()
+            entry = self._directories.get(directory)
+            if entry is None:
+                continue
+
+            yield directory
+            stack.extend(reversed([os.path.join(directory, subdir) for subdir in entry["subdirs"]]))
+
+    def _load(self):
+        if self._directories is not None:
+            return
+
+        self._directories = dict()
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_FORMAT_VERSION:
+                self._directories = data["directories"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("The model directory index '{}' could not be read, it'll be rebuilt: {}".format(
+                self.index_path, e))
+
+    def _save(self):
+        if not self._dirty or not self.index_path:
+            return
+
+        try:
+            index_dir = os.path.dirname(self.index_path)
+            os.makedirs(index_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_FORMAT_VERSION, "directories": self._directories}, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning("The model directory index '{}' could not be written: {}".format(self.index_path, e))
+
+
+def read_ili_model_names(ilipath):
+    """
+    :return: List of model names declared in an ili file.
+    """
+    try:
+        models, encoding = scan_ili_models(ilipath)
+    except OSError as e:
+        logger.debug("Could not read ili file '{}': {}".format(ilipath, e))
+        return list()
+
+    return [model["name"] for model in models]
+
+
+_model_directory_index = None
+_model_directory_index_lock = threading.Lock()
+
+
+def get_model_directory_index():
+    """
+    :return: ModelDirectoryIndex shared by the whole process (e.g., by the ili2db and ilivalidator argument builders).
+    """
+    global _model_directory_index
+    with _model_directory_index_lock:
+        if _model_directory_index is None:
+            _model_directory_index = ModelDirectoryIndex()
+
+    return _model_directory_index
@@ -16,7 +16,7 @@
  *                                                                         *
  ***************************************************************************/
 """
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class DbActionType(Enum):
@@ -33,3 +33,12 @@ class OptimizeStrategy(Enum):
     NONE = 0
     GROUP = 1
     HIDE = 2
+
+
+class MessageLevel(IntEnum):
+    """Defines message levels with the values of Qgis.MessageLevel, for code that must run without QGIS."""
+
+    INFO = 0
+    WARNING = 1
+    CRITICAL = 2
+    SUCCESS = 3
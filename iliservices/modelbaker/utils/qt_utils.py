@@ -17,13 +17,17 @@
 """
 
 import fnmatch
+import json
 import os.path
 import re
+import tempfile
+import threading
 import unicodedata
 from abc import ABCMeta
 from functools import partial
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
 from PyQt5.QtCore import (
@@ -142,6 +146,37 @@ class NetworkError(RuntimeError):
 
 replies = list()
 
+DOWNLOAD_POOL_SIZE = 16  # Max. number of pooled connections per host
+DOWNLOAD_TIMEOUT = 60  # Seconds to wait when connecting and between two reads
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+UNKNOWN_LENGTH_CHUNK_SIZE = 256 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the requests.Session shared by all downloads, so that connections are pooled and reused.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=DOWNLOAD_POOL_SIZE, pool_maxsize=DOWNLOAD_POOL_SIZE)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
+
+
+def _get_chunk_size(total_length):
+    if not total_length:
+        return UNKNOWN_LENGTH_CHUNK_SIZE
+
+    # Around 100 progress reports per file, within reasonable limits
+    return min(max(total_length // 100, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
 
 def download_file(url, filename, on_progress=None, on_finished=None, on_error=None, on_success=None):
     """
@@ -149,38 +184,48 @@ def download_file(url, filename, on_progress=None, on_finished=None, on_error=No
     The method will only return once it's finished.
 
     While downloading it will repeatedly report progress by calling on_progress
-    with two parameters bytes_received and bytes_total.
+    with two parameters bytes_received and bytes_total (None if the server doesn't tell it).
+
+    The content is written to filename + ".part" and renamed to filename once complete. If a previous download of
+    the same file was interrupted, it's resumed (HTTP Range request) as long as the file didn't change on the server.
 
-    If an error occurs, it raises a NetworkError exception.
+    If an error occurs, it calls on_error with two parameters error_code and error_string and raises a NetworkError
+    exception.
 
     It will return the filename if everything was ok.
     """
+    part_filename = filename + ".part"
+    part_info_filename = part_filename + ".json"  # ETag/Last-Modified of the partial download
 
     try:
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            total_length = r.headers.get('content-length')
-
-            with open(filename, 'wb') as f:
-                bytes_received = 0
-                if total_length is None:  # no content length header
-                    f.write(r.content)
-                else:
-                    total_length = int(total_length)
-                    for chunk in r.iter_content(chunk_size=4096):
-                        if chunk:  # filter out keep-alive new chunks
-                            f.write(chunk)
-                            bytes_received += len(chunk)
-                            if on_progress:
-                                on_progress(bytes_received, total_length)
+        download = _download_part(url, part_filename, part_info_filename, on_progress)
+        if download is None:
+            # Stale partial file, start again
+            os.remove(part_filename)
+            download = _download_part(url, part_filename, part_info_filename, on_progress)
+            if download is None:
+                raise RequestException("The server could not satisfy the download request")
+
+        bytes_received, total_length = download
+        if total_length is not None and bytes_received < total_length:
+            raise RequestException(
+                "Incomplete download ({} of {} bytes)".format(bytes_received, total_length)
+            )
 
-        if on_success:
-            on_success()
+        os.replace(part_filename, filename)
+        if os.path.isfile(part_info_filename):
+            os.remove(part_info_filename)
 
-    except RequestException as e:
+    except (RequestException, OSError) as e:
+        response = getattr(e, "response", None)
+        error_code = response.status_code if response is not None else 0
         if on_error:
-            on_error(str(e))
-        raise  # Optionally re-raise the exception after handling it
+            on_error(error_code, str(e))
+        raise NetworkError(error_code, str(e)) from e
+
+    else:
+        if on_success:
+            on_success()
 
     finally:
         if on_finished:
@@ -189,6 +234,107 @@ def download_file(url, filename, on_progress=None, on_finished=None, on_error=No
     return filename
 
 
+def _download_part(url, part_filename, part_info_filename, on_progress):
+    """
+    Downloads url into part_filename, resuming a previous partial download if possible.
+
+    :return: tuple(bytes_received, total_length) or None if the partial file doesn't match the file on the server.
+    """
+    # Content-Length and Range offsets refer to the bytes written to the file, so they must not be compressed
+    headers = {"Accept-Encoding": "identity"}
+    bytes_received = os.path.getsize(part_filename) if os.path.isfile(part_filename) else 0
+    if bytes_received:
+        validator = _read_part_validator(part_info_filename)
+        if validator:
+            headers["Range"] = "bytes={}-".format(bytes_received)
+            headers["If-Range"] = validator
+        else:
+            bytes_received = 0
+
+    with get_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+        if r.status_code == requests.codes.requested_range_not_satisfiable:
+            return None
+
+        r.raise_for_status()
+
+        resumed = r.status_code == requests.codes.partial_content
+        if not resumed:
+            bytes_received = 0
+            _write_part_validator(part_info_filename, r.headers.get("ETag") or r.headers.get("Last-Modified"))
+
+        total_length = r.headers.get("content-length")
+        total_length = int(total_length) + bytes_received if total_length is not None else None
+
+        with open(part_filename, "ab" if resumed else "wb") as f:
+            for chunk in r.iter_content(chunk_size=_get_chunk_size(total_length)):
+                if chunk:  # filter out keep-alive new chunks
+                    f.write(chunk)
+                    bytes_received += len(chunk)
+                    if on_progress:
+                        on_progress(bytes_received, total_length)
+
+    return bytes_received, total_length
+
+
+def _read_part_validator(part_info_filename):
+    try:
+        with open(part_info_filename, encoding="utf-8") as f:
+            return json.load(f).get("validator")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_part_validator(part_info_filename, validator):
+    if validator:
+        with open(part_info_filename, "w", encoding="utf-8") as f:
+            json.dump({"validator": validator}, f)
+    elif os.path.isfile(part_info_filename):
+        os.remove(part_info_filename)  # Without validator, a partial download can't be resumed safely
+
+
+def download_file_if_modified(url, filename, etag=None, last_modified=None, timeout=None):
+    """
+    Will download the file from url to a local filename, but only if it changed since it was downloaded with the
+    given etag and/or last_modified values (conditional request). The method will only return once it's finished.
+    timeout (seconds) applies to connecting and to each read from the server.
+
+    The content is written to a temporary file (unique, so that concurrent downloads to the same filename don't
+    interfere) and the local file is replaced only once the download is complete.
+
+    If an error occurs, it raises a RequestException.
+
+    It will return a tuple (modified, etag, last_modified) with the values to pass in the next call.
+    """
+    headers = dict()
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    with get_session().get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == requests.codes.not_modified:
+            return False, etag, last_modified
+
+        r.raise_for_status()
+
+        total_length = r.headers.get("content-length")
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(filename)), prefix=os.path.basename(filename) + ".", suffix=".part"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in r.iter_content(chunk_size=_get_chunk_size(int(total_length) if total_length else None)):
+                    if chunk:  # filter out keep-alive new chunks
+                        f.write(chunk)
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        return True, r.headers.get("ETag"), r.headers.get("Last-Modified")
+
+
 class Validators(QObject):
     def validate_line_edits(self, *args, **kwargs):
         """
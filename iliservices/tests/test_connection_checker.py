@@ -0,0 +1,61 @@
+import nose2
+import unittest
+import time
+from unittest import mock
+
+from .test_pg_connection_pool import FakeConnection, FakeCursor
+from ..config.enums import (EnumTestLevel,
+                            EnumUserLevel)
+from ..db import (connection_checker,
+                 pg_connection_pool)
+from ..db.pg_connection_pool import close_pg_connection_pools
+from ..db.pg_connector import PGConnector
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class SlowCursor(FakeCursor):
+    """
+    Takes a while per query, so that the checks overlap.
+    """
+
+    def execute(self, query, *args):
+        time.sleep(0.02)
+        super().execute(query, *args)
+
+
+class SlowConnection(FakeConnection):
+    def cursor(self, *args, **kwargs):
+        return SlowCursor(self)
+
+
+class TestConnectionChecker(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(pg_connection_pool.psycopg2, 'connect', side_effect=SlowConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pg_connection_pools)
+
+    def test_many_schemas_of_one_database(self):
+        dbs = list()
+        for i in range(pg_connection_pool.PG_POOL_MAX_SIZE * 2):
+            dbs.append(PGConnector(None, conn_dict={'host': 'localhost', 'port': '5432', 'database': 'fake',
+                                                    'username': 'user', 'password': 'pass',
+                                                    'schema': 'schema_{}'.format(i)}))
+
+        results, elapsed_time = connection_checker.test_connections(dbs, EnumTestLevel.DB_SCHEMA,
+                                                                    EnumUserLevel.CREATE, max_workers=len(dbs))
+
+        self.assertEqual([result['db'] for result in results], dbs)
+        for result in results:
+            self.assertTrue(result['res'], result['msg'])
+            self.assertEqual(list(result['stages']), ['db', 'schema'])
+        # Checks never wait for the pool (its checkout timeout is way longer)
+        self.assertLess(elapsed_time, 5)
+        self.assertLess(self.connect.call_count, pg_connection_pool.PG_POOL_MAX_SIZE)
+
+
+if __name__ == '__main__':
+    nose2.main()
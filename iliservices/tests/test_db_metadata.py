@@ -0,0 +1,129 @@
+import nose2
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from .utils import get_gpkg_conn_from_path
+
+from ..config.general_config import DB_METADATA_SNAPSHOT_TTL
+from ..db.db_metadata import invalidate_metadata_snapshots
+from ..db.gpkg_connector import GPKGConnector
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TestDBMetadataSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.gpkg_path = os.path.join(self.base_dir, 'cadastre.gpkg')
+        self.execute("CREATE TABLE parcel (t_id INTEGER PRIMARY KEY)")
+
+        invalidate_metadata_snapshots()
+        self.addCleanup(invalidate_metadata_snapshots)
+
+        read_metadata_snapshot = GPKGConnector._read_metadata_snapshot
+        self.reads = list()
+
+        def read(db):
+            self.reads.append(db)
+            return read_metadata_snapshot(db)
+
+        patcher = mock.patch.object(GPKGConnector, '_read_metadata_snapshot', autospec=True, side_effect=read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def execute(self, *queries):
+        conn = sqlite3.connect(self.gpkg_path)
+        for query in queries:
+            conn.execute(query)
+        conn.commit()
+        conn.close()
+
+    def create_ili2db_tables(self):
+        self.execute("CREATE TABLE t_ili2db_table_prop (tablename TEXT, tag TEXT, setting TEXT)",
+                     "CREATE TABLE t_ili2db_model (filename TEXT, iliversion TEXT, modelname TEXT, content TEXT)",
+                     "CREATE TABLE t_ili2db_trafo (iliname TEXT, tag TEXT, setting TEXT)",
+                     "CREATE TABLE t_ili2db_settings (tag TEXT PRIMARY KEY, setting TEXT)",
+                     "CREATE TABLE t_ili2db_attrname (iliname TEXT, sqlname TEXT, colowner TEXT, target TEXT)",
+                     "INSERT INTO t_ili2db_model VALUES ('Cadastre.ili', '2.3', 'Cadastre', '')",
+                     "INSERT INTO t_ili2db_trafo VALUES ('Cadastre.Parcels.Parcel', 'ch.ehi.ili2db.inheritance', "
+                     "'newClass')")
+
+    def get_connector(self):
+        db = get_gpkg_conn_from_path(self.gpkg_path)
+        self.addCleanup(db.close_connection)
+        return db
+
+    def test_cached_snapshot(self):
+        self.create_ili2db_tables()
+        db = self.get_connector()
+
+        self.assertTrue(db._metadata_exists())
+        self.assertEqual(['Cadastre'], db.get_models())
+        self.assertFalse(db.has_basket_col())
+        self.assertEqual(4, db.get_ili2db_version())
+        self.assertEqual(1, len(self.reads))
+
+        # Hit, shared by all connectors to the same file
+        self.assertEqual(['Cadastre'], self.get_connector().get_models())
+        self.assertEqual(1, len(self.reads))
+
+        # Without invalidation, changes are not seen until the snapshot expires
+        self.execute("INSERT INTO t_ili2db_settings VALUES ('ch.ehi.ili2db.BasketHandling', 'readWrite')")
+        self.assertFalse(db.has_basket_col())
+        db.get_metadata_snapshot().loaded_at -= DB_METADATA_SNAPSHOT_TTL + 1
+        self.assertTrue(db.has_basket_col())
+        self.assertEqual(2, len(self.reads))
+
+    def test_invalidated_snapshot(self):
+        self.create_ili2db_tables()
+        db = self.get_connector()
+        other_db = self.get_connector()
+        self.assertEqual(['Cadastre'], db.get_models())
+
+        # E.g., after a schema import, done by any of the connectors
+        self.execute("INSERT INTO t_ili2db_model VALUES ('Buildings.ili', '2.3', 'Buildings', '')",
+                     "INSERT INTO t_ili2db_trafo VALUES ('Buildings.Buildings.Building', 'ch.ehi.ili2db.inheritance', "
+                     "'newClass')")
+        self.assertEqual(['Cadastre'], db.get_models())
+        other_db.invalidate_metadata_snapshot()
+        self.assertEqual(['Buildings', 'Cadastre'], sorted(db.get_models()))
+        self.assertEqual(2, len(self.reads))
+
+        # Forced refresh
+        self.execute("ALTER TABLE t_ili2db_attrname RENAME COLUMN colowner TO owner")
+        self.assertEqual(4, db.get_ili2db_version())
+        self.assertEqual(3, db.get_metadata_snapshot(refresh=True).ili2db_version)
+        self.assertEqual(3, db.get_ili2db_version())
+
+    def test_snapshot_by_file(self):
+        self.create_ili2db_tables()
+        self.get_connector().get_models()
+
+        other_path = os.path.join(self.base_dir, 'other.gpkg')
+        shutil.copyfile(self.gpkg_path, other_path)
+        db = get_gpkg_conn_from_path(other_path)
+        self.addCleanup(db.close_connection)
+        self.assertEqual(['Cadastre'], db.get_models())
+        self.assertEqual(2, len(self.reads))
+
+    def test_not_interlis_yet(self):
+        db = self.get_connector()
+        self.assertFalse(db._metadata_exists())
+        self.assertEqual([], db.get_models())
+
+        # Not cached, a schema import might be on the way
+        self.create_ili2db_tables()
+        self.assertTrue(db._metadata_exists())
+        self.assertEqual(['Cadastre'], db.get_models())
+        self.assertEqual(3, len(self.reads))
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,146 @@
+import nose2
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..modelbaker.utils.qt_utils import NetworkError, download_file
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the server content, answering Range/If-Range requests and dropping the connection after cut_after bytes
+    (once) to interrupt a download.
+    """
+
+    def do_GET(self):
+        content = self.server.content
+        start = 0
+        status = 200
+        range_header = self.headers.get('Range')
+        if range_header and self.headers.get('If-Range') in (None, self.server.etag):
+            start = int(range_header[len('bytes='):].rstrip('-'))
+            status = 206 if start < len(content) else 416
+
+        self.server.requests.append((status, range_header, self.headers.get('If-Range'),
+                                     self.headers.get('Accept-Encoding')))
+        self.send_response(status)
+        self.send_header('ETag', self.server.etag)
+        if status == 416:
+            self.send_header('Content-Range', 'bytes */{}'.format(len(content)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = content[start:]
+        if status == 206:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(content) - 1, len(content)))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if self.server.cut_after is not None:
+            body = body[:self.server.cut_after]
+            self.server.cut_after = None
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownloadFile(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = 'http://127.0.0.1:{}/ili2pg.zip'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.filename = os.path.join(self.base_dir, 'ili2pg.zip')
+        self.set_content(os.urandom(1024 * 1024))
+        self.server.requests = list()
+
+    def set_content(self, content, etag=None):
+        self.server.content = content
+        self.server.etag = etag or '"{}"'.format(hashlib.md5(content).hexdigest())
+        self.server.cut_after = None
+
+    def interrupt_download(self, cut_after=300 * 1024):
+        self.server.cut_after = cut_after
+        with self.assertRaises(NetworkError):
+            download_file(self.url, self.filename)
+        self.assertFalse(os.path.exists(self.filename))
+        bytes_received = os.path.getsize(self.filename + '.part')
+        self.assertTrue(0 < bytes_received <= cut_after)
+        return bytes_received
+
+    def assert_downloaded(self, content):
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(content, f.read())
+        self.assertFalse(os.path.exists(self.filename + '.part'))
+        self.assertFalse(os.path.exists(self.filename + '.part.json'))
+
+    def test_download(self):
+        progress = list()
+        self.assertEqual(self.filename, download_file(self.url, self.filename,
+                                                      on_progress=lambda *args: progress.append(args)))
+        self.assert_downloaded(self.server.content)
+        self.assertEqual((len(self.server.content), len(self.server.content)), progress[-1])
+
+        # Content-Length and Range offsets must be those of the file itself, not of a compressed body
+        self.assertEqual([(200, None, None, 'identity')], self.server.requests)
+
+    def test_resumed_download(self):
+        bytes_received = self.interrupt_download()
+
+        progress = list()
+        download_file(self.url, self.filename, on_progress=lambda *args: progress.append(args))
+        self.assert_downloaded(self.server.content)
+        self.assertEqual((206, 'bytes={}-'.format(bytes_received), self.server.etag, 'identity'),
+                         self.server.requests[-1])
+        self.assertEqual(2, len(self.server.requests))
+
+        # Progress goes on from the bytes already received
+        self.assertLess(bytes_received, progress[0][0])
+        self.assertEqual((len(self.server.content), len(self.server.content)), progress[-1])
+
+    def test_changed_file(self):
+        bytes_received = self.interrupt_download()
+
+        # The validator doesn't match anymore, so the server sends the whole new file
+        new_content = os.urandom(512 * 1024)
+        self.set_content(new_content)
+        download_file(self.url, self.filename)
+        self.assert_downloaded(new_content)
+        self.assertEqual(200, self.server.requests[-1][0])
+        self.assertEqual('bytes={}-'.format(bytes_received), self.server.requests[-1][1])
+
+    def test_unsatisfiable_range(self):
+        self.interrupt_download()
+
+        # Same validator, but the partial file is already longer than the file on the server: start over
+        new_content = os.urandom(100 * 1024)
+        self.set_content(new_content, etag=self.server.etag)
+        download_file(self.url, self.filename)
+        self.assert_downloaded(new_content)
+        self.assertEqual([416, 200], [request[0] for request in self.server.requests[1:]])
+        self.assertIsNone(self.server.requests[-1][1])
+
+
+if __name__ == '__main__':
+    nose2.main()
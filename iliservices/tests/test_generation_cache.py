@@ -0,0 +1,190 @@
+import nose2
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import psycopg2
+
+from .utils import (FakeGeneratorConnector,
+                    get_fake_generator,
+                    get_generation_structure,
+                    get_pg_conn,
+                    drop_pg_schema)
+
+from ..modelbaker.dbconnector.pg_connector import PGConnector
+from ..modelbaker.generator import generation_cache
+from ..modelbaker.utils.globals import OptimizeStrategy
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TestGenerationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        generation_cache.set_generation_store_path(os.path.join(self.base_dir, 'generations.sqlite'))
+        self.addCleanup(generation_cache.set_generation_store_path, generation_cache.DEFAULT_STORE_PATH)
+        generation_cache.clear_generation_cache()
+        self.addCleanup(generation_cache.clear_generation_cache)
+
+    def test_dump_and_load_generation(self):
+        generator = get_fake_generator(optimize_strategy=OptimizeStrategy.GROUP)
+        result = generator.generate(use_cache=False)
+        layers, relations, bags_of_enum, legend = result
+        self.assertEqual(5, len(layers))  # t_ili2db_settings is ignored
+        self.assertEqual(6, len(relations))  # Once per layer of parcel, which has two geometry columns
+        self.assertEqual(['owner_None'], list(bags_of_enum))
+
+        definition = generation_cache.dump_generation(generator._objects, 'dbname=fake', *result)
+        loaded = generation_cache.load_generation(json.loads(json.dumps(definition)), generator._objects,
+                                                  'dbname=fake')
+
+        self.assertEqual(get_generation_structure(*result), get_generation_structure(*loaded))
+        for layer, loaded_layer in zip(layers, loaded[0]):
+            self.assertIsNot(layer, loaded_layer)
+            self.assertEqual(layer.dump(), loaded_layer.dump())
+            self.assertEqual([field.dump() for field in layer.fields],
+                             [field.dump() for field in loaded_layer.fields])
+            self.assertEqual([field.as_dict() for field in layer.fields],
+                             [field.as_dict() for field in loaded_layer.fields])
+
+    def test_cached_generation(self):
+        generator = get_fake_generator()
+        expected = get_generation_structure(*generator.generate(use_cache=False))
+
+        result = generator.generate()
+        self.assertEqual(expected, get_generation_structure(*result))
+
+        # Hit: only the fingerprint is read, and the result is a new copy, since callers modify it
+        del generator._db_connector.queries[:]
+        cached = generator.generate()
+        self.assertEqual(['schema_fingerprint'], generator._db_connector.queries)
+        self.assertEqual(expected, get_generation_structure(*cached))
+        self.assertIsNot(result[0][0], cached[0][0])
+
+        # Hit from the disk store, e.g., after a restart
+        generation_cache.clear_generation_cache()
+        del generator._db_connector.queries[:]
+        self.assertEqual(expected, get_generation_structure(*generator.generate()))
+        self.assertEqual(['schema_fingerprint'], generator._db_connector.queries)
+
+    def test_credentials_not_stored(self):
+        uri = 'dbname=fake host=localhost user=admin password=s3cr3t'
+        generator = get_fake_generator(uri=uri)
+        layers = generator.generate()[0]
+        self.assertTrue(all(layer.uri.startswith(uri) for layer in layers))
+
+        with open(os.path.join(self.base_dir, 'generations.sqlite'), 'rb') as f:
+            content = f.read()
+        self.assertIn(b'fake_schema', content)
+        self.assertNotIn(b's3cr3t', content)
+        self.assertNotIn(b'password', content)
+
+        # Layer uris are built again with the connection of the Generator that reads the cache
+        generation_cache.clear_generation_cache()
+        other_uri = 'dbname=fake host=localhost user=reader password=0th3r'
+        cached_layers = get_fake_generator(uri=other_uri).generate()[0]
+        self.assertEqual([layer.uri.replace(uri, other_uri) for layer in layers],
+                         [layer.uri for layer in cached_layers])
+
+        # Layer uris with another connection are not stored at all
+        generation_cache.clear_generation_cache()
+        definition = generation_cache.dump_generation(generator._objects, uri, layers, [], {},
+                                                      generator._objects.create_legend_group())
+        self.assertEqual(' table="fake_schema"."parcel" (geometry)', definition['layers'][0]['uri'])
+        with self.assertRaises(ValueError):
+            generation_cache.dump_generation(generator._objects, other_uri, layers, [], {},
+                                             generator._objects.create_legend_group())
+
+    def test_fingerprint(self):
+        generator = get_fake_generator()
+        fingerprint = generator.get_schema_fingerprint()
+        self.assertEqual(fingerprint, get_fake_generator().get_schema_fingerprint())
+        generator.generate()
+
+        # Generator settings and generation arguments are part of the key
+        self.assertNotEqual(fingerprint, generator.get_schema_fingerprint(['parcel']))
+        self.assertNotEqual(fingerprint, generator.get_schema_fingerprint(ignore_node_names=['system']))
+        self.assertNotEqual(fingerprint,
+                            get_fake_generator(optimize_strategy=OptimizeStrategy.HIDE).get_schema_fingerprint())
+
+        # A schema change alters the key, so that the cached result is not used anymore
+        generator._db_connector.fields_info['building'].append({'column_name': 'floors', 'data_type': 'integer'})
+        new_fingerprint = generator.get_schema_fingerprint()
+        self.assertNotEqual(fingerprint, new_fingerprint)
+
+        del generator._db_connector.queries[:]
+        layers, relations, bags_of_enum, legend = generator.generate()
+        self.assertIn('tables_info', generator._db_connector.queries)
+        building = [layer for layer in layers if layer.name == 'building'][0]
+        self.assertEqual('floors', building.fields[-1].name)
+
+    def test_schema_without_fingerprint(self):
+        generator = get_fake_generator()
+        with mock.patch.object(FakeGeneratorConnector, 'get_schema_fingerprint', return_value=None):
+            self.assertIsNone(generator.get_schema_fingerprint())
+            generator.generate()
+            del generator._db_connector.queries[:]
+            generator.generate()
+
+        # Nothing is cached for it
+        self.assertIn('tables_info', generator._db_connector.queries)
+
+
+class TestPGSchemaFingerprint(unittest.TestCase):
+
+    SCHEMA = 'generation_cache_fingerprint'
+
+    @classmethod
+    def setUpClass(cls):
+        drop_pg_schema(cls.SCHEMA)
+        cls.db = get_pg_conn(cls.SCHEMA)
+        cls.execute("""CREATE SCHEMA "{schema}";
+                       CREATE TABLE "{schema}".t_ili2db_table_prop (tablename varchar(255), tag varchar(1024),
+                                                                      setting varchar(8000));
+                       CREATE TABLE "{schema}".t_ili2db_settings (tag varchar(60) PRIMARY KEY, setting varchar(8000));
+                       CREATE TABLE "{schema}".parcel (t_id bigserial PRIMARY KEY, area numeric(10, 1));""")
+
+    @classmethod
+    def execute(cls, query):
+        cur = cls.db.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cur.execute(query.format(schema=cls.SCHEMA))
+        cls.db.conn.commit()
+        cur.close()
+
+    def get_fingerprint(self):
+        db_connector = PGConnector(self.db.uri, self.SCHEMA)
+        try:
+            return db_connector.get_schema_fingerprint()
+        finally:
+            db_connector.close_connection()
+
+    def test_schema_fingerprint(self):
+        fingerprint = self.get_fingerprint()
+        self.assertTrue(fingerprint)
+
+        # Data changes keep the key
+        self.execute("""INSERT INTO "{schema}".parcel (area) VALUES (100.5);""")
+        self.assertEqual(fingerprint, self.get_fingerprint())
+
+        # Schema and ili2db metadata changes alter it
+        self.execute("""ALTER TABLE "{schema}".parcel ADD COLUMN number varchar(20);""")
+        new_fingerprint = self.get_fingerprint()
+        self.assertNotEqual(fingerprint, new_fingerprint)
+
+        self.execute("""INSERT INTO "{schema}".t_ili2db_settings VALUES ('ch.ehi.ili2db.createBasketCol', 'yes');""")
+        self.assertNotEqual(new_fingerprint, self.get_fingerprint())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.conn.close()
+        drop_pg_schema(cls.SCHEMA)
+
+
+if __name__ == '__main__':
+    nose2.main()
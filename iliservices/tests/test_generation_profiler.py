@@ -0,0 +1,201 @@
+import nose2
+import unittest
+import sqlite3
+import threading
+
+from .utils import (FakeDbFactory,
+                    FakeDbSimpleFactory,
+                    FakeGeneratorConnector,
+                    get_fake_generator)
+
+from ..modelbaker.dbconnector.query_observer import ObservedConnection, ObservedCursor
+from ..modelbaker.generator.profiler import (PHASE_RECORD,
+                                             QUERY_RECORD,
+                                             GenerationProfiler,
+                                             profile_phase,
+                                             profiled)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class SQLiteConnector(FakeGeneratorConnector):
+    """
+    FakeGeneratorConnector with an in-memory SQLite connection, queried for the tables info.
+    """
+
+    def __init__(self, uri, schema):
+        FakeGeneratorConnector.__init__(self, uri, schema)
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE t_ili2db_table_prop (tablename TEXT, tag TEXT, setting TEXT)")
+
+    def get_tables_info(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM t_ili2db_table_prop")
+        cursor.fetchall()
+        return FakeGeneratorConnector.get_tables_info(self)
+
+
+class SQLiteDbFactory(FakeDbFactory):
+    connector_class = SQLiteConnector
+
+
+class SQLiteDbSimpleFactory(FakeDbSimpleFactory):
+    db_factory_class = SQLiteDbFactory
+
+
+class Job:
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    @profiled("job")
+    def run(self, value):
+        return value * 2
+
+
+class TestQueryObserver(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = list()
+        self.conn = ObservedConnection(sqlite3.connect(':memory:'), self.observer)
+        self.addCleanup(self.conn.close)
+
+    def observer(self, sql, elapsed, rows):
+        self.queries.append((sql, elapsed, rows))
+
+    def test_observed_queries(self):
+        cursor = self.conn.cursor()
+        self.assertIsInstance(cursor, ObservedCursor)
+        cursor.execute("CREATE TABLE parcel (t_id INTEGER PRIMARY KEY, number TEXT)")
+        cursor.executemany("INSERT INTO parcel (number) VALUES (?)", [('1',), ('2',), ('3',)])
+
+        # Chained calls keep observing, and rows are fetched as usual
+        self.assertEqual([(3,)], cursor.execute("SELECT count(*) FROM parcel").fetchall())
+        self.assertEqual([(1,), (2,), (3,)], list(cursor.execute("SELECT t_id FROM parcel ORDER BY t_id")))
+
+        self.assertEqual(["CREATE TABLE parcel (t_id INTEGER PRIMARY KEY, number TEXT)",
+                          "INSERT INTO parcel (number) VALUES (?)",
+                          "SELECT count(*) FROM parcel",
+                          "SELECT t_id FROM parcel ORDER BY t_id"], [query[0] for query in self.queries])
+        self.assertEqual([None, 3, None, None], [query[2] for query in self.queries])  # Unknown for SELECTs
+        self.assertTrue(all(query[1] >= 0 for query in self.queries))
+
+    def test_wrapped_connection(self):
+        # Attributes are read from and written to the wrapped connection
+        self.conn.row_factory = sqlite3.Row
+        self.assertIs(sqlite3.Row, self.conn.connection.row_factory)
+        self.conn.execute("CREATE TABLE parcel (t_id INTEGER PRIMARY KEY)")
+        self.conn.commit()
+        self.assertEqual([], self.queries)  # Only queries run through cursors are observed
+
+        # Failed queries are not reported
+        with self.assertRaises(sqlite3.OperationalError):
+            self.conn.cursor().execute("SELECT * FROM building")
+        self.assertEqual([], self.queries)
+
+    def test_set_query_observer(self):
+        db_connector = SQLiteConnector('dbname=fake', 'fake_schema')
+        conn = db_connector.conn
+
+        db_connector.set_query_observer(self.observer)
+        db_connector.set_query_observer(self.observer)
+        self.assertIs(conn, db_connector.conn.connection)  # Not wrapped twice
+        db_connector.get_tables_info()
+        self.assertEqual(1, len(self.queries))
+
+        db_connector.set_query_observer(None)
+        self.assertIs(conn, db_connector.conn)
+        db_connector.get_tables_info()
+        self.assertEqual(1, len(self.queries))
+
+        # Connectors without connection are left as they are
+        db_connector = FakeGeneratorConnector('dbname=fake', 'fake_schema')
+        db_connector.set_query_observer(self.observer)
+        self.assertFalse(hasattr(db_connector, 'conn'))
+
+
+class TestGenerationProfiler(unittest.TestCase):
+
+    def test_phases_and_queries(self):
+        records = list()
+        profiler = GenerationProfiler(callback=records.append)
+        profiler.add_query("SELECT 0", 0.5)
+        with profiler.phase("layers"):
+            profiler.add_query("SELECT 1", 0.25, 10)
+            with profiler.phase("fields_info"):
+                profiler.add_query("SELECT 2", 1.0, 3)
+                profiler.add_query("SELECT 3", 0.75, None)
+
+            # Queries of other threads are not assigned to the phases of this one
+            thread = threading.Thread(target=profiler.add_query, args=("SELECT 4", 0.1, 1), name='worker')
+            thread.start()
+            thread.join()
+
+        report = profiler.report()
+        phases = {record['name']: record for record in report['phases']}
+        self.assertEqual(['layers', 'fields_info'], [record['name'] for record in report['phases']])
+        self.assertEqual('layers', phases['fields_info']['parent'])
+        self.assertEqual((1, 0.25, 10), (phases['layers']['queries'], phases['layers']['query_time'],
+                                         phases['layers']['rows']))
+        self.assertEqual((2, 1.75, 3), (phases['fields_info']['queries'], phases['fields_info']['query_time'],
+                                        phases['fields_info']['rows']))
+        self.assertEqual({'SELECT 0': None, 'SELECT 1': 'layers', 'SELECT 2': 'fields_info',
+                          'SELECT 3': 'fields_info', 'SELECT 4': None},
+                         {record['sql']: record['phase'] for record in report['queries']})
+        self.assertEqual('worker', [record for record in report['queries'] if record['sql'] == 'SELECT 4'][0]['thread'])
+
+        summary = report['summary']
+        self.assertEqual(phases['layers']['elapsed'], summary['elapsed'])  # Nested phases are not added up
+        self.assertEqual((5, 2.6, 14), (summary['queries'], round(summary['query_time'], 6), summary['rows']))
+        self.assertEqual(['SELECT 2', 'SELECT 3'], [record['sql'] for record in profiler.slowest_queries(2)])
+
+        # Complete records are passed to the callback as they come
+        self.assertEqual([QUERY_RECORD] * 4 + [PHASE_RECORD, QUERY_RECORD, PHASE_RECORD],
+                         [record['type'] for record in records])
+
+        profiler.clear()
+        self.assertEqual({'elapsed': 0, 'queries': 0, 'query_time': 0, 'rows': 0}, profiler.report()['summary'])
+
+    def test_without_sql(self):
+        profiler = GenerationProfiler(record_sql=False)
+        profiler.add_query("SELECT secret FROM users", 0.1, 1)
+        self.assertIsNone(profiler.report()['queries'][0]['sql'])
+
+    def test_without_profiler(self):
+        with profile_phase(None, "layers") as record:
+            self.assertIsNone(record)
+        self.assertEqual(4, Job(None).run(2))
+
+        profiler = GenerationProfiler()
+        self.assertEqual(4, Job(profiler).run(2))
+        self.assertEqual(['job'], [record['name'] for record in profiler.report()['phases']])
+
+    def test_profiled_generation(self):
+        for parallel_introspection in [False, True]:
+            profiler = GenerationProfiler()
+            generator = get_fake_generator(SQLiteDbSimpleFactory, profiler=profiler,
+                                           parallel_introspection=parallel_introspection)
+            generator._db_connector.concurrent_introspection = True
+            generator.generate(use_cache=False)
+
+            report = profiler.report()
+            phase_names = [record['name'] for record in report['phases']]
+            for name in ['generate', 'layers', 'relations', 'legend']:
+                self.assertIn(name, phase_names)
+            self.assertEqual(['generate'], [record['name'] for record in report['phases'] if not record['parent']
+                                            and record['thread'] == threading.current_thread().name])
+
+            # Queries of the tables info, run once by a pooled connector when prefetching
+            queries = report['queries']
+            self.assertTrue(queries)
+            self.assertEqual({"SELECT * FROM t_ili2db_table_prop"}, {query['sql'] for query in queries})
+            if parallel_introspection:
+                self.assertEqual(1, len(queries))
+                self.assertEqual('get_tables_info', queries[0]['phase'])
+                self.assertNotEqual(threading.current_thread().name, queries[0]['thread'])
+            else:
+                self.assertEqual({'tables_info'}, {query['phase'] for query in queries})
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,155 @@
+import nose2
+import unittest
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import types
+from unittest import mock
+
+from .utils import get_test_path
+
+# Imported beforehand, so that only the GPKG connector is imported with the QGIS stubs below
+from ..modelbaker.dbconnector import db_connector  # noqa: F401
+from ..modelbaker.generator import config  # noqa: F401
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def import_gpkg_connector():
+    """
+    Imports the modelbaker GPKG connector, with qgis.utils and qgis.core stubs if QGIS is not available.
+    """
+    try:
+        import qgis.core  # noqa: F401
+        import qgis.utils  # noqa: F401
+    except ImportError:
+        qgis = types.ModuleType('qgis')
+        qgis.utils = types.ModuleType('qgis.utils')
+        qgis.utils.spatialite_connect = sqlite3.connect
+        qgis.core = types.ModuleType('qgis.core')
+        qgis.core.Qgis = type('Qgis', (), {'QGIS_VERSION_INT': 32800, 'Warning': 1})
+        modules = {'qgis': qgis, 'qgis.utils': qgis.utils, 'qgis.core': qgis.core}
+    else:
+        modules = dict()
+
+    with mock.patch.dict(sys.modules, modules):
+        from ..modelbaker.dbconnector import gpkg_connector
+    return gpkg_connector
+
+
+gpkg_connector = import_gpkg_connector()
+
+# An ili2db schema with meta attributes, with and without CHECK constraints
+ILI2DB_SCHEMA = [
+    "CREATE TABLE gpkg_geometry_columns (table_name TEXT, column_name TEXT, geometry_type_name TEXT, srs_id INTEGER)",
+    "CREATE TABLE T_ILI2DB_TABLE_PROP (tablename TEXT, tag TEXT, setting TEXT)",
+    "CREATE TABLE T_ILI2DB_COLUMN_PROP (tablename TEXT, subtype TEXT, columnname TEXT, tag TEXT, setting TEXT)",
+    "CREATE TABLE T_ILI2DB_ATTRNAME (IliName TEXT, SqlName TEXT, ColOwner TEXT, Target TEXT)",
+    "CREATE TABLE T_ILI2DB_CLASSNAME (IliName TEXT, SqlName TEXT)",
+    "CREATE TABLE T_ILI2DB_INHERITANCE (thisClass TEXT, baseClass TEXT)",
+    "CREATE TABLE T_ILI2DB_MODEL (filename TEXT, iliversion TEXT, modelName TEXT, content TEXT, importDate TEXT)",
+    "CREATE TABLE T_ILI2DB_META_ATTRS (ilielement TEXT, attr_name TEXT, attr_value TEXT)",
+    """CREATE TABLE parcel (
+T_Id INTEGER PRIMARY KEY,
+number TEXT,
+area DOUBLE CHECK( area BETWEEN 0.0 AND 1.0E9),
+floors INTEGER CHECK( floors BETWEEN -5 AND 200),
+geometry POLYGON)""",
+    """CREATE TABLE building (
+T_Id INTEGER PRIMARY KEY,
+name TEXT,
+height DOUBLE,
+parcel INTEGER REFERENCES parcel (T_Id))""",
+    "CREATE TABLE owner (T_Id INTEGER PRIMARY KEY, name TEXT)",
+    "INSERT INTO gpkg_geometry_columns VALUES ('parcel', 'geometry', 'POLYGON', 2056)",
+    "INSERT INTO T_ILI2DB_TABLE_PROP VALUES ('parcel', 'ch.ehi.ili2db.tableKind', 'CLASS')",
+    "INSERT INTO T_ILI2DB_CLASSNAME VALUES ('Cadastre.Parcels.Parcel', 'parcel')",
+    "INSERT INTO T_ILI2DB_CLASSNAME VALUES ('Cadastre.Parcels.Building', 'building')",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.Parcel.Number', 'number', 'parcel', NULL)",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.Parcel.Area', 'area', 'parcel', NULL)",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.Parcel.Floors', 'floors', 'parcel', NULL)",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.Building.Name', 'name', 'building', NULL)",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.Building.Height', 'height', 'building', NULL)",
+    "INSERT INTO T_ILI2DB_ATTRNAME VALUES ('Cadastre.Parcels.ParcelBuilding.Parcel', 'parcel', 'building', "
+    "'parcel')",
+    "INSERT INTO T_ILI2DB_COLUMN_PROP VALUES ('parcel', NULL, 'area', 'ch.ehi.ili2db.unit', 'm2')",
+    "INSERT INTO T_ILI2DB_COLUMN_PROP VALUES ('parcel', NULL, 'number', 'ch.ehi.ili2db.dispName', 'Number')",
+    "INSERT INTO T_ILI2DB_COLUMN_PROP VALUES ('building', NULL, 'name', 'ch.ehi.ili2db.textKind', 'MTEXT')",
+    "INSERT INTO T_ILI2DB_COLUMN_PROP VALUES ('building', NULL, 'height', 'ch.ehi.ili2db.unit', 'm')",
+    # Reversed order of the building attributes
+    "INSERT INTO T_ILI2DB_META_ATTRS VALUES ('Cadastre.Parcels.Building.Name', 'form_order', '3')",
+    "INSERT INTO T_ILI2DB_META_ATTRS VALUES ('Cadastre.Parcels.Building.Height', 'form_order', '2')",
+    "INSERT INTO T_ILI2DB_META_ATTRS VALUES ('Cadastre.Parcels.ParcelBuilding.Parcel', 'form_order', '1')",
+    "INSERT INTO T_ILI2DB_META_ATTRS VALUES ('Cadastre.Parcels.ParcelBuilding.Parcel', 'ili2db.mapping', "
+    "'ARRAY')",
+]
+
+
+class TestGPKGFieldsInfoByTable(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+
+    def get_connector(self, gpkg_path):
+        db = gpkg_connector.GPKGConnector(gpkg_path, None)
+        self.addCleanup(db.conn.close)
+        return db
+
+    def get_ili2db_connector(self):
+        gpkg_path = os.path.join(self.base_dir, 'cadastre.gpkg')
+        conn = sqlite3.connect(gpkg_path)
+        for query in ILI2DB_SCHEMA:
+            conn.execute(query)
+        conn.commit()
+        conn.close()
+        return self.get_connector(gpkg_path)
+
+    def assert_same_info(self, db, table_names):
+        fields_info = db.get_fields_info_by_table(table_names)
+        min_max_info = db.get_min_max_info_by_table(table_names)
+        self.assertEqual(set(table_names), set(fields_info))
+        self.assertEqual(set(table_names), set(min_max_info))
+        for table_name in table_names:
+            self.assertEqual(db.get_fields_info(table_name), fields_info[table_name], table_name)
+            self.assertEqual(db.get_min_max_info(table_name), min_max_info[table_name], table_name)
+
+    def test_ili2db_schema(self):
+        db = self.get_ili2db_connector()
+        self.assertTrue(db.metadata_exists())
+        self.assert_same_info(db, ['parcel', 'building', 'owner', 'T_ILI2DB_TABLE_PROP'])
+
+        fields_info = db.get_fields_info_by_table(['parcel', 'building'])
+        self.assertEqual(['parcel', 'height', 'name', 'T_Id'],
+                         [record['column_name'] for record in fields_info['building']])  # By attr_order
+        self.assertEqual(['MTEXT', 'm'], [fields_info['building'][2]['texttype'], fields_info['building'][1]['unit']])
+        self.assertEqual('ARRAY', fields_info['building'][0]['attr_mapping'])
+        self.assertEqual('Cadastre.Parcels.Parcel.Area', fields_info['parcel'][2]['fully_qualified_name'])
+
+        min_max_info = db.get_min_max_info_by_table(['parcel', 'building'])
+        self.assertEqual({'area': ('0.0', '1.0E9'), 'floors': ('-5', '200')}, min_max_info['parcel'])
+        self.assertEqual(dict(), min_max_info['building'])
+
+    def test_bundled_gpkg(self):
+        gpkg_path = os.path.join(self.base_dir, 'ili2db.gpkg')
+        shutil.copyfile(get_test_path(os.path.join('db', 'static', 'gpkg', 'ili2db.gpkg')), gpkg_path)
+        db = self.get_connector(gpkg_path)
+        self.assertFalse(db.metadata_exists())
+
+        table_names = [record['tablename'] for record in db.get_tables_info()]
+        self.assertIn('empty', table_names)
+        self.assert_same_info(db, table_names)
+
+    def test_unknown_tables(self):
+        db = self.get_ili2db_connector()
+        self.assertEqual(dict(), db.get_fields_info_by_table([]))
+        self.assertEqual(dict(), db.get_min_max_info_by_table([]))
+        self.assertEqual(['parcel'], list(db.get_fields_info_by_table(['parcel', 'missing'])))
+        self.assertEqual(['parcel'], list(db.get_min_max_info_by_table(['parcel', 'missing'])))
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,130 @@
+import nose2
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from ..db import gpkg_read_connections
+from ..db.gpkg_connector import GPKGConnector
+from ..db.gpkg_read_connections import (close_shared_read_connections,
+                                        get_shared_read_connection)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TestGPKGReadConnections(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.addCleanup(close_shared_read_connections)
+        self.gpkg_path = os.path.join(self.base_dir, 'parcels.gpkg')
+        self.create_gpkg(self.gpkg_path, 2)
+
+    @staticmethod
+    def create_gpkg(path, parcels):
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE parcel (t_id INTEGER PRIMARY KEY, number TEXT)")
+        conn.executemany("INSERT INTO parcel (number) VALUES (?)", [('parcel {}'.format(i),) for i in range(parcels)])
+        conn.commit()
+        conn.close()
+
+    def get_connector(self, **kwargs):
+        db = GPKGConnector(None, conn_dict=dict(dbfile=self.gpkg_path, read_only=True, **kwargs))
+        res, msg = db.open_connection()
+        self.assertTrue(res, msg)
+        self.addCleanup(db.close_connection)
+        return db
+
+    @staticmethod
+    def count_parcels(db):
+        res, result = db.execute_sql_query("SELECT count(*) AS count FROM parcel")
+        return result[0]['count']
+
+    def test_shared_connection(self):
+        db = self.get_connector()
+        other_db = self.get_connector()
+        self.assertIs(db.conn, other_db.conn)
+        self.assertEqual(2, self.count_parcels(db))
+
+        # Tuned for reads only
+        self.assertEqual(1, db.conn.execute("PRAGMA query_only").fetchone()[0])
+        with self.assertRaises(sqlite3.OperationalError):
+            db.conn.execute("DELETE FROM parcel")
+
+        # Closing a connector keeps the connection open for the other ones
+        db.close_connection()
+        self.assertEqual(2, self.count_parcels(other_db))
+
+        # A regular connector has its own connection
+        rw_db = GPKGConnector(self.gpkg_path)
+        rw_db.open_connection()
+        self.addCleanup(rw_db.close_connection)
+        self.assertIsNot(other_db.conn, rw_db.conn)
+
+    def test_connection_per_thread(self):
+        conn = get_shared_read_connection(self.gpkg_path)
+        connections = list()
+        thread = threading.Thread(target=lambda: connections.append(get_shared_read_connection(self.gpkg_path)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(conn, connections[0])
+        self.assertIs(conn, get_shared_read_connection(self.gpkg_path))
+
+    def test_changed_file(self):
+        conn = get_shared_read_connection(self.gpkg_path)
+        immutable_conn = get_shared_read_connection(self.gpkg_path, immutable=True)
+        self.assertIsNot(conn, immutable_conn)
+
+        # Regular read connections see changes, immutable ones are open again
+        writer = sqlite3.connect(self.gpkg_path)
+        writer.execute("INSERT INTO parcel (number) VALUES ('parcel 3')")
+        writer.commit()
+        writer.close()
+
+        self.assertIs(conn, get_shared_read_connection(self.gpkg_path))
+        self.assertEqual(3, conn.execute("SELECT count(*) FROM parcel").fetchone()[0])
+        new_immutable_conn = get_shared_read_connection(self.gpkg_path, immutable=True)
+        self.assertIsNot(immutable_conn, new_immutable_conn)
+        self.assertEqual(3, new_immutable_conn.execute("SELECT count(*) FROM parcel").fetchone()[0])
+
+        # A replaced file is open again
+        new_path = os.path.join(self.base_dir, 'new.gpkg')
+        self.create_gpkg(new_path, 5)
+        os.replace(new_path, self.gpkg_path)
+        new_conn = get_shared_read_connection(self.gpkg_path)
+        self.assertIsNot(conn, new_conn)
+        self.assertEqual(5, new_conn.execute("SELECT count(*) FROM parcel").fetchone()[0])
+
+        # Closed ones are not reused
+        close_shared_read_connections()
+        self.assertIsNot(new_conn, get_shared_read_connection(self.gpkg_path))
+
+    def test_immutable_with_pending_wal(self):
+        writer = sqlite3.connect(self.gpkg_path)
+        self.addCleanup(writer.close)
+        writer.execute("PRAGMA journal_mode = WAL")
+        writer.execute("PRAGMA wal_autocheckpoint = 0")
+        writer.execute("INSERT INTO parcel (number) VALUES ('parcel 3')")
+        writer.commit()
+        self.assertTrue(gpkg_read_connections.is_wal_database(self.gpkg_path))
+        self.assertTrue(gpkg_read_connections.has_pending_wal(self.gpkg_path))
+
+        # Not open as immutable, otherwise the last parcel would not be seen
+        with self.assertLogs(gpkg_read_connections.logger, 'INFO') as logs:
+            db = self.get_connector(immutable=True)
+        self.assertIn("has pending changes in its WAL file", logs.output[0])
+        self.assertEqual(3, self.count_parcels(db))
+
+    def test_missing_file(self):
+        db = GPKGConnector(None, conn_dict=dict(dbfile=os.path.join(self.base_dir, 'missing.gpkg'), read_only=True))
+        res, msg = db.open_connection()
+        self.assertFalse(res)
+        self.assertIsNone(db.conn)
+
+
+if __name__ == '__main__':
+    nose2.main()
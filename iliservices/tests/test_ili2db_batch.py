@@ -0,0 +1,185 @@
+import nose2
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from .utils import (get_pg_conn,
+                    drop_pg_schema,
+                    get_test_path,
+                    get_test_copy_path,
+                    get_gpkg_conn_from_path)
+
+from ..core.ili2db import Ili2DB
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TestIli2dbBatch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ili2db = Ili2DB()
+
+        gpkg_path = get_test_copy_path('db/static/gpkg/ili2db.gpkg')
+        cls.db_connections = [get_gpkg_conn_from_path(gpkg_path)]
+
+        for schema_name in ['ili2db_batch_1', 'ili2db_batch_2']:
+            drop_pg_schema(schema_name)
+            cls.db_connections.append(get_pg_conn(schema_name))
+
+    def test_import_data_batch(self):
+        print("\nINFO: Validating batch import data...")
+        models = ['Captura_Geo_V1_2']
+        for db in self.db_connections:
+            configuration = self.ili2db.get_import_schema_configuration(db, models, create_basket_col=True)
+            res_schema_import, msg_schema_import = self.ili2db.import_schema(db, configuration)
+            self.assertTrue(res_schema_import, msg_schema_import)
+
+        xtf_path = get_test_path("xtf/test_field_data_capture_1_2.xtf")
+        jobs = list()
+        for db in self.db_connections:
+            # Two datasets per target, so that conflicting jobs are serialized
+            jobs.append((db, xtf_path, 'batch_dataset_1'))
+            jobs.append((db, xtf_path, 'batch_dataset_2'))
+
+        results, elapsed_time = self.ili2db.import_data_batch(jobs, max_workers=2)
+        self.assertEqual(len(jobs), len(results))
+        for res, msg in results:
+            self.assertTrue(res, msg)
+        self.assertGreater(elapsed_time, 0)
+
+        # A wrong XTF file only affects its own job
+        wrong_xtf_path = get_test_path("xtf/test_wrong_data_section.xtf")
+        jobs = [(self.db_connections[1], wrong_xtf_path, 'batch_dataset_3'),
+                (self.db_connections[2], xtf_path, 'batch_dataset_3')]
+        results, elapsed_time = self.ili2db.import_data_batch(jobs)
+        self.assertFalse(results[0][0], results[0][1])
+        self.assertTrue(results[1][0], results[1][1])
+
+    @classmethod
+    def tearDownClass(cls):
+        pass
+
+
+class TestIli2dbBatchGPKG(unittest.TestCase):
+    """
+    Runs the batch logic against GPKG targets only, with ili2db itself replaced, so that it needs neither
+    PostgreSQL nor java.
+    """
+
+    def setUp(self):
+        self.ili2db = Ili2DB()
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+
+        self.db_connections = list()
+        for i in range(3):
+            gpkg_path = os.path.join(self.base_dir, 'batch_{}.gpkg'.format(i))
+            shutil.copyfile(get_test_path('db/static/gpkg/ili2db.gpkg'), gpkg_path)
+            self.db_connections.append(get_gpkg_conn_from_path(gpkg_path))
+
+    def run_batch(self, jobs, max_workers, barrier=None):
+        """
+        Runs the batch with a fake import that tracks how many jobs run at the same time, overall and per target. If
+        a barrier is given, the first job of every target waits there for the first jobs of the other targets.
+
+        :return: tuple(results, max. jobs running at the same time, {target: max. jobs running at the same time},
+                 {target: datasets in the order they were imported})
+        """
+        lock = threading.Lock()
+        running = {'total': 0, 'max_total': 0}
+        running_by_target = dict()
+        max_running_by_target = dict()
+        imported = dict()
+
+        def import_data(db, configuration):
+            target = configuration.dbfile
+            with lock:
+                first_job = target not in imported
+                imported.setdefault(target, list()).append(configuration.dataset)
+                running['total'] += 1
+                running['max_total'] = max(running['max_total'], running['total'])
+                running_by_target[target] = running_by_target.get(target, 0) + 1
+                max_running_by_target[target] = max(max_running_by_target.get(target, 0), running_by_target[target])
+
+            try:
+                if barrier is not None and first_job:
+                    barrier.wait(timeout=10)  # Raises BrokenBarrierError if the targets are not run concurrently
+                time.sleep(0.05)  # Long enough for an overlapping job of the same target to be noticed
+            finally:
+                with lock:
+                    running['total'] -= 1
+                    running_by_target[target] -= 1
+            return True, 'imported'
+
+        with mock.patch.object(self.ili2db, 'import_data', side_effect=import_data):
+            results, elapsed_time = self.ili2db.import_data_batch(jobs, max_workers=max_workers)
+
+        return results, running['max_total'], max_running_by_target, imported
+
+    def test_jobs_by_target(self):
+        print("\nINFO: Validating batch import data concurrency per target...")
+        xtf_path = get_test_path("xtf/test_field_data_capture_1_2.xtf")
+        jobs = [(db, xtf_path, 'dataset_{}'.format(i)) for db in self.db_connections for i in range(3)]
+        targets = [db.dict_conn_params['dbfile'] for db in self.db_connections]
+
+        # Different targets run at the same time, jobs of the same target never overlap and keep their order
+        results, max_running, max_running_by_target, imported = self.run_batch(
+            jobs, max_workers=3, barrier=threading.Barrier(3))
+        self.assertEqual([(True, 'imported')] * len(jobs), results)
+        self.assertEqual(3, max_running)
+        self.assertEqual({target: 1 for target in targets}, max_running_by_target)
+        self.assertEqual({target: ['dataset_0', 'dataset_1', 'dataset_2'] for target in targets}, imported)
+
+        # Within max_workers
+        results, max_running, max_running_by_target, imported = self.run_batch(jobs, max_workers=2)
+        self.assertEqual([(True, 'imported')] * len(jobs), results)
+        self.assertLessEqual(max_running, 2)
+        self.assertEqual({target: 1 for target in targets}, max_running_by_target)
+
+    def test_failed_jobs_do_not_abort_the_batch(self):
+        print("\nINFO: Validating batch import data with failing jobs...")
+        imported = list()
+        lock = threading.Lock()
+
+        def import_data(db, configuration):
+            if configuration.dataset == 'crash':
+                raise RuntimeError('ili2db crashed')
+            with lock:
+                imported.append((configuration.dbfile, configuration.dataset))
+            return True, 'imported'
+
+        def get_import_data_configuration(db, xtf_path, dataset='', baskets=list(), disable_validation=False):
+            if dataset == 'no_configuration':
+                raise ValueError('no models')
+            return original_get_import_data_configuration(db, xtf_path, dataset, baskets, disable_validation)
+
+        original_get_import_data_configuration = self.ili2db.get_import_data_configuration
+        xtf_path = get_test_path("xtf/test_field_data_capture_1_2.xtf")
+        jobs = [(self.db_connections[0], xtf_path, 'crash'),
+                (self.db_connections[0], xtf_path, 'after_crash'),  # Same target, runs after the failed job
+                (self.db_connections[1], xtf_path, 'no_configuration'),
+                (self.db_connections[1], xtf_path, 'dataset'),
+                (self.db_connections[2], xtf_path, 'dataset')]
+
+        with mock.patch.object(self.ili2db, 'import_data', side_effect=import_data), \
+                mock.patch.object(self.ili2db, 'get_import_data_configuration',
+                                  side_effect=get_import_data_configuration):
+            results, elapsed_time = self.ili2db.import_data_batch(jobs, max_workers=2)
+
+        self.assertEqual([False, True, False, True, True], [res for res, msg in results])
+        self.assertIn('ili2db crashed', results[0][1])
+        self.assertIn('no models', results[2][1])
+        self.assertEqual(sorted([(self.db_connections[0].dict_conn_params['dbfile'], 'after_crash'),
+                                 (self.db_connections[1].dict_conn_params['dbfile'], 'dataset'),
+                                 (self.db_connections[2].dict_conn_params['dbfile'], 'dataset')]),
+                         sorted(imported))
+
+
+if __name__ == '__main__':
+    nose2.main()
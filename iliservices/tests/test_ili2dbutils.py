@@ -0,0 +1,228 @@
+import nose2
+import unittest
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from unittest import mock
+
+from ..modelbaker.iliwrapper import ili2dbutils
+from ..modelbaker.iliwrapper.globals import DbIliMode
+from ..modelbaker.iliwrapper.ili2dbconfig import BaseConfiguration
+from ..modelbaker.iliwrapper.modeldirindex import ModelDirectoryIndex
+
+import logging
+logger = logging.getLogger(__name__)
+
+TEST_TOOL_VERSION = '99.0.0'
+
+# Stands for a java executable, it logs every time its version is asked for
+FAKE_JAVA = """#!{python}
+import os
+import sys
+
+with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), "versions.log"), "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+sys.stderr.write('openjdk version "{version}" 2023-10-17\\n')
+"""
+
+
+class Signal:
+    def __init__(self):
+        self.messages = list()
+
+    def emit(self, message):
+        self.messages.append(message)
+
+
+class TestIli2dbUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.bin_dir = os.path.join(self.base_dir, 'bin')
+        self.tool_dir = os.path.join(self.bin_dir, 'ili2pg-{}'.format(TEST_TOOL_VERSION))
+        self.downloads = list()
+
+        for name, value in [('_get_bin_dir', lambda: self.bin_dir),
+                            ('get_tool_version', lambda tool, db_ili_version: TEST_TOOL_VERSION),
+                            ('get_tool_url', lambda tool, db_ili_version: 'http://localhost/ili2pg.zip'),
+                            ('download_file', self.fake_download_file)]:
+            patcher = mock.patch.object(ili2dbutils, name, side_effect=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fake_download_file(self, url, filename, on_progress=None):
+        self.downloads.append(url)
+        time.sleep(0.2)  # Long enough for the other threads to ask for the tool meanwhile
+        with zipfile.ZipFile(filename, 'w') as z:
+            z.writestr('ili2pg-{}.jar'.format(TEST_TOOL_VERSION), b'jar')
+            z.writestr('libs/lib.jar', b'lib')
+        return filename
+
+    def test_concurrent_first_download(self):
+        results = list()
+        stderr = Signal()
+
+        def get_bin():
+            results.append(ili2dbutils.get_ili2db_bin(DbIliMode.ili2pg, 4, Signal(), stderr))
+
+        threads = [threading.Thread(target=get_bin) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        expected_file = os.path.join(self.tool_dir, 'ili2pg-{}.jar'.format(TEST_TOOL_VERSION))
+        self.assertEqual([expected_file] * 6, results)
+        self.assertEqual(1, len(self.downloads))
+        self.assertEqual([], stderr.messages)
+        self.assertTrue(os.path.isfile(os.path.join(self.tool_dir, 'libs', 'lib.jar')))
+        self.assertEqual(['ili2pg-{}'.format(TEST_TOOL_VERSION)], os.listdir(self.bin_dir))  # Nor zip, nor lock
+
+        # Once extracted, the tool is not downloaded again
+        self.assertEqual(expected_file, ili2dbutils.get_ili2db_bin(DbIliMode.ili2pg, 4, Signal(), stderr))
+        self.assertEqual(1, len(self.downloads))
+
+    def test_failed_download(self):
+        def fail(url, filename, on_progress=None):
+            self.downloads.append(url)
+            raise ili2dbutils.NetworkError(404, 'Not Found')
+
+        ili2dbutils.download_file.side_effect = fail
+        stderr = Signal()
+        self.assertIsNone(ili2dbutils.get_ili2db_bin(DbIliMode.ili2pg, 4, Signal(), stderr))
+        self.assertIn('Not Found', stderr.messages[0])
+
+        # Tried again next time
+        ili2dbutils.download_file.side_effect = self.fake_download_file
+        self.assertTrue(ili2dbutils.get_ili2db_bin(DbIliMode.ili2pg, 4, Signal(), stderr))
+        self.assertEqual(2, len(self.downloads))
+        self.assertEqual(['ili2pg-{}'.format(TEST_TOOL_VERSION)], os.listdir(self.bin_dir))
+
+
+class TestModelDirectories(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.root = os.path.join(self.base_dir, 'models')
+        for directory in ['', 'a', os.path.join('a', 'b'), 'empty']:
+            os.makedirs(os.path.join(self.root, directory), exist_ok=True)
+            if directory != 'empty':
+                open(os.path.join(self.root, directory, 'Model.ili'), 'w').close()
+
+        patcher = mock.patch.object(ili2dbutils, 'get_model_directory_index', return_value=ModelDirectoryIndex(None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_all_modeldir_in_path(self):
+        expected = ';'.join([self.root, os.path.join(self.root, 'a'), os.path.join(self.root, 'a', 'b')])
+        self.assertEqual(expected, ili2dbutils.get_all_modeldir_in_path(self.root))
+
+        # Listed once, however the path is written
+        subdirs = list()
+        self.assertEqual(expected, ili2dbutils.get_all_modeldir_in_path(self.root + os.sep, subdirs.append))
+        self.assertEqual(expected, ili2dbutils.get_all_modeldir_in_path(os.path.join(self.root, 'a', '..')))
+        self.assertEqual(expected.split(';'), subdirs)
+
+    def test_special_paths(self):
+        for path in ['%XTF_DIR', '%ILI_FROM_DB', 'http://models.interlis.ch/']:
+            self.assertEqual(path, ili2dbutils.get_all_modeldir_in_path(path))
+
+
+@unittest.skipIf(sys.platform.startswith('win'), 'The fake java is a script with a shebang')
+class TestJavaPath(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        ili2dbutils.invalidate_java_path_cache()
+        self.addCleanup(ili2dbutils.invalidate_java_path_cache)
+        self.configuration = BaseConfiguration()
+
+        # No other java than the fake ones
+        patcher = mock.patch.dict(os.environ, {'JAVA_HOME': self.get_fake_java_home('17.0.2'),
+                                               'PATH': os.path.join(self.base_dir, 'empty')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_fake_java_home(self, version):
+        java_home = os.path.join(self.base_dir, 'java-{}'.format(version))
+        os.makedirs(os.path.join(java_home, 'bin'))
+        java_path = os.path.join(java_home, 'bin', 'java')
+        with open(java_path, 'w') as f:
+            f.write(FAKE_JAVA.format(python=sys.executable, version=version))
+        os.chmod(java_path, os.stat(java_path).st_mode | stat.S_IEXEC)
+        return java_home
+
+    def get_version_calls(self, java_home):
+        log_path = os.path.join(java_home, 'bin', 'versions.log')
+        if not os.path.exists(log_path):
+            return 0
+        with open(log_path) as f:
+            return len(f.read().splitlines())
+
+    def test_cached_java_path(self):
+        java_home = os.environ['JAVA_HOME']
+        java_path = os.path.join(java_home, 'bin', 'java')
+        self.assertEqual(java_path, self.configuration.get_java_path())
+        self.assertEqual(1, self.get_version_calls(java_home))
+
+        # Hit, for any configuration
+        self.assertEqual(java_path, self.configuration.get_java_path())
+        self.assertEqual(java_path, ili2dbutils.get_java_path(BaseConfiguration()))
+        self.assertEqual(1, self.get_version_calls(java_home))
+
+        # Explicit invalidation
+        BaseConfiguration.invalidate_java_path_cache()
+        self.assertEqual(java_path, self.configuration.get_java_path())
+        self.assertEqual(2, self.get_version_calls(java_home))
+
+        # A changed binary (e.g., a JVM upgrade) is probed again
+        mtime = os.path.getmtime(java_path)
+        os.utime(java_path, (mtime + 10, mtime + 10))
+        self.assertEqual(java_path, self.configuration.get_java_path())
+        self.assertEqual(3, self.get_version_calls(java_home))
+        self.assertEqual(java_path, self.configuration.get_java_path())
+        self.assertEqual(3, self.get_version_calls(java_home))
+
+    def test_java_path_by_environment(self):
+        java_home = os.environ['JAVA_HOME']
+        self.configuration.get_java_path()
+
+        other_java_home = self.get_fake_java_home('21.0.1')
+        with mock.patch.dict(os.environ, {'JAVA_HOME': other_java_home}):
+            self.assertEqual(os.path.join(other_java_home, 'bin', 'java'), self.configuration.get_java_path())
+        self.assertEqual(os.path.join(java_home, 'bin', 'java'), self.configuration.get_java_path())
+        self.assertEqual(1, self.get_version_calls(java_home))
+        self.assertEqual(1, self.get_version_calls(other_java_home))
+
+    def test_configured_java_path(self):
+        self.configuration.java_path = '/opt/java/bin/java'
+        self.assertEqual('/opt/java/bin/java', self.configuration.get_java_path())
+        self.assertEqual(0, self.get_version_calls(os.environ['JAVA_HOME']))
+        self.assertEqual(dict(), ili2dbutils._java_path_cache)
+
+    def test_java_not_found(self):
+        java_home = os.environ['JAVA_HOME']
+        os.remove(os.path.join(java_home, 'bin', 'java'))
+        with self.assertRaises(ili2dbutils.JavaNotFoundError):
+            self.configuration.get_java_path()
+        self.assertEqual(dict(), ili2dbutils._java_path_cache)
+
+        # A cached java that was removed is looked for again
+        other_java_home = self.get_fake_java_home('21.0.1')
+        with mock.patch.dict(os.environ, {'JAVA_HOME': other_java_home}):
+            java_path = self.configuration.get_java_path()
+            os.remove(java_path)
+            with self.assertRaises(ili2dbutils.JavaNotFoundError):
+                self.configuration.get_java_path()
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,311 @@
+import nose2
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from ..modelbaker.iliwrapper.ilicache import IliCache, IliToppingFileCache
+from ..modelbaker.utils.qt_utils import download_file_if_modified
+
+import logging
+logger = logging.getLogger(__name__)
+
+ILIMODELS_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<TRANSFER xmlns="http://www.interlis.ch/INTERLIS2.3">
+<DATASECTION>
+<IliRepository09.RepositoryIndex BID="b1">
+{}
+</IliRepository09.RepositoryIndex>
+</DATASECTION>
+</TRANSFER>
+"""
+
+MODEL_TEMPLATE = """<IliRepository09.RepositoryIndex.ModelMetadata TID="{name}">
+<Name>{name}</Name>
+<Version>2024-01-01</Version>
+</IliRepository09.RepositoryIndex.ModelMetadata>"""
+
+ILISITE_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<TRANSFER xmlns="http://www.interlis.ch/INTERLIS2.3">
+<DATASECTION>
+<IliSite09.SiteMetadata BID="b1">
+<IliSite09.SiteMetadata.Site TID="1">
+<Name>test</Name>
+<subsidiarySite>
+{}
+</subsidiarySite>
+</IliSite09.SiteMetadata.Site>
+</IliSite09.SiteMetadata>
+</DATASECTION>
+</TRANSFER>
+"""
+
+SITE_TEMPLATE = "<IliSite09.RepositoryLocation_><value>{}</value></IliSite09.RepositoryLocation_>"
+
+ILIDATA_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<TRANSFER xmlns="http://www.interlis.ch/INTERLIS2.3">
+<DATASECTION>
+<DatasetIdx16.DataIndex BID="b1">
+<DatasetIdx16.DataIndex.DatasetMetadata TID="1">
+<id>{id}</id>
+<version>2024-01-01</version>
+<owner>mailto:test@example.com</owner>
+<files>
+<DatasetIdx16.DataFile>
+<fileFormat>text/plain</fileFormat>
+<file>
+<DatasetIdx16.File>
+<path>{path}</path>
+</DatasetIdx16.File>
+</file>
+</DatasetIdx16.DataFile>
+</files>
+</DatasetIdx16.DataIndex.DatasetMetadata>
+</DatasetIdx16.DataIndex>
+</DATASECTION>
+</TRANSFER>
+"""
+
+
+class ETagRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serves a directory, answering conditional requests (If-None-Match) and logging the response status per path.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.server.requests.append((self.path, 404))
+            self.send_error(404)
+            return
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+
+        if self.headers.get('If-None-Match') == etag:
+            self.server.requests.append((self.path, 304))
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.server.requests.append((self.path, 200))
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_repository_server(directory, delay=0):
+    handler = lambda *args, **kwargs: ETagRequestHandler(*args, directory=directory, **kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.requests = list()
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:{}".format(server.server_address[1])
+
+
+def write_ilimodels(directory, model_names):
+    with open(os.path.join(directory, 'ilimodels.xml'), 'w') as f:
+        f.write(ILIMODELS_TEMPLATE.format('\n'.join([MODEL_TEMPLATE.format(name=name) for name in model_names])))
+
+
+def write_ilisite(directory, site_urls):
+    with open(os.path.join(directory, 'ilisite.xml'), 'w') as f:
+        f.write(ILISITE_TEMPLATE.format('\n'.join([SITE_TEMPLATE.format(url) for url in site_urls])))
+
+
+class TestIliCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.main_repo_dir = tempfile.mkdtemp()
+        cls.sub_repo_dir = tempfile.mkdtemp()
+        cls.main_server, cls.main_url = start_repository_server(cls.main_repo_dir)
+        cls.sub_server, cls.sub_url = start_repository_server(cls.sub_repo_dir)
+
+    def setUp(self):
+        write_ilimodels(self.main_repo_dir, ['Main_Model_V1'])
+        write_ilisite(self.main_repo_dir, [self.sub_url])
+        write_ilimodels(self.sub_repo_dir, ['Sub_Model_V1'])
+        write_ilisite(self.sub_repo_dir, [self.main_url + '/'])  # Sites referencing each other
+
+        self.main_server.requests.clear()
+        self.sub_server.requests.clear()
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def get_ilicache(self, revalidate_interval):
+        ilicache = IliCache(None)
+        ilicache.CACHE_PATH = self.cache_path
+        ilicache.REVALIDATE_INTERVAL = revalidate_interval
+        return ilicache
+
+    def test_revalidation(self):
+        print("\nINFO: Validating IliCache revalidation against a local HTTP repository...")
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(self.main_url)
+        self.assertEqual(['Main_Model_V1', 'Sub_Model_V1'], sorted(ilicache.model_names))
+        self.assertIn(('/ilimodels.xml', 200), self.main_server.requests)
+
+        # Warm start: unchanged files are not downloaded again
+        self.main_server.requests.clear()
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(self.main_url)
+        self.assertEqual(['Main_Model_V1', 'Sub_Model_V1'], sorted(ilicache.model_names))
+        self.assertEqual([('/ilimodels.xml', 304), ('/ilisite.xml', 304)], self.main_server.requests)
+
+        # Recently checked files are taken from the store, without any request
+        self.main_server.requests.clear()
+        ilicache = self.get_ilicache(3600)
+        ilicache.download_repository(self.main_url)
+        self.assertEqual(['Main_Model_V1', 'Sub_Model_V1'], sorted(ilicache.model_names))
+        self.assertEqual([], self.main_server.requests)
+
+        # Changes in the repository are detected
+        write_ilimodels(self.main_repo_dir, ['Main_Model_V1', 'Main_Model_V2'])
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(self.main_url)
+        self.assertEqual(['Main_Model_V1', 'Main_Model_V2', 'Sub_Model_V1'], sorted(ilicache.model_names))
+
+    def test_site_cycle(self):
+        print("\nINFO: Validating IliCache with sites referencing each other...")
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(self.main_url)
+        self.assertEqual(['Main_Model_V1', 'Sub_Model_V1'], sorted(ilicache.model_names))
+        self.assertEqual(2, len(self.main_server.requests))
+        self.assertEqual(2, len(self.sub_server.requests))
+
+    def test_discovery_timeout(self):
+        print("\nINFO: Validating IliCache discovery deadline with a slow subsidiary site...")
+        slow_server, slow_url = start_repository_server(self.sub_repo_dir, delay=3)
+        local_repo_dir = tempfile.mkdtemp()
+        write_ilimodels(local_repo_dir, ['Local_Model_V1'])
+        write_ilisite(local_repo_dir, [slow_url])
+
+        ilicache = self.get_ilicache(0)
+        ilicache.DISCOVERY_TIMEOUT = 1
+        start_time = time.time()
+        ilicache.download_repository(local_repo_dir)
+        self.assertLess(time.time() - start_time, 3)
+        self.assertEqual(['Local_Model_V1'], ilicache.model_names)
+
+        slow_server.shutdown()
+        shutil.rmtree(local_repo_dir, ignore_errors=True)
+
+    def test_local_repository(self):
+        print("\nINFO: Validating IliCache with a local repository...")
+        local_repo_dir = tempfile.mkdtemp()
+        write_ilimodels(local_repo_dir, ['Local_Model_V1'])
+
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(local_repo_dir)
+        self.assertEqual(['Local_Model_V1'], ilicache.model_names)
+
+        write_ilimodels(local_repo_dir, ['Local_Model_V1', 'Local_Model_V2'])
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(local_repo_dir)
+        self.assertEqual(['Local_Model_V1', 'Local_Model_V2'], sorted(ilicache.model_names))
+
+        shutil.rmtree(local_repo_dir, ignore_errors=True)
+
+    def test_sites_of_the_same_host(self):
+        print("\nINFO: Validating IliCache with several sites of the same host...")
+        nested_repo_dir = os.path.join(self.main_repo_dir, 'nested')
+        os.makedirs(nested_repo_dir, exist_ok=True)
+        write_ilimodels(nested_repo_dir, ['Nested_Model_V1'])
+        write_ilisite(nested_repo_dir, [])
+        write_ilisite(self.main_repo_dir, [self.sub_url, self.main_url + '/nested'])
+
+        ilicache = self.get_ilicache(0)
+        ilicache.download_repository(self.main_url)
+
+        # Each site has its own files in the cache
+        netloc_dir = os.path.join(self.cache_path, self.main_url.split('//')[1])
+        with open(os.path.join(netloc_dir, 'ilimodels.xml')) as f:
+            self.assertIn('Main_Model_V1', f.read())
+        with open(os.path.join(netloc_dir, 'nested', 'ilimodels.xml')) as f:
+            self.assertIn('Nested_Model_V1', f.read())
+
+        # Concurrent downloads of the same file don't share temporary files
+        target = os.path.join(self.cache_path, 'ilimodels.xml')
+        errors = list()
+
+        def download():
+            try:
+                download_file_if_modified(self.main_url + '/ilimodels.xml', target, timeout=10)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=download) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        with open(target) as f:
+            self.assertIn('Main_Model_V1', f.read())
+
+        part_files = [name for path, dirs, names in os.walk(self.cache_path) for name in names if '.part' in name]
+        self.assertEqual([], part_files)
+
+        shutil.rmtree(nested_repo_dir, ignore_errors=True)
+
+    def test_topping_file_cache(self):
+        print("\nINFO: Validating IliToppingFileCache downloads on every refresh...")
+        app = QCoreApplication.instance() or QCoreApplication([])
+        local_repo_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(local_repo_dir, 'layerstyle'))
+        with open(os.path.join(local_repo_dir, 'layerstyle', 'style.qml'), 'w') as f:
+            f.write('<qgis/>')
+        with open(os.path.join(local_repo_dir, 'ilidata.xml'), 'w') as f:
+            f.write(ILIDATA_TEMPLATE.format(id='test_style', path='layerstyle/style.qml'))
+
+        for i in range(2):  # The second time, ilidata.xml is known by the cache
+            topping_cache = IliToppingFileCache(None, file_ids=['ilidata:test_style'])
+            topping_cache.CACHE_PATH = self.cache_path
+            topping_cache.directories = [local_repo_dir]
+            downloaded_files = list()
+            topping_cache.file_download_succeeded.connect(
+                lambda dataset_id, path: downloaded_files.append((dataset_id, path)))
+
+            loop = QEventLoop()
+            finished = list()
+            topping_cache.download_finished.connect(lambda: finished.append(True))
+            topping_cache.download_finished.connect(loop.quit)
+            QTimer.singleShot(5000, loop.quit)
+            topping_cache.refresh()
+            if not finished:
+                loop.exec_()
+
+            self.assertEqual([True], finished)
+            self.assertEqual([('ilidata:test_style', os.path.join(local_repo_dir, 'layerstyle', 'style.qml'))],
+                             downloaded_files)
+
+        shutil.rmtree(local_repo_dir, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.main_server.shutdown()
+        cls.sub_server.shutdown()
+        for directory in [cls.main_repo_dir, cls.sub_repo_dir]:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    nose2.main()
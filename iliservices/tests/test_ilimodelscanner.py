@@ -0,0 +1,147 @@
+import nose2
+import unittest
+import glob
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from ..config.general_config import CUSTOM_MODEL_DIR
+from ..modelbaker.iliwrapper import ilimodelscanner
+from ..modelbaker.iliwrapper.ilicache import IliCache
+from ..modelbaker.iliwrapper.ilimodelscanner import clear_ili_scanner_cache, scan_ili_models
+
+import logging
+logger = logging.getLogger(__name__)
+
+ILI_MODEL = """INTERLIS 2.3;
+
+!! MODEL Commented (en) AT "mailto:test@example.com" VERSION "2000-01-01" =
+MODEL {name} (es) AT "mailto:test@example.com" VERSION "{version}" =
+  TOPIC Predios =
+    !! Ubicación
+    CLASS Predio =
+      Nombre : TEXT*40;
+    END Predio;
+  END Predios;
+END {name}.
+"""
+
+
+def parse_ili_file(ilipath, encoding):
+    """
+    Line by line parser used before the scanner, to compare results with.
+    """
+    models = list()
+    re_model = re.compile(r"\s*MODEL\s*([\w\d_-]+).*")
+    re_model_version = re.compile(r'VERSION "([ \w\d\._-]+)".*')
+    with open(ilipath, encoding=encoding) as file:
+        model = None
+        for lineno, line in enumerate(file):
+            line = line.split("!!")[0]
+            result = re_model.search(line)
+            if result:
+                model = dict()
+                model["name"] = result.group(1)
+                model["version"] = ""
+                model["repository"] = ilipath
+                models += [model]
+
+            result = re_model_version.search(line)
+            if result:
+                model["version"] = result.group(1)
+                model = None
+
+    return models
+
+
+class TestIliModelScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        clear_ili_scanner_cache()
+        self.addCleanup(clear_ili_scanner_cache)
+
+        scan = ilimodelscanner._scan
+        self.scans = list()
+
+        def counted_scan(data, encoding=None):
+            self.scans.append(encoding)
+            return scan(data, encoding)
+
+        patcher = mock.patch.object(ilimodelscanner, '_scan', side_effect=counted_scan)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_model(self, name, version='2026-10-18', encoding='utf-8'):
+        ilipath = os.path.join(self.base_dir, '{}.ili'.format(name))
+        with open(ilipath, 'w', encoding=encoding) as f:
+            f.write(ILI_MODEL.format(name=name, version=version))
+        return ilipath
+
+    def test_same_models_as_line_parser(self):
+        ilipaths = sorted(glob.glob(os.path.join(CUSTOM_MODEL_DIR, '*.ili')))
+        self.assertTrue(ilipaths)
+        ilicache = IliCache(None)
+        for ilipath in ilipaths:
+            expected = parse_ili_file(ilipath, 'utf-8')
+            self.assertTrue(expected, ilipath)
+            self.assertEqual(expected, ilicache.parse_ili_file(ilipath, 'utf-8'), ilipath)
+            self.assertEqual(expected, ilicache.process_ili_file(ilipath), ilipath)
+
+        ilipath = self.write_model('Catastro_Latin1_V1', encoding='latin1')
+        self.assertEqual(parse_ili_file(ilipath, 'latin1'), ilicache.process_ili_file(ilipath))
+
+    def test_encoding(self):
+        ilipath = self.write_model('Catastro_Latin1_V1', encoding='latin1')
+        self.assertEqual(([{'name': 'Catastro_Latin1_V1', 'version': '2026-10-18'}], 'latin1'),
+                         scan_ili_models(ilipath))
+
+        # An explicit encoding is honoured, as the line parser did
+        ilicache = IliCache(None)
+        with self.assertRaises(UnicodeDecodeError):
+            ilicache.parse_ili_file(ilipath, 'utf-8')
+        self.assertEqual('Catastro_Latin1_V1', ilicache.parse_ili_file(ilipath, 'latin1')[0]['name'])
+
+    def test_memoized_scan(self):
+        ilipath = self.write_model('Catastro_V1')
+        models, encoding = scan_ili_models(ilipath)
+        self.assertEqual([{'name': 'Catastro_V1', 'version': '2026-10-18'}], models)
+        self.assertEqual('utf-8', encoding)
+
+        # Hit, returning copies that callers can modify
+        models[0]['repository'] = ilipath
+        self.assertEqual(([{'name': 'Catastro_V1', 'version': '2026-10-18'}], 'utf-8'), scan_ili_models(ilipath))
+        self.assertEqual([None], self.scans)
+
+        # Memoized per encoding as well
+        scan_ili_models(ilipath, 'utf-8')
+        scan_ili_models(ilipath, 'utf-8')
+        self.assertEqual([None, 'utf-8'], self.scans)
+
+    def test_changed_file(self):
+        ilipath = self.write_model('Catastro_V1')
+        scan_ili_models(ilipath)
+        mtime_ns = os.stat(ilipath).st_mtime_ns
+
+        # Same size, another mtime
+        self.write_model('Catastro_V1', version='2026-10-19')
+        os.utime(ilipath, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertEqual('2026-10-19', scan_ili_models(ilipath)[0][0]['version'])
+        self.assertEqual(2, len(self.scans))
+
+        # Same mtime, another size
+        self.write_model('Catastro_V1', version='2026-10-19 1')
+        os.utime(ilipath, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+        self.assertEqual('2026-10-19 1', scan_ili_models(ilipath)[0][0]['version'])
+        self.assertEqual(3, len(self.scans))
+
+        os.remove(ilipath)
+        with self.assertRaises(OSError):
+            scan_ili_models(ilipath)
+
+
+if __name__ == '__main__':
+    nose2.main()
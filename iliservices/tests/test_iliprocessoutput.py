@@ -0,0 +1,109 @@
+import nose2
+import unittest
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from ..modelbaker.iliwrapper.iliprocessoutput import ProcessOutput, arun_process, stream_process_output
+
+import logging
+logger = logging.getLogger(__name__)
+
+LINES = 20000  # Far more than a pipe buffer holds
+
+# Writes UTF-8 to both streams, so that the process blocks if any of them is not read
+SCRIPT = """
+import sys
+for i in range({lines}):
+    sys.stdout.buffer.write("Info: line {{}}\\n".format(i).encode("utf-8"))
+    sys.stderr.buffer.write("Warning: línea {{}}\\n".format(i).encode("utf-8"))
+sys.stderr.buffer.write(b"Info: ...done\\n\\n")
+sys.exit(3)
+"""
+
+
+def get_command(lines=LINES):
+    return [sys.executable, '-c', SCRIPT.format(lines=lines)]
+
+
+class TestProcessOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+
+    def run_process(self, output):
+        stdout = list()
+        process = subprocess.Popen(get_command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        exit_code = stream_process_output(process, 'utf-8', stdout.append, output.append)
+        return exit_code, stdout
+
+    def test_stream_process_output(self):
+        output = ProcessOutput(max_lines=LINES + 2)
+        exit_code, stdout = self.run_process(output)
+
+        self.assertEqual(3, exit_code)
+        self.assertEqual(['Info: line {}'.format(i) for i in range(LINES)], stdout)
+        self.assertEqual(['Warning: línea {}'.format(i) for i in range(LINES)] + ['Info: ...done', ''],
+                         list(output.lines))
+
+    def test_truncated_output(self):
+        output_path = os.path.join(self.base_dir, 'ili2db.log')
+        output = ProcessOutput(max_lines=100, file_path=output_path)
+        self.addCleanup(output.close)
+        self.run_process(output)
+        output.close()
+
+        # Only the last lines are kept in memory, all of them are counted
+        self.assertEqual(LINES + 2, output.line_count)
+        self.assertEqual(100, len(output.lines))
+        self.assertEqual('Warning: línea {}'.format(LINES - 98), output.lines[0])
+        self.assertEqual('\n'.join(output.lines), output.text())
+        self.assertEqual('Info: ...done', output.last_line())
+
+        # The whole output is in the file
+        with open(output_path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        self.assertEqual(LINES + 3, len(lines))
+        self.assertEqual('Warning: línea 0', lines[0])
+        self.assertEqual(['Info: ...done', '', ''], lines[-3:])
+
+        # Appended to, so that several runs can share a log file
+        output = ProcessOutput(max_lines=100, file_path=output_path)
+        output.append('Info: next run')
+        output.close()
+        output.close()
+        with open(output_path, encoding='utf-8') as f:
+            self.assertTrue(f.read().endswith('\n\nInfo: next run\n'))
+
+    def test_last_line(self):
+        output = ProcessOutput(max_lines=2)
+        self.assertEqual('', output.last_line())
+        output.append('Info: ...done')
+        output.append('  ')
+        self.assertEqual('Info: ...done', output.last_line())
+        output.append('')
+        self.assertEqual('', output.last_line())  # Out of the kept lines
+
+    def test_async_process(self):
+        stdout = list()
+        output = ProcessOutput(max_lines=10)
+        exit_code = asyncio.run(arun_process(get_command(), 'utf-8', stdout.append, output.append))
+        self.assertEqual(3, exit_code)
+        self.assertEqual(LINES, len(stdout))
+        self.assertEqual(LINES + 2, output.line_count)
+        self.assertEqual('Info: ...done', output.last_line())
+
+    def test_async_timeout(self):
+        command = [sys.executable, '-c', 'import time; print("Info: started", flush=True); time.sleep(60)']
+        stdout = list()
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(arun_process(command, 'utf-8', stdout.append, stdout.append, timeout=1))
+        self.assertEqual(['Info: started'], stdout)
+
+
+if __name__ == '__main__':
+    nose2.main()
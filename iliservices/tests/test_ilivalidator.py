@@ -1,10 +1,19 @@
+import asyncio
 import nose2
 import unittest
+import sys
 import tempfile
+import threading
+import time
+from unittest import mock
 
 from .utils import get_test_path
 
+from ..config.general_config import JAVA_REQUIRED_VERSION
 from ..core.ilivalidator import IliValidator
+from ..modelbaker.iliwrapper.ili2dbutils import JavaNotFoundError
+from ..modelbaker.iliwrapper import iliprocessoutput
+from ..modelbaker.iliwrapper.ilivalidator import ilivalidator
 
 import logging
 logger = logging.getLogger(__name__)
@@ -77,6 +86,67 @@ class TestIliValidator(unittest.TestCase):
         res_validation, msg_validation = self.ilivalidator.validate_xtf(configuration)
         self.assertFalse(res_validation, msg_validation)
 
+    def test_async_validations(self):
+        print("\nINFO: Validate several xtf files concurrently")
+        xtf_paths = [get_test_path("xtf/test_valid_data_fdc_12.xtf"),
+                     get_test_path("xtf/test_invalid_data_fdc_12.xtf")]
+        configurations = [self.ilivalidator.get_ilivalidator_configuration(xtf_path, output_dir=tempfile.mkdtemp())
+                          for xtf_path in xtf_paths]
+
+        async def validate_all():
+            return await asyncio.gather(*[self.ilivalidator.avalidate_xtf(configuration)
+                                          for configuration in configurations])
+
+        (res_valid, msg_valid), (res_invalid, msg_invalid) = asyncio.run(validate_all())
+        self.assertTrue(res_valid, msg_valid)
+        self.assertFalse(res_invalid, msg_invalid)
+
+    def test_async_validation_timeout(self):
+        print("\nINFO: Validate a xtf with a timeout too short to finish")
+        xtf_path = get_test_path("xtf/test_valid_data_fdc_12.xtf")
+        configuration = self.ilivalidator.get_ilivalidator_configuration(xtf_path, output_dir=tempfile.mkdtemp())
+
+        # A process that outlasts the timeout stands for ilivalidator, so that the test doesn't depend on java
+        prepare_threads = list()
+
+        def prepare_command(validator):
+            prepare_threads.append(threading.current_thread())
+            return [sys.executable, '-c', 'import time; time.sleep(30)']
+
+        processes = list()
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        async def create_process(*args, **kwargs):
+            process = await create_subprocess_exec(*args, **kwargs)
+            processes.append(process)
+            return process
+
+        start_time = time.monotonic()
+        with mock.patch.object(ilivalidator.IliValidator, '_prepare_command', prepare_command), \
+                mock.patch.object(iliprocessoutput.asyncio, 'create_subprocess_exec', create_process):
+            res_validation, msg_validation = asyncio.run(self.ilivalidator.avalidate_xtf(configuration, timeout=0.5))
+
+        self.assertFalse(res_validation, msg_validation)
+        self.assertEqual("The validation was cancelled, it took more than 0.5 seconds.", msg_validation)
+        self.assertLess(time.monotonic() - start_time, 10)
+
+        # The process was killed, and the command was prepared out of the event loop thread
+        self.assertEqual(1, len(processes))
+        self.assertIsNotNone(processes[0].returncode)
+        self.assertNotEqual(0, processes[0].returncode)
+        self.assertIsNot(threading.main_thread(), prepare_threads[0])
+
+    def test_java_not_found(self):
+        print("\nINFO: Validate a xtf without java")
+        xtf_path = get_test_path("xtf/test_valid_data_fdc_12.xtf")
+        configuration = self.ilivalidator.get_ilivalidator_configuration(xtf_path, output_dir=tempfile.mkdtemp())
+        expected_msg = ("Java {} could not be found. You can configure the JAVA_HOME environment variable manually "
+                        "and try again.").format(JAVA_REQUIRED_VERSION)
+
+        with mock.patch.object(ilivalidator, 'get_java_path', side_effect=JavaNotFoundError('')):
+            self.assertEqual((False, expected_msg), self.ilivalidator.validate_xtf(configuration))
+            self.assertEqual((False, expected_msg), asyncio.run(self.ilivalidator.avalidate_xtf(configuration)))
+
     @classmethod
     def tearDownClass(cls):
         pass
@@ -0,0 +1,116 @@
+import nose2
+import unittest
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from unittest import mock
+
+from ..modelbaker.iliwrapper import iliworkerpool
+from ..modelbaker.iliwrapper.iliworkerpool import (IliWorkerPool,
+                                                   get_worker_jvm_options,
+                                                   split_java_command)
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Stands for a java executable running IliWorker: it speaks the worker protocol (in UTF-8, like the launcher) and
+# logs its command lines
+FAKE_JAVA = """#!{python}
+import os
+import sys
+
+args = sys.argv[1:]
+if args == ["-version"]:
+    sys.stderr.write('openjdk version "{version}" 2023-10-17\\n')
+    sys.exit(0)
+
+with open(os.path.join(os.path.dirname(os.path.realpath(__file__)), "jvms.log"), "a") as f:
+    f.write(" ".join(args) + "\\n")
+
+sys.stdout.write("@@ILIWORKER_READY@@\\n")
+sys.stdout.flush()
+for line in sys.stdin.buffer:
+    job_args = line.decode("utf-8").rstrip("\\n").split("\\x1f")
+    sys.stderr.buffer.write(("Info: " + "|".join(job_args) + "\\n").encode("utf-8"))
+    sys.stderr.buffer.write("@@ILIWORKER_DONE@@ {{}}\\n".format(1 if "--fail" in job_args else 0).encode("utf-8"))
+    sys.stderr.flush()
+"""
+
+
+@unittest.skipIf(sys.platform.startswith('win'), 'The fake java is a script with a shebang')
+class TestIliWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.cache_path = os.path.join(self.base_dir, 'cache')
+        patcher = mock.patch.object(iliworkerpool, 'WORKER_CACHE_PATH', self.cache_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_fake_java(self, version):
+        java_dir = os.path.join(self.base_dir, 'java-{}'.format(version), 'bin')
+        os.makedirs(java_dir)
+        java_path = os.path.join(java_dir, 'java')
+        with open(java_path, 'w') as f:
+            f.write(FAKE_JAVA.format(python=sys.executable, version=version))
+        os.chmod(java_path, os.stat(java_path).st_mode | stat.S_IEXEC)
+        return java_path
+
+    def get_jvm_commands(self, java_path):
+        with open(os.path.join(os.path.dirname(java_path), 'jvms.log')) as f:
+            return f.read().splitlines()
+
+    def add_compiled_worker(self):
+        os.makedirs(self.cache_path)
+        open(os.path.join(self.cache_path, 'IliWorker.class'), 'w').close()
+
+    def test_split_java_command(self):
+        self.assertEqual(('java', [], 'ili2pg.jar', ['--schemaimport', '--models', 'A']),
+                         split_java_command(['java', '-jar', 'ili2pg.jar', '--schemaimport', '--models', 'A']))
+        self.assertEqual(('java', ['-Xmx2g', '-Dfile.encoding=UTF-8'], 'ili2pg.jar', []),
+                         split_java_command(['java', '-Xmx2g', '-Dfile.encoding=UTF-8', '-jar', 'ili2pg.jar']))
+        self.assertIsNone(split_java_command(['java', '-cp', 'ili2pg.jar', 'ch.ehi.ili2pg.PgMain', '-jar']))
+        self.assertIsNone(split_java_command(['java', '-Xmx2g', '-jar']))
+        self.assertIsNone(split_java_command(['java', '--version']))
+        self.assertIsNone(split_java_command(1001))  # IliExecutable.ILI2DB_NOT_FOUND
+
+    def test_worker_runs_jobs(self):
+        java_path = self.get_fake_java('21.0.1')
+        self.add_compiled_worker()
+        pool = IliWorkerPool(size=1)
+        self.addCleanup(pool.shutdown)
+
+        lines = list()
+        command = [java_path, '-Xmx1g', '-jar', 'ili2pg.jar', '--schemaimport', '--dbschema', 'my schema']
+        self.assertEqual(0, pool.execute_command(command, on_line=lines.append))
+        self.assertEqual(['Info: --schemaimport|--dbschema|my schema'], lines)
+        self.assertEqual(1, pool.execute_command(command + ['--fail'], on_line=lines.append))
+
+        # Whatever the encoding of the ili2db command is, the protocol is UTF-8
+        del lines[:]
+        self.assertEqual(0, pool.execute_command(command[:-1] + ['Zürich Grundstücke'], on_line=lines.append))
+        self.assertEqual(['Info: --schemaimport|--dbschema|Zürich Grundstücke'], lines)
+
+        # Both jobs run in the same JVM, started with the options of the command plus the ones the worker needs
+        self.assertEqual(['-Xmx1g -Djava.security.manager=allow -cp {} IliWorker ili2pg.jar'.format(self.cache_path)],
+                         self.get_jvm_commands(java_path))
+
+    def test_jvm_options_by_java_version(self):
+        self.assertEqual(['-Djava.security.manager=allow'], get_worker_jvm_options(self.get_fake_java('17.0.2')))
+        self.assertEqual([], get_worker_jvm_options(self.get_fake_java('1.8.0_392')))
+
+    def test_fallback_without_javac(self):
+        java_path = os.path.join(self.base_dir, 'missing', 'bin', 'java')
+        pool = IliWorkerPool(size=1)
+        self.addCleanup(pool.shutdown)
+
+        self.assertIsNone(pool.execute_command([java_path, '-jar', 'ili2pg.jar', '--schemaimport']))
+        self.assertIsNone(pool.execute(java_path, 'ili2pg.jar', ['--schemaimport']))
+        self.assertEqual([], os.listdir(self.cache_path))  # No build leftovers
+
+
+if __name__ == '__main__':
+    nose2.main()
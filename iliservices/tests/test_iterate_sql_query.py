@@ -0,0 +1,173 @@
+import nose2
+import unittest
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+import psycopg2
+import psycopg2.extras
+
+from .test_pg_connection_pool import FakeConnection, FakeCursor
+from .utils import get_gpkg_conn_from_path
+
+from ..db import pg_connection_pool
+from ..db.pg_connection_pool import close_pg_connection_pools
+from ..db.pg_connector import PGConnector
+
+import logging
+logger = logging.getLogger(__name__)
+
+ROWS = [(1, 'parcel 1', 100.5), (2, 'parcel 2', 80.0), (3, 'parcel 3', None), (4, 'parcel 4', 35.2),
+        (5, 'parcel 5', 12.0)]
+
+
+class StreamCursor(FakeCursor):
+    """
+    Named (server-side) cursor answering SELECTs with ROWS, and failing for any other statement.
+    """
+
+    description = [('t_id',), ('number',), ('area',)]
+
+    def __init__(self, connection, name, cursor_factory):
+        FakeCursor.__init__(self, connection)
+        self.name = name
+        self.cursor_factory = cursor_factory
+        self.itersize = None
+        self.closed = False
+        self._rows = list()
+
+    def execute(self, query, *args):
+        FakeCursor.execute(self, query, *args)
+        if not query.startswith('SELECT'):
+            raise psycopg2.ProgrammingError('syntax error at or near "{}"'.format(query.split()[0]))
+        self._rows = list(ROWS)
+
+    def __iter__(self):
+        while self._rows:
+            yield self._rows.pop(0)
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class StreamConnection(FakeConnection):
+    def __init__(self, uri, connection_factory=None):
+        FakeConnection.__init__(self, uri, connection_factory)
+        self.named_cursors = list()
+
+    def cursor(self, name=None, cursor_factory=None):
+        if name is None:
+            return FakeCursor(self)
+        cursor = StreamCursor(self, name, cursor_factory)
+        self.named_cursors.append(cursor)
+        return cursor
+
+
+class TestPGIterateSqlQuery(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(pg_connection_pool.psycopg2, 'connect', side_effect=StreamConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pg_connection_pools)
+
+        conn_dict = {'host': 'localhost', 'port': '5432', 'database': 'fake', 'username': 'user',
+                     'password': 'pass', 'schema': 'schema'}
+        self.db = PGConnector(None, conn_dict=conn_dict)
+        res, msg = self.db.open_connection()
+        self.assertTrue(res, msg)
+        self.addCleanup(self.db.close_connection)
+
+    def test_rows(self):
+        res, rows = self.db.iterate_sql_query('SELECT * FROM parcel', itersize=2)
+        self.assertTrue(res)
+
+        # Declared eagerly on a named cursor, then fetched in chunks of itersize as rows are consumed
+        cursor = self.db.conn.named_cursors[-1]
+        self.assertTrue(cursor.name.startswith('iliservices_'))
+        self.assertIs(psycopg2.extras.RealDictCursor, cursor.cursor_factory)
+        self.assertEqual(2, cursor.itersize)
+        self.assertEqual(['SELECT * FROM parcel'], self.db.conn.queries[-1:])
+
+        self.assertEqual(ROWS, list(rows))
+        self.assertTrue(cursor.closed)
+
+        # Each query gets its own cursor
+        self.db.iterate_sql_query('SELECT * FROM parcel')
+        self.assertNotEqual(cursor.name, self.db.conn.named_cursors[-1].name)
+
+    def test_batches(self):
+        res, batches = self.db.iterate_sql_query('SELECT * FROM parcel', batch_size=2)
+        self.assertTrue(res)
+        self.assertIsNone(self.db.conn.named_cursors[-1].cursor_factory)
+
+        batches = list(batches)
+        self.assertEqual(3, len(batches))
+        self.assertEqual({'t_id': [1, 2], 'number': ['parcel 1', 'parcel 2'], 'area': [100.5, 80.0]}, batches[0])
+        self.assertEqual({'t_id': [5], 'number': ['parcel 5'], 'area': [12.0]}, batches[-1])
+
+    def test_unconsumed_rows(self):
+        res, rows = self.db.iterate_sql_query('SELECT * FROM parcel')
+        self.assertEqual(ROWS[0], next(rows))
+        rows.close()
+        self.assertTrue(self.db.conn.named_cursors[-1].closed)
+
+    def test_invalid_query(self):
+        rollbacks = self.db.conn.rollbacks
+        res, error = self.db.iterate_sql_query('SELEC * FROM parcel')
+        self.assertFalse(res)
+        self.assertIsInstance(error, psycopg2.ProgrammingError)
+        self.assertTrue(self.db.conn.named_cursors[-1].closed)
+
+        # The aborted transaction is rolled back, so that the connection can be used again
+        self.assertEqual(rollbacks + 1, self.db.conn.rollbacks)
+        res, rows = self.db.iterate_sql_query('SELECT * FROM parcel')
+        self.assertEqual(ROWS, list(rows))
+
+
+class TestGPKGIterateSqlQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        gpkg_path = os.path.join(self.base_dir, 'parcels.gpkg')
+        conn = sqlite3.connect(gpkg_path)
+        conn.execute("CREATE TABLE parcel (t_id INTEGER PRIMARY KEY, number TEXT, area REAL)")
+        conn.executemany("INSERT INTO parcel VALUES (?, ?, ?)", ROWS)
+        conn.commit()
+        conn.close()
+
+        self.db = get_gpkg_conn_from_path(gpkg_path)
+        self.addCleanup(self.db.close_connection)
+
+    def test_rows(self):
+        res, rows = self.db.iterate_sql_query('SELECT * FROM parcel ORDER BY t_id')
+        self.assertTrue(res)
+        rows = list(rows)
+        self.assertEqual(ROWS, [tuple(row) for row in rows])
+        self.assertEqual('parcel 1', rows[0]['number'])
+
+    def test_batches(self):
+        res, batches = self.db.iterate_sql_query('SELECT t_id, area FROM parcel ORDER BY t_id', batch_size=2)
+        self.assertTrue(res)
+        self.assertEqual([{'t_id': [1, 2], 'area': [100.5, 80.0]},
+                          {'t_id': [3, 4], 'area': [None, 35.2]},
+                          {'t_id': [5], 'area': [12.0]}], list(batches))
+
+        res, batches = self.db.iterate_sql_query('SELECT * FROM parcel WHERE t_id > 5', batch_size=2)
+        self.assertEqual([], list(batches))
+
+    def test_invalid_query(self):
+        res, error = self.db.iterate_sql_query('SELECT * FROM building')
+        self.assertFalse(res)
+        self.assertIsInstance(error, sqlite3.OperationalError)
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,109 @@
+import nose2
+import unittest
+from unittest import mock
+
+from ..db import model_hierarchy
+from ..db.db_connector import DBConnector
+from ..db.model_hierarchy import ModelHierarchy, get_model_hierarchy
+
+import logging
+logger = logging.getLogger(__name__)
+
+LST_MODELS = ["D_G_C_V2_9_6{ LADM_COL_V1_2 ISO19107_PLANAS_V1} D_SNR_V2_9_6{ LADM_COL_V1_2} "
+              "D_I_I_V2_9_6{ D_SNR_V2_9_6 D_G_C_V2_9_6}",
+              "LADM_COL_V1_2{ ISO19107_PLANAS_V1}",
+              "ISO19107_PLANAS_V1",
+              "Catastro_V1"]
+
+TRAFO_MODELS = [["D_G_C_V2_9_6"],
+                ["D_I_I_V2_9_6", "Catastro_V1"],
+                ["LADM_COL_V1_2", "LADM_COL_V1_2"],
+                ["Unknown_V1"],
+                []]
+
+
+def resolve_models(lst_models, trafo_models):
+    """
+    Implementation used before the memoized ModelHierarchy, to compare results with.
+    """
+    model_hierarchy = DBConnector._parse_models_from_db_meta_attrs(lst_models)
+
+    dependencies = list()
+    for model in trafo_models:
+        dependencies.extend(model_hierarchy.get(model, list()))
+
+    return list(set(dependencies + trafo_models))
+
+
+class TestModelHierarchy(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(model_hierarchy._hierarchies, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        parse_model_hierarchy = model_hierarchy.parse_model_hierarchy
+        self.parsed = list()
+
+        def parse(lst_models):
+            self.parsed.append(lst_models)
+            return parse_model_hierarchy(lst_models)
+
+        patcher = mock.patch.object(model_hierarchy, 'parse_model_hierarchy', side_effect=parse)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_models_as_before(self):
+        for trafo_models in TRAFO_MODELS:
+            expected = sorted(resolve_models(LST_MODELS, trafo_models))
+            self.assertEqual(expected, DBConnector._resolve_models(LST_MODELS, trafo_models), trafo_models)
+
+        self.assertEqual(['D_G_C_V2_9_6', 'ISO19107_PLANAS_V1', 'LADM_COL_V1_2'],
+                         DBConnector._resolve_models(LST_MODELS, ['D_G_C_V2_9_6']))
+
+    def test_memoized_hierarchy(self):
+        hierarchy = get_model_hierarchy(LST_MODELS)
+        self.assertIsInstance(hierarchy, ModelHierarchy)
+        self.assertEqual(frozenset(['LADM_COL_V1_2', 'ISO19107_PLANAS_V1']), hierarchy.dependencies['D_G_C_V2_9_6'])
+
+        # Hit, for the same content in any order (e.g., another schema with the same models)
+        self.assertIs(hierarchy, get_model_hierarchy(list(LST_MODELS)))
+        self.assertIs(hierarchy, get_model_hierarchy(list(reversed(LST_MODELS))))
+        self.assertEqual(1, len(self.parsed))
+        self.assertEqual(1, len(model_hierarchy._hierarchies))
+
+        # Resolved models are memoized per set of trafo models, and returned as new lists
+        models = hierarchy.resolve(['D_I_I_V2_9_6', 'Catastro_V1'])
+        models.append('Other_V1')
+        self.assertEqual(hierarchy.resolve(['Catastro_V1', 'D_I_I_V2_9_6']),
+                         hierarchy.resolve(['D_I_I_V2_9_6', 'Catastro_V1']))
+        self.assertEqual(1, len(hierarchy._resolved))
+        self.assertNotIn('Other_V1', hierarchy.resolve(['D_I_I_V2_9_6', 'Catastro_V1']))
+
+    def test_changed_content(self):
+        hierarchy = get_model_hierarchy(LST_MODELS)
+
+        # E.g., after importing another model into the schema
+        lst_models = LST_MODELS + ["Edificios_V1{ Catastro_V1}"]
+        new_hierarchy = get_model_hierarchy(lst_models)
+        self.assertIsNot(hierarchy, new_hierarchy)
+        self.assertEqual(2, len(self.parsed))
+        self.assertEqual(['Catastro_V1', 'Edificios_V1'], new_hierarchy.resolve(['Edificios_V1']))
+        self.assertEqual(['Edificios_V1'], hierarchy.resolve(['Edificios_V1']))
+        self.assertIs(hierarchy, get_model_hierarchy(LST_MODELS))
+
+    def test_bounded_cache(self):
+        with mock.patch.object(model_hierarchy, 'MAX_CACHED_HIERARCHIES', 2):
+            first = get_model_hierarchy(["A_V1"])
+            second = get_model_hierarchy(["B_V1"])
+            self.assertIs(first, get_model_hierarchy(["A_V1"]))  # Now the most recently used
+            get_model_hierarchy(["C_V1"])
+
+            self.assertEqual(2, len(model_hierarchy._hierarchies))
+            self.assertIs(first, get_model_hierarchy(["A_V1"]))
+            self.assertIsNot(second, get_model_hierarchy(["B_V1"]))  # Evicted
+        self.assertEqual(4, len(self.parsed))
+
+
+if __name__ == '__main__':
+    nose2.main()
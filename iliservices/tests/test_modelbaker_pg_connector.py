@@ -0,0 +1,62 @@
+import nose2
+import unittest
+from unittest import mock
+
+from .test_pg_connection_pool import FakeConnection, FakeCursor
+from ..modelbaker.dbconnector import pg_connector
+from ..modelbaker.dbconnector.pg_connector import PGConnector
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ColumnsCursor(FakeCursor):
+    """
+    Answers every query with the columns of two tables.
+    """
+
+    def __iter__(self):
+        return iter([{'table_name': 'parcel', 'column_name': 't_id'},
+                     {'table_name': 'parcel', 'column_name': 'area'},
+                     {'table_name': 'building', 'column_name': 't_id'}])
+
+
+class ColumnsConnection(FakeConnection):
+    def cursor(self, *args, **kwargs):
+        return ColumnsCursor(self)
+
+
+class TestModelBakerPGConnector(unittest.TestCase):
+
+    def get_db_connector(self, metadata_exists):
+        with mock.patch.object(pg_connector.psycopg2, 'connect', side_effect=ColumnsConnection), \
+                mock.patch.object(PGConnector, '_metadata_exists', return_value=metadata_exists):
+            return PGConnector('dbname=fake', 'schema')
+
+    def test_fields_info_without_metadata(self):
+        db_connector = self.get_db_connector(False)
+
+        fields_info = db_connector.get_fields_info('parcel')
+        self.assertNotEqual([], fields_info)
+        query = db_connector.conn.queries[-1]
+        self.assertIn('information_schema.columns', query)
+        self.assertNotIn('t_ili2db', query)
+
+        fields_info = db_connector.get_fields_info_by_table(['parcel', 'building'])
+        self.assertEqual(['t_id', 'area'], [field['column_name'] for field in fields_info['parcel']])
+        self.assertEqual(['t_id'], [field['column_name'] for field in fields_info['building']])
+        query = db_connector.conn.queries[-1]
+        self.assertIn('information_schema.columns', query)
+        self.assertNotIn('t_ili2db', query)
+
+    def test_fields_info_with_metadata(self):
+        db_connector = self.get_db_connector(True)
+
+        db_connector.get_fields_info('parcel')
+        self.assertIn('t_ili2db_column_prop', db_connector.conn.queries[-1])
+        db_connector.get_fields_info_by_table(['parcel', 'building'])
+        self.assertIn('t_ili2db_column_prop', db_connector.conn.queries[-1])
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,180 @@
+import nose2
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from ..modelbaker.iliwrapper import modeldirindex
+from ..modelbaker.iliwrapper.modeldirindex import ModelDirectoryIndex
+
+import logging
+logger = logging.getLogger(__name__)
+
+ILI_MODEL = """INTERLIS 2.3;
+
+MODEL {name} (en) AT "mailto:test@example.com" VERSION "2026-10-18" =
+END {name}.
+"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestModelDirectoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        self.root = os.path.join(self.base_dir, 'models')
+        self.index_path = os.path.join(self.base_dir, 'cache', 'modeldirindex.json')
+        self.add_model('A', 'a')
+        self.add_model('B', os.path.join('a', 'b'))
+        os.makedirs(os.path.join(self.root, 'empty'))
+
+        self.clock = FakeClock()
+        self.scanned_directories = list()
+        self.parsed_files = list()
+        scan_directory = ModelDirectoryIndex._scan_directory
+        read_ili_model_names = modeldirindex.read_ili_model_names
+
+        def scan(directory, mtime, previous_entry):
+            self.scanned_directories.append(os.path.relpath(directory, self.root))
+            return scan_directory(directory, mtime, previous_entry)
+
+        def read(ilipath):
+            self.parsed_files.append(os.path.basename(ilipath))
+            return read_ili_model_names(ilipath)
+
+        for patcher in [mock.patch.object(modeldirindex, 'time', self.clock),
+                        mock.patch.object(ModelDirectoryIndex, '_scan_directory', side_effect=scan),
+                        mock.patch.object(modeldirindex, 'read_ili_model_names', side_effect=read)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add_model(self, name, directory):
+        directory = os.path.join(self.root, directory)
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, '{}.ili'.format(name))
+        with open(file_path, 'w') as f:
+            f.write(ILI_MODEL.format(name=name))
+        return file_path
+
+    def get_expected_directories(self, *directories):
+        return [os.path.join(self.root, directory) for directory in directories]
+
+    def test_model_directories(self):
+        index = ModelDirectoryIndex(self.index_path)
+        self.assertEqual(self.get_expected_directories('a', os.path.join('a', 'b')),
+                         index.get_model_directories(self.root))
+        self.assertEqual(['.', 'a', os.path.join('a', 'b'), 'empty'], sorted(self.scanned_directories))
+
+        models = index.get_models(self.root)
+        self.assertEqual({os.path.join(self.root, 'a', 'A.ili'): ['A'],
+                          os.path.join(self.root, 'a', 'b', 'B.ili'): ['B']}, models)
+        self.assertTrue(os.path.isfile(self.index_path))
+
+        # Hit: models are parsed once, and the tree is not listed again
+        del self.scanned_directories[:]
+        self.assertEqual(models, index.get_models(self.root))
+        self.assertEqual(['A.ili', 'B.ili'], sorted(self.parsed_files))
+        self.assertEqual([], self.scanned_directories)
+
+    def test_refresh_interval(self):
+        index = ModelDirectoryIndex(self.index_path)
+        index.get_model_directories(self.root)
+        self.add_model('C', 'c')
+
+        # Within the interval, the tree is not checked for changes
+        self.clock.now += modeldirindex.DEFAULT_REFRESH_INTERVAL - 1
+        self.assertNotIn(os.path.join(self.root, 'c'), index.get_model_directories(self.root))
+
+        # Then only the changed directories are listed again
+        del self.scanned_directories[:]
+        self.clock.now += 1
+        self.assertIn(os.path.join(self.root, 'c'), index.get_model_directories(self.root))
+        self.assertEqual(['.', 'c'], sorted(self.scanned_directories))
+
+        # Unless the refresh is forced or the tree is invalidated
+        self.add_model('D', 'd')
+        self.assertIn(os.path.join(self.root, 'd'), index.get_model_directories(self.root, force_refresh=True))
+        self.add_model('E', 'e')
+        index.invalidate(self.root)
+        self.assertIn(os.path.join(self.root, 'e'), index.get_model_directories(self.root))
+        self.add_model('F', 'f')
+        index.invalidate()
+        self.assertIn(os.path.join(self.root, 'f'), index.get_model_directories(self.root))
+
+    def test_changed_and_removed_files(self):
+        index = ModelDirectoryIndex(self.index_path, refresh_interval=0)
+        index.get_models(self.root)
+
+        file_path = self.add_model('A2', 'a')
+        os.utime(file_path, (1, 1))
+        shutil.rmtree(os.path.join(self.root, 'a', 'b'))
+        del self.parsed_files[:]
+
+        self.assertEqual({os.path.join(self.root, 'a', 'A.ili'): ['A'],
+                          file_path: ['A2']}, index.get_models(self.root))
+        self.assertEqual(['A2.ili'], self.parsed_files)
+        self.assertEqual(self.get_expected_directories('a'), index.get_model_directories(self.root))
+
+        # A file rewritten in place is parsed again
+        with open(file_path, 'w') as f:
+            f.write(ILI_MODEL.format(name='Renamed'))
+        os.utime(file_path, (2, 2))
+        self.assertEqual(['Renamed'], index.get_models(self.root)[file_path])
+
+    def test_persisted_index(self):
+        index = ModelDirectoryIndex(self.index_path)
+        models = index.get_models(self.root)
+        del self.scanned_directories[:]
+        del self.parsed_files[:]
+
+        # E.g., after a restart: the tree is checked, but unchanged directories and files are not read again
+        index = ModelDirectoryIndex(self.index_path)
+        self.assertEqual(models, index.get_models(self.root))
+        self.assertEqual([], self.scanned_directories)
+        self.assertEqual([], self.parsed_files)
+
+    def test_unreadable_index(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, 'w') as f:
+            f.write('{"version": 1, "directories": ')
+
+        index = ModelDirectoryIndex(self.index_path)
+        with self.assertLogs(modeldirindex.logger, 'WARNING'):
+            models = index.get_models(self.root)
+        self.assertEqual([['A'], ['B']], sorted(models.values()))
+
+        # It's rebuilt
+        with open(self.index_path) as f:
+            self.assertEqual(modeldirindex.INDEX_FORMAT_VERSION, json.load(f)['version'])
+
+        # Indexes of another format are ignored
+        with open(self.index_path, 'w') as f:
+            json.dump({'version': 0, 'directories': {self.root: 'unknown'}}, f)
+        del self.parsed_files[:]
+        self.assertEqual(models, ModelDirectoryIndex(self.index_path).get_models(self.root))
+        self.assertEqual(['A.ili', 'B.ili'], sorted(self.parsed_files))
+
+    def test_memory_only_index(self):
+        index = ModelDirectoryIndex(None)
+        self.assertEqual(self.get_expected_directories('a', os.path.join('a', 'b')),
+                         index.get_model_directories(self.root))
+        self.assertFalse(os.path.exists(os.path.dirname(self.index_path)))
+
+    def test_missing_root(self):
+        index = ModelDirectoryIndex(self.index_path)
+        self.assertEqual([], index.get_model_directories(os.path.join(self.base_dir, 'missing')))
+        self.assertEqual(dict(), index.get_models(os.path.join(self.base_dir, 'missing')))
+
+
+if __name__ == '__main__':
+    nose2.main()
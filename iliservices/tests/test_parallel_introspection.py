@@ -0,0 +1,127 @@
+import nose2
+import unittest
+import sqlite3
+import threading
+
+from .utils import (FakeDbFactory,
+                    FakeDbSimpleFactory,
+                    FakeGeneratorConnector,
+                    get_fake_generator,
+                    get_generation_structure)
+
+from ..modelbaker.generator import generator as generator_module
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ConcurrentConnector(FakeGeneratorConnector):
+    """
+    FakeGeneratorConnector that supports parallel introspection. Every connector created is kept in connectors, the
+    first one being the connector of the Generator. The other ones (the pooled connectors) raise pooled_error, if set,
+    when asked for the BAG OF info.
+    """
+    connectors = list()
+    pooled_error = None
+
+    def __init__(self, uri, schema):
+        FakeGeneratorConnector.__init__(self, uri, schema)
+        self.concurrent_introspection = True
+        self.driver_errors = (sqlite3.Error,)
+        self.thread_names = set()
+        self.closed = False
+        ConcurrentConnector.connectors.append(self)
+
+    def get_tables_info(self):
+        self.thread_names.add(threading.current_thread().name)
+        return FakeGeneratorConnector.get_tables_info(self)
+
+    def get_ignored_layers(self, *args):
+        self.queries.append('ignored_layers')
+        self.thread_names.add(threading.current_thread().name)
+        return FakeGeneratorConnector.get_ignored_layers(self, *args)
+
+    def get_bags_of_info(self):
+        if self.pooled_error and self is not ConcurrentConnector.connectors[0]:
+            raise self.pooled_error
+        return FakeGeneratorConnector.get_bags_of_info(self)
+
+    def close_connection(self):
+        self.closed = True
+
+
+class ConcurrentDbFactory(FakeDbFactory):
+    connector_class = ConcurrentConnector
+
+
+class ConcurrentDbSimpleFactory(FakeDbSimpleFactory):
+    db_factory_class = ConcurrentDbFactory
+
+
+class TestParallelIntrospection(unittest.TestCase):
+
+    def setUp(self):
+        ConcurrentConnector.connectors = list()
+        self.addCleanup(setattr, ConcurrentConnector, 'pooled_error', None)
+
+    def get_generator(self, **kwargs):
+        return get_fake_generator(ConcurrentDbSimpleFactory, parallel_introspection=True, **kwargs)
+
+    def test_prefetched_generation(self):
+        for kwargs in [dict(), dict(bulk_introspection=False)]:
+            ConcurrentConnector.connectors = list()
+            expected = get_generation_structure(*get_fake_generator(**kwargs).generate(use_cache=False))
+
+            generator = self.get_generator(**kwargs)
+            self.assertEqual(expected, get_generation_structure(*generator.generate(use_cache=False)))
+
+            # The metadata, even the ignored layers, comes from the pooled connectors, which are closed afterwards.
+            # Without bulk introspection, the Generator still queries fields, range and value map info table by table
+            main_connector = ConcurrentConnector.connectors[0]
+            self.assertIs(generator._db_connector, main_connector)
+            per_table_queries = {'fields_info', 'min_max_info', 'value_map_info'} if kwargs else set()
+            self.assertEqual(per_table_queries, set(main_connector.queries))
+            self.assertEqual(set(), main_connector.thread_names)
+
+            pooled_connectors = ConcurrentConnector.connectors[1:]
+            self.assertTrue(pooled_connectors)
+            self.assertTrue(all(connector.closed for connector in pooled_connectors))
+            queries = sum([connector.queries for connector in pooled_connectors], [])
+            self.assertIn('ignored_layers', queries)
+            self.assertEqual(1, queries.count('tables_info'))
+
+            # Nothing is kept after the generation
+            self.assertEqual(dict(), generator._prefetched)
+
+    def test_filtered_generation(self):
+        expected = get_generation_structure(*get_fake_generator().generate(['parcel', 'building'], use_cache=False))
+        generator = self.get_generator()
+        self.assertEqual(expected,
+                         get_generation_structure(*generator.generate(['parcel', 'building'], use_cache=False)))
+        self.assertEqual([], ConcurrentConnector.connectors[0].queries)
+
+    def test_fallback_on_db_errors(self):
+        expected = get_generation_structure(*get_fake_generator().generate(use_cache=False))
+        generator = self.get_generator()
+        ConcurrentConnector.pooled_error = sqlite3.OperationalError('connection lost')
+
+        with self.assertLogs(generator_module.logger, 'WARNING') as logs:
+            result = generator.generate(use_cache=False)
+        self.assertEqual(1, len(logs.records))
+        self.assertIn("Metadata of the schema 'fake_schema' could not be fetched concurrently, it will be fetched "
+                      "sequentially: connection lost", logs.output[0])
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+        # The Generator queried the DB itself
+        self.assertEqual(expected, get_generation_structure(*result))
+        self.assertIn('tables_info', ConcurrentConnector.connectors[0].queries)
+
+    def test_bugs_are_raised(self):
+        generator = self.get_generator()
+        ConcurrentConnector.pooled_error = KeyError('current_layer_name')
+        with self.assertRaises(KeyError):
+            generator.generate(use_cache=False)
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,111 @@
+import nose2
+import unittest
+import glob
+import json
+import os
+import shutil
+import tempfile
+
+from .utils import get_test_path
+
+from ..config.general_config import CUSTOM_MODEL_DIR
+from ..modelbaker.generator import parsed_model_cache
+from ..modelbaker.generator.domain_relations_generator import DomainRelationGenerator
+from ..modelbaker.generator.parsed_model_cache import get_parsed_model
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def read_model(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin1')
+
+
+def get_expected_results():
+    """
+    parse_model output for the bundled models, as given by the original (line by line, multi-pass) implementation.
+    Each model is parsed with the enumeration domains it defines and with the ones of all the bundled models.
+    """
+    with open(get_test_path('parse_model/expected_parse_model.json')) as f:
+        return json.load(f)
+
+
+class TestParsedModelCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.expected = get_expected_results()
+        cls.generator = DomainRelationGenerator(None, 'smart2')
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, True)
+        parsed_model_cache.set_parsed_model_store_path(os.path.join(self.base_dir, 'parsed_models.sqlite'))
+        self.addCleanup(parsed_model_cache.set_parsed_model_store_path, parsed_model_cache.DEFAULT_STORE_PATH)
+        parsed_model_cache.clear_parsed_model_cache()
+        self.addCleanup(parsed_model_cache.clear_parsed_model_cache)
+
+        self.parsed_models = list()
+
+    def parse(self, model_content, domains):
+        self.parsed_models.append(model_content)
+        return self.generator.parse_model(model_content, domains)
+
+    def test_parse_model_parity(self):
+        paths = sorted(glob.glob(os.path.join(CUSTOM_MODEL_DIR, '*.ili')))
+        self.assertEqual(sorted(self.expected['models']), [os.path.basename(path) for path in paths])
+
+        for path in paths:
+            expected = self.expected['models'][os.path.basename(path)]
+            content = read_model(path)
+            for domains, expected_parsed in [(expected['domains'], expected['parsed']),
+                                             (self.expected['all_domains'], expected['parsed_with_all_domains'])]:
+                parsed = self.generator.parse_model(content, domains)
+                self.assertEqual(expected_parsed, json.loads(json.dumps(parsed)), os.path.basename(path))
+
+    def test_cached_parse_model(self):
+        path = os.path.join(CUSTOM_MODEL_DIR, 'LADM_COL_v_2_0_0_Ext_POT.ili')
+        content = read_model(path)
+        domains = self.expected['models'][os.path.basename(path)]['domains']
+        expected = json.loads(json.dumps(self.generator.parse_model(content, domains)))
+        self.assertTrue(expected[0] and expected[1] and expected[2])
+
+        self.assertEqual(expected, get_parsed_model('LADM_COL_V2', content, domains, self.parse))
+        self.assertEqual(1, len(self.parsed_models))
+
+        # Hit, with a new copy on each call, since callers modify it
+        cached = get_parsed_model('LADM_COL_V2', content, domains, self.parse)
+        self.assertEqual(expected, cached)
+        cached[0].clear()
+        cached[2]['changed'] = True
+        self.assertEqual(expected, get_parsed_model('LADM_COL_V2', content, domains, self.parse))
+        self.assertEqual(1, len(self.parsed_models))
+
+        # Hit from the disk store, e.g., after a restart
+        parsed_model_cache.clear_parsed_model_cache()
+        self.assertEqual(expected, get_parsed_model('LADM_COL_V2', content, domains, self.parse))
+        self.assertEqual(1, len(self.parsed_models))
+
+        # Other domains or another model content are parsed again
+        get_parsed_model('LADM_COL_V2', content, domains[:3], self.parse)
+        get_parsed_model('LADM_COL_V2', content.replace('!!', '!! changed '), domains, self.parse)
+        self.assertEqual(3, len(self.parsed_models))
+
+    def test_memory_only_cache(self):
+        parsed_model_cache.set_parsed_model_store_path(None)
+        content = read_model(os.path.join(CUSTOM_MODEL_DIR, 'LADM_COL_v_4_0_1_Nucleo.ili'))
+        domains = self.expected['all_domains']
+
+        first = get_parsed_model('LADM_COL_V4', content, domains, self.parse)
+        self.assertEqual(first, get_parsed_model('LADM_COL_V4', content, domains, self.parse))
+        self.assertEqual(1, len(self.parsed_models))
+        self.assertEqual([], os.listdir(self.base_dir))
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -0,0 +1,139 @@
+import nose2
+import unittest
+import time
+from unittest import mock
+
+import psycopg2.extensions
+
+from ..db import pg_connection_pool
+from ..db.pg_connection_pool import (PGConnectionPool,
+                                     PoolTimeoutError,
+                                     close_pg_connection_pools)
+from ..db.pg_connector import PGConnector
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class FakeCursor:
+    """
+    Answers every query with the same row, like a schema that exists and a user with all privileges.
+    """
+
+    rowcount = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, *args):
+        self.connection.queries.append(query)
+
+    def fetchone(self):
+        return (1, 1)
+
+    def fetchall(self):
+        return [(1, 1)]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeConnection:
+    """
+    Stands for a psycopg2 connection, so that the pool can be tested without a PostgreSQL server.
+    """
+
+    def __init__(self, uri, connection_factory=None):
+        self.uri = uri
+        self.closed = 0
+        self.autocommit = False
+        self.queries = list()
+        self.rollbacks = 0
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class TestPGConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(pg_connection_pool.psycopg2, 'connect', side_effect=FakeConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pg_connection_pools)
+
+    def test_bounded_checkout(self):
+        pool = PGConnectionPool('dbname=fake', min_size=0, max_size=2)
+        conn_1 = pool.checkout()
+        conn_2 = pool.checkout()
+        with self.assertRaises(PoolTimeoutError):
+            pool.checkout(timeout=0.1)
+
+        # Checked in connections are reused
+        pool.checkin(conn_1)
+        self.assertIs(pool.checkout(timeout=0.1), conn_1)
+        pool.checkin(conn_1)
+        pool.checkin(conn_2)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_unbounded_checkout(self):
+        pool = PGConnectionPool('dbname=fake', min_size=0, max_size=2)
+        long_lived = [pool.checkout(timeout=0.1, bounded=False) for i in range(5)]
+        self.assertEqual(pool.size, 0)
+
+        # Long-lived connections don't take slots of the pool
+        conn_1 = pool.checkout(timeout=0.1)
+        conn_2 = pool.checkout(timeout=0.1)
+        pool.checkin(conn_1)
+        pool.checkin(conn_2)
+
+        # Once returned, they are kept only up to max_size
+        for conn in long_lived:
+            pool.checkin(conn)
+        self.assertEqual(pool.size, 2)
+        self.assertEqual(len([conn for conn in long_lived if conn.closed]), 5)
+
+    def test_connectors_beyond_pool_size(self):
+        max_size = pg_connection_pool.PG_POOL_MAX_SIZE
+        conn_dict = {'host': 'localhost', 'port': '5432', 'database': 'fake', 'username': 'user',
+                     'password': 'pass', 'schema': 'schema'}
+
+        connectors = list()
+        start_time = time.monotonic()
+        for i in range(max_size + 2):
+            db = PGConnector(None, conn_dict=conn_dict)
+            res, msg = db.open_connection()
+            self.assertTrue(res, msg)
+            connectors.append(db)
+
+        # A connector keeps its connection, and can still borrow another one from the pool
+        res, msg = connectors[0].has_schema_privileges(connectors[0].uri, 'schema')
+        self.assertTrue(res, msg)
+        self.assertLess(time.monotonic() - start_time, 5)
+
+        for db in connectors:
+            db.close_connection()
+
+
+if __name__ == '__main__':
+    nose2.main()
@@ -16,9 +16,13 @@
  *                                                                         *
  ***************************************************************************/
 """
+import copy
+import hashlib
+import json
 import os
 import psycopg2
 import shutil
+from unittest import mock
 
 from ..config.config_db_supported import ConfigDBsSupported
 from ..config.general_config import (ILISERVICES_DB_NAME,
@@ -26,6 +30,12 @@ from ..config.general_config import (ILISERVICES_DB_NAME,
                                      ILISERVICES_DB_PASS,
                                      ILISERVICES_DB_PORT,
                                      ILISERVICES_DB_HOST)
+from ..modelbaker.dataobjects.records import structure_as_dict
+from ..modelbaker.dbconnector.db_connector import DBConnector
+from ..modelbaker.generator import generation_cache
+from ..modelbaker.generator import generator as generator_module
+from ..modelbaker.generator.generator import Generator
+from ..modelbaker.iliwrapper.globals import DbIliMode
 
 
 dbs_supported = ConfigDBsSupported()
@@ -82,4 +92,234 @@ def get_gpkg_conn_from_path(path):
     dict_conn['dbfile'] = path
     db = get_opened_db_connector_for_tests('gpkg', dict_conn)
 
-    return db
\ No newline at end of file
+    return db
+
+
+# Fake schema, connector and factories, so that the Generator can be run without a DB
+SCHEMA = 'fake_schema'
+
+TABLES_INFO = [
+    {'schemaname': SCHEMA, 'tablename': 'parcel', 'geometry_column': 'geometry', 'srid': 9377,
+     'type': 'MULTIPOLYGON', 'extent': '4800000;1900000;4900000;2000000', 'ili_name': 'Cadastre.Parcels.Parcel',
+     'kind_settings': 'CLASS', 'coord_decimals': 3, 'base_topic': 'Cadastre.Parcels', 'relevance': True},
+    {'schemaname': SCHEMA, 'tablename': 'parcel', 'geometry_column': 'reference_point', 'srid': 9377,
+     'type': 'POINT', 'extent': None, 'ili_name': 'Cadastre.Parcels.Parcel', 'kind_settings': 'CLASS',
+     'base_topic': 'Cadastre.Parcels', 'relevance': True},
+    {'schemaname': SCHEMA, 'tablename': 'building', 'geometry_column': 'geometry', 'srid': 9377,
+     'type': 'POLYGON', 'extent': None, 'ili_name': 'Cadastre.Parcels.Building', 'kind_settings': 'CLASS',
+     'base_topic': 'Cadastre.Parcels', 'relevance': True},
+    {'schemaname': SCHEMA, 'tablename': 'owner', 'geometry_column': None, 'type': None,
+     'ili_name': 'Cadastre.Parcels.Owner', 'kind_settings': 'CLASS', 'base_topic': 'Cadastre.Parcels',
+     'relevance': False},
+    {'schemaname': SCHEMA, 'tablename': 'parcel_type', 'geometry_column': None, 'type': None,
+     'ili_name': 'Cadastre.ParcelType', 'kind_settings': 'ENUM'},
+    {'schemaname': SCHEMA, 'tablename': 't_ili2db_settings', 'geometry_column': None, 'type': None},
+]
+
+FIELDS_INFO = {
+    'parcel': [
+        {'column_name': 't_id', 'data_type': 'bigint'},
+        {'column_name': 't_ili_tid', 'data_type': 'uuid', 'oid_domain': 'INTERLIS.UUIDOID'},
+        {'column_name': 'number', 'data_type': 'character varying', 'column_alias': 'Parcel number',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.Number'},
+        {'column_name': 'area', 'data_type': 'numeric', 'numeric_scale': 1, 'unit': 'm2',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.Area'},
+        {'column_name': 'parcel_type', 'data_type': 'bigint', 'enum_domain': 'Cadastre.ParcelType',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.Type'},
+        {'column_name': 'registration_date', 'data_type': 'date',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.RegistrationDate'},
+        {'column_name': 'geometry', 'data_type': 'geometry',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.Geometry'},
+        {'column_name': 'reference_point', 'data_type': 'geometry',
+         'fully_qualified_name': 'Cadastre.Parcels.Parcel.ReferencePoint'},
+    ],
+    'building': [
+        {'column_name': 't_id', 'data_type': 'bigint'},
+        {'column_name': 'parcel', 'data_type': 'bigint'},
+        {'column_name': 'notes', 'data_type': 'text', 'texttype': 'MTEXT'},
+        {'column_name': 'geometry', 'data_type': 'geometry'},
+    ],
+    'owner': [
+        {'column_name': 't_id', 'data_type': 'bigint'},
+        {'column_name': 'name', 'data_type': 'character varying',
+         'fully_qualified_name': 'Cadastre.Parcels.Owner.Name'},
+        {'column_name': 'parcel', 'data_type': 'bigint'},
+    ],
+    'parcel_type': [
+        {'column_name': 't_id', 'data_type': 'bigint'},
+        {'column_name': 'ilicode', 'data_type': 'character varying'},
+        {'column_name': 'dispname', 'data_type': 'character varying'},
+    ],
+}
+
+MIN_MAX_INFO = {'parcel': {'area': (0, 1000000)}}
+VALUE_MAP_INFO = {'owner': {'name': ['A', 'B']}}
+
+RELATIONS_INFO = [
+    {'constraint_name': 'building_parcel_fkey', 'referencing_table': 'building', 'referencing_column': 'parcel',
+     'referenced_table': 'parcel', 'referenced_column': 't_id', 'strength': 'COMPOSITE', 'cardinality_max': '1'},
+    {'constraint_name': 'owner_parcel_fkey', 'referencing_table': 'owner', 'referencing_column': 'parcel',
+     'referenced_table': 'parcel', 'referenced_column': 't_id', 'strength': '', 'cardinality_max': '1'},
+    {'constraint_name': 'parcel_parcel_type_fkey', 'referencing_table': 'parcel', 'referencing_column': 'parcel_type',
+     'referenced_table': 'parcel_type', 'referenced_column': 't_id', 'strength': '', 'cardinality_max': '1'},
+]
+
+META_ATTRS_INFO = [
+    {'ilielement': 'Cadastre.Parcels.Parcel', 'attr_name': 'dispExpression', 'attr_value': 'number'},
+    {'ilielement': 'Cadastre.Parcels.Parcel.RegistrationDate', 'attr_name': 'hidden', 'attr_value': 'True'},
+]
+
+BAGS_OF_INFO = [
+    {'current_layer_name': 'owner', 'attribute': 'parcel_types', 'target_layer_name': 'parcel_type',
+     'cardinality_min': '0', 'cardinality_max': '*'},
+]
+
+ILINAME_DBNAME_MAPPING = [
+    {'iliname': 'Cadastre.Parcels.Parcel', 'sqlname': 'parcel'},
+    {'iliname': 'Cadastre.Parcels.Building', 'sqlname': 'building'},
+    {'iliname': 'Cadastre.Parcels.Owner', 'sqlname': 'owner'},
+    {'iliname': 'Cadastre.ParcelType', 'sqlname': 'parcel_type'},
+]
+
+
+class FakeGeneratorConnector(DBConnector):
+    """
+    In-memory schema (two classes with geometries, a class without geometry and a domain) for the Generator, so
+    that it can be run without a DB. Every metadata call is recorded in queries.
+    """
+
+    def __init__(self, uri, schema):
+        DBConnector.__init__(self, uri, schema)
+        self.schema = schema
+        self.tid = 't_id'
+        self.tilitid = 't_ili_tid'
+        self.dispName = 'dispname'
+        self.basket_table_name = 't_ili2db_basket'
+        self.dataset_table_name = 't_ili2db_dataset'
+        self.tables_info = copy.deepcopy(TABLES_INFO)
+        self.fields_info = copy.deepcopy(FIELDS_INFO)
+        self.queries = list()
+
+    def get_tables_info(self):
+        self.queries.append('tables_info')
+        return copy.deepcopy(self.tables_info)
+
+    def get_meta_attrs_info(self):
+        self.queries.append('meta_attrs_info')
+        return copy.deepcopy(META_ATTRS_INFO)
+
+    def get_meta_attrs(self, ili_name):
+        self.queries.append('meta_attrs')
+        return [record for record in META_ATTRS_INFO if record['ilielement'] == ili_name]
+
+    def get_fields_info(self, table_name):
+        self.queries.append('fields_info')
+        return copy.deepcopy(self.fields_info.get(table_name, []))
+
+    def get_min_max_info(self, table_name):
+        self.queries.append('min_max_info')
+        return copy.deepcopy(MIN_MAX_INFO.get(table_name, {}))
+
+    def get_value_map_info(self, table_name):
+        self.queries.append('value_map_info')
+        return copy.deepcopy(VALUE_MAP_INFO.get(table_name, {}))
+
+    def get_relations_info(self, filter_layer_list=[]):
+        self.queries.append('relations_info')
+        return [copy.deepcopy(record) for record in RELATIONS_INFO
+                if not filter_layer_list or record['referencing_table'] in filter_layer_list]
+
+    def get_bags_of_info(self):
+        self.queries.append('bags_of_info')
+        return copy.deepcopy(BAGS_OF_INFO)
+
+    def get_iliname_dbname_mapping(self, sqlnames=list()):
+        self.queries.append('iliname_dbname_mapping')
+        return copy.deepcopy(ILINAME_DBNAME_MAPPING)
+
+    def map_data_types(self, data_type):
+        return {'date': self.QGIS_DATE_TYPE}.get(data_type, data_type)
+
+    def ili_version(self):
+        return 4
+
+    def metadata_exists(self):
+        return True
+
+    def get_schema_fingerprint(self):
+        self.queries.append('schema_fingerprint')
+        content = json.dumps([self.tables_info, self.fields_info], sort_keys=True)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class FakeLayerUri:
+    provider = 'postgres'
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.pg_estimated_metadata = False
+
+    def get_connection_uri(self):
+        return self.uri
+
+    def get_data_source_uri(self, record):
+        return '{} table="{}"."{}" ({})'.format(self.uri, record['schemaname'], record['tablename'],
+                                                record['geometry_column'])
+
+
+class FakeDbFactory:
+    connector_class = FakeGeneratorConnector
+
+    def get_db_connector(self, uri, schema):
+        return self.connector_class(uri, schema)
+
+    def get_layer_uri(self, uri):
+        return FakeLayerUri(uri)
+
+    def customize_widget_editor(self, field, data_type):
+        if data_type == 'boolean':
+            field.widget = 'CheckBox'
+
+
+class FakeDbSimpleFactory:
+    db_factory_class = FakeDbFactory
+
+    def create_factory(self, tool):
+        return self.db_factory_class()
+
+
+def get_fake_generator(db_simple_factory_class=FakeDbSimpleFactory, uri='dbname=fake', **kwargs):
+    """
+    :return: Headless Generator (with the given Generator arguments) running on a FakeGeneratorConnector.
+    """
+    with mock.patch.object(generator_module, 'DbSimpleFactory', db_simple_factory_class):
+        return Generator(DbIliMode.ili2pg, uri, 'smart2', SCHEMA, headless=True, **kwargs)
+
+
+def get_generation_structure(layers, relations, bags_of_enum, legend):
+    """
+    :return: JSON serializable definition of a generation result, built from the dump() of every layer, field,
+             relation and legend group (layers are given by index wherever they are referenced).
+    """
+    layer_indexes = {id(layer): i for i, layer in enumerate(layers)}
+
+    def legend_group(group):
+        return {'dump': group.dump(),
+                'attributes': [getattr(group, attribute) for attribute in generation_cache.LEGEND_GROUP_ATTRIBUTES],
+                'items': [legend_group(item) if hasattr(item, 'items') else layer_indexes[id(item)]
+                          for item in group.items]}
+
+    structure = structure_as_dict(layers, relations, legend)
+    structure['layer_dumps'] = [layer.dump() for layer in layers]
+    structure['field_dumps'] = [[field.dump() for field in layer.fields] for layer in layers]
+    structure['relation_dumps'] = [
+        dict(relation.dump(), referencingLayer=layer_indexes[id(relation.referencing_layer)],
+             referencedLayer=layer_indexes[id(relation.referenced_layer)], name=relation.name)
+        for relation in relations]
+    structure['legend_groups'] = legend_group(legend)
+    structure['bags_of_enum'] = {
+        layer_name: {attribute: [layer_indexes[id(item)] if i in (0, 2) else item for i, item in enumerate(items)]
+                     for attribute, items in attributes.items()}
+        for layer_name, attributes in bags_of_enum.items()}
+
+    return json.loads(json.dumps(structure, default=str))
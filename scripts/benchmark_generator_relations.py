@@ -0,0 +1,123 @@
+"""
+Benchmark of Generator.relations on a synthetic schema with thousands of FK relations.
+
+The schema mimics a large LADM-COL one: class tables with many fields, several layers per geometric table, domain
+tables referenced from most classes (some through extended domains) and a given number of FK relations. The DB
+connector is replaced by an in-memory one, so only the Generator work is measured.
+
+Usage (from the repository root, in an environment with QGIS, or without it if --headless is given):
+    python scripts/benchmark_generator_relations.py [--relations 2000] [--repeat 5] [--headless]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QObject  # noqa: E402
+
+from iliservices.modelbaker.generator.generator import Generator  # noqa: E402
+from iliservices.modelbaker.generator.object_factory import get_object_factory  # noqa: E402
+from iliservices.modelbaker.utils.globals import OptimizeStrategy  # noqa: E402
+
+
+class InMemoryConnector:
+    def __init__(self, relations_info, iliname_dbname_mapping):
+        self.relations_info = relations_info
+        self.iliname_dbname_mapping = iliname_dbname_mapping
+        self.tid = "t_id"
+        self.dispName = "dispname"
+
+    def get_relations_info(self, filter_layer_list=[]):
+        return self.relations_info
+
+    def get_iliname_dbname_mapping(self, sqlnames=list()):
+        return self.iliname_dbname_mapping
+
+    def get_bags_of_info(self):
+        return []
+
+    def ili_version(self):
+        return 4
+
+
+def build_schema(object_factory, num_relations, num_classes=800, num_domains=300, fields_per_class=60, seed=1):
+    random.seed(seed)
+    layers = list()
+    iliname_dbname_mapping = list()
+    classes = ["clase_{}".format(i) for i in range(num_classes)]
+    domains = ["dominio_{}".format(i) for i in range(num_domains)]
+
+    for i, name in enumerate(classes):
+        iliname_dbname_mapping.append({"iliname": "Modelo.Tema.Clase{}".format(i), "sqlname": name})
+        # Some tables have several geometry columns, i.e., several layers
+        for geometry_column in ["geometria", "punto"][: 1 + (i % 4 == 0)]:
+            layer = object_factory.create_layer(name=name, geometry_column=geometry_column, is_relevant=i % 5 != 0)
+            for j in range(fields_per_class):
+                layer.fields.append(object_factory.create_field("campo_{}".format(j)))
+            layers.append(layer)
+
+    for i, name in enumerate(domains):
+        iliname_dbname_mapping.append({"iliname": "Modelo.Tema.Dominio{}".format(i), "sqlname": name})
+        layers.append(object_factory.create_layer(name=name, is_domain=True))
+
+    relations_info = list()
+    for i in range(num_relations):
+        referencing_table = random.choice(classes)
+        column = "campo_{}".format(random.randrange(fields_per_class))
+        if i % 2:  # Half of the FKs point to domains
+            referenced_table = random.choice(domains)
+            for layer in layers:
+                if layer.name == referencing_table:
+                    for field in layer.fields:
+                        if field.name == column:
+                            # Extended domains are not in the class mapping
+                            field.enum_domain = "Modelo.Tema.Dominio{}{}".format(
+                                referenced_table.split("_")[-1], "" if i % 3 else ".Extendido"
+                            )
+        else:
+            referenced_table = random.choice(classes)
+        relations_info.append({
+            "constraint_name": "{}_{}_fkey".format(referencing_table, i),
+            "referencing_table": referencing_table,
+            "referencing_column": column,
+            "referenced_table": referenced_table,
+            "referenced_column": "t_id",
+            "strength": "COMPOSITE" if i % 7 == 0 else "",
+            "cardinality_max": "1",
+        })
+
+    return layers, relations_info, iliname_dbname_mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--relations", type=int, default=2000, help="Number of FK relations in the schema")
+    parser.add_argument("--repeat", type=int, default=5, help="Times relations() is run (best time is reported)")
+    parser.add_argument("--headless", action="store_true", help="Build plain records instead of QGIS objects")
+    args = parser.parse_args()
+
+    object_factory = get_object_factory(args.headless)
+    layers, relations_info, iliname_dbname_mapping = build_schema(object_factory, args.relations)
+
+    generator = Generator.__new__(Generator)
+    QObject.__init__(generator)
+    generator._objects = object_factory
+    generator._db_connector = InMemoryConnector(relations_info, iliname_dbname_mapping)
+
+    for optimize_strategy in (OptimizeStrategy.NONE, OptimizeStrategy.HIDE):
+        generator.optimize_strategy = optimize_strategy
+        best = None
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            relations, bags_of_enum = generator.relations(layers)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print("{:<30} {:>6} layers {:>6} FKs {:>6} relations {:>9.2f} ms".format(
+            str(optimize_strategy), len(layers), len(relations_info), len(relations), best * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of DomainRelationGenerator.parse_model over the models in resources/ilimodels.
+
+Each model is parsed with the enumeration domains it defines (qualified as ili2db stores them), which is what
+get_domain_relations_info passes for ili2db 3 schemas. parse_model is called directly, so the parsed model cache
+is not involved.
+
+Usage (from the repository root, in an environment with QGIS):
+    python scripts/benchmark_parse_model.py [--repeat 5] [model_dir]
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from iliservices.config.general_config import CUSTOM_MODEL_DIR  # noqa: E402
+from iliservices.modelbaker.generator.domain_relations_generator import DomainRelationGenerator  # noqa: E402
+
+re_model = re.compile(r"^\s*MODEL\s+([\w-]+)")
+re_topic = re.compile(r"^\s*TOPIC\s+([\w-]+)")
+re_end_topic = re.compile(r"^\s*END\s+([\w-]+)\s*;")
+re_enum_domain = re.compile(r"^\s*([\w-]+)\s*(?:\(\s*\w+\s*\))?\s*=\s*\(")
+
+
+def read_model(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("latin1")
+
+
+def find_enum_domains(content):
+    domains = list()
+    model = topic = ""
+    within_domain = False
+    for line in content.splitlines():
+        result = re_model.search(line)
+        if result:
+            model = result.group(1)
+            continue
+        result = re_topic.search(line)
+        if result:
+            topic = result.group(1)
+            continue
+        result = re_end_topic.search(line)
+        if result and result.group(1) == topic:
+            topic = ""
+            continue
+        if line.strip().startswith("DOMAIN"):
+            within_domain = True
+        elif re.match(r"^\s*(CLASS|STRUCTURE|ASSOCIATION|UNIT|FUNCTION|TOPIC|END)\b", line):
+            within_domain = False
+        if within_domain:
+            result = re_enum_domain.search(line.replace("DOMAIN", ""))
+            if result:
+                domains.append(".".join(part for part in (model, topic, result.group(1)) if part))
+
+    return domains
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model_dir", nargs="?", default=CUSTOM_MODEL_DIR)
+    parser.add_argument("--repeat", type=int, default=5, help="Times each model is parsed (best time is reported)")
+    args = parser.parse_args()
+
+    generator = DomainRelationGenerator(None, "smart2")
+    total = 0
+    for path in sorted(glob.glob(os.path.join(args.model_dir, "**", "*.ili"), recursive=True)):
+        content = read_model(path)
+        domains = find_enum_domains(content)
+        best = None
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            parsed = generator.parse_model(content, domains)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        total += best
+        print("{:<45} {:>6} lines {:>4} domains {:>4} classes {:>9.2f} ms".format(
+            os.path.basename(path), len(content.splitlines()), len(domains), len(parsed[0]), best * 1000))
+
+    print("{:<45} {:>48.2f} ms".format("Total", total * 1000))
+
+
+if __name__ == "__main__":
+    main()